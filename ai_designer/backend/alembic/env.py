@@ -3,25 +3,28 @@ Alembic Environment Configuration
 """
 
 from logging.config import fileConfig
-from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy.ext.asyncio import async_engine_from_config
 from alembic import context
+import asyncio
 import sys
 from pathlib import Path
 
-# Add parent directory to path
-sys.path.append(str(Path(__file__).resolve().parents[0]))
+# Add backend directory to path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 # Import models
 from core.database import Base
 from models import *  # Import all models
+from models.search import SEARCH_COLUMNS, SEARCH_VECTOR_COLUMN, fts_table
 
 # this is the Alembic Config object
 config = context.config
 
 # Interpret the config file for Python logging
-if config.config_file_name is not None:
-    fileConfig(config.config_file_name)
+# (not when called in-process by core.migrations, which passes a connection)
+if config.config_file_name is not None and "connection" not in config.attributes:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
 
 # add your model's MetaData object here
 target_metadata = Base.metadata
@@ -32,10 +35,22 @@ target_metadata = Base.metadata
 # ... etc.
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    """Skip full-text search objects created by the migrations but not mapped
+    by the ORM (SQLite FTS5 tables, PostgreSQL search_vector column/index)"""
+    if type_ == "table" and reflected and compare_to is None:
+        return not name.startswith(tuple(fts_table(table) for table in SEARCH_COLUMNS))
+    if type_ == "column":
+        return name != SEARCH_VECTOR_COLUMN
+    if type_ == "index":
+        return not (name or "").endswith(f"_{SEARCH_VECTOR_COLUMN}")
+    return True
+
+
 def get_database_url():
-    """Get database URL from settings"""
+    """Get database URL: `alembic -x url=...` overrides settings"""
     from core.config import settings
-    return settings.DATABASE_URL
+    return context.get_x_argument(as_dictionary=True).get("url") or settings.DATABASE_URL
 
 
 def run_migrations_offline() -> None:
@@ -53,6 +68,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -61,29 +77,48 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
-def run_migrations_online() -> None:
-    """Run migrations in 'online' mode.
+def do_run_migrations(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        # SQLite不支持大部分ALTER TABLE，按表重建
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
 
-    In this scenario we need to create an Engine
-    and associate a connection with the context.
-    """
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    """Run migrations through the async driver configured in DATABASE_URL"""
     configuration = config.get_section(config.config_ini_section, {})
     configuration["sqlalchemy.url"] = get_database_url()
 
-    connectable = engine_from_config(
+    connectable = async_engine_from_config(
         configuration,
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
     )
 
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection,
-            target_metadata=target_metadata
-        )
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+
+    await connectable.dispose()
+
 
-        with context.begin_transaction():
-            context.run_migrations()
+def run_migrations_online() -> None:
+    """Run migrations in 'online' mode.
+
+    Uses the connection passed in `config.attributes["connection"]` when
+    called programmatically (core.migrations), otherwise creates an async
+    engine.
+    """
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        do_run_migrations(connection)
+    else:
+        asyncio.run(run_async_migrations())
 
 
 if context.is_offline_mode():
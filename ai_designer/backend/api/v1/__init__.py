@@ -9,6 +9,10 @@ from api.v1.endpoints import (
     code,
     aesthetic,
     health,
+    admin,
+    assets,
+    search,
+    templates,
 )
 
 router = APIRouter()
@@ -19,3 +23,7 @@ router.include_router(image.router, prefix="/image", tags=["Image Generation"])
 router.include_router(svg.router, prefix="/svg", tags=["SVG Generation"])
 router.include_router(code.router, prefix="/code", tags=["Code Generation"])
 router.include_router(aesthetic.router, prefix="/aesthetic", tags=["Aesthetic Engine"])
+router.include_router(assets.router, prefix="/assets", tags=["Asset Search"])
+router.include_router(search.router, prefix="/search", tags=["Search"])
+router.include_router(templates.router, prefix="/templates", tags=["Templates"])
+router.include_router(admin.router, prefix="/admin", tags=["Admin"])
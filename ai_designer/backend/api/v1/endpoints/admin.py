@@ -0,0 +1,91 @@
+"""
+Admin Endpoints
+运行时诊断 - 采样分析（需开启 PROFILER_ENABLED 并携带 X-Admin-Token）
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from loguru import logger
+
+from core.config import settings
+from core.profiler import SamplingProfiler, format_collapsed, profile_store, top_frames
+from core.security import verify_admin_token
+
+router = APIRouter()
+
+# 同一进程同时只允许一个定时采样
+_profile_lock = asyncio.Lock()
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """管理接口鉴权；未开启时表现为不存在"""
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not verify_admin_token(x_admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def _render_profile(profile: dict, format: str):
+    """按格式输出采样结果"""
+    if format == "json":
+        return {
+            **{k: v for k, v in profile.items() if k != "stacks"},
+            "top": top_frames(profile["stacks"]),
+            "stacks": profile["stacks"],
+        }
+
+    filename = f"profile-{int(time.time())}.folded"
+    return PlainTextResponse(
+        format_collapsed(profile["stacks"]),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/profile", dependencies=[Depends(require_admin)])
+async def run_profile(
+    seconds: float = Query(10.0, gt=0, description="Sampling duration in seconds"),
+    hz: int = Query(100, ge=1, le=1000, description="Samples per second"),
+    format: str = Query("collapsed", pattern="^(collapsed|json)$"),
+    include_idle: bool = Query(False, description="Keep samples of idle threads")
+):
+    """
+    Sample every thread of this worker for N seconds
+
+    Returns collapsed stacks (flamegraph.pl / speedscope) or a JSON summary.
+    """
+    if seconds > settings.PROFILER_MAX_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"seconds must be <= {settings.PROFILER_MAX_SECONDS}"
+        )
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profiling session is already running")
+
+    async with _profile_lock:
+        logger.info(f"Profiling worker for {seconds}s at {hz}Hz")
+        profiler = SamplingProfiler(hz=hz, include_idle=include_idle).start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            await asyncio.to_thread(profiler.stop)
+
+    return _render_profile(profiler.to_dict(), format)
+
+
+@router.get("/profile/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_request_profile(
+    profile_id: str,
+    format: str = Query("collapsed", pattern="^(collapsed|json)$")
+):
+    """
+    Get a per-request profile recorded via the X-Profile header
+    """
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    return _render_profile(profile, format)
@@ -0,0 +1,166 @@
+"""
+Asset Search Endpoints
+"""
+
+from fastapi import APIRouter, Depends, Header, HTTPException, UploadFile, File, Query, Request
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from typing import Optional, List
+import time
+from loguru import logger
+
+from core.config import settings
+from core.security import verify_admin_token
+from services.asset_index import EmbeddingUnavailable, asset_index
+
+router = APIRouter()
+
+
+async def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """修改索引与查看索引统计需要管理员令牌（未配置ADMIN_TOKEN时一律拒绝）"""
+    if not verify_admin_token(x_admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+class SimilarAsset(BaseModel):
+    """Similar asset"""
+    asset_id: str
+    similarity: float
+
+
+class AssetSearchResponse(BaseModel):
+    """Asset similarity search response"""
+    success: bool
+    results: List[SimilarAsset]
+    query_ms: float
+    request_id: Optional[str] = None
+
+
+class AssetIngestResponse(BaseModel):
+    """Asset ingest response"""
+    success: bool
+    asset_id: str
+    indexed: bool
+    duplicate_of: Optional[str] = None
+    similarity: Optional[float] = None
+    request_id: Optional[str] = None
+
+
+async def _read_image(image: UploadFile) -> bytes:
+    data = await image.read(settings.MAX_IMAGE_SIZE + 1)
+    if len(data) > settings.MAX_IMAGE_SIZE:
+        raise HTTPException(status_code=413, detail="Image too large")
+    return data
+
+
+async def _embed(image: Optional[UploadFile], text: Optional[str]):
+    """Embed an uploaded image or a text query with CLIP"""
+    if image is None and not text:
+        raise HTTPException(status_code=400, detail="Provide an image or a text query")
+    try:
+        if image is not None:
+            return await run_in_threadpool(asset_index.embed_image, await _read_image(image))
+        return await run_in_threadpool(asset_index.embed_text, text)
+    except EmbeddingUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/search", response_model=AssetSearchResponse)
+async def search_assets(
+    http_request: Request,
+    image: Optional[UploadFile] = File(None),
+    query: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100)
+):
+    """
+    Find generated assets similar to an uploaded image or a text query
+
+    Both are embedded with CLIP, so a text query such as "dark glassmorphism
+    dashboard" matches images as well as SVGs.
+    """
+    request_id = getattr(http_request.state, "request_id", "unknown")
+    vector = await _embed(image, query)
+
+    start = time.perf_counter()
+    results = await run_in_threadpool(asset_index.search, vector, limit)
+    query_ms = (time.perf_counter() - start) * 1000
+
+    logger.info(f"[{request_id}] Asset search returned {len(results)} results in {query_ms:.2f}ms")
+    return AssetSearchResponse(success=True, results=results, query_ms=round(query_ms, 3), request_id=request_id)
+
+
+@router.get("/index/stats", dependencies=[Depends(require_admin_token)])
+async def get_index_stats():
+    """
+    Get asset index statistics (requires `X-Admin-Token`)
+    """
+    return await run_in_threadpool(asset_index.stats)
+
+
+@router.get("/{asset_id}/similar", response_model=AssetSearchResponse)
+async def get_similar_assets(
+    asset_id: str,
+    http_request: Request,
+    limit: int = Query(10, ge=1, le=100)
+):
+    """
+    Find assets similar to an already indexed asset (e.g. a `generation_id`)
+    """
+    request_id = getattr(http_request.state, "request_id", "unknown")
+
+    start = time.perf_counter()
+    try:
+        results = await run_in_threadpool(asset_index.similar, asset_id, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    query_ms = (time.perf_counter() - start) * 1000
+    if results is None:
+        raise HTTPException(status_code=404, detail=f"Asset is not indexed: {asset_id}")
+
+    return AssetSearchResponse(success=True, results=results, query_ms=round(query_ms, 3), request_id=request_id)
+
+
+@router.post("/ingest", response_model=AssetIngestResponse, dependencies=[Depends(require_admin_token)])
+async def ingest_asset(
+    http_request: Request,
+    asset_id: str,
+    image: Optional[UploadFile] = File(None),
+    text: Optional[str] = None,
+    dedup: bool = True,
+    threshold: Optional[float] = Query(None, ge=0.0, le=1.0)
+):
+    """
+    Add an asset to the similarity index (requires `X-Admin-Token`)
+
+    With `dedup` (default) the asset is not indexed when an existing asset is at
+    least `threshold` similar (default ASSET_DEDUP_THRESHOLD); the response then
+    names it in `duplicate_of`. Pass `text` instead of an image for assets
+    without a bitmap, such as SVGs.
+    """
+    request_id = getattr(http_request.state, "request_id", "unknown")
+    vector = await _embed(image, text)
+
+    try:
+        result = await run_in_threadpool(asset_index.ingest, asset_id, vector, dedup, threshold)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if result["duplicate_of"]:
+        logger.info(f"[{request_id}] Asset {asset_id} duplicates {result['duplicate_of']} ({result['similarity']})")
+    return AssetIngestResponse(success=True, **result, request_id=request_id)
+
+
+@router.delete("/{asset_id}", dependencies=[Depends(require_admin_token)])
+async def remove_asset(asset_id: str):
+    """
+    Remove an asset from the similarity index (requires `X-Admin-Token`)
+    """
+    try:
+        removed = await run_in_threadpool(asset_index.remove, asset_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not removed:
+        raise HTTPException(status_code=404, detail=f"Asset is not indexed: {asset_id}")
+    return {"success": True, "asset_id": asset_id}
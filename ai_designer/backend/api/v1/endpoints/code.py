@@ -3,12 +3,16 @@ Code Generation Endpoints
 """
 
 from fastapi import APIRouter, HTTPException, UploadFile, File, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
+import json
+import time
 import uuid
 from loguru import logger
 
+from core.config import settings
 from services import code_service
 
 router = APIRouter()
@@ -81,27 +85,72 @@ class DesignToCodeResponse(BaseModel):
     success: bool
     message: str
     framework: str
+    code: Optional[str] = None
+    language: Optional[str] = None
+    component_name: Optional[str] = None
+    layout: Optional[dict] = None
+    metadata: Optional[dict] = None
+    request_id: Optional[str] = None
 
 
 @router.post("/design-to-code", response_model=DesignToCodeResponse)
 async def design_to_code(
+    http_request: Request,
     image: UploadFile = File(...),
     framework: str = "react",
     language: str = "typescript",
-    with_tailwind: bool = True
+    with_tailwind: bool = True,
+    component_name: str = "GeneratedComponent"
 ):
     """
     Convert design image to code
+
+    The image is segmented into layout regions (navbar, hero, cards, buttons, ...)
+    which are matched against component templates with CLIP when it is loaded,
+    or classified by position and shape otherwise. The detected layout is
+    returned alongside the generated code.
     """
+    request_id = getattr(http_request.state, "request_id", "unknown")
+
+    extension = (image.filename or "").rsplit(".", 1)[-1].lower()
+    if extension not in settings.ALLOWED_IMAGE_FORMATS and not (image.content_type or "").startswith("image/"):
+        raise HTTPException(status_code=400, detail="Unsupported image format")
+
+    image_data = await image.read(settings.MAX_IMAGE_SIZE + 1)
+    if len(image_data) > settings.MAX_IMAGE_SIZE:
+        raise HTTPException(status_code=413, detail="Image too large")
+
     try:
-        # TODO: Implement image-to-code conversion using CLIP
-        return {
-            "success": False,
-            "message": "Image-to-code conversion coming soon",
-            "framework": framework
-        }
+        start_time = datetime.now()
+        logger.info(f"[{request_id}] Converting design image to {framework} code ({len(image_data)} bytes)")
+
+        result = await code_service.image_to_code(
+            image_data,
+            framework=framework,
+            language=language,
+            with_tailwind=with_tailwind,
+            component_name=component_name
+        )
+
+        generation_time = (datetime.now() - start_time).total_seconds()
+        logger.info(f"[{request_id}] Design converted in {generation_time:.2f}s")
+
+        return DesignToCodeResponse(
+            success=True,
+            message=f"Detected {result['metadata']['analysis']['regions']} layout regions",
+            framework=result["framework"],
+            code=result["code"],
+            language=result["language"],
+            component_name=result["component_name"],
+            layout=result["layout"],
+            metadata=result["metadata"],
+            request_id=request_id
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Design-to-code conversion failed: {str(e)}")
+        logger.error(f"[{request_id}] Design-to-code conversion failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -118,6 +167,11 @@ async def generate_component_library(
 ):
     """
     Generate a component library
+
+    Components are generated concurrently with a shared theme context. A
+    component that misses its deadline or fails is returned as template code
+    with `status` set to `timeout` or `failed`. Use `/component-library/stream`
+    to receive components as they finish.
     """
     try:
         request_id = getattr(http_request.state, "request_id", "unknown")
@@ -140,7 +194,8 @@ async def generate_component_library(
                 "name": comp["component_name"],
                 "code": comp["code"],
                 "framework": comp["framework"],
-                "language": comp["language"]
+                "language": comp["language"],
+                "status": comp["status"]
             })
 
         logger.info(f"[{request_id}] Generated {len(components)} components in {generation_time:.2f}s")
@@ -159,26 +214,85 @@ async def generate_component_library(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/component-library/stream")
+async def stream_component_library(
+    request: ComponentLibraryRequest,
+    http_request: Request
+):
+    """
+    Stream a component library as Server-Sent Events
+
+    Emits one `component` event per component in completion order (`index`
+    gives its position in the request) and a final `done` event. Closing the
+    stream cancels the remaining components.
+    """
+    request_id = getattr(http_request.state, "request_id", "unknown")
+    logger.info(f"[{request_id}] Streaming component library with theme: {request.theme}")
+
+    async def events():
+        start = time.perf_counter()
+        statuses = {}
+        async for comp in code_service.iter_component_library(request.theme, request.components):
+            statuses[comp["status"]] = statuses.get(comp["status"], 0) + 1
+            event = {
+                "index": comp["index"],
+                "name": comp["component_name"],
+                "code": comp["code"],
+                "framework": comp["framework"],
+                "language": comp["language"],
+                "status": comp["status"],
+                "generation_time": comp["generation_time"],
+            }
+            yield f"event: component\ndata: {json.dumps(event)}\n\n"
+
+        done = {
+            "theme": request.theme,
+            "count": sum(statuses.values()),
+            "statuses": statuses,
+            "generation_time": round(time.perf_counter() - start, 3),
+            "request_id": request_id,
+        }
+        logger.info(f"[{request_id}] Streamed {done['count']} components in {done['generation_time']:.2f}s")
+        yield f"event: done\ndata: {json.dumps(done)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 class OptimizeCodeRequest(BaseModel):
     """Code optimization request"""
     code: str = Field(..., description="Code to optimize")
     framework: str = Field(default="react", description="Target framework")
+    minify: bool = Field(default=True, description="Strip comments and redundant whitespace")
+    use_llm: bool = Field(default=False, description="Run an additional AI optimization pass after the local one")
 
 
 @router.post("/optimize")
 async def optimize_code(
-    request: OptimizeCodeRequest
+    request: OptimizeCodeRequest,
+    http_request: Request
 ):
     """
     Optimize existing code
+
+    Unused imports, duplicate Tailwind classes and whitespace are handled locally in
+    milliseconds; set use_llm for an additional AI pass.
     """
     try:
-        request_id = "unknown"
+        request_id = getattr(http_request.state, "request_id", "unknown")
 
         logger.info(f"[{request_id}] Optimizing code")
 
         # Optimize code
-        result = await code_service.optimize_code(request.code, request.framework)
+        result = await code_service.optimize_code(
+            request.code,
+            request.framework,
+            minify=request.minify,
+            use_llm=request.use_llm
+        )
 
         logger.info(f"[{request_id}] Code optimized")
 
@@ -188,6 +302,11 @@ async def optimize_code(
             "suggestions": result["suggestions"],
             "original_size": result["original_size"],
             "optimized_size": result["optimized_size"],
+            "original_gzip_size": result.get("original_gzip_size"),
+            "optimized_gzip_size": result.get("optimized_gzip_size"),
+            "removed_imports": result.get("removed_imports", []),
+            "stages": result.get("stages", []),
+            "elapsed_ms": result.get("elapsed_ms"),
             "request_id": request_id
         }
 
@@ -2,15 +2,26 @@
 Image Generation Endpoints
 """
 
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from typing import Optional, Union
+import json
 import uuid
-import base64
+import hashlib
 from datetime import datetime
 from loguru import logger
 
 from services import image_service
+from services.image_generation import ImageGenerationService, stage_labels
+from services.asset_index import asset_index
+from services.near_duplicates import near_duplicates, prompt_variant_key
+from core.admission import AdmissionDecision, AdmissionRejected, image_admission
+from core.coalesce import RequestCoalescer
+from core.image_buffer import BufferResponse, EmbeddedImage, ImageJSONResponse
+from core.metrics import track_stage
+from services.generation_jobs import JobBackendUnavailable, GenerationJob, SharedJob, job_registry
 from schemas.image import (
     ImageGenerationRequest,
     ImageGenerationResponse,
@@ -20,11 +31,82 @@ from core.config import settings
 
 router = APIRouter()
 
+PNG_DATA_URL_PREFIX = "data:image/png;base64,"
+
+# 固定seed的相同请求结果一致，并发到达时只生成一次
+image_coalescer = RequestCoalescer("hero_banner")
+
+
+def _admit(route: str, request: ImageGenerationRequest) -> AdmissionDecision:
+    """准入控制：返回实际使用的尺寸/步数；过载且无法降级时抛出AdmissionRejected"""
+    if not settings.IMAGE_ADMISSION_ENABLED:
+        return AdmissionDecision(route, "admit", request.width, request.height, request.num_inference_steps)
+    return image_admission.admit(route, "hero_banner", request.width, request.height, request.num_inference_steps)
+
+
+def _near_duplicate_owner(http_request: Request) -> Optional[str]:
+    """
+    近重复复用的用户范围：AuthenticationMiddleware 由访问令牌确定的用户；匿名请求返回None（不检测、不复用）
+
+    客户端地址来自可伪造的X-Forwarded-For，同一NAT后的用户也会共用，不能作为隔离边界
+    """
+    if not settings.NEAR_DUPLICATE_ENABLED:
+        return None
+    user = http_request.scope.get("user")
+    if user is None or not user.is_authenticated:
+        return None
+    return str(user.identity)
+
+
+def _admit_preset(
+    route: str, endpoint: str, size: str, default_size: str, steps: int, count: int = 1
+) -> AdmissionDecision:
+    """按尺寸预设准入：工作量为 数量 × 预设尺寸 × 步数；这些端点没有演示渲染，最低降级档位仍超时则拒绝"""
+    presets = ImageGenerationService.SIZE_PRESETS
+    width, height = presets.get(size, presets[default_size])
+    if not settings.IMAGE_ADMISSION_ENABLED:
+        return AdmissionDecision(route, "admit", width, height, steps)
+    return image_admission.admit(route, endpoint, width, height, steps, count=count, allow_demo=False)
+
+
+def _overloaded(error: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=f"Image generation is overloaded, retry in {error.retry_after}s",
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+def _admission_headers(admission: AdmissionDecision) -> dict:
+    return {"X-Admission": admission.decision}
+
 
 @router.post("/generate", response_model=ImageGenerationResponse)
-async def generate_image(request: ImageGenerationRequest, http_request: Request):
+async def generate_image(
+    request: ImageGenerationRequest,
+    http_request: Request,
+    response_format: str = Query(
+        "json",
+        pattern="^(json|png)$",
+        description="json (base64 fields) or png (raw image body)"
+    )
+):
     """
     Generate an image using AI model
+
+    With `response_format=png` the encoded image is returned as the response
+    body and metadata moves to X-* headers.
+
+    Under overload the request may be downgraded to fewer steps or a smaller
+    size (`X-Admission: degrade`, actual size in `dimensions`), rendered in demo
+    mode (`X-Admission: demo`) or rejected with 503 and `Retry-After`.
+
+    For a request with a valid `Authorization: Bearer` access token, a result
+    that is a near-duplicate of one that user already received is not stored
+    again; `duplicate_of` (`X-Duplicate-Of`) names the original and its image
+    is returned. Fixed-seed prompt variants that differ only in case,
+    punctuation or whitespace are served from that cache without generating.
+    Anonymous requests are never matched against other results.
     """
     try:
         request_id = getattr(http_request.state, "request_id", "unknown")
@@ -32,41 +114,267 @@ async def generate_image(request: ImageGenerationRequest, http_request: Request)
 
         logger.info(f"[{request_id}] Generating image: {request.prompt}")
 
-        # Generate image using service
+        style = request.style.value if request.style else "modern_minimal"
+        owner = _near_duplicate_owner(http_request)
+        request_key = None
+        if owner is not None and request.seed is not None:
+            request_key = prompt_variant_key(
+                request.prompt,
+                style=style,
+                negative_prompt=request.negative_prompt,
+                width=request.width,
+                height=request.height,
+                guidance_scale=request.guidance_scale,
+                steps=request.num_inference_steps,
+                seed=request.seed
+            )
+
+        # Generate image using service (在线程池中执行，避免阻塞事件循环)
+        # 合并的请求共享同一次准入结果
+        async def generate():
+            admission = _admit("generate", request)
+            try:
+                return admission, await run_in_threadpool(
+                    image_service.generate_hero_banner,
+                    prompt=request.prompt,
+                    style=style,
+                    size=f"{admission.width}x{admission.height}",
+                    negative_prompt=request.negative_prompt,
+                    guidance_scale=request.guidance_scale,
+                    num_inference_steps=admission.steps,
+                    seed=request.seed,
+                    demo=admission.demo,
+                    owner=owner
+                )
+            finally:
+                image_admission.release(admission)
+
+        cached = near_duplicates.lookup_request(owner, request_key) if request_key is not None else None
+        if cached is not None:
+            # 归一化后相同的固定种子请求，直接返回缓存结果（不占用准入名额）
+            admission = AdmissionDecision("generate", "admit", cached.width, cached.height, request.num_inference_steps)
+            result = {
+                "image_data": cached.image_data,
+                "width": cached.width,
+                "height": cached.height,
+                "duplicate_of": cached.generation_id,
+                "cache_hit": True,
+            }
+        elif request.seed is not None:
+            # 只合并同一用户的请求：结果中的duplicate_of与复用的图像都按用户隔离
+            key = hashlib.sha256(
+                json.dumps({"owner": owner, "request": request.model_dump(mode="json")}, sort_keys=True).encode("utf-8")
+            ).hexdigest()
+            admission, result = await image_coalescer.run(key, generate)
+        else:
+            admission, result = await generate()
+
+        size = f"{result['width']}x{result['height']}"
+        if admission.decision != "admit":
+            logger.warning(
+                f"[{request_id}] Admission {admission.decision}: {request.width}x{request.height}/"
+                f"{request.num_inference_steps} steps -> {size}/{admission.steps} steps"
+            )
+
+        generation_time = (datetime.now() - start_time).total_seconds()
+
+        logger.info(f"[{request_id}] Image generated successfully in {generation_time:.2f}s")
+
+        generation_id = str(uuid.uuid4())
+        image_data = result["image_data"]
+        duplicate_of = result.get("duplicate_of")
+        if owner is not None and not admission.demo:
+            near_duplicates.record(owner, generation_id, result, "hero_banner", request_key)
+        if duplicate_of is not None:
+            logger.info(f"[{request_id}] Result {generation_id} is a near-duplicate of {duplicate_of}")
+        elif not admission.demo:
+            # 后台写入相似设计索引，不阻塞响应
+            asset_index.submit(generation_id, image_data)
+
+        if response_format == "png":
+            headers = {
+                **_admission_headers(admission),
+                "X-Generation-Id": generation_id,
+                "X-Generation-Time": f"{generation_time:.3f}",
+                "X-Image-Width": str(result["width"]),
+                "X-Image-Height": str(result["height"]),
+            }
+            if duplicate_of is not None:
+                headers["X-Duplicate-Of"] = duplicate_of
+            return BufferResponse(image_data, media_type="image/png", headers=headers)
+
+        # base64在发送时逐块编码写入响应流，不生成完整的字符串副本
+        with track_stage("hero_banner", "serialization", *stage_labels(style, result["width"], result["height"])):
+            content = ImageGenerationResponse(
+                success=True,
+                generation_id=generation_id,
+                generation_time=generation_time,
+                prompt=request.prompt,
+                dimensions={"width": result["width"], "height": result["height"]},
+                style=request.style,
+                seed=request.seed,
+                duplicate_of=duplicate_of,
+                request_id=request_id
+            ).model_dump(mode="json")
+            content["image_url"] = EmbeddedImage(image_data, prefix=PNG_DATA_URL_PREFIX)
+            content["image_base64"] = EmbeddedImage(image_data)
+
+        return ImageJSONResponse(content, headers=_admission_headers(admission))
+
+    except AdmissionRejected as e:
+        request_id = getattr(http_request.state, "request_id", "unknown")
+        logger.warning(f"[{request_id}] Image generation rejected: {e}")
+        raise _overloaded(e)
+    except Exception as e:
+        request_id = getattr(http_request.state, "request_id", "unknown")
+        logger.error(f"[{request_id}] Image generation failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _get_job(job_id: str) -> Union[GenerationJob, SharedJob]:
+    job = await job_registry.lookup(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown generation job: {job_id}")
+    return job
+
+
+@router.post("/jobs", status_code=202)
+async def create_generation_job(
+    request: ImageGenerationRequest,
+    http_request: Request,
+    preview_every: int = Query(
+        settings.IMAGE_PREVIEW_EVERY,
+        ge=1,
+        le=100,
+        description="Emit a low-res latent preview every N denoising steps"
+    )
+):
+    """
+    Start an image generation job with progressive previews
+
+    Subscribe to `events_url` (Server-Sent Events) for `progress`, `preview`
+    and a final `completed` / `cancelled` / `failed` event. `DELETE` the job to
+    stop it between denoising steps; closing the last event stream does the same.
+
+    Under overload the job may run with fewer steps or a smaller size
+    (`admission` in the response) or be rejected with 503 and `Retry-After`.
+    With several workers the follow-up requests may reach any of them, so jobs
+    need IMAGE_JOB_BACKEND=redis and answer 503 otherwise.
+    """
+    request_id = getattr(http_request.state, "request_id", "unknown")
+    style = request.style.value if request.style else "modern_minimal"
+
+    try:
+        await job_registry.prepare()
+    except JobBackendUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    try:
+        admission = _admit("jobs", request)
+    except AdmissionRejected as e:
+        logger.warning(f"[{request_id}] Generation job rejected: {e}")
+        raise _overloaded(e)
+
+    job = job_registry.create("hero_banner", admission.steps, preview_every)
+    await job_registry.share(job)
+    job_url = f"{http_request.url.path}/{job.id}"
+    logger.info(f"[{request_id}] Generation job {job.id} queued ({admission.decision}): {request.prompt}")
+
+    def generate(progress):
         result = image_service.generate_hero_banner(
             prompt=request.prompt,
-            style=request.style.value if request.style else "modern_minimal",
-            size=f"{request.width}x{request.height}",
+            style=style,
+            size=f"{admission.width}x{admission.height}",
             negative_prompt=request.negative_prompt,
             guidance_scale=request.guidance_scale,
-            num_inference_steps=request.num_inference_steps,
-            seed=request.seed
+            num_inference_steps=admission.steps,
+            seed=request.seed,
+            progress=progress,
+            demo=admission.demo
         )
+        if not admission.demo:
+            asset_index.submit(job.id, result["image_data"])
+        return result
+
+    job.start(
+        generate,
+        describe=lambda result: {
+            "result_url": f"{job_url}/result",
+            "width": result["width"],
+            "height": result["height"],
+            "aesthetic_score": result["aesthetic_score"],
+        },
+        on_finished=lambda: image_admission.release(admission)
+    )
+
+    return {
+        **job.snapshot(),
+        "admission": {
+            "decision": admission.decision,
+            "width": admission.width,
+            "height": admission.height,
+            "steps": admission.steps,
+        },
+        "status_url": job_url,
+        "events_url": f"{job_url}/events",
+        "request_id": request_id,
+    }
 
-        generation_time = (datetime.now() - start_time).total_seconds()
 
-        # Convert image to base64 for response
-        image_base64 = base64.b64encode(result["image_data"]).decode("utf-8")
+@router.get("/jobs/{job_id}")
+async def get_generation_job(job_id: str):
+    """
+    Get generation job status
+    """
+    return (await _get_job(job_id)).snapshot()
 
-        logger.info(f"[{request_id}] Image generated successfully in {generation_time:.2f}s")
 
-        return ImageGenerationResponse(
-            success=True,
-            image_url=f"data:image/png;base64,{image_base64}",
-            image_base64=image_base64,
-            generation_id=str(uuid.uuid4()),
-            generation_time=generation_time,
-            prompt=request.prompt,
-            dimensions={"width": result["width"], "height": result["height"]},
-            style=request.style,
-            seed=request.seed,
-            request_id=request_id
-        )
+@router.get("/jobs/{job_id}/events")
+async def stream_generation_job(job_id: str):
+    """
+    Stream job progress and preview images as Server-Sent Events
+    """
+    job = await _get_job(job_id)
 
-    except Exception as e:
-        request_id = getattr(http_request.state, "request_id", "unknown")
-        logger.error(f"[{request_id}] Image generation failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    async def events():
+        async for event in job_registry.events(job):
+            yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/jobs/{job_id}/result")
+async def get_generation_job_result(job_id: str):
+    """
+    Download the generated PNG of a completed job
+    """
+    job = await _get_job(job_id)
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Generation job is {job.status}")
+
+    return BufferResponse(
+        job.result["image_data"],
+        media_type="image/png",
+        headers={
+            "X-Generation-Id": job.id,
+            "X-Image-Width": str(job.result["width"]),
+            "X-Image-Height": str(job.result["height"]),
+        }
+    )
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_generation_job(job_id: str):
+    """
+    Cancel a generation job; the pipeline stops after the current step
+    """
+    job = await _get_job(job_id)
+    await job_registry.cancel(job, "client")
+    return job.snapshot()
 
 
 class IconGenerationRequest(BaseModel):
@@ -84,48 +392,59 @@ async def generate_icons(
     """
     Generate icon set
     """
+    admission = None
     try:
         request_id = getattr(http_request.state, "request_id", "unknown")
         start_time = datetime.now()
 
-        logger.info(f"[{request_id}] Generating {request.count} icons for: {request.concept}")
+        admission = _admit_preset(
+            "icons", "icon", request.size, "icon", ImageGenerationService.ICON_INFERENCE_STEPS, request.count
+        )
+
+        logger.info(f"[{request_id}] Generating {request.count} icons for: {request.concept} ({admission.decision})")
 
         # Generate icons
-        icons = image_service.generate_icon(
+        icons = await run_in_threadpool(
+            image_service.generate_icon,
             concept=request.concept,
             style=request.style,
             count=request.count,
-            size=request.size
+            size=f"{admission.width}x{admission.height}",
+            num_inference_steps=admission.steps
         )
 
         generation_time = (datetime.now() - start_time).total_seconds()
 
-        # Convert to base64
         icon_data = []
-        for icon in icons:
-            icon_base64 = base64.b64encode(icon["image_data"]).decode("utf-8")
-            icon_data.append({
-                "concept": icon["concept"],
-                "style": icon["style"],
-                "variant": icon["variant"],
-                "data_url": f"data:image/png;base64,{icon_base64}",
-                "width": icon["width"],
-                "height": icon["height"]
-            })
+        with track_stage("icon", "serialization", *stage_labels(request.style, icons[0]["width"], icons[0]["height"])):
+            for icon in icons:
+                icon_data.append({
+                    "concept": icon["concept"],
+                    "style": icon["style"],
+                    "variant": icon["variant"],
+                    "data_url": EmbeddedImage(icon["image_data"], prefix=PNG_DATA_URL_PREFIX),
+                    "width": icon["width"],
+                    "height": icon["height"]
+                })
 
         logger.info(f"[{request_id}] Generated {len(icons)} icons in {generation_time:.2f}s")
 
-        return {
+        return ImageJSONResponse({
             "success": True,
             "icons": icon_data,
             "generation_time": generation_time,
             "request_id": request_id
-        }
+        }, headers=_admission_headers(admission))
 
+    except AdmissionRejected as e:
+        raise _overloaded(e)
     except Exception as e:
         request_id = getattr(http_request.state, "request_id", "unknown")
         logger.error(f"[{request_id}] Icon generation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if admission is not None:
+            image_admission.release(admission)
 
 
 class BackgroundGenerationRequest(BaseModel):
@@ -143,44 +462,54 @@ async def generate_background(
     """
     Generate background texture
     """
+    admission = None
     try:
         request_id = getattr(http_request.state, "request_id", "unknown")
         start_time = datetime.now()
 
         color_list = request.colors.split(",") if request.colors else None
 
-        logger.info(f"[{request_id}] Generating {request.style} background")
+        admission = _admit_preset(
+            "background", "background", request.size, "hero_medium", ImageGenerationService.BACKGROUND_INFERENCE_STEPS
+        )
+
+        logger.info(f"[{request_id}] Generating {request.style} background ({admission.decision})")
 
         # Generate background
-        result = image_service.generate_background(
+        result = await run_in_threadpool(
+            image_service.generate_background,
             style=request.style,
             colors=color_list,
             complexity=request.complexity,
-            size=request.size
+            size=f"{admission.width}x{admission.height}",
+            num_inference_steps=admission.steps
         )
 
         generation_time = (datetime.now() - start_time).total_seconds()
 
-        # Convert to base64
-        image_base64 = base64.b64encode(result["image_data"]).decode("utf-8")
-
         logger.info(f"[{request_id}] Background generated in {generation_time:.2f}s")
 
-        return {
-            "success": True,
-            "image_url": f"data:image/png;base64,{image_base64}",
-            "style": style,
-            "complexity": complexity,
-            "width": result["width"],
-            "height": result["height"],
-            "generation_time": generation_time,
-            "request_id": request_id
-        }
-
+        with track_stage("background", "serialization", *stage_labels(request.style, result["width"], result["height"])):
+            return ImageJSONResponse({
+                "success": True,
+                "image_url": EmbeddedImage(result["image_data"], prefix=PNG_DATA_URL_PREFIX),
+                "style": request.style,
+                "complexity": request.complexity,
+                "width": result["width"],
+                "height": result["height"],
+                "generation_time": generation_time,
+                "request_id": request_id
+            }, headers=_admission_headers(admission))
+
+    except AdmissionRejected as e:
+        raise _overloaded(e)
     except Exception as e:
         request_id = getattr(http_request.state, "request_id", "unknown")
         logger.error(f"[{request_id}] Background generation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if admission is not None:
+            image_admission.release(admission)
 
 
 @router.get("/styles", response_model=ImagePresetsResponse)
@@ -0,0 +1,156 @@
+"""
+Search Endpoints
+资源浏览与模板检索 - 全文检索 + 标签/类型/格式/日期分面
+"""
+
+from datetime import datetime
+from typing import List, Optional
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import get_read_db
+from schemas.search import (
+    AssetSearchHit,
+    AssetSearchPage,
+    TagCount,
+    TemplateSearchHit,
+    TemplateSearchPage,
+)
+from services.search import SearchResults, search_service
+
+router = APIRouter()
+
+SORT_PATTERN = "^(relevance|newest|popular|rating)$"
+
+
+async def _search(db: AsyncSession, http_request: Request, kind: str, query: Optional[str], **kwargs):
+    request_id = getattr(http_request.state, "request_id", "unknown")
+    start = time.perf_counter()
+    try:
+        results: SearchResults = await search_service.search(db, kind, query, **kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    query_ms = (time.perf_counter() - start) * 1000
+
+    logger.info(f"[{request_id}] {kind} search '{query or ''}' returned {len(results.items)} results in {query_ms:.2f}ms")
+    return results, round(query_ms, 3), request_id
+
+
+def _facets(results: SearchResults) -> dict:
+    return {
+        facet: [{"value": value, "count": count} for value, count in values]
+        for facet, values in results.facets.items()
+    }
+
+
+@router.get("/assets", response_model=AssetSearchPage)
+async def search_assets(
+    http_request: Request,
+    q: Optional[str] = Query(None, description="Full-text query over name, tags and description"),
+    type: Optional[List[str]] = Query(None, description="Asset types (image, svg, code, ...)"),
+    format: Optional[List[str]] = Query(None, description="File formats (png, svg, ...)"),
+    tag: Optional[List[str]] = Query(None, description="Tags (name or slug); all must match"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    sort: str = Query("relevance", pattern=SORT_PATTERN),
+    facets: bool = True,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Browse and search public assets
+
+    Without `q` results are ordered by usage count and rating; with `q` by text
+    relevance boosted by usage count and rating. `facets` holds per-type,
+    per-format, per-tag and per-month counts of all matches, estimated from a
+    uniform sample (`facets_estimated`) beyond SEARCH_FACET_SAMPLE_SIZE matches.
+    Facets and `total` are cached for SEARCH_FACET_CACHE_TTL seconds, the
+    result page is not.
+    """
+    results, query_ms, request_id = await _search(
+        db, http_request, "assets", q,
+        filters={"type": type or [], "format": format or []},
+        tags=tag or [],
+        created_from=created_from,
+        created_to=created_to,
+        sort=sort,
+        limit=limit,
+        offset=offset,
+        facets=facets,
+    )
+    hits = [
+        AssetSearchHit.model_validate(asset).model_copy(update={"score": score})
+        for asset, score in results.items
+    ]
+    return AssetSearchPage(
+        success=True,
+        results=hits,
+        total=results.total,
+        facets=_facets(results),
+        facets_estimated=results.facets_estimated,
+        query_ms=query_ms,
+        request_id=request_id
+    )
+
+
+@router.get("/templates", response_model=TemplateSearchPage)
+async def search_templates(
+    http_request: Request,
+    q: Optional[str] = Query(None, description="Full-text query over name, tags, category and description"),
+    type: Optional[List[str]] = Query(None, description="Template types (image, svg, code)"),
+    category: Optional[List[str]] = Query(None, description="Template categories"),
+    tag: Optional[List[str]] = Query(None, description="Tags (name or slug); all must match"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    sort: str = Query("relevance", pattern=SORT_PATTERN),
+    facets: bool = True,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Search public templates
+
+    Ranked like asset search; `facets` holds per-type, per-category, per-tag
+    and per-month counts.
+    """
+    results, query_ms, request_id = await _search(
+        db, http_request, "templates", q,
+        filters={"type": type or [], "category": category or []},
+        tags=tag or [],
+        created_from=created_from,
+        created_to=created_to,
+        sort=sort,
+        limit=limit,
+        offset=offset,
+        facets=facets,
+    )
+    hits = [
+        TemplateSearchHit.model_validate(template).model_copy(update={"score": score})
+        for template, score in results.items
+    ]
+    return TemplateSearchPage(
+        success=True,
+        results=hits,
+        total=results.total,
+        facets=_facets(results),
+        facets_estimated=results.facets_estimated,
+        query_ms=query_ms,
+        request_id=request_id
+    )
+
+
+@router.get("/tags", response_model=List[TagCount])
+async def list_tags(
+    prefix: Optional[str] = Query(None, description="Tag prefix for autocomplete"),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    List tags by usage count
+    """
+    return await search_service.popular_tags(db, prefix, limit)
@@ -10,6 +10,7 @@ import uuid
 from loguru import logger
 
 from services import svg_service
+from services.asset_index import asset_index
 
 router = APIRouter()
 
@@ -31,6 +32,7 @@ class SVGGenerationResponse(BaseModel):
     height: int
     style: str
     metadata: Optional[dict] = None
+    generation_id: Optional[str] = None
     request_id: Optional[str] = None
 
 
@@ -66,6 +68,10 @@ async def generate_svg(request: SVGGenerationRequest, http_request: Request):
 
         logger.info(f"[{request_id}] SVG generated in {generation_time:.2f}s")
 
+        # SVG没有位图，按描述文本写入相似设计索引
+        generation_id = str(uuid.uuid4())
+        asset_index.submit(generation_id, text=request.description)
+
         return SVGGenerationResponse(
             success=True,
             svg_code=result["svg_code"],
@@ -73,6 +79,7 @@ async def generate_svg(request: SVGGenerationRequest, http_request: Request):
             height=result["height"],
             style=result["style"],
             metadata=result["metadata"],
+            generation_id=generation_id,
             request_id=request_id
         )
 
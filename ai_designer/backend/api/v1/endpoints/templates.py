@@ -0,0 +1,140 @@
+"""
+Template Endpoints
+模板 - 热门列表（预计算并缓存）、使用记录（计数器批量写回）与变量替换渲染（编译结果缓存）
+"""
+
+from typing import Optional
+from uuid import UUID
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.database import get_db, get_read_db
+from models.template import Template
+from schemas.template import (
+    PopularTemplatesResponse,
+    TemplateGridItem,
+    TemplateGridRequest,
+    TemplateGridResponse,
+    TemplateRenderRequest,
+    TemplateRenderResponse,
+    TemplateUsageResponse,
+)
+from services.template_engine import template_engine
+from services.usage_counters import usage_counters
+
+router = APIRouter()
+
+
+@router.get("/popular", response_model=PopularTemplatesResponse)
+async def popular_templates(
+    http_request: Request,
+    category: Optional[str] = Query(None, description="Only templates in this category"),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    List public templates by usage count and rating
+
+    Served from a precomputed listing that is refreshed after each usage
+    counter flush and cached for POPULAR_TEMPLATES_TTL seconds, so counts
+    may lag by one flush interval.
+    """
+    request_id = getattr(http_request.state, "request_id", "unknown")
+    templates = await usage_counters.popular_templates(db, category, limit)
+    return PopularTemplatesResponse(success=True, templates=templates, request_id=request_id)
+
+
+@router.post("/{template_id}/use", response_model=TemplateUsageResponse)
+async def record_template_use(
+    template_id: UUID,
+    http_request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Record one use of a template
+
+    The increment is buffered and written back in bulk; the returned count
+    includes increments that are not flushed yet.
+    """
+    request_id = getattr(http_request.state, "request_id", "unknown")
+    # 走主库：刚创建的模板可能还没同步到只读副本
+    usage_count = (await db.execute(select(Template.usage_count).where(Template.id == template_id))).scalar_one_or_none()
+    if usage_count is None:
+        raise HTTPException(status_code=404, detail=f"Template not found: {template_id}")
+
+    await usage_counters.increment("templates", [template_id])
+    pending = await usage_counters.pending("templates", template_id)
+    return TemplateUsageResponse(
+        success=True,
+        template_id=template_id,
+        usage_count=usage_count + pending,
+        request_id=request_id
+    )
+
+
+async def _get_template(db: AsyncSession, template_id: UUID) -> Template:
+    # 没有已认证用户时只开放公开模板，私有模板与不存在的模板同样返回404（与检索一致）
+    template = (await db.execute(
+        select(Template).where(Template.id == template_id, Template.is_public == True)  # noqa: E712
+    )).scalar_one_or_none()
+    if template is None:
+        raise HTTPException(status_code=404, detail=f"Template not found: {template_id}")
+    return template
+
+
+@router.post("/{template_id}/render", response_model=TemplateRenderResponse)
+async def render_template(
+    template_id: UUID,
+    request: TemplateRenderRequest,
+    http_request: Request,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Substitute variables into a template's prompt or code snippet
+
+    Only public templates can be rendered. Prompts use `{name}` placeholders,
+    code snippets `{{ name }}`. Values default to same-named template
+    parameters. The parsed template is cached by id and updated_at.
+    """
+    request_id = getattr(http_request.state, "request_id", "unknown")
+    template = await _get_template(db, template_id)
+    try:
+        text = template_engine.render(template, request.variables, request.field)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return TemplateRenderResponse(success=True, template_id=template_id, text=text, request_id=request_id)
+
+
+@router.post("/{template_id}/render-grid", response_model=TemplateGridResponse)
+async def render_template_grid(
+    template_id: UUID,
+    request: TemplateGridRequest,
+    http_request: Request,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Render every combination of a parameter grid in one call
+
+    Used to seed galleries: `{"grid": {"title": ["A", "B"], "style": ["flat",
+    "glass"]}}` returns four renders, the first grid variable varying
+    slowest. At most TEMPLATE_GRID_MAX combinations.
+    """
+    request_id = getattr(http_request.state, "request_id", "unknown")
+    template = await _get_template(db, template_id)
+    start = time.perf_counter()
+    try:
+        rendered = template_engine.render_grid(template, request.grid, request.variables, request.field)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    render_ms = (time.perf_counter() - start) * 1000
+
+    return TemplateGridResponse(
+        success=True,
+        template_id=template_id,
+        items=[TemplateGridItem(variables=point, text=text) for point, text in rendered],
+        render_ms=round(render_ms, 3),
+        request_id=request_id
+    )
@@ -0,0 +1,9 @@
+"""
+Benchmarks
+离线性能基准 - 进程内启动API，使用确定性的桩模型（图像/Gemini/CLIP）、fakeredis与SQLite，
+按受控并发驱动混合负载，记录吞吐、延迟分位数与峰值内存，并与保存的基线比较
+
+Usage:
+    python scripts/bench_api.py --output baseline.json
+    python scripts/bench_api.py --compare baseline.json
+"""
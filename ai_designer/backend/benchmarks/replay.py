@@ -0,0 +1,181 @@
+"""
+Traffic Replay
+流量回放 - 按录制的到达间隔（可加速）重放请求，按路由统计延迟分布并与录制时对比；
+也可由基准负载按泊松到达生成确定性的合成录制
+"""
+
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+from urllib.parse import urlencode
+
+import httpx
+from starlette.routing import Match
+
+from benchmarks.runner import PERCENTILES, percentile
+from benchmarks.workloads import plan_requests
+from core.traffic import TrafficRecorder, body_digest, decode_body, encode_body
+
+
+@dataclass(frozen=True)
+class ReplayResult:
+    """单个请求的回放结果（耗时单位：秒）"""
+    route: str
+    status: int
+    recorded_status: int
+    latency: float
+    recorded_latency: float
+    lag: float  # 实际发出时间晚于计划时间的差值
+
+
+def synthesize_capture(
+    workload: str,
+    count: int,
+    rate: float = 10.0,
+    seed: int = 0,
+    start: float = 0.0,
+) -> List[Dict[str, Any]]:
+    """由基准负载生成合成录制：请求内容与 plan_requests 一致，到达间隔服从速率为rate的指数分布"""
+    rng = random.Random(seed)
+    records, ts = [], start
+    for request in plan_requests(workload, count, seed=seed):
+        body = json.dumps(request.json).encode("utf-8") if request.json is not None else b""
+        records.append({
+            "type": "request",
+            "ts": ts,
+            "offset": ts - start,
+            "method": request.method,
+            "path": request.path,
+            "query": urlencode(request.params),
+            "content_type": "application/json" if body else None,
+            **encode_body(body),
+            "body_sha256": body_digest(body),
+            "body_size": len(body),
+            "status": None,
+            "duration_ms": None,
+        })
+        ts += rng.expovariate(rate)
+    return records
+
+
+def write_capture(records: List[Dict[str, Any]], path: Union[str, Path]):
+    """以录制格式写出（供合成录制或筛选后的录制使用），覆盖已有文件"""
+    Path(path).unlink(missing_ok=True)
+    recorder = TrafficRecorder(path)
+    for record in records:
+        recorder.write({key: value for key, value in record.items() if key != "offset"})
+    recorder.close()
+
+
+def route_namer(app) -> Callable[[str, str], str]:
+    """把请求路径归并为路由模板（/jobs/abc -> /api/v1/image/jobs/{job_id}），未匹配的保留原路径"""
+    cache: Dict[tuple, str] = {}
+
+    def name(method: str, path: str) -> str:
+        key = (method, path)
+        if key not in cache:
+            scope = {"type": "http", "method": method, "path": path, "root_path": ""}
+            cache[key] = next(
+                (route.path for route in app.routes if route.matches(scope)[0] == Match.FULL),
+                path,
+            )
+        return cache[key]
+
+    return name
+
+
+async def replay(
+    client: httpx.AsyncClient,
+    records: List[Dict[str, Any]],
+    speed: float = 1.0,
+    max_in_flight: Optional[int] = None,
+    route_name: Optional[Callable[[str, str], str]] = None,
+) -> Dict[str, Any]:
+    """按 offset/speed 的时间点发出请求（speed<=0 时不等待）；max_in_flight 限制同时在途的请求数
+
+    只记录了哈希的请求体无法还原，这些请求跳过并计入 skipped。
+    """
+    route_name = route_name or (lambda method, path: path)
+    semaphore = asyncio.Semaphore(max_in_flight) if max_in_flight else None
+    results: List[ReplayResult] = []
+    skipped = 0
+
+    async def issue(record: Dict[str, Any], body: bytes, scheduled: float):
+        try:
+            lag = time.perf_counter() - scheduled
+            headers = {"content-type": record["content_type"]} if record.get("content_type") else None
+            path = f"{record['path']}?{record['query']}" if record.get("query") else record["path"]
+            request_start = time.perf_counter()
+            try:
+                status = (await client.request(record["method"], path, content=body, headers=headers)).status_code
+            except httpx.HTTPError:
+                status = 599
+            results.append(ReplayResult(
+                route=f"{record['method']} {route_name(record['method'], record['path'])}",
+                status=status,
+                recorded_status=record.get("status") or status,
+                latency=time.perf_counter() - request_start,
+                recorded_latency=(record.get("duration_ms") or 0.0) / 1000,
+                lag=lag,
+            ))
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+    tasks = []
+    start = time.perf_counter()
+    for record in records:
+        body = decode_body(record)
+        if body is None:
+            skipped += 1
+            continue
+
+        scheduled = start + (record.get("offset", 0.0) / speed if speed > 0 else 0.0)
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if semaphore is not None:
+            await semaphore.acquire()
+        tasks.append(asyncio.create_task(issue(record, body, scheduled)))
+
+    await asyncio.gather(*tasks)
+    return replay_report(results, time.perf_counter() - start, skipped, speed)
+
+
+def replay_report(results: List[ReplayResult], elapsed: float, skipped: int = 0, speed: float = 1.0) -> Dict[str, Any]:
+    """按路由汇总回放与录制时的延迟分位数、错误数、状态码不一致数与调度滞后"""
+
+    def distribution(values: List[float]) -> Dict[str, float]:
+        ordered = sorted(values)
+        summary = {f"p{p}": round(percentile(ordered, p) * 1000, 3) for p in PERCENTILES}
+        summary["max"] = round(ordered[-1] * 1000, 3) if ordered else 0.0
+        return summary
+
+    def stats(items: List[ReplayResult]) -> Dict[str, Any]:
+        recorded = [item.recorded_latency for item in items if item.recorded_latency]
+        return {
+            "requests": len(items),
+            "errors": sum(item.status >= 400 for item in items),
+            "status_mismatches": sum(item.status != item.recorded_status for item in items),
+            "latency_ms": distribution([item.latency for item in items]),
+            "recorded_latency_ms": distribution(recorded) if recorded else None,
+            "lag_ms": distribution([item.lag for item in items]),
+        }
+
+    by_route: Dict[str, List[ReplayResult]] = {}
+    for result in results:
+        by_route.setdefault(result.route, []).append(result)
+
+    report = stats(results)
+    report.update({
+        "skipped": skipped,
+        "speed": speed,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 3) if elapsed else 0.0,
+        "routes": {route: stats(items) for route, items in sorted(by_route.items())},
+    })
+    return report
@@ -0,0 +1,303 @@
+"""
+Benchmark Runner
+基准执行与比较 - 进程内ASGI调用，固定并发，统计吞吐/延迟分位数/峰值RSS，按容差比较两次结果
+"""
+
+import asyncio
+import math
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import FastAPI
+
+from benchmarks.stubs import StubGeminiModel, StubImageBackend, install_stubs
+from benchmarks.workloads import PlannedRequest, plan_requests
+
+BASELINE_VERSION = 1
+PERCENTILES = (50, 95, 99)
+
+
+def _peak_rss_mb() -> float:
+    # Linux下ru_maxrss单位为KB，macOS为字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """最近秩法分位数（输入需已排序）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(records: List[Tuple[str, int, float]], elapsed: float) -> Dict[str, Any]:
+    """records: (请求名, 状态码, 耗时秒)"""
+
+    def stats(latencies: List[float], errors: int) -> Dict[str, Any]:
+        ordered = sorted(latencies)
+        latency_ms = {f"p{p}": round(percentile(ordered, p) * 1000, 3) for p in PERCENTILES}
+        latency_ms["mean"] = round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0
+        latency_ms["max"] = round(ordered[-1] * 1000, 3) if ordered else 0.0
+        return {
+            "requests": len(ordered),
+            "errors": errors,
+            "throughput_rps": round(len(ordered) / elapsed, 3) if elapsed else 0.0,
+            "latency_ms": latency_ms,
+        }
+
+    by_name: Dict[str, List[Tuple[int, float]]] = {}
+    for name, status, latency in records:
+        by_name.setdefault(name, []).append((status, latency))
+
+    summary = stats([latency for _, _, latency in records], sum(status >= 400 for _, status, _ in records))
+    summary["elapsed_s"] = round(elapsed, 3)
+    summary["endpoints"] = {
+        name: stats([latency for _, latency in items], sum(status >= 400 for status, _ in items))
+        for name, items in sorted(by_name.items())
+    }
+    return summary
+
+
+async def drive(
+    app: FastAPI,
+    plan: List[PlannedRequest],
+    concurrency: int,
+    on_error: Optional[Callable[[PlannedRequest, httpx.Response], None]] = None,
+) -> Tuple[List[Tuple[str, int, float]], float]:
+    """以固定并发按顺序发送计划中的请求"""
+    records: List[Tuple[str, int, float]] = []
+    pending = iter(plan)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def worker():
+            for request in pending:
+                start = time.perf_counter()
+                response = await client.request(
+                    request.method, request.path, json=request.json, params=request.params
+                )
+                records.append((request.name, response.status_code, time.perf_counter() - start))
+                if response.status_code >= 400 and on_error is not None:
+                    on_error(request, response)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return records, elapsed
+
+
+async def run_workload(
+    app: FastAPI,
+    workload: str,
+    requests: int = 200,
+    concurrency: int = 8,
+    seed: int = 0,
+    warmup: Optional[int] = None,
+) -> Dict[str, Any]:
+    """预热后运行一次负载，返回统计结果（含本次运行新增的峰值RSS）"""
+    warmup = min(20, requests // 10) if warmup is None else warmup
+    if warmup:
+        await drive(app, plan_requests(workload, warmup, seed=seed + 1), concurrency)
+
+    rss_before = _peak_rss_mb()
+    records, elapsed = await drive(app, plan_requests(workload, requests, seed=seed), concurrency)
+    peak = _peak_rss_mb()
+
+    result = summarize(records, elapsed)
+    result["concurrency"] = concurrency
+    result["peak_rss_mb"] = round(peak, 1)
+    result["peak_rss_delta_mb"] = round(peak - rss_before, 1)
+    return result
+
+
+class BenchEnvironment:
+    """进程内API + 桩模型 + fakeredis + SQLite + 临时数据目录（不执行lifespan，不加载真实模型）"""
+
+    def __init__(
+        self,
+        database_url: str = "sqlite+aiosqlite://",
+        read_database_url: Optional[str] = None,
+        image_seconds_per_megapixel_step: float = 0.0002,
+        gemini_seconds_per_call: float = 0.0,
+        rate_limit: bool = False,
+    ):
+        self.database_url = database_url
+        self.read_database_url = read_database_url
+        self.image_backend = StubImageBackend(image_seconds_per_megapixel_step)
+        self.gemini_model = StubGeminiModel(gemini_seconds_per_call)
+        self.rate_limit = rate_limit
+        self.app: Optional[FastAPI] = None
+        self.sessions = None
+        self.read_sessions = None
+        self._restore: List[Callable[[], None]] = []
+
+    async def __aenter__(self) -> FastAPI:
+        from fakeredis import aioredis
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        from core.config import settings
+        import models  # noqa: F401  注册全部表
+        from core.database import Base, get_db, get_read_db
+        from core.redis import cache
+        from main import app
+        from services.near_duplicates import near_duplicates
+        from services.usage_counters import usage_counters
+
+        self._restore.append(install_stubs(self.image_backend, self.gemini_model))
+
+        previous_client = cache._client
+        cache._client = aioredis.FakeRedis(decode_responses=True)
+        self._restore.append(lambda: setattr(cache, "_client", previous_client))
+
+        previous_rate_limit = settings.RATE_LIMIT_ENABLED
+        settings.RATE_LIMIT_ENABLED = self.rate_limit
+        self._restore.append(lambda: setattr(settings, "RATE_LIMIT_ENABLED", previous_rate_limit))
+
+        # 资源索引与模板索引写入临时目录，不污染 ./data
+        self._restore.append(self._use_temporary_data_dir(settings))
+
+        # 近重复索引与未写回的使用次数是进程内状态，每个环境从空开始
+        near_duplicates.reset()
+        self._restore.append(near_duplicates.reset)
+        usage_counters.reset()
+        self._restore.append(usage_counters.reset)
+
+        self._engines = [create_async_engine(self.database_url)]
+        if self.read_database_url:
+            # 只读副本替身：与主库分开的另一个数据库，由测试自行写入数据
+            self._engines.append(create_async_engine(self.read_database_url))
+        for engine in self._engines:
+            async with engine.begin() as conn:
+                # 建表（含全文检索索引）
+                await conn.run_sync(Base.metadata.create_all)
+        sessions = self.sessions = async_sessionmaker(self._engines[0], expire_on_commit=False)
+        read_sessions = self.read_sessions = async_sessionmaker(self._engines[-1], expire_on_commit=False)
+
+        async def override_get_db():
+            async with sessions() as session:
+                yield session
+
+        async def override_get_read_db():
+            async with read_sessions() as session:
+                yield session
+
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_read_db] = override_get_read_db
+        self._restore.append(lambda: app.dependency_overrides.pop(get_db, None))
+        self._restore.append(lambda: app.dependency_overrides.pop(get_read_db, None))
+
+        self.app = app
+        return app
+
+    async def __aexit__(self, *exc_info):
+        for restore in reversed(self._restore):
+            restore()
+        self._restore.clear()
+        for engine in self._engines:
+            await engine.dispose()
+
+    @staticmethod
+    def _use_temporary_data_dir(settings) -> Callable[[], None]:
+        from services.asset_index import asset_index
+
+        data_dir = tempfile.mkdtemp(prefix="ai_designer_bench_")
+        paths = {
+            "ASSET_INDEX_PATH": f"{data_dir}/asset_index",
+            "DESIGN_TEMPLATE_INDEX_PATH": f"{data_dir}/design_template_index.npz",
+        }
+        previous = {name: getattr(settings, name) for name in paths}
+
+        def close_index():
+            if asset_index.is_initialized:
+                asset_index.close()
+            asset_index.reset()
+
+        close_index()
+        for name, path in paths.items():
+            setattr(settings, name, path)
+
+        def restore():
+            close_index()
+            for name, value in previous.items():
+                setattr(settings, name, value)
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+        return restore
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "image_seconds_per_megapixel_step": self.image_backend.seconds_per_megapixel_step,
+            "gemini_seconds_per_call": self.gemini_model.seconds_per_call,
+            "rate_limit": self.rate_limit,
+        }
+
+
+def baseline_document(results: Dict[str, Dict[str, Any]], config: Dict[str, Any]) -> Dict[str, Any]:
+    """基线JSON结构"""
+    return {
+        "version": BASELINE_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+        },
+        "config": config,
+        "workloads": results,
+    }
+
+
+@dataclass(frozen=True)
+class Regression:
+    """超出容差的指标变化"""
+    workload: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        return (self.current - self.baseline) / self.baseline if self.baseline else math.inf
+
+    def __str__(self) -> str:
+        return f"{self.workload:<10} {self.metric:<18} {self.baseline:>10.2f} -> {self.current:>10.2f} ({self.change:+.1%})"
+
+
+# 指标 -> (取值函数, 变大是否变差, 绝对变化下限)；下限用于忽略极小数值上的抖动
+METRICS: Dict[str, Tuple[Callable[[Dict[str, Any]], float], bool, float]] = {
+    "throughput_rps": (lambda r: r["throughput_rps"], False, 0.0),
+    "latency_p50_ms": (lambda r: r["latency_ms"]["p50"], True, 1.0),
+    "latency_p95_ms": (lambda r: r["latency_ms"]["p95"], True, 1.0),
+    "latency_p99_ms": (lambda r: r["latency_ms"]["p99"], True, 2.0),
+    "peak_rss_delta_mb": (lambda r: r["peak_rss_delta_mb"], True, 8.0),
+    "errors": (lambda r: r["errors"], True, 0.0),
+}
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.1) -> List[Regression]:
+    """比较两次结果，返回变差超过tolerance（相对值）的指标；只比较两边都有的负载"""
+    regressions = []
+    for workload, result in current["workloads"].items():
+        previous = baseline["workloads"].get(workload)
+        if previous is None:
+            continue
+        for metric, (value, higher_is_worse, floor) in METRICS.items():
+            old, new = value(previous), value(result)
+            delta = (new - old) if higher_is_worse else (old - new)
+            if metric == "errors":
+                worse = delta > 0
+            else:
+                worse = delta > max(abs(old) * tolerance, floor)
+            if worse:
+                regressions.append(Regression(workload, metric, old, new))
+    return regressions
@@ -0,0 +1,154 @@
+"""
+Benchmark Stubs
+确定性的桩模型 - 相同输入得到相同输出，推理耗时按像素数×步数模拟
+"""
+
+import hashlib
+import os
+import re
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+
+def _digest(*parts: Any) -> int:
+    data = "\x1f".join(str(part) for part in parts).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+class StubImageBackend:
+    """图像生成 + CLIP评分/编码桩，接口与ModelServerClient一致
+
+    以远程后端的身份接入ImageGenerationService：种子由后端处理，美学评分与设计稿区域编码
+    也由后端计算，因此不需要torch。
+    """
+
+    is_remote = True
+
+    def __init__(self, seconds_per_megapixel_step: float = 0.0002):
+        self.seconds_per_megapixel_step = seconds_per_megapixel_step
+        self.calls = 0
+
+    def ping(self) -> Dict[str, Any]:
+        return {"pid": os.getpid(), "models": ["image_generator", "clip_model"], "scheduler": "stub"}
+
+    def __call__(self, seed: Optional[int] = None, progress=None, **kwargs) -> SimpleNamespace:
+        self.calls += 1
+        width, height = kwargs["width"], kwargs["height"]
+        steps = kwargs.get("num_inference_steps") or 1
+
+        step_seconds = self.seconds_per_megapixel_step * width * height / 1e6
+        for step in range(1, steps + 1):
+            if step_seconds:
+                time.sleep(step_seconds)
+            if progress is not None:
+                progress.report(step, steps, None)
+
+        rng = np.random.default_rng(_digest(kwargs.get("prompt"), kwargs.get("negative_prompt"), seed))
+        return SimpleNamespace(images=[self._render(rng, width, height)])
+
+    @staticmethod
+    def _render(rng: np.random.Generator, width: int, height: int) -> Image.Image:
+        """两色渐变加低幅噪声，PNG体积接近真实生成图"""
+        start, end = rng.integers(0, 256, size=(2, 3))
+        ramp = np.linspace(0.0, 1.0, width, dtype=np.float32)[None, :, None]
+        pixels = start + (end - start) * ramp
+        pixels = pixels + rng.integers(0, 16, size=(height, width, 3))
+        return Image.fromarray(pixels.clip(0, 255).astype(np.uint8), "RGB")
+
+    def aesthetic_score(self, image: Image.Image) -> float:
+        """缩略图对比度映射到0-1"""
+        thumbnail = np.asarray(image.convert("L").resize((16, 16)), dtype=np.float32)
+        return round(min(1.0, 0.5 + thumbnail.std() / 255.0), 4)
+
+    model_id = "stub-clip"
+
+    def embed_regions(self, crops: np.ndarray) -> np.ndarray:
+        """区域编码：由区域的平均颜色决定的确定性单位向量"""
+        return np.stack([self._unit_vector(crop.reshape(-1, 3).mean(axis=0).round().tolist()) for crop in crops])
+
+    def embed_texts(self, texts) -> np.ndarray:
+        return np.stack([self._unit_vector(text) for text in texts])
+
+    @staticmethod
+    def _unit_vector(*parts: Any, dimensions: int = 512) -> np.ndarray:
+        vector = np.random.default_rng(_digest(*parts)).standard_normal(dimensions).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+
+class StubGeminiModel:
+    """Gemini GenerativeModel桩：按提示词返回确定性的SVG或组件代码"""
+
+    def __init__(self, seconds_per_call: float = 0.0):
+        self.seconds_per_call = seconds_per_call
+        self.calls = 0
+
+    def generate_content(self, prompt: str) -> SimpleNamespace:
+        self.calls += 1
+        if self.seconds_per_call:
+            # 与真实SDK一致为同步调用
+            time.sleep(self.seconds_per_call)
+
+        if prompt.startswith("Generate SVG"):
+            return SimpleNamespace(text=self._svg(prompt))
+        return SimpleNamespace(text=f"```tsx\n{self._component(prompt)}\n```")
+
+    @staticmethod
+    def _svg(prompt: str) -> str:
+        match = re.search(r"Size: (\d+)x(\d+)", prompt)
+        width, height = (int(match.group(1)), int(match.group(2))) if match else (512, 512)
+        seed = _digest(prompt)
+        shapes = []
+        for i in range(6):
+            cx, cy = (seed >> (i * 4)) % width, (seed >> (i * 5)) % height
+            radius = 8 + (seed >> (i * 3)) % (min(width, height) // 4)
+            shapes.append(f'<circle cx="{cx}" cy="{cy}" r="{radius}" fill="#{(seed >> i) % 0xFFFFFF:06x}"/>')
+        return (
+            f'Here is the SVG:\n<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}">\n  ' + "\n  ".join(shapes) + "\n</svg>"
+        )
+
+    @staticmethod
+    def _component(prompt: str) -> str:
+        match = re.search(r"Component name: (\w+)", prompt)
+        name = match.group(1) if match else "OptimizedComponent"
+        seed = _digest(prompt)
+        items = "\n".join(f'        <li key="{i}" className="p-2">Item {i}</li>' for i in range(3 + seed % 5))
+        return (
+            'import React from "react";\n\n'
+            f"export interface {name}Props {{\n  title?: string;\n}}\n\n"
+            f"export const {name}: React.FC<{name}Props> = ({{ title = \"{name}\" }}) => (\n"
+            '  <section className="rounded-lg shadow-md p-6" aria-label={title}>\n'
+            "    <h2 className=\"text-xl font-semibold\">{title}</h2>\n"
+            f"    <ul>\n{items}\n    </ul>\n"
+            "  </section>\n);\n\n"
+            f"export default {name};"
+        )
+
+
+def install_stubs(image_backend: StubImageBackend, gemini_model: StubGeminiModel) -> Callable[[], None]:
+    """把桩模型注册到ModelManager并重建服务单例，返回恢复原状态的函数"""
+    from services import code_service, image_service, model_manager, svg_service
+    from services.design_analysis import design_analyzer
+
+    stubs = {"image_generator": image_backend, "gemini_model": gemini_model}
+    previous = {name: model_manager.models.get(name) for name in stubs}
+    services = (image_service, svg_service, code_service, design_analyzer)
+
+    model_manager.models.update(stubs)
+    for service in services:
+        service.reset()
+
+    def restore():
+        for name, model in previous.items():
+            if model is None:
+                model_manager.models.pop(name, None)
+            else:
+                model_manager.models[name] = model
+        for service in services:
+            service.reset()
+
+    return restore
@@ -0,0 +1,145 @@
+"""
+Benchmark Workloads
+基准负载定义 - 每类负载由按权重抽样的请求模板组成，请求序列由种子确定
+"""
+
+import random
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+ART_STYLES = ["van_gogh", "monet", "kandinsky", "matisse", "hiroshige"]
+PAGES = [
+    "a SaaS analytics dashboard landing page with pricing and testimonials",
+    "a portfolio site for an architecture studio with a project gallery",
+    "an online bookstore home page with featured titles and newsletter signup",
+    "a mobile banking onboarding flow with account setup steps",
+]
+
+SAMPLE_COMPONENT = """import React, { useState } from "react";
+
+export default function Counter() {
+  const [count, setCount] = useState(0);
+  return <button onClick={() => setCount(count + 1)}>Clicked {count} times</button>;
+}
+"""
+
+
+@dataclass(frozen=True)
+class RequestTemplate:
+    """一类请求：payload(rng) 生成本次请求的JSON或查询参数"""
+    name: str
+    method: str
+    path: str
+    weight: float
+    json: Optional[Callable[[random.Random], Dict[str, Any]]] = None
+    params: Optional[Callable[[random.Random], Dict[str, Any]]] = None
+
+
+@dataclass(frozen=True)
+class PlannedRequest:
+    name: str
+    method: str
+    path: str
+    json: Optional[Dict[str, Any]] = None
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+def _hero(rng: random.Random) -> Dict[str, Any]:
+    # 约1/4的请求固定种子，重复提交会命中请求合并
+    width, height = rng.choice([(1024, 576), (1280, 704), (768, 768)])
+    return {
+        "prompt": f"{rng.choice(PAGES)}, hero illustration",
+        "width": width,
+        "height": height,
+        "num_inference_steps": 20,
+        "seed": rng.choice([None, None, None, 42]),
+    }
+
+
+IMAGE = [
+    RequestTemplate("image.generate", "POST", "/api/v1/image/generate", 6, json=_hero),
+    RequestTemplate(
+        "image.generate_png", "POST", "/api/v1/image/generate", 2, json=_hero,
+        params=lambda rng: {"response_format": "png"},
+    ),
+    RequestTemplate(
+        "image.icons", "POST", "/api/v1/image/icons", 1,
+        json=lambda rng: {"concept": rng.choice(["search", "cart", "profile"]), "count": 4, "size": "thumbnail"},
+    ),
+    RequestTemplate(
+        "image.background", "POST", "/api/v1/image/background", 1,
+        json=lambda rng: {"style": rng.choice(["gradient", "mesh", "noise"]), "size": "card"},
+    ),
+]
+
+SVG = [
+    RequestTemplate(
+        "svg.generate", "POST", "/api/v1/svg/generate", 8,
+        json=lambda rng: {"description": f"a minimalist logo with a circle and triangle #{rng.randrange(50)}"},
+    ),
+    RequestTemplate(
+        "svg.icon_set", "POST", "/api/v1/svg/icon-set", 2,
+        json=lambda rng: {"concept": rng.choice(["navigation", "social", "media"]), "count": 6, "size": 128},
+    ),
+]
+
+CODE = [
+    RequestTemplate(
+        "code.generate", "POST", "/api/v1/code/generate", 6,
+        json=lambda rng: {"description": rng.choice(PAGES), "component_name": "Landing"},
+    ),
+    RequestTemplate(
+        "code.component_library", "POST", "/api/v1/code/component-library", 1,
+        json=lambda rng: {"theme": rng.choice(["modern", "minimal"]), "components": ["Button", "Card", "Input"]},
+    ),
+    RequestTemplate(
+        "code.optimize", "POST", "/api/v1/code/optimize", 3,
+        json=lambda rng: {"code": SAMPLE_COMPONENT, "framework": "react"},
+    ),
+]
+
+AESTHETIC = [
+    RequestTemplate(
+        "aesthetic.design", "POST", "/api/v1/aesthetic/design", 7,
+        json=lambda rng: {
+            "art_style": rng.choice(ART_STYLES),
+            "page_description": rng.choice(PAGES),
+            "target_components": rng.sample(["hero_banner", "header", "card", "button", "background"], 3),
+        },
+    ),
+    RequestTemplate(
+        "aesthetic.analyze", "POST", "/api/v1/aesthetic/analyze", 3,
+        params=lambda rng: {"art_style": rng.choice(ART_STYLES), "page_description": rng.choice(PAGES)},
+    ),
+]
+
+# 混合负载按线上比例加权：文本类请求多，图像请求少但单次耗时长
+WORKLOADS: Dict[str, List[RequestTemplate]] = {
+    "image": IMAGE,
+    "svg": SVG,
+    "code": CODE,
+    "aesthetic": AESTHETIC,
+    "mixed": (
+        [RequestTemplate(t.name, t.method, t.path, t.weight * 0.2, t.json, t.params) for t in IMAGE]
+        + [RequestTemplate(t.name, t.method, t.path, t.weight * 0.3, t.json, t.params) for t in SVG]
+        + [RequestTemplate(t.name, t.method, t.path, t.weight * 0.25, t.json, t.params) for t in CODE]
+        + [RequestTemplate(t.name, t.method, t.path, t.weight * 0.25, t.json, t.params) for t in AESTHETIC]
+    ),
+}
+
+
+def plan_requests(workload: str, count: int, seed: int = 0) -> List[PlannedRequest]:
+    """按权重抽样生成请求序列（相同种子得到相同序列）"""
+    templates = WORKLOADS[workload]
+    rng = random.Random(seed)
+    chosen = rng.choices(templates, weights=[t.weight for t in templates], k=count)
+    return [
+        PlannedRequest(
+            name=template.name,
+            method=template.method,
+            path=template.path,
+            json=template.json(rng) if template.json else None,
+            params=template.params(rng) if template.params else {},
+        )
+        for template in chosen
+    ]
@@ -0,0 +1,195 @@
+"""
+Admission control
+准入控制 - 按已接收但未完成的工作量与近期推理耗时预测完成时间，超出期限时提前降级或拒绝，
+过载时尾延迟保持有界，而不是所有请求一起排到超时
+"""
+
+import math
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from core.config import settings
+from core.metrics import ADMISSION_DECISIONS, ADMISSION_QUEUED_WORK
+
+
+def work_units(width: int, height: int, steps: int) -> float:
+    """推理工作量：百万像素 × 步数（扩散推理耗时近似与两者成正比）"""
+    return width * height / 1e6 * max(1, steps)
+
+
+class AdmissionRejected(Exception):
+    """预测完成时间超过期限且无法降级"""
+
+    def __init__(self, route: str, predicted_seconds: Optional[float], retry_after: int):
+        self.route = route
+        self.predicted_seconds = predicted_seconds
+        self.retry_after = retry_after
+        super().__init__(f"{route} overloaded, retry after {retry_after}s")
+
+
+@dataclass
+class AdmissionDecision:
+    """准入结果：decision 为 admit / degrade / demo；width/height/steps 为实际应使用的参数"""
+    route: str
+    decision: str
+    width: int
+    height: int
+    steps: int
+    predicted_seconds: Optional[float] = None
+    units: float = 0.0  # 计入排队工作量的部分，release时扣除
+    released: bool = False
+
+    @property
+    def demo(self) -> bool:
+        return self.decision == "demo"
+
+
+class AdmissionController:
+    """生成请求准入控制器
+
+    推理在同一条流水线上串行执行，因此新请求的完成时间 ≈（已接收工作量 + 本请求工作量）×
+    单位工作量耗时。单位耗时取各端点最近推理耗时的指数移动平均；尚无样本时只按队列长度限制。
+
+    超出期限时依次尝试：减少步数（不低于min_steps）→ 缩小尺寸（边长不低于min_scale）→
+    演示渲染（demo_fallback）→ 拒绝（AdmissionRejected，带Retry-After秒数）。
+
+    一个请求生成多张图（图标组）时 count 为张数，工作量按张数累计，降级后的步数与尺寸对每张图相同。
+    """
+
+    def __init__(
+        self,
+        deadline: Optional[float] = None,
+        max_queue: Optional[int] = None,
+        min_steps: Optional[int] = None,
+        min_scale: Optional[float] = None,
+        demo_fallback: Optional[bool] = None,
+        size_multiple: int = 64,
+        smoothing: float = 0.2,
+    ):
+        self.deadline = settings.IMAGE_ADMISSION_DEADLINE if deadline is None else deadline
+        self.max_queue = settings.IMAGE_ADMISSION_MAX_QUEUE if max_queue is None else max_queue
+        self.min_steps = settings.IMAGE_ADMISSION_MIN_STEPS if min_steps is None else min_steps
+        self.min_scale = settings.IMAGE_ADMISSION_MIN_SCALE if min_scale is None else min_scale
+        self.demo_fallback = settings.IMAGE_ADMISSION_DEMO_FALLBACK if demo_fallback is None else demo_fallback
+        self.size_multiple = size_multiple
+        self.smoothing = smoothing
+
+        # release/observe在线程池中调用
+        self._lock = threading.Lock()
+        self.seconds_per_unit: Dict[str, float] = {}
+        self.queued_units = 0.0
+        self.in_flight: Dict[str, int] = {}
+
+    def observe(self, endpoint: str, width: int, height: int, steps: int, seconds: float):
+        """记录一次推理耗时"""
+        sample = seconds / work_units(width, height, steps)
+        with self._lock:
+            previous = self.seconds_per_unit.get(endpoint)
+            self.seconds_per_unit[endpoint] = (
+                sample if previous is None else (1 - self.smoothing) * previous + self.smoothing * sample
+            )
+
+    def _unit_cost(self, endpoint: str) -> Optional[float]:
+        if endpoint in self.seconds_per_unit:
+            return self.seconds_per_unit[endpoint]
+        if self.seconds_per_unit:
+            return max(self.seconds_per_unit.values())
+        return None
+
+    def admit(
+        self,
+        route: str,
+        endpoint: str,
+        width: int,
+        height: int,
+        steps: int,
+        count: int = 1,
+        allow_demo: bool = True
+    ) -> AdmissionDecision:
+        """决定是否接收请求；接收（含降级）后必须调用release。allow_demo=False 的端点没有演示渲染，过载时直接拒绝"""
+        with self._lock:
+            decision = self._decide(route, endpoint, width, height, steps, max(1, count), allow_demo)
+            if decision.units:
+                self.queued_units += decision.units
+                self.in_flight[route] = self.in_flight.get(route, 0) + 1
+                ADMISSION_QUEUED_WORK.set(self.queued_units)
+
+        ADMISSION_DECISIONS.labels(route, decision.decision).inc()
+        return decision
+
+    def release(self, decision: AdmissionDecision):
+        """请求完成（成功、失败或取消）后扣除其工作量；重复调用无效"""
+        with self._lock:
+            if decision.released or not decision.units:
+                return
+            decision.released = True
+            self.queued_units = max(0.0, self.queued_units - decision.units)
+            self.in_flight[decision.route] -= 1
+            ADMISSION_QUEUED_WORK.set(self.queued_units)
+
+    def _decide(
+        self, route: str, endpoint: str, width: int, height: int, steps: int, count: int, allow_demo: bool
+    ) -> AdmissionDecision:
+        queued = sum(self.in_flight.values())
+        unit_cost = self._unit_cost(endpoint)
+        wait = self.queued_units * unit_cost if unit_cost is not None else None
+        units = work_units(width, height, steps) * count
+
+        if self.max_queue and queued >= self.max_queue:
+            return self._overflow(route, width, height, steps, wait, math.ceil(wait or 1), allow_demo)
+
+        if unit_cost is None:
+            return AdmissionDecision(route, "admit", width, height, steps, None, units)
+
+        predicted = wait + units * unit_cost
+        if predicted <= self.deadline:
+            return AdmissionDecision(route, "admit", width, height, steps, predicted, units)
+
+        # 剩余时间预算内最多可执行的工作量
+        budget = (self.deadline - wait) / unit_cost
+        megapixels = width * height / 1e6 * count
+        min_steps = min(steps, self.min_steps)
+
+        if budget >= megapixels * min_steps:
+            reduced_steps = max(min_steps, int(budget / megapixels))
+            return self._degraded(route, width, height, reduced_steps, count, wait, unit_cost)
+
+        scale = math.sqrt(budget / (megapixels * min_steps)) if budget > 0 else 0.0
+        if scale >= self.min_scale:
+            reduced_width, reduced_height = self._scaled(width, scale), self._scaled(height, scale)
+            return self._degraded(route, reduced_width, reduced_height, min_steps, count, wait, unit_cost)
+
+        # 最低降级档位仍超时：等待队列消化到能容纳最低档位所需的时间
+        smallest = work_units(self._scaled(width, self.min_scale), self._scaled(height, self.min_scale), min_steps) * count
+        retry_after = math.ceil(wait + smallest * unit_cost - self.deadline)
+        return self._overflow(route, width, height, steps, predicted, retry_after, allow_demo)
+
+    def _scaled(self, size: int, scale: float) -> int:
+        return max(self.size_multiple, int(size * scale) // self.size_multiple * self.size_multiple)
+
+    def _degraded(
+        self, route: str, width: int, height: int, steps: int, count: int, wait: float, unit_cost: float
+    ) -> AdmissionDecision:
+        units = work_units(width, height, steps) * count
+        return AdmissionDecision(route, "degrade", width, height, steps, wait + units * unit_cost, units)
+
+    def _overflow(
+        self,
+        route: str,
+        width: int,
+        height: int,
+        steps: int,
+        predicted: Optional[float],
+        retry_after: int,
+        allow_demo: bool = True
+    ) -> AdmissionDecision:
+        if self.demo_fallback and allow_demo:
+            # 演示渲染不占用推理流水线，不计入排队工作量
+            return AdmissionDecision(route, "demo", width, height, steps, predicted)
+        ADMISSION_DECISIONS.labels(route, "reject").inc()
+        raise AdmissionRejected(route, predicted, max(1, retry_after))
+
+
+# 全局准入控制器（图像生成流水线）
+image_admission = AdmissionController()
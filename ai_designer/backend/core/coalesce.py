@@ -0,0 +1,51 @@
+"""
+Request coalescing
+相同参数的并发请求合并为一次执行（single-flight）
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from core.metrics import COALESCED_REQUESTS
+
+
+class RequestCoalescer:
+    """请求合并器
+
+    同一key的请求在第一个请求执行期间到达时，直接等待其结果，
+    不再重复执行。仅适用于结果确定的请求（如固定seed的生成）。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def inflight(self) -> int:
+        """当前执行中的不同请求数"""
+        return len(self._inflight)
+
+    async def run(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """执行或加入一个进行中的请求"""
+        future = self._inflight.get(key)
+        if future is not None:
+            COALESCED_REQUESTS.labels(self.name).inc()
+            # shield: 某个等待者取消不影响其他等待者
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # 标记已读取，避免无等待者时的警告
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
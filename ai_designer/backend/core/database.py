@@ -2,28 +2,120 @@
 Database configuration and initialization
 """
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+import time
+from typing import Dict, Optional, Type
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from core.config import settings
+from core.metrics import DB_POOL_CHECKED_OUT, DB_POOL_CHECKOUTS, DB_POOL_WAIT_SECONDS
 from loguru import logger
 
-# Create async engine
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    pool_size=10,
-    max_overflow=20,
-    pool_pre_ping=True
-)
-
-# Create async session factory
-AsyncSessionLocal = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-    autocommit=False,
-    autoflush=False
-)
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """记录取连接等待时间与取出次数的连接池，role 区分主库与只读副本"""
+
+    role = "primary"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            DB_POOL_WAIT_SECONDS.labels(self.role).observe(time.perf_counter() - start)
+            DB_POOL_CHECKOUTS.labels(self.role, "timeout").inc()
+            raise
+        DB_POOL_WAIT_SECONDS.labels(self.role).observe(time.perf_counter() - start)
+        DB_POOL_CHECKOUTS.labels(self.role, "ok").inc()
+        return connection
+
+
+_POOL_CLASSES: Dict[str, Type[InstrumentedQueuePool]] = {}
+
+
+def _pool_class(role: str) -> Type[InstrumentedQueuePool]:
+    # 连接池在dispose时按类重建，role放在类属性上才能保留
+    if role not in _POOL_CLASSES:
+        _POOL_CLASSES[role] = type(f"InstrumentedQueuePool[{role}]", (InstrumentedQueuePool,), {"role": role})
+    return _POOL_CLASSES[role]
+
+
+def create_database_engine(url: str, role: str = "primary") -> AsyncEngine:
+    """
+    按配置创建引擎
+
+    连接池大小、超时、回收与pre-ping来自 DATABASE_POOL_*；asyncpg 的预编译语句缓存为
+    DATABASE_STATEMENT_CACHE_SIZE（经pgbouncer事务模式连接时设为0）；SQL日志只由 DATABASE_ECHO 控制。
+    内存SQLite只有一个连接，保持默认的StaticPool
+    """
+    url = make_url(url)
+    kwargs = {"echo": settings.DATABASE_ECHO}
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return create_async_engine(url, **kwargs)
+
+    if url.get_driver_name() == "asyncpg":
+        cache_size = settings.DATABASE_STATEMENT_CACHE_SIZE
+        if "prepared_statement_cache_size" not in url.query:
+            url = url.update_query_dict({"prepared_statement_cache_size": str(cache_size)})
+        kwargs["connect_args"] = {"statement_cache_size": cache_size}
+
+    engine = create_async_engine(
+        url,
+        poolclass=_pool_class(role),
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE,
+        pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+        **kwargs
+    )
+    DB_POOL_CHECKED_OUT.labels(role).set_function(lambda: engine.pool.checkedout())
+    return engine
+
+
+class DatabaseRouter:
+    """
+    主库与只读副本的引擎和会话工厂
+
+    写入以及需要读到刚写入数据的请求用主库会话（get_db），列表与检索用只读会话（get_read_db）；
+    未配置 DATABASE_READ_URL 时两者是同一个主库
+    """
+
+    def __init__(self, url: str, read_url: Optional[str] = None):
+        self.engine = create_database_engine(url, "primary")
+        self.read_engine = create_database_engine(read_url, "replica") if read_url else self.engine
+        self.sessions = self._sessionmaker(self.engine)
+        self.read_sessions = self._sessionmaker(self.read_engine) if read_url else self.sessions
+
+    @staticmethod
+    def _sessionmaker(engine: AsyncEngine) -> async_sessionmaker:
+        return async_sessionmaker(
+            engine,
+            class_=AsyncSession,
+            expire_on_commit=False,
+            autocommit=False,
+            autoflush=False
+        )
+
+    @property
+    def has_replica(self) -> bool:
+        return self.read_engine is not self.engine
+
+    async def dispose(self):
+        await self.engine.dispose()
+        if self.has_replica:
+            await self.read_engine.dispose()
+
+
+# 主库与只读副本（首次连接时才建立连接）
+database = DatabaseRouter(settings.DATABASE_URL, settings.DATABASE_READ_URL)
+engine = database.engine
+
+# Create async session factories
+AsyncSessionLocal = database.sessions
+ReadSessionLocal = database.read_sessions
 
 # Base class for models
 Base = declarative_base()
@@ -31,7 +123,7 @@ Base = declarative_base()
 
 async def get_db() -> AsyncSession:
     """
-    Dependency to get database session
+    Dependency to get database session (primary)
     """
     async with AsyncSessionLocal() as session:
         try:
@@ -40,21 +132,43 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+async def get_read_db() -> AsyncSession:
+    """
+    Dependency to get a read-only session (replica when DATABASE_READ_URL is set)
+    """
+    async with ReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
 async def init_db():
     """
-    Initialize database tables
+    Check the database schema on startup (DATABASE_SCHEMA_MODE)
+
+    verify: one query that alembic_version is at the head revision, raises
+    SchemaNotMigrated otherwise; create: create_all (development/tests only);
+    off: nothing
     """
+    mode = settings.DATABASE_SCHEMA_MODE
     try:
-        async with engine.begin() as conn:
+        if mode == "off":
+            return
+        if mode == "create":
             # Import all models to ensure they're registered with Base
-            from models.user import User
-            from models.project import Project
-            from models.design import Design
-            
-            # Create all tables
-            await conn.run_sync(Base.metadata.create_all)
-            
-        logger.info("✅ Database tables created successfully")
+            import models  # noqa: F401
+
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            logger.info("✅ Database tables created successfully")
+            return
+        if mode != "verify":
+            raise ValueError(f"Unknown DATABASE_SCHEMA_MODE: {mode}")
+
+        from core.migrations import verify_schema
+        revision = await verify_schema(engine)
+        logger.info(f"✅ Database schema at revision {', '.join(revision)}")
     except Exception as e:
         logger.error(f"❌ Failed to initialize database: {e}")
         raise
@@ -64,5 +178,5 @@ async def close_db():
     """
     Close database connection
     """
-    await engine.dispose()
+    await database.dispose()
     logger.info("✅ Database connection closed")
@@ -0,0 +1,245 @@
+"""
+Image Buffers
+图像缓冲区 - 共享内存传递像素、只编码一次、发送时逐块base64，避免整块数据的重复拷贝
+"""
+
+import base64
+import io
+import json
+import re
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Union
+from uuid import uuid4
+
+from PIL import Image
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+# 原始数据按3的倍数切块，base64后每块64KB且可直接拼接
+BASE64_CHUNK_SIZE = 3 * 16384
+BODY_CHUNK_SIZE = 64 * 1024
+
+_MODE_CHANNELS = {"L": 1, "RGB": 3, "RGBA": 4}
+
+
+def _write_pixels(image: Image.Image, target: memoryview):
+    """按块把原始像素写入target，不像tobytes()那样生成整幅图像的临时bytes"""
+    image.load()
+    encoder = Image._getencoder(image.mode, "raw", image.mode)
+    encoder.setimage(image.im, (0, 0) + image.size)
+
+    offset = 0
+    while True:
+        _, status, chunk = encoder.encode(max(BODY_CHUNK_SIZE, image.width * 4))
+        target[offset:offset + len(chunk)] = chunk
+        offset += len(chunk)
+        if status:
+            break
+    if status < 0:
+        raise RuntimeError(f"encoder error {status} while copying pixels")
+
+
+class SharedImageBuffer:
+    """共享内存中的原始像素，用于进程间传递图像而不经过pickle
+
+    创建方调用 transfer() 后把 ref 发给对端，对端 attach() 读取后 release()；
+    共享内存段始终只由一个进程负责释放。
+    """
+
+    def __init__(self, shm: SharedMemory, width: int, height: int, mode: str = "RGB"):
+        self.shm = shm
+        self.width = width
+        self.height = height
+        self.mode = mode
+
+    @classmethod
+    def from_image(cls, image: Image.Image) -> "SharedImageBuffer":
+        """新建共享内存段并写入图像像素"""
+        if image.mode not in _MODE_CHANNELS:
+            image = image.convert("RGB")
+
+        width, height = image.size
+        shm = SharedMemory(create=True, size=width * height * _MODE_CHANNELS[image.mode])
+        buffer = cls(shm, width, height, image.mode)
+        _write_pixels(image, buffer.view)
+        return buffer
+
+    @classmethod
+    def attach(cls, ref: Mapping[str, Any]) -> "SharedImageBuffer":
+        """附加到对端创建的共享内存段"""
+        return cls(SharedMemory(name=ref["shm"]), ref["width"], ref["height"], ref["mode"])
+
+    @property
+    def ref(self) -> Dict[str, Any]:
+        """可跨进程发送的描述信息"""
+        return {"shm": self.shm.name, "width": self.width, "height": self.height, "mode": self.mode}
+
+    @property
+    def view(self) -> memoryview:
+        """像素数据的memoryview（零拷贝）"""
+        return self.shm.buf[:self.width * self.height * _MODE_CHANNELS[self.mode]]
+
+    def to_image(self) -> Image.Image:
+        """转换为PIL图像（复制一次像素，之后可立即释放共享内存）"""
+        return Image.frombytes(self.mode, (self.width, self.height), self.view)
+
+    def transfer(self) -> Dict[str, Any]:
+        """把释放责任交给接收方，返回ref"""
+        ref = self.ref
+        # 否则本进程的resource_tracker会在退出时再次清理对端已释放的段
+        resource_tracker.unregister(self.shm._name, "shared_memory")
+        self.shm.close()
+        return ref
+
+    def release(self):
+        """关闭并删除共享内存段"""
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def discard(cls, ref: Mapping[str, Any]):
+        """释放对端未读取的共享内存段"""
+        try:
+            cls.attach(ref).release()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "SharedImageBuffer":
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def encode_image(image: Image.Image, format: str = "PNG", **params) -> memoryview:
+    """编码图像，返回编码缓冲区的memoryview（不做getvalue()拷贝）"""
+    output = io.BytesIO()
+    image.save(output, format=format, **params)
+    return output.getbuffer()
+
+
+def base64_size(nbytes: int) -> int:
+    """base64编码后的长度"""
+    return (nbytes + 2) // 3 * 4
+
+
+def iter_base64(data: BytesLike, chunk_size: int = BASE64_CHUNK_SIZE) -> Iterator[bytes]:
+    """逐块base64编码，每次只产生一个小块"""
+    view = memoryview(data).cast("B")
+    for start in range(0, len(view), chunk_size):
+        yield base64.b64encode(view[start:start + chunk_size])
+
+
+class EmbeddedImage:
+    """JSON响应中的图像字段，发送时才做base64编码"""
+
+    __slots__ = ("data", "prefix")
+
+    def __init__(self, data: BytesLike, prefix: str = ""):
+        self.data = memoryview(data).cast("B")
+        self.prefix = prefix
+
+    @property
+    def size(self) -> int:
+        return len(self.prefix) + base64_size(len(self.data))
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        if self.prefix:
+            yield self.prefix.encode("ascii")
+        yield from iter_base64(self.data)
+
+
+class ImageJSONResponse(Response):
+    """JSON响应，其中的EmbeddedImage字段直接逐块编码写入响应流
+
+    其余字段照常序列化，Content-Length预先算出，不需要分块传输。
+    """
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+    ):
+        self.status_code = status_code
+        self.background = None
+        self.body = b""
+        self._parts = self._render_parts(content)
+
+        length = sum(part.size if isinstance(part, EmbeddedImage) else len(part) for part in self._parts)
+        self.init_headers({**(headers or {}), "content-length": str(length)})
+
+    @staticmethod
+    def _render_parts(content: Any) -> List[Union[bytes, EmbeddedImage]]:
+        token = uuid4().hex
+        images: List[EmbeddedImage] = []
+
+        def replace(value):
+            if isinstance(value, EmbeddedImage):
+                images.append(value)
+                return f"{token}:{len(images) - 1}"
+            if isinstance(value, dict):
+                return {key: replace(item) for key, item in value.items()}
+            if isinstance(value, (list, tuple)):
+                return [replace(item) for item in value]
+            return value
+
+        text = json.dumps(
+            replace(content),
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+        # 切分后奇数位为图像序号
+        pieces = re.split(rf"{token}:(\d+)".encode("ascii"), text)
+        return [
+            images[int(piece)] if index % 2 else piece
+            for index, piece in enumerate(pieces)
+        ]
+
+    def iter_body(self) -> Iterator[bytes]:
+        for part in self._parts:
+            if isinstance(part, EmbeddedImage):
+                yield from part.iter_chunks()
+            elif part:
+                yield part
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        for chunk in self.iter_body():
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class BufferResponse(Response):
+    """直接发送已编码的缓冲区（按块切片，不复制整块数据）"""
+
+    def __init__(
+        self,
+        data: BytesLike,
+        media_type: str = "application/octet-stream",
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+    ):
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.body = b""
+        self._view = memoryview(data).cast("B")
+        self.init_headers({**(headers or {}), "content-length": str(len(self._view))})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        for start in range(0, len(self._view), BODY_CHUNK_SIZE):
+            chunk = bytes(self._view[start:start + BODY_CHUNK_SIZE])
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
@@ -0,0 +1,56 @@
+"""
+Lazy loading helpers
+延迟创建服务单例，避免导入时加载重型依赖或抢先读取尚未加载的模型
+"""
+
+import threading
+from typing import Any, Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class LazyObject(Generic[T]):
+    """首次访问属性时才调用factory创建实例的代理对象
+
+    `from services import image_service` 只拿到代理，真正的
+    ImageGenerationService 在第一次调用方法时创建（此时lifespan中的
+    模型加载已完成）。
+    """
+
+    __slots__ = ("_factory", "_instance", "_lock")
+
+    def __init__(self, factory: Callable[[], T]):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _get_instance(self) -> T:
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                instance = self._instance
+                if instance is None:
+                    instance = self._factory()
+                    object.__setattr__(self, "_instance", instance)
+        return instance
+
+    @property
+    def is_initialized(self) -> bool:
+        """实例是否已创建"""
+        return self._instance is not None
+
+    def reset(self):
+        """丢弃已创建的实例，下次访问时重新创建（替换模型后使用）"""
+        with self._lock:
+            object.__setattr__(self, "_instance", None)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get_instance(), name)
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(self._get_instance(), name, value)
+
+    def __repr__(self) -> str:
+        if self._instance is None:
+            return f"<LazyObject {getattr(self._factory, '__name__', self._factory)} (not created)>"
+        return repr(self._instance)
@@ -0,0 +1,68 @@
+"""
+Logging configuration
+日志配置 - 异步队列sink、JSON结构化输出、级别预判断
+"""
+
+import sys
+from typing import Optional
+from loguru import logger
+from core.config import settings
+
+
+CONSOLE_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | "
+    "<cyan>{name}</cyan>:<cyan>{function}</cyan> - <level>{message}</level>"
+)
+
+# 当前生效的最低日志级别，用于在热路径上跳过被抑制级别的格式化
+_min_level_no = 0
+
+
+def setup_logging(
+    level: Optional[str] = None,
+    json_format: Optional[bool] = None,
+    enqueue: Optional[bool] = None
+):
+    """
+    配置全局logger
+
+    Args:
+        level: 最低日志级别，默认 settings.LOG_LEVEL
+        json_format: 是否输出JSON（每行一条记录），默认 settings.LOG_JSON
+        enqueue: 是否通过后台队列异步写出，默认 settings.LOG_ENQUEUE
+    """
+    global _min_level_no
+
+    level = (level or settings.LOG_LEVEL).upper()
+    json_format = settings.LOG_JSON if json_format is None else json_format
+    enqueue = settings.LOG_ENQUEUE if enqueue is None else enqueue
+
+    logger.remove()
+    logger.add(
+        sys.stderr,
+        level=level,
+        format=CONSOLE_FORMAT,
+        serialize=json_format,
+        enqueue=enqueue,
+        backtrace=False,
+        diagnose=settings.LOG_DIAGNOSE,
+    )
+
+    if settings.LOG_FILE:
+        logger.add(
+            settings.LOG_FILE,
+            level=level,
+            serialize=True,
+            enqueue=enqueue,
+            rotation="100 MB",
+            retention=10,
+            # loguru默认diagnose=True，文件日志从不记录局部变量
+            diagnose=False,
+        )
+
+    _min_level_no = logger.level(level).no
+
+
+def is_enabled(level: str) -> bool:
+    """判断某级别的日志是否会被输出"""
+    return logger.level(level).no >= _min_level_no
@@ -0,0 +1,210 @@
+"""
+Metrics
+Prometheus指标 - 生成流水线分阶段耗时、缓存命中、提示词编码复用、请求合并、限流拒绝、任务取消、准入控制、近重复复用、使用次数写回、模板编译缓存、数据库连接池
+
+多worker部署时各进程把指标写入 PROMETHEUS_MULTIPROC_DIR，/metrics 汇总所有进程
+"""
+
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Iterable, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+
+# 覆盖从毫秒级的缓存查询到分钟级的CPU推理
+STAGE_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+
+# 生成流水线阶段: queue_wait, inference, encoding, serialization
+STAGE_SECONDS = Histogram(
+    "ai_designer_stage_seconds",
+    "Time spent in each generation pipeline stage",
+    ["endpoint", "stage", "style", "size"],
+    buckets=STAGE_BUCKETS,
+)
+
+CACHE_LOOKUP_SECONDS = Histogram(
+    "ai_designer_cache_lookup_seconds",
+    "Redis cache lookup latency",
+    ["operation"],
+    buckets=STAGE_BUCKETS[:10],
+)
+
+CACHE_REQUESTS = Counter(
+    "ai_designer_cache_requests_total",
+    "Cache lookups by result (hit, miss, error)",
+    ["result"],
+)
+
+PROMPT_EMBEDDING_REQUESTS = Counter(
+    "ai_designer_prompt_embedding_requests_total",
+    "Prompt embedding cache lookups by result (hit, miss)",
+    ["result"],
+)
+
+COALESCED_REQUESTS = Counter(
+    "ai_designer_coalesced_requests_total",
+    "Requests served by joining an identical in-flight generation",
+    ["endpoint"],
+)
+
+RATE_LIMIT_REJECTIONS = Counter(
+    "ai_designer_rate_limit_rejections_total",
+    "Requests rejected by the rate limiter",
+    ["scope"],
+)
+
+
+CANCELLED_JOBS = Counter(
+    "ai_designer_cancelled_jobs_total",
+    "Generation jobs cancelled before completion (client request or abandoned stream)",
+    ["endpoint", "reason"],
+)
+
+CANCELLED_STEPS_RECLAIMED = Counter(
+    "ai_designer_cancelled_steps_reclaimed_total",
+    "Diffusion steps skipped because the job was cancelled",
+    ["endpoint"],
+)
+
+CANCELLED_SECONDS_RECLAIMED = Counter(
+    "ai_designer_cancelled_seconds_reclaimed_total",
+    "Estimated inference seconds saved by cancelling jobs",
+    ["endpoint"],
+)
+
+NEAR_DUPLICATE_RESULTS = Counter(
+    "ai_designer_near_duplicate_results_total",
+    "Generated images by near-duplicate outcome (stored, duplicate, cache_hit)",
+    ["endpoint", "outcome"],
+)
+
+NEAR_DUPLICATE_BYTES_SAVED = Counter(
+    "ai_designer_near_duplicate_bytes_saved_total",
+    "Encoded image bytes reused from a near-duplicate instead of being stored again",
+    ["endpoint"],
+)
+
+ADMISSION_DECISIONS = Counter(
+    "ai_designer_admission_decisions_total",
+    "Generation requests by admission decision (admit, degrade, demo, reject)",
+    ["route", "decision"],
+)
+
+ADMISSION_QUEUED_WORK = Gauge(
+    "ai_designer_admission_queued_work",
+    "Admitted generation work not yet finished, in megapixel-steps",
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_WAIT_SECONDS = Histogram(
+    "ai_designer_db_pool_wait_seconds",
+    "Time spent waiting for a database connection from the pool",
+    ["role"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+
+DB_POOL_CHECKOUTS = Counter(
+    "ai_designer_db_pool_checkouts_total",
+    "Database connection checkouts by pool role and outcome (ok, timeout)",
+    ["role", "outcome"],
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "ai_designer_db_pool_checked_out",
+    "Database connections currently checked out of the pool",
+    ["role"],
+    multiprocess_mode="livesum",
+)
+
+TEMPLATE_COMPILE_REQUESTS = Counter(
+    "ai_designer_template_compile_requests_total",
+    "Template compilation cache lookups by outcome (hit, miss)",
+    ["outcome"],
+)
+
+USAGE_COUNTER_FLUSHES = Counter(
+    "ai_designer_usage_counter_flushes_total",
+    "Usage counter write-backs by outcome (ok, error)",
+    ["outcome"],
+)
+
+USAGE_COUNTER_ROWS = Counter(
+    "ai_designer_usage_counter_rows_total",
+    "Rows updated by usage counter write-backs",
+    ["kind"],
+)
+
+
+OTHER_LABEL = "other"
+
+
+def bounded_label(value: Optional[str], known: Iterable[str]) -> str:
+    """
+    请求参数作为标签时只保留已知取值，其余记为 other
+
+    style/size/framework 来自客户端，原样作为标签时每个新取值都会新增一组时间序列
+    """
+    if not value:
+        return ""
+    return value if value in known else OTHER_LABEL
+
+
+def observe_stage(
+    endpoint: str,
+    stage: str,
+    seconds: float,
+    style: str = "",
+    size: str = ""
+):
+    """记录一个阶段的耗时"""
+    STAGE_SECONDS.labels(endpoint, stage, style or "", size or "").observe(seconds)
+
+
+@contextmanager
+def track_stage(endpoint: str, stage: str, style: str = "", size: str = ""):
+    """上下文管理器：记录代码块耗时到对应阶段"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(endpoint, stage, time.perf_counter() - start, style, size)
+
+
+def setup_multiprocess_metrics(path: str) -> str:
+    """
+    多worker启动前准备指标目录：清空上次运行留下的文件并导出 PROMETHEUS_MULTIPROC_DIR
+
+    必须在启动worker（及模型服务）之前调用，prometheus_client 在导入时根据该环境变量选择存储方式
+    """
+    path = os.path.abspath(path)
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    return path
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """生成Prometheus文本格式的指标，返回 (内容, Content-Type)
+
+    设置了 PROMETHEUS_MULTIPROC_DIR（WORKERS>1）时汇总目录中所有进程的指标，否则只有当前进程
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,100 @@
+"""
+Schema Migrations
+数据库迁移 - Alembic迁移由 scripts/migrate.py 在部署时单独执行；
+worker启动时只用一条查询核对 alembic_version 是否为head版本，不反射、不建表
+"""
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import pool, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from core.config import settings
+
+ALEMBIC_INI = Path(__file__).resolve().parents[1] / "alembic.ini"
+VERSION_TABLE = "alembic_version"
+
+
+class SchemaNotMigrated(RuntimeError):
+    """数据库结构不是当前代码对应的head版本"""
+
+    def __init__(self, current: Tuple[str, ...], head: Tuple[str, ...]):
+        self.current = current
+        self.head = head
+        found = ", ".join(current) or "none (not migrated)"
+        super().__init__(
+            f"Database schema revision is {found}, expected {', '.join(head)}; "
+            f"run `python scripts/migrate.py upgrade`"
+        )
+
+
+def alembic_config() -> Config:
+    """backend/alembic.ini，与当前工作目录无关"""
+    return Config(str(ALEMBIC_INI))
+
+
+@lru_cache(maxsize=1)
+def head_revisions() -> Tuple[str, ...]:
+    """代码中迁移脚本的head版本（读取一次迁移目录）"""
+    return tuple(sorted(ScriptDirectory.from_config(alembic_config()).get_heads()))
+
+
+async def current_revisions(engine: AsyncEngine) -> Tuple[str, ...]:
+    """
+    数据库当前的迁移版本
+
+    只执行一条 SELECT；alembic_version 表不存在（从未迁移）时返回空元组。
+    连接失败照常抛出
+    """
+    async with engine.connect() as conn:
+        try:
+            result = await conn.execute(text(f"SELECT version_num FROM {VERSION_TABLE}"))
+        except DBAPIError:
+            return ()
+        return tuple(sorted(result.scalars().all()))
+
+
+async def verify_schema(engine: AsyncEngine) -> Tuple[str, ...]:
+    """数据库版本等于head时返回该版本，否则抛出 SchemaNotMigrated"""
+    current = await current_revisions(engine)
+    head = head_revisions()
+    if current != head:
+        raise SchemaNotMigrated(current, head)
+    return current
+
+
+async def _run(url: Optional[str], operation: Callable[[Config], None]):
+    # 经 config.attributes 把连接交给 alembic/env.py，迁移与调用方使用同一个异步驱动
+    engine = create_async_engine(url or settings.DATABASE_URL, poolclass=pool.NullPool)
+    config = alembic_config()
+
+    def run(connection):
+        config.attributes["connection"] = connection
+        operation(config)
+
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(run)
+    finally:
+        await engine.dispose()
+
+
+async def upgrade(revision: str = "head", url: Optional[str] = None):
+    """升级到指定版本（默认head）"""
+    await _run(url, lambda config: command.upgrade(config, revision))
+
+
+async def downgrade(revision: str, url: Optional[str] = None):
+    """降级到指定版本（如 -1、base）"""
+    await _run(url, lambda config: command.downgrade(config, revision))
+
+
+async def stamp(revision: str = "head", url: Optional[str] = None):
+    """只写入版本号而不执行迁移（已由create_all建好表的数据库接入迁移时使用）"""
+    await _run(url, lambda config: command.stamp(config, revision))
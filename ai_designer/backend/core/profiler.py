@@ -0,0 +1,144 @@
+"""
+Sampling profiler
+进程内采样分析器 - 定时抓取所有线程调用栈，输出collapsed stacks（可直接生成火焰图）
+"""
+
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, Optional
+
+
+# 线程空闲时的栈顶函数，默认不计入样本
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+}
+
+
+class SamplingProfiler:
+    """采样分析器
+
+    后台线程按固定频率读取 sys._current_frames()，把每个线程的调用栈
+    折叠为 "root;child;leaf" 形式并计数。无需外部依赖，可在生产进程中
+    临时开启。
+    """
+
+    def __init__(self, hz: int = 100, include_idle: bool = False, max_depth: int = 128):
+        self.interval = 1.0 / max(1, hz)
+        self.include_idle = include_idle
+        self.max_depth = max_depth
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SamplingProfiler":
+        """开始采样"""
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        """停止采样并返回折叠后的调用栈计数"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.started_at is not None:
+            self.duration = time.perf_counter() - self.started_at
+        return self.counts
+
+    def to_dict(self, **extra) -> Dict:
+        """导出采样结果"""
+        return {
+            "samples": self.samples,
+            "duration": round(self.duration, 3),
+            "hz": round(1.0 / self.interval),
+            "stacks": dict(self.counts),
+            **extra,
+        }
+
+    def _run(self):
+        own_id = threading.get_ident()
+        thread_names = {}
+
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if len(thread_names) != len(frames):
+                thread_names = {t.ident: t.name for t in threading.enumerate()}
+
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                stack = self._collapse(frame)
+                if stack is None:
+                    continue
+                name = thread_names.get(thread_id, str(thread_id))
+                self.counts[f"{name};{stack}"] += 1
+
+            self.samples += 1
+
+    def _collapse(self, frame) -> Optional[str]:
+        """将帧链折叠为 root;...;leaf"""
+        code = frame.f_code
+        if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+            return None
+
+        names = []
+        depth = 0
+        while frame is not None and depth < self.max_depth:
+            code = frame.f_code
+            names.append(
+                f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            )
+            frame = frame.f_back
+            depth += 1
+
+        names.reverse()
+        return ";".join(names)
+
+
+def format_collapsed(counts: Dict[str, int]) -> str:
+    """输出Brendan Gregg collapsed格式（flamegraph.pl / speedscope 可直接读取）"""
+    lines = (f"{stack} {count}" for stack, count in counts.items())
+    return "\n".join(sorted(lines)) + "\n"
+
+
+def top_frames(counts: Dict[str, int], limit: int = 20) -> Iterable[Dict[str, int]]:
+    """按栈顶函数（self time）汇总前N个热点"""
+    leaf_counts: Counter = Counter()
+    for stack, count in counts.items():
+        leaf_counts[stack.rsplit(";", 1)[-1]] += count
+    return [{"frame": frame, "samples": n} for frame, n in leaf_counts.most_common(limit)]
+
+
+class ProfileStore:
+    """最近的按请求采样结果（有界，LRU淘汰）"""
+
+    def __init__(self, max_profiles: int = 20):
+        self.max_profiles = max_profiles
+        self._profiles: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: Dict, profile_id: Optional[str] = None) -> str:
+        profile_id = profile_id or uuid.uuid4().hex
+        with self._lock:
+            self._profiles[profile_id] = profile
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+
+# 全局按请求采样结果存储
+profile_store = ProfileStore()
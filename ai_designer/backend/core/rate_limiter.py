@@ -0,0 +1,206 @@
+"""
+Rate limiting engine
+滑动窗口速率限制 - Redis Lua原子脚本 + 本地令牌桶降级
+"""
+
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+from redis.asyncio import Redis
+
+from core.config import settings
+from core.metrics import RATE_LIMIT_REJECTIONS
+from core.redis import cache
+
+
+# 一次往返完成 清理过期 -> 计数 -> 判断 -> 写入 -> 续期
+# KEYS[1]: 限流key
+# ARGV: now_ms, window_ms, limit, member
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+local count = redis.call('ZCARD', key)
+
+if count >= limit then
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    local retry_after = window
+    if oldest[2] then
+        retry_after = tonumber(oldest[2]) + window - now
+    end
+    return {0, count, retry_after}
+end
+
+redis.call('ZADD', key, now, ARGV[4])
+redis.call('PEXPIRE', key, window)
+return {1, count + 1, 0}
+"""
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """单条限流规则"""
+    limit: int
+    window: int  # seconds
+
+    @classmethod
+    def parse(cls, value: str) -> "RateLimitRule":
+        """解析 "10/60" 形式的规则"""
+        limit, _, window = value.partition("/")
+        return cls(limit=int(limit), window=int(window or 60))
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    """限流检查结果"""
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float = 0.0  # seconds
+
+
+class TokenBucket:
+    """本地令牌桶（Redis不可用时的降级方案）"""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated_at")
+
+    def __init__(self, capacity: int, window: int):
+        self.capacity = float(capacity)
+        self.rate = capacity / float(window)  # tokens per second
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def consume(self, now: Optional[float] = None) -> Tuple[bool, float]:
+        """尝试消耗一个令牌，返回 (是否成功, 需等待秒数)"""
+        now = time.monotonic() if now is None else now
+        elapsed = max(0.0, now - self.updated_at)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True, 0.0
+
+        return False, (1.0 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """速率限制引擎
+
+    按路由前缀匹配规则（最长前缀优先，同一前缀时限定方法的规则优先），
+    规则键可带方法前缀，如 "POST /api/v1/image/" 只限制该前缀下的POST请求。
+    Redis可用时使用Lua脚本实现的原子滑动窗口，Redis不可用或出错时降级为进程内令牌桶。
+    """
+
+    # 本地令牌桶数量上限，超过后清空以防内存无限增长
+    MAX_LOCAL_BUCKETS = 10000
+
+    def __init__(
+        self,
+        redis_client: Optional[Redis] = None,
+        default_rule: Optional[RateLimitRule] = None,
+        route_rules: Optional[Dict[str, str]] = None,
+        key_prefix: str = "rate_limit",
+    ):
+        self.redis = redis_client
+        self.default_rule = default_rule or RateLimitRule(
+            limit=settings.RATE_LIMIT_REQUESTS,
+            window=settings.RATE_LIMIT_WINDOW,
+        )
+        rules = settings.RATE_LIMIT_ROUTES if route_rules is None else route_rules
+        # (规则键, 方法, 路径前缀, 规则)，最长前缀优先
+        self.route_rules = sorted(
+            (
+                (key, *self._split_key(key), RateLimitRule.parse(rule))
+                for key, rule in rules.items()
+            ),
+            key=lambda item: (len(item[2]), bool(item[1])),
+            reverse=True,
+        )
+        self.key_prefix = key_prefix
+        self._script = None
+        self._script_client = None
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    @staticmethod
+    def _split_key(key: str) -> Tuple[Optional[str], str]:
+        """"POST /api/v1/image/" -> ("POST", "/api/v1/image/")；不带方法时为 (None, 前缀)"""
+        method, _, prefix = key.strip().rpartition(" ")
+        return (method.strip().upper() or None), prefix
+
+    def get_rule(self, path: str, method: Optional[str] = None) -> Tuple[str, RateLimitRule]:
+        """获取路径对应的规则，返回 (规则作用域, 规则)；method为空时只匹配不限定方法的规则"""
+        for key, rule_method, prefix, rule in self.route_rules:
+            if path.startswith(prefix) and rule_method in (None, method):
+                return key, rule
+        return "default", self.default_rule
+
+    async def check(self, client_id: str, path: str, method: Optional[str] = None) -> RateLimitResult:
+        """检查并记录一次请求"""
+        scope, rule = self.get_rule(path, method)
+        key = f"{self.key_prefix}:{scope}:{client_id}"
+
+        # 未显式传入客户端时使用全局缓存连接（在lifespan中建立）
+        redis = self.redis if self.redis is not None else await cache.get_client()
+        result = None
+        if redis is not None:
+            try:
+                result = await self._check_redis(redis, key, rule)
+            except Exception as e:
+                logger.warning(f"Redis rate limit check failed, using local bucket: {e}")
+
+        if result is None:
+            result = self._check_local(key, rule)
+
+        if not result.allowed:
+            RATE_LIMIT_REJECTIONS.labels(scope).inc()
+        return result
+
+    async def _check_redis(
+        self,
+        redis: Redis,
+        key: str,
+        rule: RateLimitRule
+    ) -> RateLimitResult:
+        """Redis滑动窗口检查（单次往返）"""
+        if self._script is None or self._script_client is not redis:
+            self._script = redis.register_script(SLIDING_WINDOW_SCRIPT)
+            self._script_client = redis
+
+        now_ms = int(time.time() * 1000)
+        # 成员需唯一，否则同一毫秒内的请求会被合并而少计
+        member = f"{now_ms}-{uuid.uuid4().hex}"
+
+        allowed, count, retry_after_ms = await self._script(
+            keys=[key],
+            args=[now_ms, rule.window * 1000, rule.limit, member],
+        )
+
+        return RateLimitResult(
+            allowed=bool(int(allowed)),
+            limit=rule.limit,
+            remaining=max(0, rule.limit - int(count)),
+            retry_after=max(0, int(retry_after_ms)) / 1000.0,
+        )
+
+    def _check_local(self, key: str, rule: RateLimitRule) -> RateLimitResult:
+        """本地令牌桶检查"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.MAX_LOCAL_BUCKETS:
+                self._buckets.clear()
+            bucket = self._buckets[key] = TokenBucket(rule.limit, rule.window)
+
+        allowed, retry_after = bucket.consume()
+        return RateLimitResult(
+            allowed=allowed,
+            limit=rule.limit,
+            remaining=int(bucket.tokens),
+            retry_after=retry_after,
+        )
@@ -5,8 +5,10 @@ Redis cache configuration and utilities
 from redis.asyncio import Redis, from_url
 from typing import Optional, Any
 import json
+import time
 from loguru import logger
 from core.config import settings
+from core.metrics import CACHE_LOOKUP_SECONDS, CACHE_REQUESTS
 
 
 class RedisCache:
@@ -40,15 +42,20 @@ class RedisCache:
         if not self._client:
             return None
 
+        start = time.perf_counter()
         try:
             value = await self._client.get(key)
+            CACHE_LOOKUP_SECONDS.labels("get").observe(time.perf_counter() - start)
             if value is not None:
+                CACHE_REQUESTS.labels("hit").inc()
                 try:
                     return json.loads(value)
                 except json.JSONDecodeError:
                     return value
+            CACHE_REQUESTS.labels("miss").inc()
             return None
         except Exception as e:
+            CACHE_REQUESTS.labels("error").inc()
             logger.error(f"Redis get error: {e}")
             return None
 
@@ -89,8 +96,11 @@ class RedisCache:
         if not self._client:
             return False
 
+        start = time.perf_counter()
         try:
-            return await self._client.exists(key) > 0
+            exists = await self._client.exists(key) > 0
+            CACHE_LOOKUP_SECONDS.labels("exists").observe(time.perf_counter() - start)
+            return exists
         except Exception as e:
             logger.error(f"Redis exists error: {e}")
             return False
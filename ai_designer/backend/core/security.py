@@ -0,0 +1,53 @@
+"""
+Security helpers
+管理接口鉴权与用户访问令牌（JWT）
+"""
+
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from core.config import settings
+
+# 配置与 .env.example 中的占位密钥：公开可见，不能用于签名
+PLACEHOLDER_SECRET_KEYS = frozenset({
+    "your-secret-key-change-in-production",
+    "your-secret-key-change-this-in-production",
+})
+
+
+def verify_admin_token(token: Optional[str]) -> bool:
+    """校验管理员令牌（未配置ADMIN_TOKEN时一律拒绝）"""
+    if not settings.ADMIN_TOKEN or not token:
+        return False
+    return secrets.compare_digest(token.encode("utf-8"), settings.ADMIN_TOKEN.encode("utf-8"))
+
+
+def secret_key_configured() -> bool:
+    """SECRET_KEY 已替换为部署自己的密钥（占位值签名的令牌任何人都能伪造）"""
+    return bool(settings.SECRET_KEY) and settings.SECRET_KEY not in PLACEHOLDER_SECRET_KEYS
+
+
+def create_access_token(subject: str, expires_minutes: Optional[int] = None) -> str:
+    """签发用户访问令牌（sub 为用户ID）；SECRET_KEY 仍是占位值时拒绝签发"""
+    from jose import jwt
+
+    if not secret_key_configured():
+        raise RuntimeError("SECRET_KEY is not configured")
+    expires = datetime.now(timezone.utc) + timedelta(
+        minutes=expires_minutes if expires_minutes is not None else settings.ACCESS_TOKEN_EXPIRE_MINUTES
+    )
+    return jwt.encode({"sub": str(subject), "exp": expires}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def verify_access_token(token: Optional[str]) -> Optional[str]:
+    """校验用户访问令牌，返回用户ID；无效、过期或 SECRET_KEY 未配置时返回None"""
+    from jose import JWTError, jwt
+
+    if not token or not secret_key_configured():
+        return None
+    try:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    subject = claims.get("sub")
+    return str(subject) if subject else None
@@ -0,0 +1,114 @@
+"""
+Traffic Capture
+流量录制格式 - 每个请求一行JSON（JSONL），由后台线程写入，供本地回放复现线上负载
+
+文件首行为头部：
+    {"type": "capture", "version": 1, "pid": 123, "started_at": 1700000000.0}
+之后每行一个请求：
+    {"type": "request", "ts": 1700000000.12, "method": "POST", "path": "/api/v1/svg/generate",
+     "query": "", "content_type": "application/json", "body": "{...}", "body_encoding": "utf-8",
+     "body_sha256": "...", "body_size": 57, "status": 200, "duration_ms": 12.3}
+未保存请求体时 body 为 null，只保留哈希与大小。
+"""
+
+import base64
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from loguru import logger
+
+CAPTURE_VERSION = 1
+
+
+def encode_body(body: bytes) -> Dict[str, Any]:
+    """请求体 -> 可写入JSON的字段（UTF-8文本原样保存，其余base64）"""
+    try:
+        return {"body": body.decode("utf-8"), "body_encoding": "utf-8"}
+    except UnicodeDecodeError:
+        return {"body": base64.b64encode(body).decode("ascii"), "body_encoding": "base64"}
+
+
+def decode_body(record: Dict[str, Any]) -> Optional[bytes]:
+    """还原请求体；未保存时返回None（无请求体的记录返回b""）"""
+    if record.get("body") is None:
+        return b"" if not record.get("body_size") else None
+    if record.get("body_encoding") == "base64":
+        return base64.b64decode(record["body"])
+    return record["body"].encode("utf-8")
+
+
+def body_digest(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+class TrafficRecorder:
+    """追加写入录制文件，写盘在后台线程中进行，不阻塞事件循环"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._queue: "queue.SimpleQueue[Optional[Dict[str, Any]]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+        self._thread.start()
+        self.write({"type": "capture", "version": CAPTURE_VERSION, "pid": os.getpid(), "started_at": time.time()})
+
+    @classmethod
+    def for_process(cls, directory: Union[str, Path]) -> "TrafficRecorder":
+        """每个worker进程单独一个文件，避免多进程交错写入"""
+        name = f"capture-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl"
+        return cls(Path(directory) / name)
+
+    def write(self, record: Dict[str, Any]):
+        self._queue.put(record)
+
+    def close(self, timeout: float = 5.0):
+        """写完队列中剩余的记录"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        with self.path.open("a", encoding="utf-8") as output:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+                try:
+                    output.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+                    # 批量写入：队列清空时才flush
+                    if self._queue.empty():
+                        output.flush()
+                except Exception as e:
+                    logger.warning(f"Traffic capture write failed: {e}")
+
+
+def load_capture(paths: Iterable[Union[str, Path]]) -> List[Dict[str, Any]]:
+    """读取一个或多个录制文件，按请求到达时间合并排序，并补充相对首个请求的 offset（秒）"""
+    records: List[Dict[str, Any]] = []
+    for path in paths:
+        with open(path, encoding="utf-8") as capture:
+            for line_number, line in enumerate(capture, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 进程被强杀时最后一行可能不完整
+                    logger.warning(f"Skipping malformed capture line {path}:{line_number}")
+                    continue
+                if record.get("type") == "capture" and record.get("version", CAPTURE_VERSION) > CAPTURE_VERSION:
+                    raise ValueError(f"{path}: unsupported capture version {record['version']}")
+                if record.get("type") == "request":
+                    records.append(record)
+
+    records.sort(key=lambda record: record["ts"])
+    if records:
+        start = records[0]["ts"]
+        for record in records:
+            record["offset"] = record["ts"] - start
+    return records
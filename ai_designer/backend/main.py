@@ -5,24 +5,30 @@ AI Designer Backend
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
 from loguru import logger
-import sys
-
-# Configure logger
-logger.remove()
-logger.add(sys.stderr, format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan> - <level>{message}</level>")
 
 from core.config import settings
+from core.logging import setup_logging
+
+# Configure logger (异步队列sink，可选JSON输出)
+setup_logging()
+
 from core.database import init_db
+from core.migrations import SchemaNotMigrated
 from core.redis import cache
-# from middleware import (
-#     RequestIDMiddleware,
-#     LoggingMiddleware,
-#     ErrorHandlerMiddleware,
-#     RateLimitMiddleware
-# )
+from core.metrics import render_metrics
+from middleware import (
+    AuthenticationMiddleware,
+    RequestIDMiddleware,
+    LoggingMiddleware,
+    ErrorHandlerMiddleware,
+    RateLimitMiddleware,
+    ProfilingMiddleware,
+    TrafficCaptureMiddleware,
+    register_exception_handlers
+)
 from api.v1 import router as api_v1_router
 
 
@@ -35,6 +41,9 @@ async def lifespan(app: FastAPI):
     try:
         await init_db()
         logger.info("✅ Database initialized")
+    except SchemaNotMigrated:
+        # 表结构落后于代码时拒绝启动，而不是带着旧结构处理请求
+        raise
     except Exception as e:
         logger.warning(f"⚠️ Database initialization skipped: {e}")
 
@@ -45,10 +54,18 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"⚠️ Redis initialization skipped: {e}")
 
+    # 使用次数计数器定期批量写回
+    from services.usage_counters import usage_counters
+    usage_counters.start()
+
     # Initialize AI models (skip for now)
     try:
         from services import model_manager
-        await model_manager.load_all_models()
+        if settings.MODEL_SERVER_ENABLED:
+            # 模型由独立的模型服务进程持有，worker只保留客户端
+            await model_manager.load_remote_models(settings.MODEL_SERVER_SOCKET)
+        else:
+            await model_manager.load_all_models()
         logger.info("✅ AI models loaded")
     except Exception as e:
         logger.warning(f"⚠️ AI models loading skipped: {e}")
@@ -56,11 +73,28 @@ async def lifespan(app: FastAPI):
     yield
 
     logger.info("🛑 Shutting down AI Designer Backend...")
+    try:
+        # 写回剩余的使用次数增量（redis后端需要在断开Redis前完成）
+        await usage_counters.close()
+    except Exception as e:
+        logger.warning(f"⚠️ Usage counter flush on shutdown failed: {e}")
+
+    from services.generation_jobs import job_registry
+    await job_registry.close()
+
     try:
         await cache.disconnect()
     except:
         pass
 
+    from services.asset_index import asset_index
+    if asset_index.is_initialized:
+        # 等待后台入库写完日志
+        asset_index.close()
+
+    # 等待日志队列写完
+    await logger.complete()
+
 
 # Create FastAPI app
 app = FastAPI(
@@ -72,7 +106,26 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# CORS middleware
+# Custom middleware (注意顺序，后添加的先执行)
+# 均为纯ASGI中间件：CORS -> (TrafficCapture) -> RequestID -> Logging -> ErrorHandler -> Authentication -> RateLimit -> 路由
+# RateLimit未传入redis_client时，按请求使用lifespan中建立的全局缓存连接
+if settings.PROFILER_ENABLED:
+    # 按请求采样（X-Profile + X-Admin-Token），位于最内层只覆盖路由处理
+    app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RateLimitMiddleware)
+# 访问令牌 -> scope["user"]（不拒绝匿名请求）
+app.add_middleware(AuthenticationMiddleware)
+app.add_middleware(ErrorHandlerMiddleware)
+app.add_middleware(
+    LoggingMiddleware,
+    skip_paths=["/health", "/metrics", "/api/docs", "/api/redoc", "/"]
+)
+app.add_middleware(RequestIDMiddleware)
+if settings.TRAFFIC_CAPTURE_ENABLED:
+    # 位于RequestID外层，记录的耗时覆盖整个中间件链
+    app.add_middleware(TrafficCaptureMiddleware)
+
+# CORS middleware (最外层，保证429/500等响应同样带有CORS头)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ORIGINS,
@@ -81,14 +134,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Custom middleware (注意顺序，后添加的先执行)
-# app.add_middleware(RequestIDMiddleware)
-# app.add_middleware(
-#     LoggingMiddleware,
-#     skip_paths=["/health", "/api/docs", "/api/redoc", "/"]
-# )
-# app.add_middleware(ErrorHandlerMiddleware)
-# app.add_middleware(RateLimitMiddleware, redis_client=await cache.get_client())
+register_exception_handlers(app)
 
 # Include routers
 app.include_router(api_v1_router, prefix="/api/v1")
@@ -115,6 +161,13 @@ async def health_check():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics endpoint"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -131,10 +184,29 @@ async def global_exception_handler(request, exc):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=settings.DEBUG,
-        log_level="info"
-    )
+
+    if settings.WORKERS > 1:
+        # 每个worker只有自己的指标，通过共享目录汇总；须在启动任何子进程之前设置
+        from core.metrics import setup_multiprocess_metrics
+        setup_multiprocess_metrics(settings.PROMETHEUS_MULTIPROC_DIR)
+
+    model_server = None
+    if settings.MODEL_SERVER_ENABLED:
+        # 先启动模型服务进程，各worker通过Unix socket共享同一份模型
+        from services.model_server import start_model_server
+        model_server = start_model_server(settings.MODEL_SERVER_SOCKET)
+
+    try:
+        uvicorn.run(
+            "main:app",
+            host=settings.HOST,
+            port=settings.PORT,
+            workers=settings.WORKERS,
+            # reload与多worker互斥
+            reload=settings.DEBUG and settings.WORKERS == 1,
+            log_level="info"
+        )
+    finally:
+        if model_server is not None:
+            model_server.terminate()
+            model_server.join(timeout=10)
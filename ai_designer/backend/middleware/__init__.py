@@ -2,14 +2,21 @@
 Middleware package for AI Designer Backend
 """
 
+from .authentication import AuthenticationMiddleware
 from .logging import LoggingMiddleware
-from .error_handler import ErrorHandlerMiddleware
+from .error_handler import ErrorHandlerMiddleware, register_exception_handlers
 from .rate_limit import RateLimitMiddleware
 from .request_id import RequestIDMiddleware
+from .profiling import ProfilingMiddleware
+from .traffic_capture import TrafficCaptureMiddleware
 
 __all__ = [
+    'AuthenticationMiddleware',
     'LoggingMiddleware',
     'ErrorHandlerMiddleware',
     'RateLimitMiddleware',
     'RequestIDMiddleware',
+    'ProfilingMiddleware',
+    'TrafficCaptureMiddleware',
+    'register_exception_handlers',
 ]
@@ -0,0 +1,50 @@
+"""
+Authentication Middleware
+用户身份 - 校验 Authorization: Bearer 访问令牌，把已认证用户放入 scope["user"]
+"""
+
+from starlette.authentication import BaseUser, UnauthenticatedUser
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from core.security import verify_access_token
+
+
+class TokenUser(BaseUser):
+    """由访问令牌认证的用户（identity 为用户ID）"""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+
+    @property
+    def is_authenticated(self) -> bool:
+        return True
+
+    @property
+    def display_name(self) -> str:
+        return self.user_id
+
+    @property
+    def identity(self) -> str:
+        return self.user_id
+
+
+class AuthenticationMiddleware:
+    """访问令牌认证中间件（纯ASGI实现）
+
+    只确定请求的用户，不拒绝请求：缺少令牌、令牌无效或过期时 scope["user"] 为匿名用户，
+    按用户隔离的功能（如近重复结果复用）对匿名请求不生效。
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+        user_id = verify_access_token(token.strip()) if scheme.lower() == "bearer" else None
+        scope["user"] = TokenUser(user_id) if user_id else UnauthenticatedUser()
+        await self.app(scope, receive, send)
@@ -4,8 +4,10 @@ Error Handler Middleware
 """
 
 from fastapi import Request, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from loguru import logger
 from typing import Any, Dict, Optional
 from sqlalchemy.exc import SQLAlchemyError
@@ -109,72 +111,96 @@ def create_error_response(
     )
 
 
+def register_exception_handlers(app):
+    """注册异常处理器（APIError、验证错误、数据库错误）"""
+
+    # 自定义API错误
+    @app.exception_handler(APIError)
+    async def api_error_handler(request: Request, exc: APIError):
+        request_id = getattr(request.state, "request_id", "unknown")
+        logger.warning(
+            f"[{request_id}] API Error: {exc.error_code} - {exc.message}"
+        )
+        return create_error_response(exc, request_id)
+
+    # FastAPI验证错误
+    @app.exception_handler(RequestValidationError)
+    async def validation_error_handler(request: Request, exc: RequestValidationError):
+        request_id = getattr(request.state, "request_id", "unknown")
+        logger.warning(
+            f"[{request_id}] Validation Error: {exc.errors()}"
+        )
+
+        return JSONResponse(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            content={
+                "error": "Validation failed",
+                "error_code": "VALIDATION_ERROR",
+                "request_id": request_id,
+                "detail": jsonable_encoder(exc.errors()),
+            }
+        )
+
+    # 数据库错误
+    @app.exception_handler(SQLAlchemyError)
+    async def database_error_handler(request: Request, exc: SQLAlchemyError):
+        request_id = getattr(request.state, "request_id", "unknown")
+        logger.error(f"[{request_id}] Database Error: {str(exc)}")
+
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={
+                "error": "Database operation failed",
+                "error_code": "DATABASE_ERROR",
+                "request_id": request_id,
+            }
+        )
+
+
 class ErrorHandlerMiddleware:
-    """错误处理中间件"""
+    """错误处理中间件（纯ASGI实现）
+
+    捕获下游未处理的异常并返回带request_id的标准JSON错误响应。
+    若响应已开始发送（如流式响应中途出错），只能记录日志并继续抛出。
+    """
 
-    def __init__(self, app):
+    def __init__(self, app: ASGIApp):
         self.app = app
-        self._register_exception_handlers()
-
-    def _register_exception_handlers(self):
-        """注册异常处理器"""
-
-        # 自定义API错误
-        @self.app.exception_handler(APIError)
-        async def api_error_handler(request: Request, exc: APIError):
-            request_id = getattr(request.state, "request_id", "unknown")
-            logger.warning(
-                f"[{request_id}] API Error: {exc.error_code} - {exc.message}"
-            )
-            return create_error_response(exc, request_id)
-
-        # FastAPI验证错误
-        @self.app.exception_handler(RequestValidationError)
-        async def validation_error_handler(request: Request, exc: RequestValidationError):
-            request_id = getattr(request.state, "request_id", "unknown")
-            logger.warning(
-                f"[{request_id}] Validation Error: {exc.errors()}"
-            )
-            
-            return JSONResponse(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                content={
-                    "error": "Validation failed",
-                    "error_code": "VALIDATION_ERROR",
-                    "request_id": request_id,
-                    "detail": exc.errors(),
-                }
-            )
-
-        # 数据库错误
-        @self.app.exception_handler(SQLAlchemyError)
-        async def database_error_handler(request: Request, exc: SQLAlchemyError):
-            request_id = getattr(request.state, "request_id", "unknown")
-            logger.error(f"[{request_id}] Database Error: {str(exc)}")
-            
-            return JSONResponse(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                content={
-                    "error": "Database operation failed",
-                    "error_code": "DATABASE_ERROR",
-                    "request_id": request_id,
-                }
-            )
-
-        # 未处理的异常
-        @self.app.exception_handler(Exception)
-        async def general_exception_handler(request: Request, exc: Exception):
-            request_id = getattr(request.state, "request_id", "unknown")
-            logger.error(
-                f"[{request_id}] Unhandled Exception: {type(exc).__name__} - {str(exc)}",
-                exc_info=True
-            )
-            
-            return JSONResponse(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                content={
-                    "error": "Internal server error",
-                    "error_code": "INTERNAL_ERROR",
-                    "request_id": request_id,
-                }
-            )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as exc:
+            request_id = scope.get("state", {}).get("request_id", "unknown")
+
+            if isinstance(exc, APIError):
+                response = create_error_response(exc, request_id)
+            else:
+                logger.opt(exception=exc).error(
+                    f"[{request_id}] Unhandled Exception: {type(exc).__name__} - {str(exc)}"
+                )
+                response = JSONResponse(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    content={
+                        "error": "Internal server error",
+                        "error_code": "INTERNAL_ERROR",
+                        "request_id": request_id,
+                    }
+                )
+
+            if response_started:
+                raise
+
+            await response(scope, receive, send)
@@ -3,70 +3,105 @@ Logging Middleware
 记录所有HTTP请求和响应的详细信息
 """
 
+import random
 import time
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from typing import Optional
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from loguru import logger
+from core.config import settings
+from core.logging import is_enabled
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """记录HTTP请求和响应"""
+class LoggingMiddleware:
+    """记录HTTP请求和响应（纯ASGI实现）
 
-    def __init__(self, app, skip_paths: list = None):
-        super().__init__(app)
-        self.skip_paths = skip_paths or ["/health", "/api/docs", "/api/redoc", "/"]
+    每个请求在完成时输出一条结构化日志（字段通过 bind 写入 extra）：
+    - 5xx/异常: ERROR，始终记录
+    - 4xx 或慢请求: WARNING，始终记录
+    - 其余: INFO，按 sample_rate 采样
+    """
 
-    async def dispatch(self, request: Request, call_next):
+    def __init__(
+        self,
+        app: ASGIApp,
+        skip_paths: list = None,
+        sample_rate: Optional[float] = None,
+        slow_request_ms: Optional[float] = None
+    ):
+        self.app = app
+        self.skip_paths = set(skip_paths or ["/health", "/api/docs", "/api/redoc", "/"])
+        self.sample_rate = settings.LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.slow_request_ms = (
+            settings.LOG_SLOW_REQUEST_MS if slow_request_ms is None else slow_request_ms
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         # 跳过健康检查等路径
-        if request.url.path in self.skip_paths:
-            return await call_next(request)
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
 
-        # 记录请求开始
-        start_time = time.time()
-        request_id = request.state.request_id if hasattr(request.state, "request_id") else "unknown"
+        start_time = time.perf_counter()
+        status_code = 500
 
-        logger.info(
-            f"[{request_id}] {request.method} {request.url.path} - Started",
-            extra={
-                "method": request.method,
-                "path": request.url.path,
-                "query_params": str(request.query_params),
-                "client": request.client.host if request.client else "unknown",
-            }
-        )
+        async def send_with_timing(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # 添加处理时间到响应头
+                process_time = time.perf_counter() - start_time
+                MutableHeaders(scope=message)["X-Process-Time"] = f"{process_time:.3f}"
+            await send(message)
 
         # 处理请求
         try:
-            response = await call_next(request)
+            await self.app(scope, receive, send_with_timing)
         except Exception as e:
             # 记录异常
-            logger.error(
-                f"[{request_id}] {request.method} {request.url.path} - Error: {str(e)}",
-                extra={
-                    "method": request.method,
-                    "path": request.url.path,
-                    "error": str(e),
-                }
-            )
+            self._log(scope, 500, start_time, error=e)
             raise
 
-        # 计算处理时间
-        process_time = time.time() - start_time
+        # 记录响应（包含流式响应的完整耗时）
+        self._log(scope, status_code, start_time)
 
-        # 记录响应
-        logger.info(
-            f"[{request_id}] {request.method} {request.url.path} - Completed {response.status_code} - {process_time:.3f}s",
-            extra={
-                "method": request.method,
-                "path": request.url.path,
-                "status_code": response.status_code,
-                "process_time": process_time,
-                "client": request.client.host if request.client else "unknown",
-            }
-        )
+    def _log(
+        self,
+        scope: Scope,
+        status_code: int,
+        start_time: float,
+        error: Optional[Exception] = None
+    ):
+        """按级别与采样规则输出一条请求日志"""
+        duration_ms = (time.perf_counter() - start_time) * 1000
+        slow = duration_ms >= self.slow_request_ms
 
-        # 添加处理时间到响应头
-        response.headers["X-Process-Time"] = f"{process_time:.3f}"
+        if error is not None or status_code >= 500:
+            level = "ERROR"
+        elif status_code >= 400 or slow:
+            level = "WARNING"
+        else:
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return
+            level = "INFO"
 
-        return response
+        # 级别被抑制时不做任何格式化
+        if not is_enabled(level):
+            return
+
+        request_id = scope.get("state", {}).get("request_id", "unknown")
+        client = scope["client"][0] if scope.get("client") else "unknown"
+
+        logger.bind(
+            method=scope["method"],
+            path=scope["path"],
+            status_code=status_code,
+            duration_ms=round(duration_ms, 1),
+            client=client,
+            slow=slow,
+            error=str(error) if error is not None else None,
+        ).log(
+            level,
+            "[{}] {} {} - {} - {:.1f}ms",
+            request_id, scope["method"], scope["path"], status_code, duration_ms
+        )
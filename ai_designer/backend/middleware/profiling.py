@@ -0,0 +1,66 @@
+"""
+Profiling Middleware
+按请求采样 - 对带 X-Profile 头的请求记录调用栈
+"""
+
+import asyncio
+import uuid
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from loguru import logger
+from core.config import settings
+from core.profiler import SamplingProfiler, profile_store
+from core.security import verify_admin_token
+
+
+class ProfilingMiddleware:
+    """按请求采样中间件（纯ASGI实现）
+
+    请求同时携带 X-Profile 和有效的 X-Admin-Token 时，在请求处理期间
+    运行采样分析器，响应头返回 X-Profile-Id，结果可通过
+    GET /api/v1/admin/profile/{profile_id} 获取。
+
+    注意：采样覆盖进程内所有线程，并发请求的调用栈也会出现在结果中。
+    """
+
+    def __init__(self, app: ASGIApp, hz: int = 200, max_concurrent: Optional[int] = None):
+        self.app = app
+        self.hz = hz
+        self.max_concurrent = max_concurrent or settings.PROFILER_MAX_CONCURRENT
+        self._active = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        if (
+            not headers.get("x-profile")
+            or self._active >= self.max_concurrent
+            or not verify_admin_token(headers.get("x-admin-token"))
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+
+        async def send_with_profile_id(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Profile-Id"] = profile_id
+            await send(message)
+
+        self._active += 1
+        profiler = SamplingProfiler(hz=self.hz).start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            # stop() 需要等待采样线程退出，放到线程中避免阻塞事件循环
+            await asyncio.to_thread(profiler.stop)
+            self._active -= 1
+            profile_store.add(
+                profiler.to_dict(method=scope["method"], path=scope["path"]),
+                profile_id
+            )
+            logger.info(f"Request profile {profile_id} recorded for {scope['method']} {scope['path']}")
@@ -3,130 +3,92 @@ Rate Limit Middleware
 基于Redis的API速率限制
 """
 
-from fastapi import Request, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
 from loguru import logger
-import time
+import math
 from typing import Optional
 from redis.asyncio import Redis
 from core.config import settings
+from core.rate_limiter import RateLimiter
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """API速率限制中间件"""
+def client_id(scope: Scope) -> str:
+    """客户端标识（限流与按用户隔离的缓存共用）"""
+    headers = Headers(scope=scope)
 
-    def __init__(self, app, redis_client: Optional[Redis] = None):
-        super().__init__(app)
-        self.redis = redis_client
-        self.default_limit = settings.RATE_LIMIT_REQUESTS
-        self.default_window = settings.RATE_LIMIT_WINDOW
+    # 优先使用X-Forwarded-For头
+    forwarded_for = headers.get("x-forwarded-for")
+    if forwarded_for:
+        return forwarded_for.split(",")[0].strip()
 
-    async def dispatch(self, request: Request, call_next):
+    # 使用X-Real-IP头
+    real_ip = headers.get("x-real-ip")
+    if real_ip:
+        return real_ip
+
+    # 使用直接连接的IP
+    client = scope.get("client")
+    if client:
+        return client[0]
+
+    return "unknown"
+
+
+class RateLimitMiddleware:
+    """API速率限制中间件（纯ASGI实现）"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        redis_client: Optional[Redis] = None,
+        limiter: Optional[RateLimiter] = None
+    ):
+        self.app = app
+        self.limiter = limiter or RateLimiter(redis_client=redis_client)
+        self.skip_paths = set(settings.RATE_LIMIT_SKIP_PATHS)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         # 跳过健康检查
-        if request.url.path in ["/health", "/api/docs", "/api/redoc", "/"]:
-            return await call_next(request)
+        if (
+            scope["type"] != "http"
+            or not settings.RATE_LIMIT_ENABLED
+            or scope["path"] in self.skip_paths
+        ):
+            await self.app(scope, receive, send)
+            return
 
         # 获取客户端标识
-        client_id = self._get_client_id(request)
-
-        # 获取速率限制
-        limit, window = self._get_rate_limit(request)
+        client_id = self._get_client_id(scope)
 
-        # 检查速率限制
-        if not await self._check_rate_limit(client_id, limit, window):
+        # 检查速率限制（单次Redis往返）
+        result = await self.limiter.check(client_id, scope["path"], scope["method"])
+        if not result.allowed:
+            retry_after = max(1, math.ceil(result.retry_after))
             logger.warning(
-                f"Rate limit exceeded for {client_id} on {request.url.path}"
+                f"Rate limit exceeded for {client_id} on {scope['path']}"
             )
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={
                     "error": "Rate limit exceeded",
                     "error_code": "RATE_LIMIT_EXCEEDED",
-                    "detail": f"Too many requests. Limit: {limit} requests per {window} seconds",
-                    "retry_after": window,
+                    "detail": f"Too many requests. Limit: {result.limit} requests per window",
+                    "retry_after": retry_after,
+                },
+                headers={
+                    "Retry-After": str(retry_after),
+                    "X-RateLimit-Limit": str(result.limit),
+                    "X-RateLimit-Remaining": "0",
                 }
             )
+            await response(scope, receive, send)
+            return
 
-        return await call_next(request)
+        await self.app(scope, receive, send)
 
-    def _get_client_id(self, request: Request) -> str:
+    def _get_client_id(self, scope: Scope) -> str:
         """获取客户端标识"""
-        # 优先使用X-Forwarded-For头
-        forwarded_for = request.headers.get("X-Forwarded-For")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-
-        # 使用X-Real-IP头
-        real_ip = request.headers.get("X-Real-IP")
-        if real_ip:
-            return real_ip
-
-        # 使用直接连接的IP
-        if request.client:
-            return request.client.host
-
-        return "unknown"
-
-    def _get_rate_limit(self, request: Request) -> tuple[int, int]:
-        """获取速率限制配置"""
-        # 根据端点类型设置不同的限制
-        path = request.url.path
-
-        # 图像生成端点 - 更严格的限制
-        if "/generate/image" in path:
-            return 10, 60  # 10次/分钟
-
-        # SVG生成端点
-        if "/generate/svg" in path:
-            return 30, 60  # 30次/分钟
-
-        # 代码生成端点
-        if "/generate/code" in path:
-            return 20, 60  # 20次/分钟
-
-        # 默认限制
-        return self.default_limit, self.default_window
-
-    async def _check_rate_limit(
-        self,
-        client_id: str,
-        limit: int,
-        window: int
-    ) -> bool:
-        """检查是否超过速率限制"""
-        if not self.redis:
-            # 如果没有Redis，跳过速率限制
-            return True
-
-        key = f"rate_limit:{client_id}:{self._get_window_key(window)}"
-        current_time = int(time.time())
-
-        try:
-            # 使用Redis Sorted Set实现滑动窗口
-            # 移除窗口外的请求
-            await self.redis.zremrangebyscore(key, 0, current_time - window)
-
-            # 获取当前请求数
-            current_count = await self.redis.zcard(key)
-
-            # 检查是否超过限制
-            if current_count >= limit:
-                return False
-
-            # 添加当前请求
-            await self.redis.zadd(key, {str(current_time): current_time})
-
-            # 设置过期时间
-            await self.redis.expire(key, window)
-
-            return True
-
-        except Exception as e:
-            logger.error(f"Rate limit check failed: {e}")
-            # Redis出错时，允许请求通过
-            return True
-
-    def _get_window_key(self, window: int) -> str:
-        """获取时间窗口key"""
-        return f"{int(time.time() // window)}"
+        return client_id(scope)
@@ -4,32 +4,34 @@ Request ID Middleware
 """
 
 import uuid
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from loguru import logger
 
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    """为每个请求添加唯一ID"""
+class RequestIDMiddleware:
+    """为每个请求添加唯一ID（纯ASGI实现）"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-    async def dispatch(self, request: Request, call_next):
         # 生成或获取请求ID
-        request_id = request.headers.get("X-Request-ID") or str(uuid.uuid4())
-        
-        # 将请求ID存储在请求状态中
-        request.state.request_id = request_id
-        
+        request_id = Headers(scope=scope).get("x-request-id") or str(uuid.uuid4())
+
+        # 将请求ID存储在请求状态中 (request.state.request_id)
+        scope.setdefault("state", {})["request_id"] = request_id
+
+        async def send_with_request_id(message: Message):
+            if message["type"] == "http.response.start":
+                # 添加请求ID到响应头
+                MutableHeaders(scope=message)["X-Request-ID"] = request_id
+            await send(message)
+
         # 添加请求ID到日志上下文
         with logger.contextualize(request_id=request_id):
-            logger.debug(f"Request started: {request.method} {request.url.path}")
-            
-            # 处理请求
-            response = await call_next(request)
-            
-            # 添加请求ID到响应头
-            response.headers["X-Request-ID"] = request_id
-            
-            logger.debug(f"Request completed: {response.status_code}")
-            
-            return response
+            await self.app(scope, receive, send_with_request_id)
@@ -0,0 +1,95 @@
+"""
+Traffic Capture Middleware
+流量录制 - 按采样率记录请求方法、路径、请求体与耗时，写入JSONL供本地回放
+"""
+
+import hashlib
+import random
+import time
+from typing import List, Optional
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from loguru import logger
+
+from core.config import settings
+from core.traffic import TrafficRecorder, encode_body
+
+
+class TrafficCaptureMiddleware:
+    """流量录制中间件（纯ASGI实现）
+
+    不记录任何请求头（Authorization、X-Admin-Token等不会落盘），只保留回放所需的
+    方法、路径、查询串、Content-Type和请求体。请求体在应用读取时顺带计算哈希，
+    应用未读完的请求体只记录已读部分的大小，不保存内容。
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        recorder: Optional[TrafficRecorder] = None,
+        sample_rate: Optional[float] = None,
+        capture_bodies: Optional[bool] = None,
+        max_body_bytes: Optional[int] = None,
+        skip_paths: Optional[List[str]] = None,
+    ):
+        self.app = app
+        self.recorder = recorder or TrafficRecorder.for_process(settings.TRAFFIC_CAPTURE_DIR)
+        self.sample_rate = settings.TRAFFIC_CAPTURE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.capture_bodies = settings.TRAFFIC_CAPTURE_BODIES if capture_bodies is None else capture_bodies
+        self.max_body_bytes = settings.TRAFFIC_CAPTURE_MAX_BODY_BYTES if max_body_bytes is None else max_body_bytes
+        self.skip_paths = set(settings.TRAFFIC_CAPTURE_SKIP_PATHS if skip_paths is None else skip_paths)
+        logger.info(f"Traffic capture enabled, writing to {self.recorder.path}")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope["type"] != "http"
+            or scope["path"] in self.skip_paths
+            or (self.sample_rate < 1.0 and random.random() >= self.sample_rate)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        ts = time.time()
+        start = time.perf_counter()
+        digest = hashlib.sha256()
+        chunks: List[bytes] = []
+        body = {"size": 0, "complete": False}
+        status = {"code": 500}
+
+        async def receive_with_capture() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                digest.update(chunk)
+                body["size"] += len(chunk)
+                if self.capture_bodies and body["size"] <= self.max_body_bytes:
+                    chunks.append(chunk)
+                if not message.get("more_body", False):
+                    body["complete"] = True
+            return message
+
+        async def send_with_capture(message: Message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_with_capture, send_with_capture)
+        finally:
+            record = {
+                "type": "request",
+                "ts": ts,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "content_type": Headers(scope=scope).get("content-type"),
+                "body": None,
+                "body_sha256": digest.hexdigest() if body["complete"] else None,
+                "body_size": body["size"],
+                "status": status["code"],
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+            }
+            if body["complete"] and self.capture_bodies and body["size"] <= self.max_body_bytes:
+                record.update(encode_body(b"".join(chunks)))
+            self.recorder.write(record)
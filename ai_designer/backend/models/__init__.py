@@ -9,10 +9,13 @@ from .project import Project
 from .design import Design
 from .generation import Generation, GenerationCache
 from .asset import Asset
-from .tag import Tag, AssetTag
+from .tag import Tag, AssetTag, TemplateTag
 from .favorite import Favorite
 from .template import Template
 
+# 全文检索索引随表创建
+from . import search
+
 __all__ = [
     # Core models
     'User',
@@ -26,6 +29,7 @@ __all__ = [
     # Tag models
     'Tag',
     'AssetTag',
+    'TemplateTag',
     # Favorite models
     'Favorite',
     # Template models
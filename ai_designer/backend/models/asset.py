@@ -3,8 +3,7 @@ Asset Model
 管理生成的图像、SVG等资源
 """
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Text, Boolean
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Text, Boolean, Uuid, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import uuid
@@ -16,10 +15,10 @@ class Asset(Base):
     """资源表"""
     __tablename__ = "assets"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
-    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"), nullable=True)
-    generation_id = Column(UUID(as_uuid=True), ForeignKey("generations.id"), nullable=True)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    user_id = Column(Uuid, ForeignKey("users.id"), nullable=False)
+    project_id = Column(Uuid, ForeignKey("projects.id"), nullable=True)
+    generation_id = Column(Uuid, ForeignKey("generations.id"), nullable=True)
 
     # 资源信息
     type = Column(String, nullable=False)  # image, svg, code, other
@@ -35,8 +34,12 @@ class Asset(Base):
 
     # 元数据
     description = Column(Text)
-    tags = Column(String)  # 逗号分隔的标签
-    metadata = Column(String)  # JSON字符串
+    tags = Column(String)  # 逗号分隔的标签（asset_tags的冗余副本，用于全文检索）
+    metadata_ = Column("metadata", String)  # JSON字符串
+
+    # 使用统计（搜索排序）
+    usage_count = Column(Integer, default=0, nullable=False)  # 使用次数
+    rating = Column(Integer, default=0, nullable=False)  # 评分
 
     # 状态
     is_public = Column(Boolean, default=False)  # 是否公开
@@ -52,5 +55,14 @@ class Asset(Base):
     project = relationship("Project")
     generation = relationship("Generation")
 
+    # 资源浏览：按可见范围过滤后按热度或时间取前N条；按类型/格式计数走覆盖索引
+    __table_args__ = (
+        Index("ix_assets_public_popular", "is_public", "is_deleted", "usage_count", "rating", "created_at"),
+        Index("ix_assets_public_created", "is_public", "is_deleted", "created_at"),
+        Index("ix_assets_public_type", "is_public", "is_deleted", "type", "format", "created_at"),
+        Index("ix_assets_user_popular", "user_id", "is_deleted", "usage_count", "rating", "created_at"),
+        Index("ix_assets_user_created", "user_id", "is_deleted", "created_at"),
+    )
+
     def __repr__(self):
         return f"<Asset {self.name} ({self.type})>"
@@ -2,8 +2,7 @@
 Design Model
 """
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Text, Uuid
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import uuid
@@ -15,13 +14,13 @@ class Design(Base):
     """设计表"""
     __tablename__ = "designs"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"), nullable=False)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    project_id = Column(Uuid, ForeignKey("projects.id"), nullable=False)
     type = Column(String, nullable=False)  # image, svg, code
     prompt = Column(Text)
     style = Column(String)
     content = Column(Text)  # 生成的内容
-    metadata = Column(JSON)  # 附加元数据
+    metadata_ = Column("metadata", JSON)  # 附加元数据
     version = Column(String, default="1.0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -3,8 +3,7 @@ Generation Model
 记录每次AI生成操作的详细信息
 """
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Float, JSON, Text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Float, JSON, Text, Uuid
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import uuid
@@ -16,9 +15,9 @@ class Generation(Base):
     """生成记录表"""
     __tablename__ = "generations"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
-    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"), nullable=True)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    user_id = Column(Uuid, ForeignKey("users.id"), nullable=False)
+    project_id = Column(Uuid, ForeignKey("projects.id"), nullable=True)
 
     # 生成类型
     type = Column(String, nullable=False)  # image, svg, code
@@ -40,7 +39,7 @@ class Generation(Base):
     error_code = Column(String)
 
     # 元数据
-    metadata = Column(JSON)  # 额外的元数据
+    metadata_ = Column("metadata", JSON)  # 额外的元数据
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -62,7 +61,7 @@ class GenerationCache(Base):
     """生成结果缓存表"""
     __tablename__ = "generation_cache"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
     cache_key = Column(String, unique=True, nullable=False, index=True)
 
     # 请求信息
@@ -73,7 +72,7 @@ class GenerationCache(Base):
     # 缓存的结果
     result_url = Column(String)
     result_content = Column(Text)
-    metadata = Column(JSON)
+    metadata_ = Column("metadata", JSON)
 
     # 统计
     hit_count = Column(Integer, default=0)  # 命中次数
@@ -0,0 +1,87 @@
+"""
+Search Indexes
+全文检索索引 - PostgreSQL使用生成列tsvector + GIN索引，SQLite（本地开发）使用FTS5外部内容表 + 同步触发器。
+由初始迁移创建（开发/测试的create_all时随表创建），ORM模型不映射这些列/表，由 services.search 直接查询
+"""
+
+from typing import Dict, List, Tuple
+
+from sqlalchemy import DDL, event
+
+from core.config import settings
+from models.asset import Asset
+from models.template import Template
+
+# 每张表参与全文检索的列及权重：(列名, PostgreSQL权重等级, SQLite bm25权重)
+SEARCH_COLUMNS: Dict[str, List[Tuple[str, str, float]]] = {
+    Asset.__tablename__: [
+        ("name", "A", 10.0),
+        ("tags", "B", 5.0),
+        ("description", "C", 1.0),
+    ],
+    Template.__tablename__: [
+        ("name", "A", 10.0),
+        ("tags", "B", 5.0),
+        ("category", "B", 5.0),
+        ("description", "C", 1.0),
+    ],
+}
+
+SEARCH_VECTOR_COLUMN = "search_vector"
+
+
+def fts_table(table: str) -> str:
+    """SQLite FTS5表名"""
+    return f"{table}_fts"
+
+
+def _postgresql_ddl(table: str) -> List[str]:
+    document = " || ".join(
+        f"setweight(to_tsvector('{settings.SEARCH_TEXT_CONFIG}', coalesce({column}, '')), '{weight}')"
+        for column, weight, _ in SEARCH_COLUMNS[table]
+    )
+    return [
+        f"ALTER TABLE {table} ADD COLUMN {SEARCH_VECTOR_COLUMN} tsvector GENERATED ALWAYS AS ({document}) STORED",
+        f"CREATE INDEX ix_{table}_{SEARCH_VECTOR_COLUMN} ON {table} USING gin ({SEARCH_VECTOR_COLUMN})",
+    ]
+
+
+def _sqlite_ddl(table: str) -> List[str]:
+    fts = fts_table(table)
+    columns = [column for column, _, _ in SEARCH_COLUMNS[table]]
+    names = ", ".join(columns)
+    new = ", ".join(f"new.{column}" for column in columns)
+    old = ", ".join(f"old.{column}" for column in columns)
+    delete = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.rowid, {old});"
+    insert = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.rowid, {new});"
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{table}', content_rowid='rowid', "
+        f"tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END",
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {names} ON {table} BEGIN {delete} {insert} END",
+    ]
+
+
+def search_ddl(dialect: str, table: str) -> List[str]:
+    """建表后创建全文检索列/表的语句（迁移脚本使用；修改SEARCH_COLUMNS需要新的迁移）"""
+    if dialect == "postgresql":
+        return _postgresql_ddl(table)
+    if dialect == "sqlite":
+        return _sqlite_ddl(table)
+    return []
+
+
+def rebuild_statement(table: str) -> str:
+    """SQLite：按内容表重建FTS索引（VACUUM可能改变无整数主键表的rowid）"""
+    fts = fts_table(table)
+    return f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"
+
+
+for _model in (Asset, Template):
+    _table = _model.__table__
+    for _statement in _postgresql_ddl(_table.name):
+        event.listen(_table, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+    for _statement in _sqlite_ddl(_table.name):
+        event.listen(_table, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+    event.listen(_table, "before_drop", DDL(f"DROP TABLE IF EXISTS {fts_table(_table.name)}").execute_if(dialect="sqlite"))
@@ -3,8 +3,7 @@ Tag Model
 标签系统，用于组织和搜索资源
 """
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, Integer
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Uuid, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import uuid
@@ -16,8 +15,8 @@ class Tag(Base):
     """标签表"""
     __tablename__ = "tags"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    user_id = Column(Uuid, ForeignKey("users.id"), nullable=True)
 
     # 标签信息
     name = Column(String, nullable=False, unique=True)
@@ -26,7 +25,7 @@ class Tag(Base):
     description = Column(String)
 
     # 统计
-    usage_count = Column(Integer, default=0)  # 使用次数
+    usage_count = Column(Integer, default=0, nullable=False)  # 使用次数（资源与模板）
 
     # 时间戳
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -43,15 +42,44 @@ class AssetTag(Base):
     """资源标签关联表（多对多）"""
     __tablename__ = "asset_tags"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    asset_id = Column(UUID(as_uuid=True), ForeignKey("assets.id"), nullable=False, index=True)
-    tag_id = Column(UUID(as_uuid=True), ForeignKey("tags.id"), nullable=False, index=True)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    asset_id = Column(Uuid, ForeignKey("assets.id"), nullable=False)
+    tag_id = Column(Uuid, ForeignKey("tags.id"), nullable=False)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # 按资源取标签 / 按标签过滤资源
+    __table_args__ = (
+        UniqueConstraint("asset_id", "tag_id", name="uq_asset_tags_asset_tag"),
+        Index("ix_asset_tags_tag_asset", "tag_id", "asset_id"),
+    )
+
     # Relationships
     asset = relationship("Asset")
     tag = relationship("Tag")
 
     def __repr__(self):
         return f"<AssetTag {self.asset_id} - {self.tag_id}>"
+
+
+class TemplateTag(Base):
+    """模板标签关联表（多对多）"""
+    __tablename__ = "template_tags"
+
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    template_id = Column(Uuid, ForeignKey("templates.id"), nullable=False)
+    tag_id = Column(Uuid, ForeignKey("tags.id"), nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("template_id", "tag_id", name="uq_template_tags_template_tag"),
+        Index("ix_template_tags_tag_template", "tag_id", "template_id"),
+    )
+
+    # Relationships
+    template = relationship("Template")
+    tag = relationship("Tag")
+
+    def __repr__(self):
+        return f"<TemplateTag {self.template_id} - {self.tag_id}>"
@@ -3,8 +3,7 @@ Template Model
 模板系统，预设的设计模板
 """
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Text, Integer
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Text, Integer, Uuid, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import uuid
@@ -16,14 +15,15 @@ class Template(Base):
     """模板表"""
     __tablename__ = "templates"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)  # None表示系统模板
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    user_id = Column(Uuid, ForeignKey("users.id"), nullable=True)  # None表示系统模板
 
     # 模板信息
     name = Column(String, nullable=False)
     slug = Column(String, unique=True, nullable=False, index=True)
     type = Column(String, nullable=False)  # image, svg, code
     category = Column(String)  # 分类
+    tags = Column(String)  # 逗号分隔的标签（template_tags的冗余副本，用于全文检索）
 
     # 描述和预览
     description = Column(Text)
@@ -36,8 +36,8 @@ class Template(Base):
     code_snippet = Column(Text)  # 代码片段（如果是代码模板）
 
     # 使用统计
-    usage_count = Column(Integer, default=0)  # 使用次数
-    rating = Column(Integer, default=0)  # 评分
+    usage_count = Column(Integer, default=0, nullable=False)  # 使用次数
+    rating = Column(Integer, default=0, nullable=False)  # 评分
 
     # 状态
     is_public = Column(Boolean, default=False)  # 是否公开
@@ -53,5 +53,9 @@ class Template(Base):
     # Relationships
     user = relationship("User")
 
+    __table_args__ = (
+        Index("ix_templates_public_popular", "is_public", "usage_count", "rating", "created_at"),
+    )
+
     def __repr__(self):
         return f"<Template {self.name} ({self.type})>"
@@ -124,6 +124,7 @@ class ImageGenerationResponse(BaseModel):
     dimensions: dict = Field(..., description="图像尺寸")
     style: str = Field(..., description="使用的风格")
     seed: Optional[int] = Field(None, description="使用的种子")
+    duplicate_of: Optional[str] = Field(None, description="近重复时为原结果的生成ID")
     request_id: str = Field(..., description="请求ID")
 
 
@@ -0,0 +1,94 @@
+"""
+Search schemas
+"""
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from typing import Optional, List, Dict
+from datetime import datetime
+from uuid import UUID
+
+
+class SearchFacetValue(BaseModel):
+    """分面取值及匹配数"""
+
+    value: str = Field(..., description="取值（类型/格式/分类/标签名/YYYY-MM）")
+    count: int = Field(..., description="匹配数")
+
+
+class _SearchHit(BaseModel):
+    """检索结果公共字段"""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: UUID = Field(..., description="ID")
+    name: str = Field(..., description="名称")
+    type: str = Field(..., description="类型")
+    description: Optional[str] = Field(None, description="描述")
+    tags: List[str] = Field(default_factory=list, description="标签")
+    usage_count: int = Field(0, description="使用次数")
+    rating: int = Field(0, description="评分")
+    created_at: Optional[datetime] = Field(None, description="创建时间")
+    score: float = Field(0.0, description="排序得分（文本相关度×热度加成，无检索词时为0）")
+
+    @field_validator("tags", mode="before")
+    @classmethod
+    def split_tags(cls, v):
+        """模型中为逗号分隔的字符串"""
+        if v is None:
+            return []
+        if isinstance(v, str):
+            return [tag for tag in v.split(",") if tag]
+        return v
+
+
+class AssetSearchHit(_SearchHit):
+    """资源检索结果"""
+
+    format: Optional[str] = Field(None, description="文件格式")
+    url: Optional[str] = Field(None, description="访问URL")
+    width: Optional[int] = Field(None, description="宽度")
+    height: Optional[int] = Field(None, description="高度")
+
+
+class TemplateSearchHit(_SearchHit):
+    """模板检索结果"""
+
+    slug: str = Field(..., description="模板slug")
+    category: Optional[str] = Field(None, description="分类")
+    preview_url: Optional[str] = Field(None, description="预览图URL")
+    thumbnail_url: Optional[str] = Field(None, description="缩略图URL")
+    is_official: Optional[bool] = Field(None, description="是否官方模板")
+
+
+class _SearchPage(BaseModel):
+    """检索结果页公共字段"""
+
+    success: bool = Field(..., description="是否成功")
+    total: Optional[int] = Field(None, description="匹配总数（facets=false时不计算）")
+    facets: Dict[str, List[SearchFacetValue]] = Field(default_factory=dict, description="分面计数")
+    facets_estimated: bool = Field(False, description="分面计数是否由抽样估算（匹配数超过SEARCH_FACET_SAMPLE_SIZE）")
+    query_ms: float = Field(..., description="查询耗时(毫秒)")
+    request_id: Optional[str] = Field(None, description="请求ID")
+
+
+class AssetSearchPage(_SearchPage):
+    """资源检索响应"""
+
+    results: List[AssetSearchHit] = Field(..., description="结果")
+
+
+class TemplateSearchPage(_SearchPage):
+    """模板检索响应"""
+
+    results: List[TemplateSearchHit] = Field(..., description="结果")
+
+
+class TagCount(BaseModel):
+    """标签及使用次数"""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    name: str = Field(..., description="标签名")
+    slug: str = Field(..., description="标签slug")
+    color: Optional[str] = Field(None, description="标签颜色")
+    usage_count: int = Field(..., description="使用次数")
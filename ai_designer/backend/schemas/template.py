@@ -0,0 +1,96 @@
+"""
+Template schemas
+"""
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from typing import Any, Dict, Optional, List
+from datetime import datetime
+from uuid import UUID
+
+
+class TemplateSummary(BaseModel):
+    """模板列表项"""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: UUID = Field(..., description="模板ID")
+    name: str = Field(..., description="模板名称")
+    slug: str = Field(..., description="模板slug")
+    type: str = Field(..., description="类型")
+    category: Optional[str] = Field(None, description="分类")
+    description: Optional[str] = Field(None, description="描述")
+    tags: List[str] = Field(default_factory=list, description="标签")
+    preview_url: Optional[str] = Field(None, description="预览图URL")
+    thumbnail_url: Optional[str] = Field(None, description="缩略图URL")
+    usage_count: int = Field(0, description="使用次数（最多落后一个写回周期）")
+    rating: int = Field(0, description="评分")
+    is_official: Optional[bool] = Field(None, description="是否官方模板")
+    created_at: Optional[datetime] = Field(None, description="创建时间")
+
+    @field_validator("tags", mode="before")
+    @classmethod
+    def split_tags(cls, v):
+        """模型中为逗号分隔的字符串"""
+        if v is None:
+            return []
+        if isinstance(v, str):
+            return [tag for tag in v.split(",") if tag]
+        return v
+
+
+class PopularTemplatesResponse(BaseModel):
+    """热门模板响应"""
+
+    success: bool = Field(..., description="是否成功")
+    templates: List[TemplateSummary] = Field(..., description="按使用次数与评分排序的模板")
+    request_id: Optional[str] = Field(None, description="请求ID")
+
+
+class TemplateUsageResponse(BaseModel):
+    """模板使用记录响应"""
+
+    success: bool = Field(..., description="是否成功")
+    template_id: UUID = Field(..., description="模板ID")
+    usage_count: int = Field(..., description="使用次数（含尚未写回的增量）")
+    request_id: Optional[str] = Field(None, description="请求ID")
+
+
+class TemplateRenderRequest(BaseModel):
+    """模板渲染请求"""
+
+    variables: Dict[str, Any] = Field(default_factory=dict, description="变量取值，覆盖模板parameters中的同名默认值")
+    field: str = Field("prompt_template", description="渲染的字段", pattern="^(prompt_template|code_snippet)$")
+
+
+class TemplateRenderResponse(BaseModel):
+    """模板渲染响应"""
+
+    success: bool = Field(..., description="是否成功")
+    template_id: UUID = Field(..., description="模板ID")
+    text: str = Field(..., description="渲染结果")
+    request_id: Optional[str] = Field(None, description="请求ID")
+
+
+class TemplateGridRequest(BaseModel):
+    """参数网格批量渲染请求"""
+
+    grid: Dict[str, List[Any]] = Field(..., description="变量名 -> 取值列表，按笛卡尔积展开")
+    variables: Dict[str, Any] = Field(default_factory=dict, description="所有组合共用的变量")
+    field: str = Field("prompt_template", description="渲染的字段", pattern="^(prompt_template|code_snippet)$")
+
+
+class TemplateGridItem(BaseModel):
+    """网格中的一个组合"""
+
+    variables: Dict[str, Any] = Field(..., description="本组合的网格取值")
+    text: str = Field(..., description="渲染结果")
+
+
+class TemplateGridResponse(BaseModel):
+    """参数网格批量渲染响应"""
+
+    success: bool = Field(..., description="是否成功")
+    template_id: UUID = Field(..., description="模板ID")
+    items: List[TemplateGridItem] = Field(..., description="按网格顺序的渲染结果")
+    render_ms: float = Field(..., description="渲染耗时(毫秒)")
+    request_id: Optional[str] = Field(None, description="请求ID")
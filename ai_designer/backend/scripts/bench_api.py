@@ -0,0 +1,137 @@
+"""
+API benchmark
+进程内启动API（桩模型 + fakeredis + SQLite），按固定并发运行各类负载，
+输出吞吐、p50/p95/p99延迟与峰值内存的JSON基线；--compare 与已有基线比较，出现回退时退出码为1
+
+Usage:
+    python scripts/bench_api.py --output bench/baseline.json
+    python scripts/bench_api.py --workloads mixed,image --requests 500 --concurrency 16
+    python scripts/bench_api.py --compare bench/baseline.json --output bench/current.json
+    python scripts/bench_api.py --diff bench/baseline.json bench/current.json
+"""
+
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.workloads import WORKLOADS
+
+
+def run_child(args) -> dict:
+    """在当前进程中运行单个负载（峰值RSS只反映这一个负载）"""
+    from loguru import logger
+
+    from benchmarks.runner import BenchEnvironment, run_workload
+
+    if not args.logs:
+        logger.remove()
+
+    async def main():
+        async with BenchEnvironment(
+            image_seconds_per_megapixel_step=args.image_step_seconds,
+            gemini_seconds_per_call=args.gemini_seconds,
+            rate_limit=args.rate_limit,
+        ) as app:
+            return await run_workload(app, args.child, args.requests, args.concurrency, seed=args.seed)
+
+    return asyncio.run(main())
+
+
+def run_all(args) -> dict:
+    from benchmarks.runner import baseline_document
+
+    results = {}
+    for workload in args.workloads.split(","):
+        command = [
+            sys.executable, __file__, "--child", workload,
+            "--requests", str(args.requests),
+            "--concurrency", str(args.concurrency),
+            "--seed", str(args.seed),
+            "--image-step-seconds", str(args.image_step_seconds),
+            "--gemini-seconds", str(args.gemini_seconds),
+        ]
+        if args.rate_limit:
+            command.append("--rate-limit")
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        results[workload] = json.loads(output.strip().splitlines()[-1])
+        print_result(workload, results[workload])
+
+    return baseline_document(results, {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+        "image_seconds_per_megapixel_step": args.image_step_seconds,
+        "gemini_seconds_per_call": args.gemini_seconds,
+        "rate_limit": args.rate_limit,
+    })
+
+
+def print_result(workload: str, result: dict):
+    latency = result["latency_ms"]
+    print(
+        f"{workload:<10} {result['throughput_rps']:>9.1f}/s "
+        f"p50 {latency['p50']:>8.1f}ms  p95 {latency['p95']:>8.1f}ms  p99 {latency['p99']:>8.1f}ms  "
+        f"peak RSS +{result['peak_rss_delta_mb']:.1f}MB  errors {result['errors']}"
+    )
+
+
+def report_regressions(baseline: dict, current: dict, tolerance: float) -> int:
+    from benchmarks.runner import compare
+
+    if baseline.get("config") != current.get("config"):
+        print("warning: benchmark configs differ, comparison may be meaningless")
+
+    regressions = compare(baseline, current, tolerance)
+    if not regressions:
+        print(f"no regressions (tolerance {tolerance:.0%})")
+        return 0
+
+    print(f"{len(regressions)} regression(s) beyond {tolerance:.0%}:")
+    for regression in regressions:
+        print(f"  {regression}")
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workloads", default=",".join(WORKLOADS))
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--image-step-seconds", type=float, default=0.0002,
+                        help="桩图像模型每百万像素每步的模拟耗时")
+    parser.add_argument("--gemini-seconds", type=float, default=0.0, help="桩Gemini每次调用的模拟耗时")
+    parser.add_argument("--rate-limit", action="store_true", help="保留限流中间件（默认关闭，避免429）")
+    parser.add_argument("--logs", action="store_true", help="保留请求日志输出")
+    parser.add_argument("--output", type=Path, help="写入结果JSON")
+    parser.add_argument("--compare", type=Path, metavar="BASELINE", help="运行后与基线比较")
+    parser.add_argument("--diff", nargs=2, type=Path, metavar=("BASELINE", "CURRENT"), help="只比较两个已有结果")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="允许的相对变差")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args)))
+        return
+
+    if args.diff:
+        baseline, current = (json.loads(path.read_text()) for path in args.diff)
+        sys.exit(report_regressions(baseline, current, args.tolerance))
+
+    document = run_all(args)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(document, indent=2) + "\n")
+        print(f"results written to {args.output}")
+
+    if args.compare:
+        sys.exit(report_regressions(json.loads(args.compare.read_text()), document, args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
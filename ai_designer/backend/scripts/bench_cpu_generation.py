@@ -0,0 +1,71 @@
+"""
+CPU generation benchmark
+在CPU上按分辨率测量每张图像的生成耗时（使用当前 IMAGE_MODEL_ID / IMAGE_SCHEDULER / IMAGE_CPU_* 配置）
+
+Usage:
+    IMAGE_MODEL_ID=stabilityai/sdxl-turbo python scripts/bench_cpu_generation.py
+    python scripts/bench_cpu_generation.py --sizes thumbnail,icon,hero_small --runs 3 --steps 30
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from loguru import logger
+
+from core.config import settings
+from services.ai_models import apply_scheduler_profile, model_manager, resolve_cpu_runtime
+from services.image_generation import ImageGenerationService
+
+PROMPT = "modern landing page hero illustration, clean lines, minimalist, professional"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="thumbnail,icon,hero_small,hero_medium")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--steps", type=int, default=30, help="请求的步数（少步数模型会被限制）")
+    parser.add_argument("--guidance", type=float, default=7.5)
+    args = parser.parse_args()
+
+    # 强制CPU，即使本机有GPU
+    model_manager._device = "cpu"
+    if not asyncio.run(model_manager.load_image_generator()):
+        sys.exit("Image generator failed to load (is diffusers installed?)")
+
+    pipe = model_manager.get_model("image_generator")
+    profile = model_manager.generation_profile
+    params = apply_scheduler_profile(
+        {"num_inference_steps": args.steps, "guidance_scale": args.guidance}, profile
+    )
+
+    print(f"model:     {settings.IMAGE_MODEL_ID}")
+    print(f"runtime:   {resolve_cpu_runtime(settings.IMAGE_CPU_RUNTIME)}")
+    print(f"scheduler: {profile['name']} | steps: {params['num_inference_steps']} | guidance: {params['guidance_scale']}")
+    print()
+    print(f"{'size':<12} {'resolution':>10} {'first':>8} {'median':>8} {'s/step':>8}")
+
+    logger.remove()
+    for size in args.sizes.split(","):
+        width, height = ImageGenerationService.SIZE_PRESETS[size]
+        timings = []
+        # 第一次包含图编译/内核选择等预热开销，单独列出
+        for _ in range(args.runs + 1):
+            start = time.perf_counter()
+            pipe(prompt=PROMPT, width=width, height=height, **params)
+            timings.append(time.perf_counter() - start)
+
+        median = statistics.median(timings[1:])
+        print(
+            f"{size:<12} {f'{width}x{height}':>10} {timings[0]:>7.1f}s {median:>7.1f}s "
+            f"{median / params['num_inference_steps']:>7.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
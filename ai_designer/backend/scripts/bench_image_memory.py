@@ -0,0 +1,143 @@
+"""
+Image response memory benchmark
+对比旧的 getvalue() + base64字符串 + JSONResponse 路径与缓冲区流式输出路径，
+单个在途图像从编码到响应发送完毕的峰值内存
+
+Usage:
+    python scripts/bench_image_memory.py [--sizes hero_large,hero_medium,icon]
+"""
+
+import argparse
+import asyncio
+import base64
+import gc
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.responses import JSONResponse
+from PIL import Image
+
+from core.image_buffer import EmbeddedImage, ImageJSONResponse, encode_image
+from schemas.image import ImageGenerationResponse
+from services.image_generation import ImageGenerationService
+
+MODES = ("legacy", "buffered")
+
+
+def _noise_image(width: int, height: int) -> Image.Image:
+    # 随机像素几乎不可压缩，接近生成图像PNG体积的上限
+    return Image.frombytes("RGB", (width, height), os.urandom(width * height * 3))
+
+
+def _fields(width: int, height: int) -> dict:
+    return dict(
+        success=True,
+        generation_id="bench",
+        generation_time=1.0,
+        prompt="benchmark",
+        dimensions={"width": width, "height": height},
+        style="modern",
+        request_id="bench",
+    )
+
+
+def legacy_response(image: Image.Image):
+    """旧路径：getvalue() -> base64字符串 -> data URL -> 模型 -> JSONResponse"""
+    img_byte_arr = io.BytesIO()
+    image.save(img_byte_arr, format="PNG")
+    image_data = img_byte_arr.getvalue()
+
+    image_base64 = base64.b64encode(image_data).decode("utf-8")
+    model = ImageGenerationResponse(
+        image_url=f"data:image/png;base64,{image_base64}",
+        image_base64=image_base64,
+        **_fields(*image.size)
+    )
+    return JSONResponse(model.model_dump(mode="json"))
+
+
+def buffered_response(image: Image.Image):
+    """新路径：编码一次，base64在发送时逐块生成"""
+    image_data = encode_image(image)
+    content = ImageGenerationResponse(**_fields(*image.size)).model_dump(mode="json")
+    content["image_url"] = EmbeddedImage(image_data, prefix="data:image/png;base64,")
+    content["image_base64"] = EmbeddedImage(image_data)
+    return ImageJSONResponse(content)
+
+
+async def send_response(response) -> int:
+    """以ASGI方式发送，只统计字节数（模拟写入socket）"""
+    sent = 0
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal sent
+        sent += len(message.get("body", b""))
+
+    await response({"type": "http"}, receive, send)
+    return sent
+
+
+def measure(mode: str, size: str) -> dict:
+    """在当前进程中测量一次，返回峰值内存（相对生成图像之后的基线）"""
+    width, height = ImageGenerationService.SIZE_PRESETS[size]
+    image = _noise_image(width, height)
+    build = legacy_response if mode == "legacy" else buffered_response
+
+    gc.collect()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+
+    sent = asyncio.run(send_response(build(image)))
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {
+        "mode": mode,
+        "size": f"{width}x{height}",
+        "body_bytes": sent,
+        "peak_alloc_mb": peak / 2**20,
+        # Linux下ru_maxrss单位为KB
+        "peak_rss_delta_mb": (rss_after - rss_before) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="hero_large,hero_medium,icon")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(*args.child)))
+        return
+
+    print(f"{'size':<10} {'mode':<9} {'body':>9} {'peak alloc':>11} {'peak RSS +':>11}")
+    for size in args.sizes.split(","):
+        for mode in MODES:
+            # 每次在新进程中测量，避免峰值RSS互相影响
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", mode, size],
+                capture_output=True, text=True, check=True
+            ).stdout
+            row = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{row['size']:<10} {row['mode']:<9} {row['body_bytes'] / 2**20:>7.1f}MB "
+                f"{row['peak_alloc_mb']:>9.1f}MB {row['peak_rss_delta_mb']:>9.1f}MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
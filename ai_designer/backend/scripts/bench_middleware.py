@@ -0,0 +1,143 @@
+"""
+Middleware benchmark
+对比 BaseHTTPMiddleware 旧实现与纯ASGI中间件栈在空端点上的吞吐
+
+Usage:
+    python scripts/bench_middleware.py [--requests 5000]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from loguru import logger
+
+from core.rate_limiter import RateLimiter, RateLimitRule
+from middleware import (
+    RequestIDMiddleware,
+    LoggingMiddleware,
+    ErrorHandlerMiddleware,
+    RateLimitMiddleware,
+)
+
+
+# ---------------------------------------------------------------------------
+# 旧实现（BaseHTTPMiddleware）的等价复刻，用作对照组
+# ---------------------------------------------------------------------------
+
+class LegacyRequestIDMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        request_id = request.headers.get("X-Request-ID") or str(uuid.uuid4())
+        request.state.request_id = request_id
+        with logger.contextualize(request_id=request_id):
+            response = await call_next(request)
+            response.headers["X-Request-ID"] = request_id
+            return response
+
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        start_time = time.time()
+        request_id = getattr(request.state, "request_id", "unknown")
+        logger.info(f"[{request_id}] {request.method} {request.url.path} - Started")
+        response = await call_next(request)
+        process_time = time.time() - start_time
+        logger.info(f"[{request_id}] {request.method} {request.url.path} - Completed {response.status_code}")
+        response.headers["X-Process-Time"] = f"{process_time:.3f}"
+        return response
+
+
+class LegacyErrorHandlerMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        try:
+            return await call_next(request)
+        except Exception:
+            return JSONResponse(status_code=500, content={"error": "Internal server error"})
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, limiter):
+        super().__init__(app)
+        self.limiter = limiter
+
+    async def dispatch(self, request, call_next):
+        client_id = request.client.host if request.client else "unknown"
+        result = await self.limiter.check(client_id, request.url.path, request.method)
+        if not result.allowed:
+            return JSONResponse(status_code=429, content={"error": "Rate limit exceeded"})
+        return await call_next(request)
+
+
+def build_app(stack: str) -> FastAPI:
+    """构建带指定中间件栈的最小应用"""
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    # 未连接Redis时使用本地令牌桶，排除网络影响
+    limiter = RateLimiter(route_rules={}, default_rule=RateLimitRule(10 ** 9, 60))
+
+    if stack == "legacy":
+        app.add_middleware(LegacyRateLimitMiddleware, limiter=limiter)
+        app.add_middleware(LegacyErrorHandlerMiddleware)
+        app.add_middleware(LegacyLoggingMiddleware)
+        app.add_middleware(LegacyRequestIDMiddleware)
+    elif stack == "asgi":
+        app.add_middleware(RateLimitMiddleware, limiter=limiter)
+        app.add_middleware(ErrorHandlerMiddleware)
+        app.add_middleware(LoggingMiddleware, skip_paths=[])
+        app.add_middleware(RequestIDMiddleware)
+
+    return app
+
+
+async def run(stack: str, requests: int) -> float:
+    """顺序发送请求，返回 requests/sec"""
+    app = build_app(stack)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # 预热
+        for _ in range(100):
+            await client.get("/ping")
+
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = await client.get("/ping")
+            assert response.status_code == 200
+        elapsed = time.perf_counter() - start
+
+    return requests / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    # 只测量中间件本身的开销，不输出日志
+    logger.remove()
+
+    results = {}
+    for stack in ("none", "legacy", "asgi"):
+        results[stack] = await run(stack, args.requests)
+
+    baseline = results["none"]
+    print(f"{'stack':<8} {'req/s':>10} {'overhead/req':>14}")
+    for stack, rps in results.items():
+        overhead_us = (1 / rps - 1 / baseline) * 1e6
+        print(f"{stack:<8} {rps:>10.0f} {overhead_us:>12.1f}us")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,174 @@
+"""
+Search benchmark
+生成合成资源库（默认100万条资源、带标签关联），测量资源浏览/检索的结果页与分面查询延迟
+
+Usage:
+    python scripts/bench_search.py [--assets 1000000] [--queries 50] [--database-url sqlite+aiosqlite:///path.db]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import models  # noqa: F401
+from core.database import Base
+from models import Asset, AssetTag, Tag, User
+from services.search import search_service, slugify
+
+BATCH = 50_000
+WORDS = (
+    "sunset hero banner dashboard login gradient glass neon minimal dark light product card pricing "
+    "landing mobile icon logo chart avatar onboarding profile settings checkout retro organic flat"
+).split()
+# 词频近似Zipf-Mandelbrot分布：最常见的词出现在约9%的资源中，长尾词只命中几百条
+VOCABULARY = WORDS + [f"term{i}" for i in range(2000)]
+WORD_WEIGHTS = 1.0 / (np.arange(len(VOCABULARY)) + 10.0)
+WORD_WEIGHTS /= WORD_WEIGHTS.sum()
+TYPES = [("image", "png"), ("image", "jpg"), ("svg", "svg"), ("code", "tsx")]
+TAG_COUNT = 500
+
+
+def _zipf(rng: np.random.Generator, size: int, limit: int) -> np.ndarray:
+    return np.minimum(rng.zipf(1.3, size), limit) - 1
+
+
+async def populate(engine, count: int):
+    """批量写入用户、标签、资源与标签关联（全文索引由触发器/生成列维护）"""
+    rng = np.random.default_rng(0)
+    random.seed(0)
+    start_date = datetime(2024, 1, 1)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        user_id = uuid.uuid4()
+        await conn.execute(insert(User), [{"id": user_id, "email": "bench@example.com"}])
+        tag_ids = [uuid.uuid4() for _ in range(TAG_COUNT)]
+        await conn.execute(insert(Tag), [
+            {"id": tag_id, "name": f"tag {i}", "slug": slugify(f"tag {i}"), "usage_count": 0}
+            for i, tag_id in enumerate(tag_ids)
+        ])
+
+    for offset in range(0, count, BATCH):
+        size = min(BATCH, count - offset)
+        words = rng.choice(len(VOCABULARY), (size, 5), p=WORD_WEIGHTS)
+        kinds = rng.integers(0, len(TYPES), size)
+        usage = _zipf(rng, size, 10_000)
+        ratings = rng.integers(0, 6, size)
+        days = rng.integers(0, 730, size)
+        tags = _zipf(rng, (size, 2), TAG_COUNT)
+
+        assets, links = [], []
+        for i in range(size):
+            asset_id = uuid.uuid4()
+            asset_tags = sorted({int(t) for t in tags[i]})
+            assets.append({
+                "id": asset_id,
+                "user_id": user_id,
+                "type": TYPES[kinds[i]][0],
+                "format": TYPES[kinds[i]][1],
+                "name": " ".join(VOCABULARY[w] for w in words[i, :3]),
+                "description": " ".join(VOCABULARY[w] for w in words[i, 3:]),
+                "tags": ",".join(f"tag {t}" for t in asset_tags),
+                "usage_count": int(usage[i]),
+                "rating": int(ratings[i]),
+                "is_public": True,
+                "is_deleted": False,
+                "created_at": start_date + timedelta(days=int(days[i]), seconds=random.randrange(86400)),
+            })
+            links += [{"id": uuid.uuid4(), "asset_id": asset_id, "tag_id": tag_ids[t]} for t in asset_tags]
+
+        async with engine.begin() as conn:
+            await conn.execute(insert(Asset), assets)
+            await conn.execute(insert(AssetTag), links)
+        print(f"  {offset + size:>9} assets", end="\r", flush=True)
+
+    async with engine.begin() as conn:
+        counts = select(func.count()).where(AssetTag.tag_id == Tag.id).scalar_subquery()
+        await conn.execute(update(Tag).values(usage_count=counts))
+        if engine.dialect.name == "sqlite":
+            await conn.exec_driver_sql("ANALYZE")
+        else:
+            await conn.exec_driver_sql("ANALYZE assets; ANALYZE asset_tags; ANALYZE tags")
+    print()
+
+
+WORKLOADS = {
+    "browse (popular)": lambda q: {},
+    "browse type=svg": lambda q: {"filters": {"type": ["svg"]}},
+    "browse tag": lambda q: {"tags": [f"tag {q % 20}"]},
+    "browse newest + date range": lambda q: {
+        "sort": "newest", "created_from": datetime(2025, 1 + q % 12, 1), "created_to": datetime(2025, 1 + q % 12, 28)
+    },
+    "text 1 word": lambda q: {"query": VOCABULARY[(q * 37) % 500]},
+    "text 2 words + prefix": lambda q: {"query": f"{WORDS[q % len(WORDS)]} {VOCABULARY[(q * 7) % 500][:-1]}"},
+    "text + type + tag": lambda q: {"query": VOCABULARY[(q * 37) % 500], "filters": {"type": ["image"]}, "tags": [f"tag {q % 5}"]},
+}
+
+
+async def measure(engine, queries: int):
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessions() as db:
+        print(f"{'workload':<28} {'page p50':>9} {'page p99':>9} {'facets p50':>11} {'facets p99':>11}")
+        for name, build in WORKLOADS.items():
+            pages, totals = [], []
+            for q in range(queries + 3):
+                kwargs = build(q)
+                start = time.perf_counter()
+                await search_service.search(db, "assets", limit=20, facets=False, **kwargs)
+                page = (time.perf_counter() - start) * 1000
+                start = time.perf_counter()
+                await search_service.search(db, "assets", limit=20, facets=True, **kwargs)
+                total = (time.perf_counter() - start) * 1000 - page
+                if q >= 3:  # 前几次为预热
+                    pages.append(page)
+                    totals.append(max(total, 0.0))
+            pages, totals = np.sort(pages), np.sort(totals)
+            p99 = min(len(pages) - 1, int(len(pages) * 0.99))
+            print(
+                f"{name:<28} {pages[len(pages) // 2]:>7.2f}ms {pages[p99]:>7.2f}ms "
+                f"{totals[len(totals) // 2]:>9.2f}ms {totals[p99]:>9.2f}ms"
+            )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--assets", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--database-url", help="existing or empty database (default: temporary SQLite file)")
+    parser.add_argument("--skip-populate", action="store_true", help="reuse the data already in --database-url")
+    args = parser.parse_args()
+
+    directory = None
+    url = args.database_url
+    if url is None:
+        directory = tempfile.mkdtemp(prefix="search_bench_")
+        url = f"sqlite+aiosqlite:///{os.path.join(directory, 'search.db')}"
+    engine = create_async_engine(url)
+    try:
+        if not args.skip_populate:
+            start = time.perf_counter()
+            await populate(engine, args.assets)
+            print(f"populated {args.assets} assets in {time.perf_counter() - start:.1f}s ({engine.dialect.name})")
+        await measure(engine, args.queries)
+    finally:
+        await engine.dispose()
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
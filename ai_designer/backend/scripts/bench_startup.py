@@ -0,0 +1,139 @@
+"""
+Cold start benchmark
+冷启动耗时 - 每次运行都在新的解释器中导入应用并执行启动时的表结构处理（DATABASE_SCHEMA_MODE），
+比较 create（每个worker启动时create_all，逐表检查是否存在）与 verify（一条查询核对迁移版本），
+输出进程总耗时、导入、init_db与首个查询耗时的分位数，以及init_db执行的SQL语句数
+（SQLite本地文件上每条语句只需几十微秒；PostgreSQL上每条都是一次网络往返）
+
+Usage:
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --runs 20 --modes create,verify --output bench/startup.json
+    python scripts/bench_startup.py --database-url postgresql+asyncpg://user:password@db/ai_designer  # 需已迁移到head
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+MODES = ("create", "verify")
+METRICS = ("process_ms", "import_ms", "init_db_ms", "first_query_ms", "init_db_statements")
+
+
+def run_child() -> dict:
+    """在全新进程中按worker的顺序：导入应用 -> init_db -> 第一个查询"""
+    start = time.perf_counter()
+    import main  # noqa: F401
+    imported = time.perf_counter()
+
+    from loguru import logger
+    from sqlalchemy import event, text
+
+    from core.database import AsyncSessionLocal, close_db, engine, init_db
+
+    logger.remove()
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    async def startup():
+        begin = time.perf_counter()
+        await init_db()
+        initialized = time.perf_counter()
+        executed = len(statements)
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("SELECT id FROM templates LIMIT 1"))
+        queried = time.perf_counter()
+        await close_db()
+        return initialized - begin, queried - initialized, executed
+
+    init_db_seconds, first_query_seconds, executed = asyncio.run(startup())
+    return {
+        "import_ms": round((imported - start) * 1000, 3),
+        "init_db_ms": round(init_db_seconds * 1000, 3),
+        "first_query_ms": round(first_query_seconds * 1000, 3),
+        "init_db_statements": executed,
+    }
+
+
+def cold_start(mode: str, database_url: str) -> dict:
+    env = dict(os.environ, DATABASE_URL=database_url, DATABASE_SCHEMA_MODE=mode, DATABASE_READ_URL="")
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, __file__, "--child"], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return result
+
+
+def run_all(modes, runs: int, database_url: str) -> dict:
+    from benchmarks.runner import percentile
+
+    results = {}
+    for mode in modes:
+        cold_start(mode, database_url)  # 预热文件系统缓存，不计入结果
+        samples = [cold_start(mode, database_url) for _ in range(runs)]
+        results[mode] = {}
+        for metric in METRICS:
+            ordered = sorted(sample[metric] for sample in samples)
+            results[mode][metric] = {
+                "p50": percentile(ordered, 50),
+                "p95": percentile(ordered, 95),
+                "mean": round(sum(ordered) / len(ordered), 3),
+            }
+        print_result(mode, results[mode])
+    return results
+
+
+def print_result(mode: str, result: dict):
+    timings = "  ".join(
+        f"{metric[:-3]} p50 {result[metric]['p50']:>7.1f}ms p95 {result[metric]['p95']:>7.1f}ms"
+        for metric in METRICS if metric.endswith("_ms")
+    )
+    print(f"{mode:<8}{timings}  init_db statements {result['init_db_statements']['p50']:.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--database-url", help="已迁移到head的数据库（默认临时SQLite文件，由本脚本迁移）")
+    parser.add_argument("--output", type=Path, help="写入结果JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child()))
+        return
+
+    workdir = None
+    database_url = args.database_url
+    if database_url is None:
+        from core import migrations
+
+        workdir = tempfile.mkdtemp(prefix="ai_designer_startup_")
+        database_url = f"sqlite+aiosqlite:///{workdir}/startup.db"
+        asyncio.run(migrations.upgrade("head", database_url))
+
+    try:
+        results = run_all(args.modes.split(","), args.runs, database_url)
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps({"runs": args.runs, "modes": results}, indent=2) + "\n")
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
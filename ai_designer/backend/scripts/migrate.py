@@ -0,0 +1,70 @@
+"""
+Database migrations
+在部署时（启动worker之前）执行Alembic迁移；worker启动时只核对版本（DATABASE_SCHEMA_MODE=verify）
+
+Usage:
+    python scripts/migrate.py upgrade              # 升级到head
+    python scripts/migrate.py upgrade 0001
+    python scripts/migrate.py downgrade -1
+    python scripts/migrate.py current
+    python scripts/migrate.py check                # 不是head时退出码为1（部署流水线/就绪检查）
+    python scripts/migrate.py stamp head           # 已由create_all建好表的数据库接入迁移
+    python scripts/migrate.py --url sqlite+aiosqlite:///./dev.db upgrade
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core import migrations
+
+
+async def show_current(url) -> int:
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from core.config import settings
+
+    engine = create_async_engine(url or settings.DATABASE_URL)
+    try:
+        current = await migrations.current_revisions(engine)
+    finally:
+        await engine.dispose()
+    head = migrations.head_revisions()
+    print(f"current: {', '.join(current) or 'none'}")
+    print(f"head:    {', '.join(head)}")
+    return 0 if current == head else 1
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Apply database schema migrations")
+    parser.add_argument("--url", help="database URL (default: DATABASE_URL)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    upgrade = subparsers.add_parser("upgrade", help="upgrade to a revision (default head)")
+    upgrade.add_argument("revision", nargs="?", default="head")
+    downgrade = subparsers.add_parser("downgrade", help="downgrade to a revision, e.g. -1 or base")
+    downgrade.add_argument("revision")
+    stamp = subparsers.add_parser("stamp", help="record a revision without running migrations")
+    stamp.add_argument("revision", nargs="?", default="head")
+    subparsers.add_parser("current", help="print the current and head revisions")
+    subparsers.add_parser("check", help="exit 1 unless the database is at head")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)-5.5s [%(name)s] %(message)s")
+
+    if args.command == "upgrade":
+        asyncio.run(migrations.upgrade(args.revision, args.url))
+    elif args.command == "downgrade":
+        asyncio.run(migrations.downgrade(args.revision, args.url))
+    elif args.command == "stamp":
+        asyncio.run(migrations.stamp(args.revision, args.url))
+    else:
+        status = asyncio.run(show_current(args.url))
+        return status if args.command == "check" else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Traffic replay
+回放录制的流量（TRAFFIC_CAPTURE_ENABLED=true 时由中间件写入 TRAFFIC_CAPTURE_DIR），
+默认在进程内以桩模型运行API（完全离线），按原始到达间隔或加速回放，输出各路由的延迟分布
+
+Usage:
+    python scripts/replay_traffic.py data/traffic/*.jsonl
+    python scripts/replay_traffic.py data/traffic/*.jsonl --speed 10 --output bench/replay.json
+    python scripts/replay_traffic.py data/traffic/*.jsonl --target http://localhost:8000 --speed 0 --max-in-flight 32
+    python scripts/replay_traffic.py --synthesize mixed --requests 500 --rate 20 --capture-output bench/mixed.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.workloads import WORKLOADS
+
+
+async def run(args, records) -> dict:
+    import httpx
+    from loguru import logger
+
+    from benchmarks.replay import replay, route_namer
+    from benchmarks.runner import BenchEnvironment
+    from main import app
+
+    if not args.logs:
+        # 导入main时会重新配置日志sink
+        logger.remove()
+
+    options = {"speed": args.speed, "max_in_flight": args.max_in_flight}
+    if args.target:
+        async with httpx.AsyncClient(base_url=args.target, timeout=args.timeout) as client:
+            return await replay(client, records, route_name=route_namer(app), **options)
+
+    async with BenchEnvironment(
+        image_seconds_per_megapixel_step=args.image_step_seconds,
+        gemini_seconds_per_call=args.gemini_seconds,
+    ) as app:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+            return await replay(client, records, route_name=route_namer(app), **options)
+
+
+def print_report(report: dict):
+    print(
+        f"{report['requests']} requests in {report['elapsed_s']:.1f}s (speed {report['speed']}x), "
+        f"{report['errors']} errors, {report['status_mismatches']} status mismatches, {report['skipped']} skipped"
+    )
+    print(f"{'route':<48} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'rec p95':>9} {'lag p95':>9}")
+    for route, stats in report["routes"].items():
+        latency, lag = stats["latency_ms"], stats["lag_ms"]
+        recorded = stats["recorded_latency_ms"]["p95"] if stats["recorded_latency_ms"] else float("nan")
+        print(
+            f"{route:<48} {stats['requests']:>6} {latency['p50']:>9.1f} {latency['p95']:>9.1f} "
+            f"{latency['p99']:>9.1f} {recorded:>9.1f} {lag['p95']:>9.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("captures", nargs="*", type=Path, help="录制文件（多个文件按时间合并）")
+    parser.add_argument("--speed", type=float, default=1.0, help="时间压缩倍数，0表示不等待立即发出")
+    parser.add_argument("--max-in-flight", type=int, help="同时在途请求上限（默认不限制）")
+    parser.add_argument("--target", help="回放到运行中的服务（默认进程内桩模型）")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--image-step-seconds", type=float, default=0.0002,
+                        help="桩图像模型每百万像素每步的模拟耗时")
+    parser.add_argument("--gemini-seconds", type=float, default=0.0, help="桩Gemini每次调用的模拟耗时")
+    parser.add_argument("--synthesize", choices=sorted(WORKLOADS), help="不读取录制，由基准负载生成合成流量")
+    parser.add_argument("--requests", type=int, default=300, help="合成流量的请求数")
+    parser.add_argument("--rate", type=float, default=10.0, help="合成流量的平均到达速率（请求/秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--capture-output", type=Path, help="写出合成录制后退出")
+    parser.add_argument("--logs", action="store_true", help="保留请求日志输出")
+    parser.add_argument("--output", type=Path, help="写入回放报告JSON")
+    args = parser.parse_args()
+
+    from benchmarks.replay import synthesize_capture, write_capture
+    from core.traffic import load_capture
+
+    if args.synthesize:
+        records = synthesize_capture(args.synthesize, args.requests, rate=args.rate, seed=args.seed)
+    elif args.captures:
+        records = load_capture(args.captures)
+    else:
+        parser.error("either capture files or --synthesize is required")
+
+    if args.capture_output:
+        write_capture(records, args.capture_output)
+        print(f"{len(records)} requests written to {args.capture_output}")
+        return
+
+    report = asyncio.run(run(args, records))
+    print_report(report)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
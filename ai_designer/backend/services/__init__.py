@@ -1,55 +1,69 @@
 """
 AI Services Package
 所有AI服务的统一导出
+
+子模块按需导入（PEP 562），服务单例为 LazyObject，首次访问时才创建；
+torch/diffusers/clip/google.generativeai 只在首次加载模型时导入。
 """
 
-from .ai_models import (
-    ModelManager,
-    model_manager,
-    get_image_generator,
-    get_gemini_client,
-    get_gemini_model,
-    get_clip_model,
-    get_clip_preprocess
-)
-
-from .image_generation import (
-    ImageGenerationService,
-    image_service
-)
-
-from .svgn_generation import (
-    SVGGenerationService,
-    svg_service
-)
-
-from .code_generation import (
-    CodeGenerationService,
-    code_service
-)
-
-from .aesthetic_engine import (
-    AestheticEngine,
-    aesthetic_engine
-)
-
-__all__ = [
+import importlib
+from typing import TYPE_CHECKING
+
+# 导出名 -> 所在子模块
+_EXPORTS = {
     # AI Models
-    "ModelManager",
-    "model_manager",
-    "get_image_generator",
-    "get_gemini_client",
-    "get_gemini_model",
-    "get_clip_model",
-    "get_clip_preprocess",
-    
+    "ModelManager": ".ai_models",
+    "model_manager": ".ai_models",
+    "get_image_generator": ".ai_models",
+    "get_gemini_client": ".ai_models",
+    "get_gemini_model": ".ai_models",
+    "get_clip_model": ".ai_models",
+    "get_clip_preprocess": ".ai_models",
+
+    # Model Server
+    "ModelServer": ".model_server",
+    "ModelServerClient": ".model_server",
+
     # Services
-    "ImageGenerationService",
-    "image_service",
-    "SVGGenerationService",
-    "svg_service",
-    "CodeGenerationService",
-    "code_service",
-    "AestheticEngine",
-    "aesthetic_engine"
-]
+    "ImageGenerationService": ".image_generation",
+    "image_service": ".image_generation",
+    "SVGGenerationService": ".svgn_generation",
+    "svg_service": ".svgn_generation",
+    "CodeGenerationService": ".code_generation",
+    "code_service": ".code_generation",
+    "AestheticEngine": ".aesthetic_engine",
+    "aesthetic_engine": ".aesthetic_engine",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value  # 之后直接命中模块属性
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
+
+
+if TYPE_CHECKING:
+    from .ai_models import (
+        ModelManager,
+        model_manager,
+        get_image_generator,
+        get_gemini_client,
+        get_gemini_model,
+        get_clip_model,
+        get_clip_preprocess
+    )
+    from .model_server import ModelServer, ModelServerClient
+    from .image_generation import ImageGenerationService, image_service
+    from .svgn_generation import SVGGenerationService, svg_service
+    from .code_generation import CodeGenerationService, code_service
+    from .aesthetic_engine import AestheticEngine, aesthetic_engine
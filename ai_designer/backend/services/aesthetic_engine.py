@@ -5,8 +5,8 @@ Aesthetic Engine Service
 
 from typing import Optional, List, Dict, Any, Tuple
 from loguru import logger
+from core.lazy import LazyObject
 from services.ai_models import get_clip_model, get_clip_preprocess
-import torch
 
 
 class AestheticEngine:
@@ -332,5 +332,5 @@ class AestheticEngine:
         return suggestions
 
 
-# 全局服务实例
-aesthetic_engine = AestheticEngine()
+# 全局服务实例（首次访问时创建）
+aesthetic_engine = LazyObject(AestheticEngine)
@@ -5,6 +5,7 @@ Aesthetic Design Generation Service
 
 from typing import Dict, List, Any, Optional
 from loguru import logger
+from core.lazy import LazyObject
 import json
 
 
@@ -715,5 +716,5 @@ This aesthetic design is optimized for: {page_description}
         return summary
 
 
-# 全局服务实例
-aesthetic_service = AestheticGenerationService()
+# 全局服务实例（首次访问时创建）
+aesthetic_service = LazyObject(AestheticGenerationService)
@@ -4,31 +4,117 @@ AI Models Service
 """
 
 import os
+import asyncio
+import importlib.util
 from typing import Optional, Dict, Any
 from loguru import logger
-import torch
 from pathlib import Path
 
-# Import AI frameworks
-try:
-    from diffusers import StableDiffusionPipeline, DPMSolverMultistepScheduler
-    DIFFUSERS_AVAILABLE = True
-except ImportError:
-    DIFFUSERS_AVAILABLE = False
-    logger.warning("diffusers not available - image generation disabled")
+from core.config import settings
+
+# 重型框架（torch、diffusers、clip、google.generativeai）只在首次加载模型时导入，
+# 这里仅检查是否已安装，不触发导入
+DIFFUSERS_AVAILABLE = importlib.util.find_spec("diffusers") is not None
+GEMINI_AVAILABLE = importlib.util.find_spec("google") is not None and \
+    importlib.util.find_spec("google.generativeai") is not None
+CLIP_AVAILABLE = importlib.util.find_spec("clip") is not None
+
+OPENVINO_AVAILABLE = importlib.util.find_spec("optimum") is not None and \
+    importlib.util.find_spec("optimum.intel") is not None
+ONNX_AVAILABLE = importlib.util.find_spec("optimum") is not None and \
+    importlib.util.find_spec("optimum.onnxruntime") is not None
+
+# 调度器 -> (diffusers类名, 调度器额外配置, 最大步数, 固定引导系数)
+# 少步数模型超过max_steps不会更好，只会更慢；Turbo/Lightning在无CFG下训练
+SCHEDULER_PROFILES: Dict[str, Dict[str, Any]] = {
+    "dpm": {"scheduler": "DPMSolverMultistepScheduler", "config": {}, "max_steps": None, "guidance_scale": None},
+    "lcm": {"scheduler": "LCMScheduler", "config": {}, "max_steps": 8, "guidance_scale": 1.0},
+    "turbo": {
+        "scheduler": "EulerAncestralDiscreteScheduler",
+        "config": {"timestep_spacing": "trailing"},
+        "max_steps": 4,
+        "guidance_scale": 0.0
+    },
+    "lightning": {
+        "scheduler": "EulerDiscreteScheduler",
+        "config": {"timestep_spacing": "trailing"},
+        "max_steps": 8,
+        "guidance_scale": 0.0
+    },
+}
+
+
+def resolve_scheduler_profile(model_id: str, scheduler: str = "auto") -> Dict[str, Any]:
+    """根据配置或模型ID选择调度器与推理参数"""
+    if scheduler != "auto":
+        if scheduler not in SCHEDULER_PROFILES:
+            raise ValueError(f"Unknown IMAGE_SCHEDULER: {scheduler}")
+        return {"name": scheduler, **SCHEDULER_PROFILES[scheduler]}
+
+    lowered = model_id.lower()
+    for name in ("lcm", "turbo", "lightning"):
+        if name in lowered:
+            return {"name": name, **SCHEDULER_PROFILES[name]}
+    return {"name": "dpm", **SCHEDULER_PROFILES["dpm"]}
+
+
+def apply_scheduler_profile(kwargs: Dict[str, Any], profile: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """按调度器限制推理步数与引导系数"""
+    if not profile:
+        return kwargs
+
+    max_steps = profile.get("max_steps")
+    if max_steps and kwargs.get("num_inference_steps", max_steps) > max_steps:
+        kwargs["num_inference_steps"] = max_steps
+    if profile.get("guidance_scale") is not None:
+        kwargs["guidance_scale"] = profile["guidance_scale"]
+    return kwargs
+
+
+def make_generator(pipe, seed: int):
+    """为pipeline创建带种子的随机数生成器（optimum导出的pipeline使用numpy）"""
+    pipe = getattr(pipe, "inner", pipe)  # TiledPipeline
+    if type(pipe).__module__.startswith("optimum"):
+        import numpy as np
+        return np.random.RandomState(seed)
+
+    import torch
+    return torch.Generator(device=pipe.device).manual_seed(seed)
+
+
+def cpu_supports_bf16(cpuinfo: Optional[str] = None) -> bool:
+    """CPU是否有原生bfloat16指令（AVX512-BF16 / AMX-BF16）"""
+    if cpuinfo is None:
+        try:
+            cpuinfo = Path("/proc/cpuinfo").read_text()
+        except OSError:
+            return False
 
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
-    logger.warning("google-generativeai not available - Gemini API disabled")
+    for line in cpuinfo.splitlines():
+        if line.startswith("flags"):
+            flags = set(line.split(":", 1)[1].split())
+            return bool(flags & {"avx512_bf16", "amx_bf16"})
+    return False
 
-try:
-    import clip
-    CLIP_AVAILABLE = True
-except ImportError:
-    CLIP_AVAILABLE = False
+
+def resolve_cpu_runtime(runtime: str = "auto") -> str:
+    """选择CPU推理后端，auto时优先使用已安装的OpenVINO/ONNX Runtime"""
+    available = {"torch": True, "openvino": OPENVINO_AVAILABLE, "onnx": ONNX_AVAILABLE}
+    if runtime == "auto":
+        return next(name for name in ("openvino", "onnx", "torch") if available[name])
+    if runtime not in available:
+        raise ValueError(f"Unknown IMAGE_CPU_RUNTIME: {runtime}")
+    if not available[runtime]:
+        logger.warning(f"CPU runtime '{runtime}' not installed (pip install optimum[{runtime}]), using torch")
+        return "torch"
+    return runtime
+
+
+if not DIFFUSERS_AVAILABLE:
+    logger.warning("diffusers not available - image generation disabled")
+if not GEMINI_AVAILABLE:
+    logger.warning("google-generativeai not available - Gemini API disabled")
+if not CLIP_AVAILABLE:
     logger.warning("clip not available - CLIP features disabled")
 
 
@@ -45,14 +131,25 @@ class ModelManager:
 
     def __init__(self):
         if not self._initialized:
-            self.device = self._get_device()
+            self._device: Optional[str] = None
             self.models: Dict[str, Any] = {}
+            # 当前图像模型的调度器与推理参数限制
+            self.generation_profile: Optional[Dict[str, Any]] = None
             self._initialized = True
-            logger.info(f"ModelManager initialized with device: {self.device}")
+
+    @property
+    def device(self) -> str:
+        """计算设备（首次访问时导入torch检测）"""
+        if self._device is None:
+            self._device = self._get_device()
+            logger.info(f"ModelManager using device: {self._device}")
+        return self._device
 
     @staticmethod
     def _get_device() -> str:
         """获取可用设备"""
+        import torch
+
         if torch.cuda.is_available():
             return "cuda"
         elif torch.backends.mps.is_available():
@@ -79,8 +176,29 @@ class ModelManager:
 
         return results
 
+    async def load_remote_models(self, address: Optional[str] = None) -> Dict[str, bool]:
+        """多worker模式：图像生成/CLIP由模型服务进程持有，本进程只连接并加载轻量的Gemini客户端"""
+        from services.model_server import ModelServerClient
+
+        client = ModelServerClient(address)
+        try:
+            status = await asyncio.to_thread(client.ping)
+            logger.info(f"Connected to model server (pid={status['pid']}, models={status['models']})")
+        except Exception as e:
+            # 模型服务可能仍在加载模型，请求时再连接
+            logger.warning(f"Model server not reachable yet at {client.address}: {e}")
+
+        self.models["image_generator"] = client
+
+        results = {
+            "image_generator": True,
+            "gemini": await self.load_gemini_client()
+        }
+        logger.info(f"Remote model setup complete: {results}")
+        return results
+
     async def load_image_generator(self) -> bool:
-        """加载图像生成模型 (FLUX.1 或 SDXL)"""
+        """加载图像生成模型 (FLUX/SDXL，含LCM/Turbo等少步数模型)"""
         try:
             if not DIFFUSERS_AVAILABLE:
                 logger.warning("Diffusers not available, skipping image generator")
@@ -90,29 +208,32 @@ class ModelManager:
                 "IMAGE_MODEL_ID",
                 "stabilityai/stable-diffusion-xl-base-1.0"
             )
+            profile = resolve_scheduler_profile(model_id, settings.IMAGE_SCHEDULER)
 
-            logger.info(f"Loading image generation model: {model_id}")
+            logger.info(f"Loading image generation model: {model_id} | scheduler: {profile['name']}")
 
-            # 使用float16节省显存
-            pipe = StableDiffusionPipeline.from_pretrained(
-                model_id,
-                torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
-                variant="fp16" if self.device == "cuda" else None,
-                use_safetensors=True
-            )
+            if self.device == "cpu":
+                pipe = await asyncio.to_thread(self._load_cpu_pipeline, model_id)
+            else:
+                pipe = await asyncio.to_thread(self._load_gpu_pipeline, model_id)
 
-            # 使用DPM++调度器提高速度
-            pipe.scheduler = DPMSolverMultistepScheduler.from_config(pipe.scheduler.config)
+            self._set_scheduler(pipe, profile)
 
-            # 移动到设备
-            pipe = pipe.to(self.device)
+            if settings.IMAGE_MEMORY_BUDGET_MB > 0:
+                # 按内存预算分块解码/分块放大
+                from services.tiling import TiledPipeline
 
-            # 启用内存优化
-            if self.device == "cuda":
-                pipe.enable_attention_slicing()
-                pipe.enable_vae_slicing()
+                pipe = TiledPipeline(
+                    pipe,
+                    memory_budget_mb=settings.IMAGE_MEMORY_BUDGET_MB,
+                    tile_size=settings.IMAGE_TILE_SIZE,
+                    overlap=settings.IMAGE_TILE_OVERLAP,
+                    max_base_pixels=settings.IMAGE_MAX_BASE_PIXELS,
+                    upscale_strength=settings.IMAGE_UPSCALE_STRENGTH
+                )
 
             self.models["image_generator"] = pipe
+            self.generation_profile = profile
             logger.info("✅ Image generation model loaded successfully")
             return True
 
@@ -120,6 +241,100 @@ class ModelManager:
             logger.error(f"Failed to load image generator: {e}")
             return False
 
+    def _load_gpu_pipeline(self, model_id: str):
+        """CUDA/MPS：float16 + 显存优化"""
+        import torch
+        from diffusers import DiffusionPipeline
+
+        # 使用float16节省显存
+        pipe = DiffusionPipeline.from_pretrained(
+            model_id,
+            torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
+            variant="fp16" if self.device == "cuda" else None,
+            use_safetensors=True
+        )
+
+        # 移动到设备
+        pipe = pipe.to(self.device)
+
+        # 启用内存优化
+        if self.device == "cuda":
+            pipe.enable_attention_slicing()
+            pipe.enable_vae_slicing()
+
+        return pipe
+
+    def _load_cpu_pipeline(self, model_id: str):
+        """CPU：优先导出到OpenVINO/ONNX Runtime，否则torch + bf16/channels-last"""
+        runtime = resolve_cpu_runtime(settings.IMAGE_CPU_RUNTIME)
+        threads = settings.IMAGE_CPU_THREADS
+
+        if runtime in ("openvino", "onnx"):
+            return self._load_exported_pipeline(model_id, runtime, threads)
+
+        import torch
+        from diffusers import DiffusionPipeline
+
+        if threads > 0:
+            torch.set_num_threads(threads)
+
+        use_bf16 = settings.IMAGE_CPU_BF16 and cpu_supports_bf16()
+        pipe = DiffusionPipeline.from_pretrained(
+            model_id,
+            torch_dtype=torch.bfloat16 if use_bf16 else torch.float32,
+            use_safetensors=True
+        )
+
+        # 卷积在channels-last布局下可走oneDNN快速路径
+        for name in ("unet", "vae"):
+            module = getattr(pipe, name, None)
+            if module is not None:
+                module.to(memory_format=torch.channels_last)
+        pipe.enable_vae_slicing()
+
+        logger.info(
+            f"CPU runtime: torch | dtype: {'bfloat16' if use_bf16 else 'float32'} | "
+            f"threads: {torch.get_num_threads()}"
+        )
+        return pipe
+
+    def _load_exported_pipeline(self, model_id: str, runtime: str, threads: int):
+        """通过optimum导出UNet/VAE/文本编码器并缓存，之后直接加载导出结果"""
+        xl = "xl" in model_id.lower()
+        if runtime == "openvino":
+            from optimum.intel import OVStableDiffusionPipeline, OVStableDiffusionXLPipeline
+
+            pipeline_cls = OVStableDiffusionXLPipeline if xl else OVStableDiffusionPipeline
+            options = {"ov_config": {"INFERENCE_NUM_THREADS": threads}} if threads > 0 else {}
+        else:
+            import onnxruntime
+            from optimum.onnxruntime import ORTStableDiffusionPipeline, ORTStableDiffusionXLPipeline
+
+            pipeline_cls = ORTStableDiffusionXLPipeline if xl else ORTStableDiffusionPipeline
+            session_options = onnxruntime.SessionOptions()
+            if threads > 0:
+                session_options.intra_op_num_threads = threads
+            options = {"provider": "CPUExecutionProvider", "session_options": session_options}
+
+        export_dir = Path(settings.IMAGE_EXPORT_DIR) / runtime / model_id.replace("/", "--")
+        if export_dir.exists():
+            pipe = pipeline_cls.from_pretrained(export_dir, **options)
+        else:
+            logger.info(f"Exporting {model_id} to {runtime} (first run only) -> {export_dir}")
+            pipe = pipeline_cls.from_pretrained(model_id, export=True, **options)
+            pipe.save_pretrained(export_dir)
+
+        logger.info(f"CPU runtime: {runtime} | threads: {threads or 'default'}")
+        return pipe
+
+    @staticmethod
+    def _set_scheduler(pipe, profile: Dict[str, Any]):
+        """按调度器配置替换pipeline的调度器"""
+        import diffusers
+
+        scheduler_cls = getattr(diffusers, profile["scheduler"])
+        pipe.scheduler = scheduler_cls.from_config(pipe.scheduler.config, **profile["config"])
+
     async def load_gemini_client(self) -> bool:
         """加载Gemini API客户端"""
         try:
@@ -127,6 +342,8 @@ class ModelManager:
                 logger.warning("google-generativeai not available, skipping Gemini")
                 return False
 
+            import google.generativeai as genai
+
             api_key = os.getenv("GEMINI_API_KEY")
             if not api_key:
                 logger.warning("GEMINI_API_KEY not set, Gemini API disabled")
@@ -154,6 +371,8 @@ class ModelManager:
                 logger.warning("clip not available, skipping CLIP")
                 return False
 
+            import clip
+
             logger.info("Loading CLIP model...")
 
             device = self.device if self.device != "mps" else "cpu"  # CLIP不完全支持MPS
@@ -188,7 +407,9 @@ class ModelManager:
                     model.to("cpu")
 
                 del self.models[model_name]
-                torch.cuda.empty_cache() if self.device == "cuda" else None
+                if self.device == "cuda":
+                    import torch
+                    torch.cuda.empty_cache()
 
                 logger.info(f"✅ Model {model_name} unloaded")
                 return True
@@ -233,3 +454,8 @@ def get_clip_model():
 def get_clip_preprocess():
     """获取CLIP预处理函数"""
     return model_manager.get_model("clip_preprocess")
+
+
+def get_generation_profile() -> Optional[Dict[str, Any]]:
+    """获取当前图像模型的调度器配置"""
+    return model_manager.generation_profile
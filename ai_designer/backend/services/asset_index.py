@@ -0,0 +1,748 @@
+"""
+Asset Index
+生成资源向量索引 - 生成的图像/SVG经CLIP编码后写入向量索引，提供相似设计检索与入库去重。
+默认使用本进程内的IVF索引（磁盘段通过mmap读取，新增向量先进内存增量并写追加日志），
+启用Qdrant时改用Qdrant集合
+"""
+
+import json
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+from core.config import settings
+from core.lazy import LazyObject
+from core.metrics import observe_stage
+from services.design_analysis import LayoutRegion, _normalize, clip_encoder, decode_design, letterbox
+
+# 资源ID以定长字节串存储（UUID为36字节）
+ID_BYTES = 64
+
+OP_ADD = 1
+OP_REMOVE = 2
+
+MAX_NLIST = 4096
+TRAIN_POINTS_PER_LIST = 48  # 训练样本数 = 聚类数 x 此值
+ASSIGN_CHUNK = 32768  # 分配聚类/写段文件时每批处理的行数
+
+Hit = Tuple[str, float]
+
+
+class EmbeddingUnavailable(RuntimeError):
+    """没有可用的CLIP模型（本进程未加载且未连接模型服务）"""
+
+
+def _key(asset_id: str) -> bytes:
+    key = str(asset_id).encode("utf-8")
+    if not key or len(key) > ID_BYTES:
+        raise ValueError(f"Asset id must be 1-{ID_BYTES} bytes: {asset_id!r}")
+    return key
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """按内积把每个向量分配到最近的聚类（分批计算，避免一次生成 N x nlist 的矩阵）"""
+    lists = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_CHUNK):
+        chunk = np.asarray(vectors[start:start + ASSIGN_CHUNK], dtype=np.float32)
+        lists[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return lists
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """球面k-means（输入已L2归一化），返回归一化的聚类中心"""
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(vectors))
+    centroids = vectors[np.sort(rng.choice(len(vectors), nlist, replace=False))].astype(np.float32)
+    for _ in range(iterations):
+        lists = assign_lists(vectors, centroids)
+        order = np.argsort(lists, kind="stable")
+        counts = np.bincount(lists, minlength=nlist)
+        occupied = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[occupied]
+        sums = np.add.reduceat(vectors[order], starts, axis=0)
+        centroids[occupied] = _normalize(sums)
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            # 空聚类重新取随机样本
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+    return centroids
+
+
+@dataclass
+class _Segment:
+    """不可变的磁盘段：向量按聚类连续存放，offsets[i]:offsets[i+1] 为第i个聚类的行"""
+    name: Optional[str]
+    centroids: np.ndarray
+    offsets: np.ndarray
+    vectors: np.ndarray
+    ids: np.ndarray
+    order: np.ndarray  # ids按字节序排序后的行号，用于按ID二分查找
+    trained_on: int = 0
+
+    @classmethod
+    def empty(cls, dim: int) -> "_Segment":
+        return cls(
+            None,
+            np.zeros((0, dim), dtype=np.float32),
+            np.zeros(1, dtype=np.int64),
+            np.zeros((0, dim), dtype=np.float32),
+            np.zeros(0, dtype=f"S{ID_BYTES}"),
+            np.zeros(0, dtype=np.int64),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def row_of(self, key: bytes) -> int:
+        if not len(self.ids):
+            return -1
+        position = int(np.searchsorted(self.ids, key, sorter=self.order))
+        if position < len(self.order):
+            row = int(self.order[position])
+            if self.ids[row] == key:
+                return row
+        return -1
+
+
+class IVFIndex:
+    """本地IVF向量索引（余弦相似度）
+
+    目录结构：
+      manifest.json      维度、当前段、日志编号
+      seg-NNNNNN/        centroids / offsets / vectors / ids / order（.npy，查询时mmap读取）
+      journal-NNNNNN.bin 当前段之后的增删记录（追加写，启动时重放）
+
+    查询只扫描与查询向量最近的nprobe个聚类，再加上内存增量的暴力扫描。增量达到阈值后在后台线程
+    合并为新段（向量数增长到训练时的2倍以上才重新训练聚类中心），期间查询和写入不受影响。
+    索引只由一个进程写入；多worker部署请启用Qdrant。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        nlist: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        compact_threshold: Optional[int] = None,
+    ):
+        self.path = Path(path)
+        self.nlist = settings.ASSET_INDEX_NLIST if nlist is None else nlist
+        self.nprobe = nprobe or settings.ASSET_INDEX_NPROBE
+        self.compact_threshold = compact_threshold or settings.ASSET_INDEX_COMPACT_THRESHOLD
+
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._compaction: Optional[threading.Thread] = None
+        self._dim: Optional[int] = None
+        self._segment: Optional[_Segment] = None
+        self._next_segment = 0
+        self._journal_no = 0
+        self._journal = None
+        self._seq = 0
+        self._live = 0
+        # 删除标记：ID -> 删除时的序号；序号大于某一行写入序号时该行失效（段内的行序号视为0）
+        self._removed: Dict[bytes, int] = {}
+        self._reset_delta([], np.zeros((0, 0), dtype=np.float32), [])
+        self._load()
+
+    # --- 持久化 ---------------------------------------------------------------------
+
+    def _record_dtype(self) -> np.dtype:
+        return np.dtype([("op", "u1"), ("id", f"S{ID_BYTES}"), ("vector", "<f4", (self._dim,))])
+
+    def _write_manifest(self):
+        manifest = {
+            "dim": self._dim,
+            "segment": self._segment.name,
+            "trained_on": self._segment.trained_on,
+            "journal": self._journal_no,
+            "next_segment": self._next_segment,
+        }
+        temp = self.path / "manifest.json.tmp"
+        temp.write_text(json.dumps(manifest))
+        temp.replace(self.path / "manifest.json")
+
+    def _load(self):
+        manifest_path = self.path / "manifest.json"
+        if not manifest_path.exists():
+            return
+        manifest = json.loads(manifest_path.read_text())
+        self._dim = manifest["dim"]
+        self._next_segment = manifest.get("next_segment", 0)
+        self._journal_no = manifest["journal"]
+        self._reset_delta([], np.zeros((0, self._dim), dtype=np.float32), [])
+        self._segment = (
+            self._load_segment(manifest["segment"], manifest.get("trained_on", 0))
+            if manifest["segment"] else _Segment.empty(self._dim)
+        )
+        self._live = len(self._segment)
+
+        # 重放段之后的日志（合并中途退出时可能有两个）
+        dtype = self._record_dtype()
+        journals = sorted(
+            (int(path.stem.split("-")[1]), path) for path in self.path.glob("journal-*.bin")
+        )
+        replayed = 0
+        for number, path in journals:
+            if number < self._journal_no:
+                path.unlink(missing_ok=True)
+                continue
+            data = path.read_bytes()
+            records = np.frombuffer(data[:len(data) - len(data) % dtype.itemsize], dtype=dtype)
+            for record in records:
+                if record["op"] == OP_ADD:
+                    self._apply_add([record["id"]], record["vector"][None, :])
+                else:
+                    self._apply_remove([record["id"]])
+            replayed += len(records)
+            self._journal_no = number
+        self._open_journal(self._journal_no)
+        logger.info(f"Asset index loaded from {self.path}: {self._live} vectors ({replayed} journal records)")
+
+    def _load_segment(self, name: str, trained_on: int) -> _Segment:
+        directory = self.path / name
+        return _Segment(
+            name,
+            np.load(directory / "centroids.npy"),
+            np.load(directory / "offsets.npy"),
+            np.load(directory / "vectors.npy", mmap_mode="r"),
+            np.load(directory / "ids.npy", mmap_mode="r"),
+            np.load(directory / "order.npy", mmap_mode="r"),
+            trained_on,
+        )
+
+    def _open_journal(self, number: int):
+        if self._journal is not None:
+            self._journal.close()
+        self._journal_no = number
+        self._journal = open(self.path / f"journal-{number:06d}.bin", "ab")
+
+    def _log(self, op: int, keys: List[bytes], vectors: Optional[np.ndarray] = None):
+        records = np.zeros(len(keys), dtype=self._record_dtype())
+        records["op"] = op
+        records["id"] = keys
+        if vectors is not None:
+            records["vector"] = vectors
+        self._journal.write(records.tobytes())
+        self._journal.flush()
+
+    def _ensure_dim(self, dim: int):
+        if self._dim is None:
+            self._dim = dim
+            self._segment = _Segment.empty(dim)
+            self._reset_delta([], np.zeros((0, dim), dtype=np.float32), [])
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._write_manifest()
+            self._open_journal(self._journal_no)
+        elif dim != self._dim:
+            raise ValueError(f"Vector dimension {dim} does not match index dimension {self._dim}")
+
+    # --- 内存增量 ---------------------------------------------------------------------
+
+    def _reset_delta(self, keys: List[bytes], vectors: np.ndarray, seqs: List[int]):
+        self._delta_ids = keys
+        self._delta_seqs = seqs
+        self._delta_vectors = vectors
+        self._delta_count = len(keys)
+        self._delta_rows = {key: row for row, key in enumerate(keys)}
+
+    def _delta_alive(self, row: int) -> bool:
+        return self._removed.get(self._delta_ids[row], -1) < self._delta_seqs[row]
+
+    def _contains(self, key: bytes) -> bool:
+        row = self._delta_rows.get(key)
+        if row is not None and self._delta_alive(row):
+            return True
+        return key not in self._removed and self._segment is not None and self._segment.row_of(key) >= 0
+
+    def _apply_add(self, keys: Sequence[bytes], vectors: np.ndarray) -> List[int]:
+        """写入内存增量，返回实际新增的下标（已存在的ID跳过）"""
+        fresh, seen = [], set()
+        for i, key in enumerate(keys):
+            key = bytes(key)
+            if key not in seen and not self._contains(key):
+                fresh.append(i)
+                seen.add(key)
+        if not fresh:
+            return fresh
+
+        needed = self._delta_count + len(fresh)
+        if needed > len(self._delta_vectors):
+            grown = np.empty((max(needed, 2 * len(self._delta_vectors), 256), self._dim), dtype=np.float32)
+            grown[:self._delta_count] = self._delta_vectors[:self._delta_count]
+            self._delta_vectors = grown
+        self._delta_vectors[self._delta_count:needed] = vectors[fresh]
+        for i in fresh:
+            self._seq += 1
+            key = bytes(keys[i])
+            self._delta_rows[key] = len(self._delta_ids)
+            self._delta_ids.append(key)
+            self._delta_seqs.append(self._seq)
+        self._delta_count = needed
+        self._live += len(fresh)
+        return fresh
+
+    def _apply_remove(self, keys: Sequence[bytes]) -> List[bytes]:
+        removed = []
+        for key in keys:
+            key = bytes(key)
+            if self._contains(key):
+                self._seq += 1
+                self._removed[key] = self._seq
+                removed.append(key)
+        self._live -= len(removed)
+        return removed
+
+    # --- 读写接口 ---------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._live
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self._dim
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> int:
+        """写入向量（自动L2归一化），已存在的ID跳过，返回新增数量"""
+        keys = [_key(asset_id) for asset_id in ids]
+        vectors = _normalize(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        with self._lock:
+            self._ensure_dim(vectors.shape[1])
+            fresh = self._apply_add(keys, vectors)
+            if fresh:
+                self._log(OP_ADD, [keys[i] for i in fresh], vectors[fresh])
+            compact = self._delta_count >= self.compact_threshold and self._compaction is None
+            if compact:
+                self._compaction = threading.Thread(target=self._compact_in_background, daemon=True)
+        if compact:
+            self._compaction.start()
+        return len(fresh)
+
+    def remove(self, ids: Iterable[str]) -> int:
+        """删除向量，返回实际删除的数量"""
+        keys = [_key(asset_id) for asset_id in ids]
+        with self._lock:
+            if self._dim is None:
+                return 0
+            removed = self._apply_remove(keys)
+            if removed:
+                self._log(OP_REMOVE, removed)
+        return len(removed)
+
+    def get(self, asset_id: str) -> Optional[np.ndarray]:
+        """已索引的向量（不存在时为None）"""
+        key = _key(asset_id)
+        with self._lock:
+            row = self._delta_rows.get(key)
+            if row is not None and self._delta_alive(row):
+                return self._delta_vectors[row].copy()
+            if self._segment is None or key in self._removed:
+                return None
+            row = self._segment.row_of(key)
+            return np.array(self._segment.vectors[row]) if row >= 0 else None
+
+    def search(self, vector: np.ndarray, limit: int = 10, exclude: Iterable[str] = ()) -> List[Hit]:
+        """返回最相似的 (ID, 余弦相似度)，按相似度降序"""
+        with self._lock:
+            # 段与增量只追加或整体替换，取引用后无需持锁扫描
+            segment, removed = self._segment, self._removed
+            delta_ids, delta_seqs = self._delta_ids, self._delta_seqs
+            delta_vectors, delta_count = self._delta_vectors, self._delta_count
+        if segment is None or limit <= 0:
+            return []
+
+        query = _normalize(np.asarray(vector, dtype=np.float32).reshape(-1))
+        excluded = {_key(asset_id) for asset_id in exclude}
+        wanted = limit + len(excluded) + len(removed)
+
+        hits: Dict[bytes, float] = {}
+        # 段内只扫描最近的nprobe个聚类
+        if len(segment):
+            nlist = len(segment.centroids)
+            coarse = segment.centroids @ query
+            nprobe = min(self.nprobe, nlist)
+            probes = np.argpartition(-coarse, nprobe - 1)[:nprobe] if nprobe < nlist else range(nlist)
+            scores, rows = [], []
+            for probe in probes:
+                start, end = segment.offsets[probe], segment.offsets[probe + 1]
+                if start < end:
+                    scores.append(segment.vectors[start:end] @ query)
+                    rows.append(np.arange(start, end))
+            if scores:
+                scores, rows = np.concatenate(scores), np.concatenate(rows)
+                for row, score in self._top(scores, rows, wanted):
+                    key = segment.ids[row]
+                    if key not in removed and key not in excluded:
+                        hits[key] = score
+
+        # 内存增量暴力扫描
+        if delta_count:
+            scores = delta_vectors[:delta_count] @ query
+            for row, score in self._top(scores, np.arange(delta_count), wanted):
+                key = delta_ids[row]
+                if removed.get(key, -1) < delta_seqs[row] and key not in excluded:
+                    hits[key] = max(score, hits.get(key, -1.0))
+
+        ranked = sorted(hits.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(key.decode("utf-8"), score) for key, score in ranked]
+
+    @staticmethod
+    def _top(scores: np.ndarray, rows: np.ndarray, count: int) -> List[Tuple[int, float]]:
+        if count < len(scores):
+            best = np.argpartition(-scores, count - 1)[:count]
+            scores, rows = scores[best], rows[best]
+        return list(zip(rows.tolist(), scores.tolist()))
+
+    # --- 合并 ---------------------------------------------------------------------------
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception as e:
+            logger.error(f"Asset index compaction failed: {e}")
+        finally:
+            with self._lock:
+                self._compaction = None
+
+    def compact(self) -> bool:
+        """把内存增量与删除标记合并为新的磁盘段，没有需要合并的内容时返回False"""
+        with self._compact_lock:
+            with self._lock:
+                if self._dim is None or (not self._delta_count and not self._removed):
+                    return False
+                snapshot_seq = self._seq
+                count = self._delta_count
+                base, removed = self._segment, dict(self._removed)
+                keys, seqs = self._delta_ids[:count], self._delta_seqs[:count]
+                vectors = self._delta_vectors[:count].copy()
+                journal_no = self._journal_no
+                segment_no = self._next_segment
+                self._next_segment += 1
+                # 合并期间的写入进入新日志
+                self._open_journal(journal_no + 1)
+
+            start = time.perf_counter()
+            alive = [row for row in range(count) if removed.get(keys[row], -1) < seqs[row]]
+            segment = self._write_segment(
+                base, f"seg-{segment_no:06d}", [keys[row] for row in alive], vectors[alive], set(removed)
+            )
+
+            with self._lock:
+                self._segment = segment
+                self._write_manifest()
+                remaining = self._delta_count - count
+                rest = np.empty((max(remaining, 256), self._dim), dtype=np.float32)
+                rest[:remaining] = self._delta_vectors[count:self._delta_count]
+                self._reset_delta(self._delta_ids[count:], rest, self._delta_seqs[count:])
+                # 已在新段中生效的删除标记不再需要
+                self._removed = {key: seq for key, seq in self._removed.items() if seq > snapshot_seq}
+
+            for number in range(journal_no + 1):
+                (self.path / f"journal-{number:06d}.bin").unlink(missing_ok=True)
+            if base.name:
+                _remove_tree(self.path / base.name)
+            logger.info(
+                f"Asset index compacted into {segment.name}: {len(segment)} vectors, "
+                f"{len(segment.centroids)} lists in {time.perf_counter() - start:.2f}s"
+            )
+            return True
+
+    def _target_nlist(self, total: int) -> int:
+        return self.nlist or max(1, min(MAX_NLIST, int(2 * math.sqrt(total))))
+
+    def _write_segment(
+        self, base: _Segment, name: str, keys: List[bytes], vectors: np.ndarray, removed: set
+    ) -> _Segment:
+        base_rows = np.arange(len(base))
+        if removed and len(base):
+            base_rows = base_rows[~np.isin(base.ids, np.array(list(removed), dtype=f"S{ID_BYTES}"))]
+        total = len(base_rows) + len(keys)
+        if not total:
+            return _Segment.empty(self._dim)
+
+        nlist = self._target_nlist(total)
+        retrain = not len(base.centroids) or (
+            len(base.centroids) != nlist if self.nlist else total > 2 * max(base.trained_on, 1)
+        )
+        trained_on = base.trained_on
+        if retrain:
+            # 从旧段和新增向量中均匀采样训练聚类中心，之后所有行重新分配
+            rng = np.random.default_rng(total)
+            sample = np.sort(rng.choice(total, min(total, nlist * TRAIN_POINTS_PER_LIST), replace=False))
+            from_base = sample < len(base_rows)
+            training = np.concatenate([base.vectors[base_rows[sample[from_base]]], vectors[sample[~from_base] - len(base_rows)]])
+            centroids = train_centroids(training, nlist)
+            base_lists = assign_lists(base.vectors, centroids)[base_rows] if len(base_rows) else np.zeros(0, np.int32)
+            trained_on = total
+        else:
+            centroids = base.centroids
+            base_lists = np.repeat(np.arange(len(centroids), dtype=np.int32), np.diff(base.offsets))[base_rows]
+        lists = np.concatenate([base_lists, assign_lists(vectors, centroids)])
+
+        # 按聚类稳定排序：旧段的行保持原顺序，写入时基本是顺序读
+        order = np.argsort(lists, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=len(centroids)))]).astype(np.int64)
+
+        directory = self.path / name
+        directory.mkdir(parents=True, exist_ok=True)
+        out_vectors = np.lib.format.open_memmap(directory / "vectors.npy", "w+", np.float32, (total, self._dim))
+        out_ids = np.zeros(total, dtype=f"S{ID_BYTES}")
+        new_ids = np.array(keys, dtype=f"S{ID_BYTES}")
+        for start in range(0, total, ASSIGN_CHUNK):
+            source = order[start:start + ASSIGN_CHUNK]
+            from_base = source < len(base_rows)
+            rows = base_rows[source[from_base]]
+            block = np.empty((len(source), self._dim), dtype=np.float32)
+            block[from_base] = base.vectors[rows]
+            block[~from_base] = vectors[source[~from_base] - len(base_rows)]
+            out_vectors[start:start + len(source)] = block
+            out_ids[start:start + len(source)][from_base] = base.ids[rows]
+            out_ids[start:start + len(source)][~from_base] = new_ids[source[~from_base] - len(base_rows)]
+        out_vectors.flush()
+        del out_vectors
+
+        np.save(directory / "ids.npy", out_ids)
+        np.save(directory / "order.npy", np.argsort(out_ids, kind="stable"))
+        np.save(directory / "centroids.npy", centroids)
+        np.save(directory / "offsets.npy", offsets)
+        return self._load_segment(name, trained_on)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "vectors": self._live,
+                "dim": self._dim,
+                "lists": len(self._segment.centroids) if self._segment is not None else 0,
+                "nprobe": self.nprobe,
+                "pending": self._delta_count,
+            }
+
+    def close(self):
+        """等待进行中的合并并关闭日志文件"""
+        compaction = self._compaction
+        if compaction is not None:
+            compaction.join()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+
+def _remove_tree(directory: Path):
+    # 仍被查询mmap引用的文件在Linux上删除后依然可读
+    for path in directory.glob("*"):
+        path.unlink(missing_ok=True)
+    directory.rmdir()
+
+
+class QdrantVectorIndex:
+    """Qdrant后端（QDRANT_ENABLED=True时使用），多worker共享同一集合；QDRANT_URL=":memory:" 为进程内实现"""
+
+    def __init__(self, url: Optional[str] = None, api_key: Optional[str] = None, collection: Optional[str] = None):
+        from qdrant_client import QdrantClient
+        from qdrant_client.http import models
+
+        url = url or settings.QDRANT_URL
+        self.models = models
+        self.collection = collection or settings.QDRANT_COLLECTION
+        if url == ":memory:":
+            self.client = QdrantClient(location=":memory:")
+        else:
+            self.client = QdrantClient(url=url, api_key=api_key or settings.QDRANT_API_KEY)
+        self._dim: Optional[int] = None
+        existing = {item.name for item in self.client.get_collections().collections}
+        if self.collection in existing:
+            params = self.client.get_collection(self.collection).config.params.vectors
+            self._dim = params.size
+
+    @staticmethod
+    def _point_id(asset_id: str) -> str:
+        # Qdrant的点ID只能是UUID或整数
+        try:
+            return str(uuid.UUID(str(asset_id)))
+        except ValueError:
+            return str(uuid.uuid5(uuid.NAMESPACE_URL, str(asset_id)))
+
+    def _ensure_collection(self, dim: int):
+        if self._dim is None:
+            self.client.create_collection(
+                self.collection,
+                vectors_config=self.models.VectorParams(size=dim, distance=self.models.Distance.COSINE),
+            )
+            self._dim = dim
+        elif dim != self._dim:
+            raise ValueError(f"Vector dimension {dim} does not match index dimension {self._dim}")
+
+    def __len__(self) -> int:
+        if self._dim is None:
+            return 0
+        return self.client.count(self.collection, exact=True).count
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self._dim
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> int:
+        vectors = _normalize(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        self._ensure_collection(vectors.shape[1])
+        points = [
+            self.models.PointStruct(id=self._point_id(asset_id), vector=vector.tolist(), payload={"asset_id": str(asset_id)})
+            for asset_id, vector in zip(ids, vectors)
+        ]
+        self.client.upsert(self.collection, points=points)
+        return len(points)
+
+    def remove(self, ids: Iterable[str]) -> int:
+        if self._dim is None:
+            return 0
+        point_ids = [self._point_id(asset_id) for asset_id in ids]
+        existing = self.client.retrieve(self.collection, ids=point_ids, with_payload=False)
+        if existing:
+            self.client.delete(self.collection, points_selector=self.models.PointIdsList(points=[p.id for p in existing]))
+        return len(existing)
+
+    def get(self, asset_id: str) -> Optional[np.ndarray]:
+        if self._dim is None:
+            return None
+        points = self.client.retrieve(self.collection, ids=[self._point_id(asset_id)], with_vectors=True)
+        return np.asarray(points[0].vector, dtype=np.float32) if points else None
+
+    def search(self, vector: np.ndarray, limit: int = 10, exclude: Iterable[str] = ()) -> List[Hit]:
+        if self._dim is None or limit <= 0:
+            return []
+        excluded = {str(asset_id) for asset_id in exclude}
+        points = self.client.search(
+            self.collection,
+            query_vector=np.asarray(vector, dtype=np.float32).reshape(-1).tolist(),
+            limit=limit + len(excluded),
+            with_payload=True,
+        )
+        hits = [(point.payload["asset_id"], float(point.score)) for point in points]
+        return [hit for hit in hits if hit[0] not in excluded][:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"vectors": len(self), "dim": self._dim, "collection": self.collection}
+
+    def compact(self) -> bool:
+        return False  # Qdrant自行维护索引
+
+    def close(self):
+        self.client.close()
+
+
+class AssetIndexService:
+    """生成资源的相似检索与入库去重
+
+    向量由当前可用的CLIP编码器（本进程或模型服务）计算：图像按整图补成正方形后编码，
+    SVG等没有位图的资源编码其描述文本（CLIP图文共享向量空间）。
+    """
+
+    def __init__(self, index: Optional[Any] = None):
+        self.index = index if index is not None else self._create_index()
+        self.backend = "qdrant" if isinstance(self.index, QdrantVectorIndex) else "ivf"
+        # 生成接口的后台入库：单线程按提交顺序执行，不占用请求的线程池
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="asset-index")
+
+    @staticmethod
+    def _create_index():
+        if settings.QDRANT_ENABLED:
+            try:
+                return QdrantVectorIndex()
+            except Exception as e:
+                logger.warning(f"Qdrant unavailable, using local asset index: {e}")
+        return IVFIndex(settings.ASSET_INDEX_PATH)
+
+    def _encoder(self) -> Any:
+        encoder = clip_encoder()
+        if encoder is None:
+            raise EmbeddingUnavailable("CLIP model is not loaded")
+        return encoder
+
+    def embed_image(self, image_data: bytes) -> np.ndarray:
+        """整图编码为单位向量（图像无法解码时抛出ValueError）"""
+        encoder = self._encoder()
+        start = time.perf_counter()
+        size = getattr(encoder, "input_size", 224)
+        pixels, _ = decode_design(image_data, max_side=4 * size)
+        height, width = pixels.shape[:2]
+        crop = letterbox(pixels, LayoutRegion((0, 0, width, height), (255, 255, 255)), size)
+        vector = _normalize(encoder.embed_regions(crop[None]))[0]
+        observe_stage("asset_index", "embed", time.perf_counter() - start, "image")
+        return vector
+
+    def embed_text(self, text: str) -> np.ndarray:
+        encoder = self._encoder()
+        start = time.perf_counter()
+        vector = _normalize(encoder.embed_texts([text]))[0]
+        observe_stage("asset_index", "embed", time.perf_counter() - start, "text")
+        return vector
+
+    def search(self, vector: np.ndarray, limit: int = 10, exclude: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        start = time.perf_counter()
+        hits = self.index.search(vector, limit, exclude)
+        observe_stage("asset_index", "search", time.perf_counter() - start, self.backend)
+        return [{"asset_id": asset_id, "similarity": round(score, 4)} for asset_id, score in hits]
+
+    def similar(self, asset_id: str, limit: int = 10) -> Optional[List[Dict[str, Any]]]:
+        """与已索引资源最相似的其他资源，资源未索引时返回None"""
+        vector = self.index.get(asset_id)
+        if vector is None:
+            return None
+        return self.search(vector, limit, exclude=[asset_id])
+
+    def ingest(
+        self,
+        asset_id: str,
+        vector: np.ndarray,
+        dedup: bool = True,
+        threshold: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """写入索引；dedup时若已有相似度不低于阈值的资源则不写入，返回该资源"""
+        threshold = settings.ASSET_DEDUP_THRESHOLD if threshold is None else threshold
+        if dedup:
+            nearest = self.index.search(vector, 1, exclude=[asset_id])
+            if nearest and nearest[0][1] >= threshold:
+                duplicate_of, score = nearest[0]
+                return {"asset_id": asset_id, "indexed": False, "duplicate_of": duplicate_of, "similarity": round(score, 4)}
+        added = self.index.add([asset_id], vector[None, :])
+        return {"asset_id": asset_id, "indexed": bool(added), "duplicate_of": None, "similarity": None}
+
+    def submit(self, asset_id: str, image_data: Optional[bytes] = None, text: Optional[str] = None):
+        """生成完成后在后台入库（不去重：生成结果都保留）；没有CLIP时跳过"""
+        if not settings.ASSET_INDEX_ON_GENERATE or clip_encoder() is None:
+            return
+        if image_data is not None:
+            image_data = bytes(image_data)  # 响应发送后缓冲区可能被复用
+
+        def run():
+            try:
+                vector = self.embed_image(image_data) if image_data is not None else self.embed_text(text)
+                self.index.add([asset_id], vector[None, :])
+            except EmbeddingUnavailable:
+                pass
+            except Exception as e:
+                logger.warning(f"Indexing asset {asset_id} failed: {e}")
+
+        self._executor.submit(run)
+
+    def remove(self, asset_id: str) -> bool:
+        return bool(self.index.remove([asset_id]))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend, **self.index.stats()}
+
+    def close(self):
+        """等待后台入库完成并关闭索引"""
+        self._executor.shutdown(wait=True)
+        self.index.close()
+
+
+# 全局资源索引（首次访问时加载，本地索引的磁盘段通过mmap常驻页缓存）
+asset_index = LazyObject(AssetIndexService)
@@ -3,9 +3,18 @@ Code Generation Service
 代码生成服务 - Design to Code, 组件生成等
 """
 
-from typing import Optional, List, Dict, Any
+import asyncio
+import gzip
+import time
+from datetime import timedelta
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
 from loguru import logger
-from services.ai_models import get_gemini_model
+from core.config import settings
+from core.lazy import LazyObject
+from services.ai_models import get_gemini_client, get_gemini_model
+from services.code_optimizer import code_optimizer
+from services.design_analysis import design_analyzer
+from core.metrics import bounded_label, track_stage
 
 
 class CodeGenerationService:
@@ -17,8 +26,43 @@ class CodeGenerationService:
     # 支持的语言
     SUPPORTED_LANGUAGES = ["typescript", "javascript", "python"]
 
+    # 默认组件库
+    DEFAULT_COMPONENTS = ["Button", "Card", "Input", "Modal", "Badge", "Avatar"]
+
+    # 组件库主题的设计约定（写入共享的主题上下文）
+    THEME_TOKENS = {
+        "modern": "primary indigo-600 / accent pink-500 on white; rounded-lg corners; shadow-md elevation; "
+                  "Inter-style sans-serif; hover and focus transitions of 150ms",
+        "minimal": "neutral gray scale with a single black accent; rounded-md corners; no shadows, 1px borders; "
+                   "generous whitespace; restrained hover states",
+        "glassmorphism": "translucent white surfaces (bg-white/10) with backdrop-blur-md; rounded-2xl corners; "
+                         "subtle white/20 borders; vivid gradient backdrops; soft glow on focus",
+    }
+
+    # 设计稿版面区域 -> 容器元素（标签, Tailwind类名）
+    LAYOUT_CONTAINERS = {
+        "navbar": ("nav", "flex items-center justify-between px-6 py-4"),
+        "hero": ("section", "flex flex-col items-center gap-6 px-6 py-20 text-center"),
+        "section": ("section", "px-6 py-12"),
+        "card": ("div", "p-6 rounded-lg shadow-md"),
+        "form": ("form", "flex flex-col gap-4"),
+        "footer": ("footer", "px-6 py-8 text-sm"),
+    }
+
+    # 设计稿版面区域 -> 叶子元素（标签, Tailwind类名, 文本, 其他属性；文本为None时自闭合）
+    LAYOUT_ELEMENTS = {
+        "heading": ("h2", "text-3xl font-bold", "Section heading", ""),
+        "text": ("p", "text-base leading-relaxed", "Supporting text for this section.", ""),
+        "button": ("button", "px-6 py-2 rounded-lg font-medium", "Get started", ' type="button"'),
+        "input": ("input", "w-full px-4 py-2 border rounded-lg", None, ' type="text" placeholder="Enter text"'),
+        "image": ("img", "w-full h-auto rounded-lg object-cover", None, ' src="https://placehold.co/{w}x{h}" alt=""'),
+    }
+
     def __init__(self):
         self.gemini_model = get_gemini_model()
+        self.gemini_client = get_gemini_client()
+        # theme -> (使用显式缓存主题上下文的模型或None, 过期时间)
+        self._theme_models: Dict[str, Tuple[Any, float]] = {}
 
     async def design_to_code(
         self,
@@ -26,7 +70,9 @@ class CodeGenerationService:
         framework: str = "react",
         language: str = "typescript",
         with_tailwind: bool = True,
-        component_name: str = "GeneratedComponent"
+        component_name: str = "GeneratedComponent",
+        context: Optional[str] = None,
+        model: Any = None
     ) -> Dict[str, Any]:
         """
         设计描述生成代码
@@ -37,6 +83,8 @@ class CodeGenerationService:
             language: 编程语言
             with_tailwind: 是否使用Tailwind CSS
             component_name: 组件名称
+            context: 放在提示词最前面的共享上下文（组件库主题）
+            model: 已缓存context的模型（此时不再重复发送context）
 
         Returns:
             生成的代码和相关元数据
@@ -44,12 +92,14 @@ class CodeGenerationService:
         try:
             logger.info(f"Generating code for: {description} | Framework: {framework}")
 
-            if self.gemini_model:
-                code = await self._generate_with_gemini(
-                    description, framework, language, with_tailwind, component_name
-                )
-            else:
-                code = self._generate_template(description, framework, language, with_tailwind, component_name)
+            # 代码生成以框架作为style维度
+            with track_stage("design_to_code", "inference", bounded_label(framework, self.SUPPORTED_FRAMEWORKS)):
+                if self.gemini_model:
+                    code = await self._generate_with_gemini(
+                        description, framework, language, with_tailwind, component_name, context, model
+                    )
+                else:
+                    code = self._generate_template(description, framework, language, with_tailwind, component_name)
 
             # 提取元数据
             metadata = self._extract_code_metadata(code, framework)
@@ -68,13 +118,65 @@ class CodeGenerationService:
             logger.error(f"Failed to generate code: {e}")
             raise
 
+    async def image_to_code(
+        self,
+        image_data: bytes,
+        framework: str = "react",
+        language: str = "typescript",
+        with_tailwind: bool = True,
+        component_name: str = "GeneratedComponent"
+    ) -> Dict[str, Any]:
+        """
+        设计稿图像生成代码
+
+        版面分析（解码、分割、CLIP区域匹配）在线程中执行，识别出的区域树直接套用版面模板，
+        不调用LLM，CPU上也能在交互式延迟内返回。
+
+        Args:
+            image_data: 上传的设计稿图像
+            framework: 框架 (react, vue, svelte, html)
+            language: 编程语言
+            with_tailwind: 是否使用Tailwind CSS
+            component_name: 组件名称
+
+        Returns:
+            生成的代码、识别出的版面与相关元数据
+        """
+        layout = await asyncio.to_thread(design_analyzer.analyze, image_data)
+        layout_dict = layout.to_dict()
+
+        with track_stage("design_to_code", "render", bounded_label(framework, self.SUPPORTED_FRAMEWORKS)):
+            code = self._generate_layout_template(layout_dict, framework, language, with_tailwind, component_name)
+
+        metadata = self._extract_code_metadata(code, framework)
+        metadata["analysis"] = {
+            "method": layout.method,
+            "regions": len(layout.regions),
+            "timings_ms": layout_dict["timings_ms"],
+        }
+
+        logger.info(
+            f"✅ Design converted to {framework} code | {len(layout.regions)} regions via {layout.method}"
+        )
+        return {
+            "code": code,
+            "framework": framework,
+            "language": language,
+            "component_name": component_name,
+            "with_tailwind": with_tailwind,
+            "layout": layout_dict,
+            "metadata": metadata
+        }
+
     async def _generate_with_gemini(
         self,
         description: str,
         framework: str,
         language: str,
         with_tailwind: bool,
-        component_name: str
+        component_name: str,
+        context: Optional[str] = None,
+        model: Any = None
     ) -> str:
         """使用Gemini生成代码"""
         try:
@@ -92,8 +194,11 @@ Requirements:
 
 Return ONLY the code, no explanations.
 """
+            if context and model is None:
+                # 共享上下文放在最前面，相同前缀可命中服务端的隐式前缀缓存
+                prompt = f"{context}\n\n{prompt}"
 
-            response = self.gemini_model.generate_content(prompt)
+            response = await self._generate_content(prompt, model)
             code = response.text.strip()
 
             # 清理代码块标记
@@ -105,6 +210,14 @@ Return ONLY the code, no explanations.
             logger.error(f"Gemini code generation failed: {e}")
             raise
 
+    async def _generate_content(self, prompt: str, model: Any = None):
+        """调用Gemini（SDK为同步接口时放到线程中执行，不阻塞事件循环）"""
+        model = model or self.gemini_model
+        generate_async = getattr(model, "generate_content_async", None)
+        if generate_async is not None:
+            return await generate_async(prompt)
+        return await asyncio.to_thread(model.generate_content, prompt)
+
     def _clean_code_blocks(self, code: str) -> str:
         """清理代码块标记"""
         # 移除 ```tsx, ```ts, ```javascript 等标记
@@ -207,6 +320,88 @@ export default {{
 """
         return code
 
+    def _generate_layout_template(
+        self,
+        layout: Dict[str, Any],
+        framework: str,
+        language: str,
+        with_tailwind: bool,
+        component_name: str
+    ) -> str:
+        """按设计稿版面生成模板代码"""
+        class_attr = "className" if framework == "react" else "class"
+        root = {
+            "kind": "page",
+            "background": layout["background"],
+            "filled": True,
+            "direction": layout["direction"],
+            "children": layout["regions"],
+        }
+        markup = self._render_layout_region(root, class_attr, with_tailwind)
+
+        if framework == "react":
+            ts_syntax = ": React.FC" if language == "typescript" else ""
+            body = "\n".join("    " + line for line in markup)
+            return f"""import React from "react";
+
+export const {component_name}{ts_syntax} = () => {{
+  return (
+{body}
+  );
+}};
+
+export default {component_name};
+"""
+        if framework == "vue":
+            script_lang = " lang=\"ts\"" if language == "typescript" else ""
+            body = "\n".join("  " + line for line in markup)
+            return f"""<template>
+{body}
+</template>
+
+<script{script_lang}>
+export default {{
+  name: '{component_name}'
+}}
+</script>
+"""
+        return "\n".join(markup) + "\n"
+
+    def _render_layout_region(self, region: Dict[str, Any], class_attr: str, with_tailwind: bool) -> List[str]:
+        """渲染一个版面区域及其子区域，返回未缩进的代码行"""
+        kind, children = region["kind"], region["children"]
+
+        classes = []
+        if region["filled"] and kind not in ("heading", "text", "image", "input"):
+            classes.append(f"bg-[{region['background']}]")
+            red, green, blue = (int(region["background"][i:i + 2], 16) for i in (1, 3, 5))
+            if 0.299 * red + 0.587 * green + 0.114 * blue < 140:
+                classes.append("text-white")
+
+        if kind in self.LAYOUT_ELEMENTS and not children:
+            tag, base, text, extra = self.LAYOUT_ELEMENTS[kind]
+            width, height = region["box"][2], region["box"][3]
+            attrs = extra.format(w=width, h=height)
+            if with_tailwind:
+                attrs = f' {class_attr}="{" ".join([base] + classes)}"' + attrs
+            return [f"<{tag}{attrs} />" if text is None else f"<{tag}{attrs}>{text}</{tag}>"]
+
+        tag, base = ("div", "min-h-screen") if kind == "page" else self.LAYOUT_CONTAINERS[kind]
+        if kind == "page" or kind not in ("navbar", "hero", "form"):
+            if region["direction"] == "row" and len(children) > 1:
+                base += f" grid grid-cols-1 md:grid-cols-{min(len(children), 6)} gap-6"
+            else:
+                base += " flex flex-col gap-4"
+        attrs = f' {class_attr}="{" ".join([base] + classes)}"' if with_tailwind else ""
+
+        if not children:
+            return [f"<{tag}{attrs}>{kind.capitalize()}</{tag}>"]
+        lines = [f"<{tag}{attrs}>"]
+        for child in children:
+            lines.extend("  " + line for line in self._render_layout_region(child, class_attr, with_tailwind))
+        lines.append(f"</{tag}>")
+        return lines
+
     def _parse_description(self, description: str) -> List[str]:
         """解析描述提取关键词"""
         keywords = []
@@ -254,6 +449,125 @@ export default {{
         }
         return metadata
 
+    def theme_context(self, theme: str) -> str:
+        """组件库共享的主题上下文（同一主题的所有组件提示词使用相同前缀）"""
+        tokens = self.THEME_TOKENS.get(theme, f"{theme} visual style applied consistently")
+        return f"""You are generating one component of a cohesive React + TypeScript component library.
+
+Theme: {theme}
+Design tokens: {tokens}
+
+Library conventions (apply to every component):
+- Tailwind CSS utility classes only, no inline styles
+- Export a named component and a default export; props interface named <ComponentName>Props
+- Same spacing scale, colors, radii and focus rings across all components
+- Keyboard accessible with visible focus states and ARIA attributes where relevant"""
+
+    async def _theme_model(self, theme: str, context: str) -> Any:
+        """显式缓存主题上下文（Gemini context caching），返回使用缓存的模型
+
+        上下文低于模型的最小缓存长度、模型不支持缓存或SDK不可用时返回None，
+        调用方改为在每个提示词前附加相同的上下文前缀；失败结果在TTL内同样复用，不重复尝试。
+        """
+        ttl = settings.CODE_THEME_CACHE_TTL
+        if not ttl or self.gemini_client is None or not self.gemini_model:
+            return None
+
+        cached = self._theme_models.get(theme)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+
+        def create():
+            from google.generativeai import caching
+
+            content = caching.CachedContent.create(
+                model=self.gemini_model.model_name,
+                system_instruction=context,
+                ttl=timedelta(seconds=ttl),
+            )
+            return self.gemini_client.GenerativeModel.from_cached_content(cached_content=content)
+
+        try:
+            model = await asyncio.to_thread(create)
+            logger.info(f"Theme context for '{theme}' cached for {ttl}s")
+        except Exception as e:
+            logger.info(f"Theme context caching unavailable, sharing the prompt prefix instead: {e}")
+            model = None
+
+        # 提前过期，避免使用即将失效的服务端缓存
+        self._theme_models[theme] = (model, time.monotonic() + ttl * 0.9)
+        return model
+
+    def _component_fallback(self, description: str, component_name: str) -> Dict[str, Any]:
+        """组件超时或失败时的模板代码"""
+        code = self._generate_template(description, "react", "typescript", True, component_name)
+        return {
+            "code": code,
+            "framework": "react",
+            "language": "typescript",
+            "component_name": component_name,
+            "with_tailwind": True,
+            "metadata": self._extract_code_metadata(code, "react")
+        }
+
+    async def iter_component_library(
+        self,
+        theme: str = "modern",
+        components: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        并发生成组件库，按完成顺序逐个产出
+
+        每项在design_to_code结果之外包含 index（在components中的位置）、
+        status（completed / timeout / failed，后两者为模板代码）和 generation_time。
+        """
+        # 只有未指定时才用默认组件；空列表表示不生成任何组件
+        if components is None:
+            components = self.DEFAULT_COMPONENTS
+        if not components:
+            return
+        context = self.theme_context(theme)
+        model = await self._theme_model(theme, context)
+        semaphore = asyncio.Semaphore(max(1, settings.CODE_LIBRARY_CONCURRENCY))
+
+        async def generate(index: int, component_name: str) -> Dict[str, Any]:
+            description = f"a beautiful {component_name.lower()} component with {theme} style"
+            async with semaphore:
+                # 期限从开始生成时计算，不含排队时间
+                start = time.perf_counter()
+                try:
+                    result = await asyncio.wait_for(
+                        self.design_to_code(
+                            description=description,
+                            framework="react",
+                            language="typescript",
+                            with_tailwind=True,
+                            component_name=component_name,
+                            context=context,
+                            model=model
+                        ),
+                        timeout=settings.CODE_COMPONENT_TIMEOUT
+                    )
+                    status = "completed"
+                except asyncio.TimeoutError:
+                    logger.warning(f"Component {component_name} exceeded {settings.CODE_COMPONENT_TIMEOUT}s, using template")
+                    result, status = self._component_fallback(description, component_name), "timeout"
+                except Exception as e:
+                    logger.warning(f"Component {component_name} failed, using template: {e}")
+                    result, status = self._component_fallback(description, component_name), "failed"
+
+            result.update(index=index, status=status, generation_time=round(time.perf_counter() - start, 3))
+            return result
+
+        tasks = [asyncio.create_task(generate(index, name)) for index, name in enumerate(components)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # 调用方提前停止迭代（如客户端断开）时取消剩余组件
+            for task in tasks:
+                task.cancel()
+
     async def generate_component_library(
         self,
         theme: str = "modern",
@@ -267,23 +581,10 @@ export default {{
             components: 组件列表 (默认生成常用组件)
 
         Returns:
-            组件列表
+            组件列表（与components顺序一致）
         """
-        if components is None:
-            components = ["Button", "Card", "Input", "Modal", "Badge", "Avatar"]
-
-        generated_components = []
-
-        for component_name in components:
-            description = f"a beautiful {component_name.lower()} component with {theme} style"
-            result = await self.design_to_code(
-                description=description,
-                framework="react",
-                language="typescript",
-                with_tailwind=True,
-                component_name=component_name
-            )
-            generated_components.append(result)
+        generated_components = [result async for result in self.iter_component_library(theme, components)]
+        generated_components.sort(key=lambda result: result["index"])
 
         logger.info(f"✅ Generated {len(generated_components)} components")
         return generated_components
@@ -291,25 +592,35 @@ export default {{
     async def optimize_code(
         self,
         code: str,
-        framework: str
+        framework: str,
+        minify: bool = True,
+        use_llm: bool = False
     ) -> Dict[str, Any]:
         """
         优化代码
 
+        先由本地优化器处理（删除未使用的import、Tailwind类名去重排序、空白压缩），
+        毫秒级完成且不依赖模型；use_llm时再把本地结果交给Gemini做结构性改写，
+        模型输出同样经过本地优化。
+
         Args:
             code: 原始代码
             framework: 框架
+            minify: 是否压缩空白与注释
+            use_llm: 是否追加LLM优化阶段
 
         Returns:
-            优化后的代码和优化建议
+            优化后的代码、实际做出的修改说明与前后大小（UTF-8字节）
         """
-        try:
-            if not self.gemini_model:
-                return {"optimized_code": code, "suggestions": []}
+        result = code_optimizer.optimize(code, framework, minify)
+        optimized_code = result.code
+        suggestions = result.suggestions()
+        stages = ["local"]
 
+        if use_llm and self.gemini_model:
             prompt = f"""Optimize this {framework} code:
 
-{code}
+{optimized_code}
 
 Requirements:
 - Improve performance
@@ -320,28 +631,33 @@ Requirements:
 
 Return ONLY the optimized code.
 """
-
-            response = self.gemini_model.generate_content(prompt)
-            optimized_code = self._clean_code_blocks(response.text)
-
-            suggestions = [
-                "Removed unused imports",
-                "Improved accessibility with ARIA labels",
-                "Optimized re-renders with proper memoization"
-            ]
-
-            logger.info("✅ Code optimized")
-            return {
-                "optimized_code": optimized_code,
-                "suggestions": suggestions,
-                "original_size": len(code),
-                "optimized_size": len(optimized_code)
-            }
-
-        except Exception as e:
-            logger.error(f"Failed to optimize code: {e}")
-            return {"optimized_code": code, "suggestions": []}
+            try:
+                response = await self._generate_content(prompt)
+                llm_result = code_optimizer.optimize(self._clean_code_blocks(response.text), framework, minify)
+                optimized_code = llm_result.code
+                suggestions.append("Restructured for performance and accessibility (AI pass)")
+                stages.append("llm")
+            except Exception as e:
+                logger.error(f"Failed to optimize code with LLM: {e}")
+                suggestions.append("AI optimization unavailable, returned locally optimized code")
+
+        optimized_bytes = optimized_code.encode("utf-8")
+        logger.info(
+            f"✅ Code optimized ({'+'.join(stages)}): {result.original_size} -> {len(optimized_bytes)} bytes, "
+            f"local pass {result.elapsed_ms:.1f}ms"
+        )
+        return {
+            "optimized_code": optimized_code,
+            "suggestions": suggestions,
+            "original_size": result.original_size,
+            "optimized_size": len(optimized_bytes),
+            "original_gzip_size": result.original_gzip_size,
+            "optimized_gzip_size": len(gzip.compress(optimized_bytes, mtime=0)),
+            "removed_imports": result.removed_imports,
+            "elapsed_ms": result.elapsed_ms,
+            "stages": stages,
+        }
 
 
-# 全局服务实例
-code_service = CodeGenerationService()
+# 全局服务实例（首次访问时创建）
+code_service = LazyObject(CodeGenerationService)
@@ -0,0 +1,739 @@
+"""
+Code Optimizer
+本地代码优化 - 单遍增量词法分析（JS/TS/JSX），删除未使用的import、Tailwind类名去重排序、
+空白与注释压缩；Vue/Svelte/HTML按标记与<script>块分别处理，不需要调用LLM
+"""
+
+import gzip
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+# 词法单元类型
+WS, COMMENT, STRING, TEMPLATE, REGEX, IDENT, NUMBER, PUNCT, JSX_TEXT = (
+    "ws", "comment", "string", "template", "regex", "ident", "number", "punct", "jsx_text"
+)
+SIGNIFICANT_SKIP = (WS, COMMENT)
+
+
+@dataclass(frozen=True)
+class Token:
+    kind: str
+    text: str
+
+
+class TokenizeError(ValueError):
+    """源码括号/模板/JSX未闭合，无法安全改写"""
+
+
+_IDENT = re.compile(r"[A-Za-z_$\u00a0-\uffff][\w$\u00a0-\uffff]*")
+_JSX_NAME = re.compile(r"[A-Za-z_$\u00a0-\uffff][\w$.:\-\u00a0-\uffff]*")
+_NUMBER = re.compile(r"0[xXbBoO][\da-fA-F_]+n?|(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d+)?n?")
+_WS = re.compile(r"\s+")
+_PUNCT = re.compile(
+    r">>>=|\.\.\.|===|!==|\*\*=|<<=|>>=|>>>|&&=|\|\|=|\?\?=|=>|==|!=|<=|>=|&&|\|\||\?\?|\?\.(?!\d)"
+    r"|\+\+|--|\+=|-=|\*=|/=|%=|&=|\|=|\^=|\*\*|<<|>>|[{}()\[\];,<>+\-*/%&|^!~?:=.@#]"
+)
+_JSX_TEXT = re.compile(r"[^<{]+")
+
+# 这些词法单元之后的 "/" 是正则字面量，"<" 可以开始JSX
+_EXPRESSION_KEYWORDS = {
+    "return", "typeof", "case", "do", "else", "in", "of", "new", "delete", "void",
+    "throw", "instanceof", "yield", "await", "default",
+}
+_REGEX_AFTER_PUNCT = set("( , = : [ ! & | ? { } ; + - * % < > ~ ^".split()) | {
+    "=>", "==", "===", "!=", "!==", "&&", "||", "??", "+=", "-=", "*=", "/=", "%=",
+    "<=", ">=", "&=", "|=", "^=", "&&=", "||=", "??=", "...",
+}
+_JSX_AFTER_PUNCT = {"(", ",", "=", ":", "?", "&&", "||", "??", "=>", "[", "{", "}", ";", "!", "..."}
+
+
+def _expression_start(prev: Optional[Token], punctuators: Set[str]) -> bool:
+    if prev is None:
+        return True
+    if prev.kind == PUNCT:
+        return prev.text in punctuators
+    return prev.kind == IDENT and prev.text in _EXPRESSION_KEYWORDS
+
+
+def tokenize(source: str) -> Iterator[Token]:
+    """单遍词法分析，逐个产出Token；所有Token的text拼接后等于原文
+
+    栈记录当前所处的嵌套上下文：brace（普通花括号）、template/expr（模板字符串及其${}）、
+    tag/closetag（JSX标签内）、jsx（JSX子节点文本）、jsxexpr（JSX中的{表达式}）。
+    """
+    pos, length = 0, len(source)
+    stack: List[str] = []
+    prev: Optional[Token] = None
+
+    def scan_template(start: int) -> Tuple[int, bool]:
+        """从 ` 或 } 开始扫描模板字符串片段，返回 (结束位置, 是否以${结束)"""
+        i = start + 1
+        while i < length:
+            char = source[i]
+            if char == "\\":
+                i += 2
+            elif char == "`":
+                return i + 1, False
+            elif char == "$" and source.startswith("${", i):
+                return i + 2, True
+            else:
+                i += 1
+        raise TokenizeError("unterminated template literal")
+
+    def scan_string(start: int) -> int:
+        quote, i = source[start], start + 1
+        while i < length:
+            char = source[i]
+            if char == "\\":
+                i += 2
+            elif char == quote:
+                return i + 1
+            elif char == "\n" and (not stack or stack[-1] not in ("tag", "closetag")):
+                break
+            else:
+                i += 1
+        raise TokenizeError("unterminated string literal")
+
+    def scan_regex(start: int) -> int:
+        i, in_class = start + 1, False
+        while i < length:
+            char = source[i]
+            if char == "\\":
+                i += 2
+                continue
+            if char == "\n":
+                break
+            if char == "[":
+                in_class = True
+            elif char == "]":
+                in_class = False
+            elif char == "/" and not in_class:
+                i += 1
+                while i < length and (source[i].isalnum() or source[i] == "_"):
+                    i += 1
+                return i
+            i += 1
+        raise TokenizeError("unterminated regular expression")
+
+    while pos < length:
+        mode = stack[-1] if stack else "code"
+        char = source[pos]
+
+        if mode == "jsx":
+            if char == "<":
+                closing = source.startswith("</", pos)
+                stack.append("closetag" if closing else "tag")
+                end = pos + (2 if closing else 1)
+                token = Token(PUNCT, source[pos:end])
+            elif char == "{":
+                stack.append("jsxexpr")
+                end, token = pos + 1, Token(PUNCT, "{")
+            else:
+                end = _JSX_TEXT.match(source, pos).end()
+                token = Token(JSX_TEXT, source[pos:end])
+            yield token
+            prev, pos = token, end
+            continue
+
+        if mode in ("tag", "closetag"):
+            match = _WS.match(source, pos)
+            if match:
+                token = Token(WS, match.group())
+            elif source.startswith("/>", pos):
+                stack.pop()
+                token = Token(PUNCT, "/>")
+            elif char == ">":
+                stack.pop()
+                if mode == "closetag":
+                    if not stack or stack[-1] != "jsx":
+                        raise TokenizeError("unbalanced JSX closing tag")
+                    stack.pop()
+                else:
+                    stack.append("jsx")
+                token = Token(PUNCT, ">")
+            elif char == "{":
+                stack.append("jsxexpr")
+                token = Token(PUNCT, "{")
+            elif char in "\"'":
+                token = Token(STRING, source[pos:scan_string(pos)])
+            elif _JSX_NAME.match(source, pos):
+                token = Token(IDENT, _JSX_NAME.match(source, pos).group())
+            else:
+                token = Token(PUNCT, char)
+            yield token
+            pos += len(token.text)
+            if token.kind not in SIGNIFICANT_SKIP:
+                prev = token
+            continue
+
+        # 代码模式（含 brace / expr / jsxexpr）
+        match = _WS.match(source, pos)
+        if match:
+            token = Token(WS, match.group())
+        elif source.startswith("//", pos):
+            end = source.find("\n", pos)
+            token = Token(COMMENT, source[pos:end if end != -1 else length])
+        elif source.startswith("/*", pos):
+            end = source.find("*/", pos + 2)
+            if end == -1:
+                raise TokenizeError("unterminated block comment")
+            token = Token(COMMENT, source[pos:end + 2])
+        elif char in "\"'":
+            token = Token(STRING, source[pos:scan_string(pos)])
+        elif char == "`":
+            end, opened = scan_template(pos)
+            if opened:
+                stack.extend(("template", "expr"))
+            token = Token(TEMPLATE, source[pos:end])
+        elif char == "}" and mode == "expr":
+            stack.pop()
+            end, opened = scan_template(pos)
+            if opened:
+                stack.append("expr")
+            else:
+                stack.pop()  # template
+            token = Token(TEMPLATE, source[pos:end])
+        elif char == "/" and _expression_start(prev, _REGEX_AFTER_PUNCT):
+            token = Token(REGEX, source[pos:scan_regex(pos)])
+        elif (
+            char == "<"
+            and pos + 1 < length
+            and (source[pos + 1] == ">" or _IDENT.match(source, pos + 1))
+            and _expression_start(prev, _JSX_AFTER_PUNCT)
+        ):
+            stack.append("tag")
+            token = Token(PUNCT, "<")
+        else:
+            match = _IDENT.match(source, pos)
+            if match:
+                token = Token(IDENT, match.group())
+            else:
+                match = _NUMBER.match(source, pos)
+                if match and match.group():
+                    token = Token(NUMBER, match.group())
+                else:
+                    match = _PUNCT.match(source, pos)
+                    token = Token(PUNCT, match.group() if match else char)
+                    if token.text == "{":
+                        stack.append("brace")
+                    elif token.text == "}":
+                        if not stack or stack[-1] not in ("brace", "jsxexpr"):
+                            raise TokenizeError("unbalanced closing brace")
+                        stack.pop()
+
+        yield token
+        pos += len(token.text)
+        if token.kind not in SIGNIFICANT_SKIP:
+            prev = token
+
+    if stack:
+        raise TokenizeError(f"unclosed {stack[-1]} at end of input")
+
+
+# --- 未使用的import -------------------------------------------------------------
+
+@dataclass
+class _ImportStatement:
+    start: int  # Token下标（含）
+    end: int  # Token下标（不含）
+    default: Optional[str] = None
+    namespace: Optional[str] = None
+    named: List[Tuple[str, str, bool]] = field(default_factory=list)  # (导入名, 本地名, 是否type)
+    type_only: bool = False
+    source: str = ""
+
+    def locals(self) -> List[str]:
+        names = [self.default, self.namespace] + [local for _, local, _ in self.named]
+        return [name for name in names if name]
+
+
+def _significant(tokens: List[Token], index: int) -> int:
+    while index < len(tokens) and tokens[index].kind in SIGNIFICANT_SKIP:
+        index += 1
+    return index
+
+
+def _parse_import(tokens: List[Token], start: int) -> Optional[_ImportStatement]:
+    """解析从tokens[start]（import）开始的顶层import语句；无法识别时返回None（保持原样）"""
+    statement = _ImportStatement(start, start)
+
+    def text(index: int) -> str:
+        return tokens[index].text if index < len(tokens) else ""
+
+    def kind(index: int) -> str:
+        return tokens[index].kind if index < len(tokens) else ""
+
+    def advance(index: int) -> int:
+        return _significant(tokens, index + 1)
+
+    i = advance(start)
+    if text(i) in ("(", ".") or kind(i) == STRING:
+        return None  # import() / import.meta / 副作用导入
+    if text(i) == "type" and text(advance(i)) not in (",", "from"):
+        statement.type_only = True
+        i = advance(i)
+
+    if kind(i) == IDENT and text(i) != "from":
+        statement.default = text(i)
+        i = advance(i)
+        if text(i) == ",":
+            i = advance(i)
+
+    if text(i) == "*":
+        i = advance(i)
+        if text(i) != "as" or kind(advance(i)) != IDENT:
+            return None
+        i = advance(i)
+        statement.namespace = text(i)
+        i = advance(i)
+    elif text(i) == "{":
+        i = advance(i)
+        while text(i) != "}":
+            is_type = text(i) == "type" and kind(advance(i)) in (IDENT, STRING) and text(advance(i)) != "as"
+            if is_type:
+                i = advance(i)
+            if kind(i) not in (IDENT, STRING):
+                return None
+            imported = local = text(i)
+            i = advance(i)
+            if text(i) == "as":
+                i = advance(i)
+                local = text(i)
+                i = advance(i)
+            statement.named.append((imported, local, is_type))
+            if text(i) == ",":
+                i = advance(i)
+            elif text(i) != "}":
+                return None
+        i = advance(i)
+
+    if text(i) != "from" or kind(advance(i)) != STRING:
+        return None
+    i = advance(i)
+    statement.source = text(i)
+    statement.end = i + 1
+
+    following = advance(i)
+    if text(following) in ("with", "assert") and text(advance(following)) == "{":
+        return None  # import属性改写时无法保留，保持原样
+    if text(following) == ";":
+        statement.end = following + 1
+    return statement
+
+
+def _render_import(statement: _ImportStatement, keep: Set[str]) -> str:
+    parts = []
+    if statement.default in keep:
+        parts.append(statement.default)
+    if statement.namespace in keep:
+        parts.append(f"* as {statement.namespace}")
+    named = [
+        ("type " if is_type else "") + (imported if imported == local else f"{imported} as {local}")
+        for imported, local, is_type in statement.named if local in keep
+    ]
+    if named:
+        parts.append("{ " + ", ".join(named) + " }")
+    prefix = "import type " if statement.type_only else "import "
+    return f"{prefix}{', '.join(parts)} from {statement.source};"
+
+
+_WORD = re.compile(r"[A-Za-z_$][\w$]*")
+
+
+def usage_words(text: str) -> Set[str]:
+    """文本中可能引用import绑定的标识符（含Svelte的$store与标记中的kebab-case组件名）"""
+    words = set(_WORD.findall(text))
+    words |= {word[1:] for word in words if word.startswith("$")}
+    for kebab in re.findall(r"[a-z][a-z0-9]*(?:-[a-z0-9]+)+", text):
+        words.add("".join(part.capitalize() for part in kebab.split("-")))
+    return words
+
+
+def remove_unused_imports(tokens: List[Token], extra_usages: Set[str] = frozenset()) -> Tuple[List[Token], List[str]]:
+    """删除未被引用的import绑定；所有绑定都未使用时删除整条语句（与TypeScript省略未使用导入一致）
+
+    使用判断是保守的：import语句以外任意位置（注释除外）出现同名单词即视为使用。
+    使用经典JSX运行时的文件保留React默认导入。
+    """
+    statements: List[_ImportStatement] = []
+    depth = 0
+    prev: Optional[Token] = None
+    for index, token in enumerate(tokens):
+        if token.kind == PUNCT and token.text == "{":
+            depth += 1
+        elif token.kind == PUNCT and token.text == "}":
+            depth -= 1
+        elif token.kind == IDENT and token.text == "import" and depth == 0 and (prev is None or prev.text != "."):
+            statement = _parse_import(tokens, index)
+            if statement is not None:
+                statements.append(statement)
+        if token.kind not in SIGNIFICANT_SKIP:
+            prev = token
+
+    if not statements:
+        return tokens, []
+
+    spans = {(s.start, s.end) for s in statements}
+    in_import = set()
+    for start, end in spans:
+        in_import.update(range(start, end))
+    used = set(extra_usages)
+    has_jsx = False
+    for index, token in enumerate(tokens):
+        if index in in_import or token.kind == COMMENT:
+            continue
+        if token.kind == IDENT and token.text.isidentifier():
+            used.add(token.text)
+        elif token.kind in (IDENT, STRING, TEMPLATE, JSX_TEXT):
+            used |= usage_words(token.text)
+        if token.kind == JSX_TEXT or (token.kind == PUNCT and token.text in ("/>", "</")):
+            has_jsx = True
+    if has_jsx:
+        used.add("React")
+
+    removed: List[str] = []
+    output: List[Token] = []
+    by_start = {statement.start: statement for statement in statements}
+    index = 0
+    while index < len(tokens):
+        statement = by_start.get(index)
+        if statement is None:
+            output.append(tokens[index])
+            index += 1
+            continue
+
+        unused = [name for name in statement.locals() if name not in used]
+        if not unused:
+            output.extend(tokens[statement.start:statement.end])
+        else:
+            removed.extend(unused)
+            keep = set(statement.locals()) - set(unused)
+            if keep:
+                output.extend(tokenize(_render_import(statement, keep)))
+            elif statement.end < len(tokens) and tokens[statement.end].kind == WS:
+                # 整条删除时连同其后的换行
+                following = tokens[statement.end].text
+                newline = following.find("\n")
+                if newline != -1:
+                    rest = following[newline + 1:]
+                    tokens[statement.end] = Token(WS, rest)
+        index = statement.end
+
+    return [token for token in output if token.text], removed
+
+
+# --- Tailwind类名 -----------------------------------------------------------------
+
+_TAILWIND_GROUPS: List[Tuple[str, ...]] = [
+    ("container",),
+    ("static", "fixed", "absolute", "relative", "sticky", "inset", "inset-x", "inset-y",
+     "top", "right", "bottom", "left", "start", "end", "z", "isolate"),
+    ("block", "inline-block", "inline", "flex", "inline-flex", "grid", "inline-grid", "table", "contents",
+     "hidden", "flow-root", "basis", "grow", "shrink", "order", "grid-cols", "grid-rows", "col", "row",
+     "auto-cols", "auto-rows", "gap", "gap-x", "gap-y", "justify", "justify-items", "justify-self",
+     "content", "items", "self", "place-content", "place-items", "place-self", "float", "clear",
+     "overflow", "overflow-x", "overflow-y", "box", "columns", "object", "visible", "invisible"),
+    ("m", "mx", "my", "mt", "mr", "mb", "ml", "ms", "me", "p", "px", "py", "pt", "pr", "pb", "pl", "ps", "pe",
+     "space-x", "space-y"),
+    ("w", "min-w", "max-w", "h", "min-h", "max-h", "size", "aspect"),
+    ("font", "text", "leading", "tracking", "whitespace", "break", "truncate", "uppercase", "lowercase",
+     "capitalize", "normal-case", "italic", "not-italic", "underline", "overline", "line-through",
+     "no-underline", "decoration", "underline-offset", "antialiased", "subpixel-antialiased", "list",
+     "align", "indent", "line-clamp", "placeholder"),
+    ("bg", "from", "via", "to", "fill", "stroke"),
+    ("border", "border-x", "border-y", "border-t", "border-r", "border-b", "border-l", "rounded", "rounded-t",
+     "rounded-r", "rounded-b", "rounded-l", "rounded-tl", "rounded-tr", "rounded-bl", "rounded-br",
+     "divide", "divide-x", "divide-y", "outline", "ring", "ring-offset"),
+    ("shadow", "opacity", "mix-blend", "bg-blend", "blur", "brightness", "contrast", "grayscale",
+     "drop-shadow", "invert", "saturate", "sepia", "backdrop", "filter"),
+    ("transition", "duration", "ease", "delay", "animate", "transform", "scale", "scale-x", "scale-y",
+     "rotate", "translate-x", "translate-y", "skew-x", "skew-y", "origin", "will-change"),
+    ("cursor", "select", "pointer-events", "resize", "scroll", "snap", "touch", "appearance", "caret",
+     "accent", "sr-only", "not-sr-only"),
+]
+_TAILWIND_ORDER: Dict[str, int] = {prefix: group for group, prefixes in enumerate(_TAILWIND_GROUPS) for prefix in prefixes}
+
+
+def _utility_group(utility: str) -> int:
+    name = utility.lstrip("!").lstrip("-")
+    parts = name.split("-")
+    for count in range(len(parts), 0, -1):
+        group = _TAILWIND_ORDER.get("-".join(parts[:count]))
+        if group is not None:
+            return group
+    return len(_TAILWIND_GROUPS)
+
+
+def _split_variants(class_name: str) -> Tuple[str, str]:
+    """hover:md:bg-red-500 -> ("hover:md:", "bg-red-500")（任意值中的冒号不拆分）"""
+    depth, split = 0, -1
+    for index, char in enumerate(class_name):
+        if char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+        elif char == ":" and depth == 0:
+            split = index
+    return class_name[:split + 1], class_name[split + 1:]
+
+
+def sort_tailwind_classes(value: str) -> str:
+    """去除重复类名并按类别排序：无变体的类在前，同一变体前缀的类放在一起；同类别内保持原顺序
+
+    类名在属性中的顺序不影响样式（由CSS中的规则顺序决定），排序只提高可读性和压缩率。
+    """
+    seen: Dict[str, int] = {}
+    for class_name in value.split():
+        seen.setdefault(class_name, len(seen))
+    if not seen:
+        return value
+
+    def key(item: Tuple[str, int]):
+        variants, utility = _split_variants(item[0])
+        return (bool(variants), variants, _utility_group(utility), item[1])
+
+    return " ".join(class_name for class_name, _ in sorted(seen.items(), key=key))
+
+
+def sort_class_attributes(tokens: List[Token]) -> Tuple[List[Token], int]:
+    """JSX中静态的 className="..." / class="..." 属性"""
+    changed = 0
+    output = list(tokens)
+    for index, token in enumerate(tokens):
+        if token.kind != STRING or index < 2:
+            continue
+        equals = index - 1
+        while equals > 0 and tokens[equals].kind == WS:
+            equals -= 1
+        name = equals - 1
+        while name > 0 and tokens[name].kind == WS:
+            name -= 1
+        if tokens[equals].text != "=" or tokens[name].text not in ("className", "class"):
+            continue
+        quote, value = token.text[0], token.text[1:-1]
+        if "\\" in value:
+            continue
+        sorted_value = sort_tailwind_classes(value)
+        if sorted_value != value:
+            output[index] = Token(STRING, f"{quote}{sorted_value}{quote}")
+            changed += 1
+    return output, changed
+
+
+_MARKUP_CLASS = re.compile(r"(?<![:\w@.-])(class\s*=\s*)([\"'])([^\"'{}<>]*)\2")
+
+
+def sort_markup_classes(markup: str) -> Tuple[str, int]:
+    """HTML/Vue/Svelte标记中的静态class属性（不处理 :class 等绑定）"""
+    changed = 0
+
+    def replace(match: re.Match) -> str:
+        nonlocal changed
+        sorted_value = sort_tailwind_classes(match.group(3))
+        if sorted_value == match.group(3):
+            return match.group(0)
+        changed += 1
+        return f"{match.group(1)}{match.group(2)}{sorted_value}{match.group(2)}"
+
+    return _MARKUP_CLASS.sub(replace, markup), changed
+
+
+# --- 空白与注释压缩 ---------------------------------------------------------------
+
+_PRESERVED_COMMENT = re.compile(r"^/\*!|@license|@preserve|@ts-|@jsx|eslint-|prettier-ignore|webpackChunkName")
+
+
+def _word_char(char: str) -> bool:
+    return char.isalnum() or char in "_$" or ord(char) > 127
+
+
+def _needs_space(left: str, right: str) -> bool:
+    """去掉两个词法单元之间的空白是否会改变词法（或让JSX属性连在一起）"""
+    a, b = left[-1], right[0]
+    if _word_char(b) and (_word_char(a) or a in "\"'`}"):
+        return True
+    if a in "+-" and b in "+-":
+        return True
+    return a == "/" and b in "/*" or a == "." and b.isdigit() or a.isdigit() and b == "."
+
+
+def minify_tokens(tokens: List[Token]) -> List[Token]:
+    """删除注释、行首缩进与多余空白
+
+    保留换行（避免自动分号插入的语义变化）；模板字符串和字符串内容不变；
+    JSX文本中含换行的空白在渲染时本就被裁掉，统一压缩为一个换行。
+    """
+    # 删除注释后相邻的空白合并为一个，保证空白之后必是非空白单元
+    kept: List[Token] = []
+    for token in tokens:
+        if token.kind == COMMENT and not _PRESERVED_COMMENT.search(token.text):
+            continue
+        if token.kind == WS and kept and kept[-1].kind == WS:
+            kept[-1] = Token(WS, kept[-1].text + token.text)
+        else:
+            kept.append(token)
+
+    output: List[Token] = []
+    for index, token in enumerate(kept):
+        if token.kind == JSX_TEXT:
+            text = re.sub(r"[ \t\r]*\n\s*", "\n", token.text)
+            output.append(Token(JSX_TEXT, text))
+            continue
+        if token.kind != WS:
+            output.append(token)
+            continue
+
+        left = output[-1].text if output else ""
+        right = kept[index + 1].text if index + 1 < len(kept) else ""
+        if not left or not right:
+            continue
+        if "\n" in token.text:
+            if output[-1].kind == WS:
+                output[-1] = Token(WS, "\n")
+            else:
+                output.append(Token(WS, "\n"))
+        elif _needs_space(left, right):
+            if not (output and output[-1].kind == WS):
+                output.append(Token(WS, " "))
+    return output
+
+
+_MARKUP_BLOCK = re.compile(r"(<(script|style|pre|textarea)\b[^>]*>)(.*?)(</\2\s*>)", re.IGNORECASE | re.DOTALL)
+# 保留IE条件注释与svelte-ignore指令
+_HTML_COMMENT = re.compile(r"<!--(?!\[if|\s*svelte-ignore)(?:.*?)-->", re.DOTALL)
+
+
+def minify_markup(markup: str) -> str:
+    """标记中含换行的空白压缩为一个换行（HTML渲染时连续空白本就折叠为一个空格），删除普通注释"""
+    return re.sub(r"[ \t\r]*\n\s*", "\n", _HTML_COMMENT.sub("", markup))
+
+
+def minify_css(css: str) -> str:
+    css = re.sub(r"/\*(?!!).*?\*/", "", css, flags=re.DOTALL)
+    css = re.sub(r"[ \t\r]*\n\s*", "\n", css)
+    # 冒号两侧的空白不能去掉（"div :hover" 是后代选择器）
+    return re.sub(r"[ \t]*([{};,])[ \t]*", r"\1", css).strip()
+
+
+# --- 入口 ---------------------------------------------------------------------------
+
+@dataclass
+class OptimizationResult:
+    """优化结果：大小单位为UTF-8字节"""
+    code: str
+    original_size: int
+    optimized_size: int
+    original_gzip_size: int
+    optimized_gzip_size: int
+    removed_imports: List[str]
+    class_attributes_sorted: int
+    minified: bool
+    elapsed_ms: float
+    warnings: List[str] = field(default_factory=list)
+
+    def suggestions(self) -> List[str]:
+        """本次实际做出的修改（面向用户的说明）"""
+        notes = []
+        if self.removed_imports:
+            notes.append(f"Removed unused imports: {', '.join(self.removed_imports)}")
+        if self.class_attributes_sorted:
+            notes.append(f"Deduplicated and sorted Tailwind classes in {self.class_attributes_sorted} attribute(s)")
+        if self.minified and self.optimized_size < self.original_size:
+            notes.append(f"Stripped comments and whitespace ({self.original_size - self.optimized_size} bytes saved)")
+        return notes + self.warnings
+
+
+class CodeOptimizer:
+    """本地代码优化器（React/Vue/Svelte/HTML）"""
+
+    SCRIPT_FRAMEWORKS = ("react", "javascript", "typescript")
+    MARKUP_FRAMEWORKS = ("vue", "svelte", "html")
+
+    def optimize(self, code: str, framework: str = "react", minify: bool = True) -> OptimizationResult:
+        start = time.perf_counter()
+        warnings: List[str] = []
+        removed: List[str] = []
+        sorted_count = 0
+
+        try:
+            if framework in self.MARKUP_FRAMEWORKS:
+                optimized, removed, sorted_count = self._optimize_markup(code, minify)
+            else:
+                optimized, removed, sorted_count = self._optimize_script(code, minify)
+        except TokenizeError as e:
+            # 无法可靠解析时不改写，避免破坏代码
+            optimized = code
+            warnings.append(f"Skipped local optimization: {e}")
+
+        original_bytes, optimized_bytes = code.encode("utf-8"), optimized.encode("utf-8")
+        return OptimizationResult(
+            code=optimized,
+            original_size=len(original_bytes),
+            optimized_size=len(optimized_bytes),
+            original_gzip_size=len(gzip.compress(original_bytes, mtime=0)),
+            optimized_gzip_size=len(gzip.compress(optimized_bytes, mtime=0)),
+            removed_imports=removed,
+            class_attributes_sorted=sorted_count,
+            minified=minify,
+            elapsed_ms=round((time.perf_counter() - start) * 1000, 3),
+            warnings=warnings,
+        )
+
+    def _optimize_script(
+        self, code: str, minify: bool, extra_usages: Set[str] = frozenset()
+    ) -> Tuple[str, List[str], int]:
+        tokens = list(tokenize(code))
+        tokens, removed = remove_unused_imports(tokens, extra_usages)
+        tokens, sorted_count = sort_class_attributes(tokens)
+        if minify:
+            tokens = minify_tokens(tokens)
+        output = "".join(token.text for token in tokens)
+        if minify:
+            output = output.strip() + "\n"
+        return output, removed, sorted_count
+
+    def _optimize_markup(self, code: str, minify: bool) -> Tuple[str, List[str], int]:
+        """<script>内按JS处理（标记中出现的名字也算作使用），<style>压缩CSS，<pre>/<textarea>原样保留"""
+        blocks = list(_MARKUP_BLOCK.finditer(code))
+        markup_usages: Set[str] = set()
+        position = 0
+        for block in blocks:
+            markup_usages |= usage_words(code[position:block.start()])
+            position = block.end()
+        markup_usages |= usage_words(code[position:])
+
+        parts: List[str] = []
+        removed: List[str] = []
+        sorted_count = 0
+        position = 0
+
+        def markup(text: str) -> str:
+            nonlocal sorted_count
+            text, count = sort_markup_classes(text)
+            sorted_count += count
+            return minify_markup(text) if minify else text
+
+        for block in blocks:
+            parts.append(markup(code[position:block.start()]))
+            open_tag, tag, body, close_tag = block.group(1), block.group(2).lower(), block.group(3), block.group(4)
+            if tag == "script" and not re.search(r"type=[\"']?(?:text/template|application/(?:ld\+)?json)", open_tag):
+                body, block_removed, block_sorted = self._optimize_script(body, minify, markup_usages)
+                removed += block_removed
+                sorted_count += block_sorted
+                body = "\n" + body if minify else body
+            elif tag == "style" and minify:
+                body = "\n" + minify_css(body) + "\n"
+            parts.append(open_tag + body + close_tag)
+            position = block.end()
+        parts.append(markup(code[position:]))
+
+        output = "".join(parts)
+        if minify:
+            output = output.strip() + "\n"
+        return output, removed, sorted_count
+
+
+# 全局优化器实例（无状态）
+code_optimizer = CodeOptimizer()
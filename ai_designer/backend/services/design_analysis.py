@@ -0,0 +1,521 @@
+"""
+Design Analysis
+设计稿分析 - 上传的图像只解码一次为NumPy数组，XY-cut分割版面区域，区域经已加载的CLIP一次批量编码，
+与预先计算的组件模板编码索引做余弦匹配；结果交给代码生成服务的版面模板，CPU上也能交互式响应
+"""
+
+import hashlib
+import io
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+from PIL import Image, ImageOps
+
+from core.config import settings
+from core.lazy import LazyObject
+from core.metrics import observe_stage
+
+# 组件模板：每个组件用几条描述做提示词集成，编码取平均
+COMPONENT_TEMPLATES: Dict[str, Tuple[str, ...]] = {
+    "navbar": (
+        "a website navigation bar with a logo and menu links",
+        "the top header bar of a web page",
+    ),
+    "hero": (
+        "a hero section with a large headline, a subtitle and a call to action button",
+        "a landing page banner with a big bold title",
+    ),
+    "section": (
+        "a section of a web page containing several elements",
+        "a block of content on a website",
+    ),
+    "card": (
+        "a card with an image, a title and a short description",
+        "a rounded content card with a shadow",
+    ),
+    "form": (
+        "a form with text input fields and a submit button",
+        "a login or sign up form",
+    ),
+    "footer": (
+        "a website footer with small links and copyright text",
+        "the bottom section of a web page",
+    ),
+    "heading": ("a large bold heading", "a section title in big letters"),
+    "text": ("a paragraph of body text", "several lines of small text"),
+    "button": ("a rounded button with a short label", "a call to action button"),
+    "input": ("a single text input field", "a search box"),
+    "image": ("a photograph", "an illustration or product image"),
+}
+
+CONTAINER_KINDS = ("navbar", "hero", "section", "card", "form", "footer")
+
+# 与背景色的通道差超过此值视为前景（浅灰卡片与白色页面的差通常只有10左右）
+COLOR_TOLERANCE = 8
+
+# CLIP图像归一化参数（OpenAI CLIP）
+_CLIP_MEAN = np.array([0.48145466, 0.4578275, 0.40821073], dtype=np.float32)
+_CLIP_STD = np.array([0.26862954, 0.26130258, 0.27577711], dtype=np.float32)
+
+
+# --- 解码与版面分割 ------------------------------------------------------------------
+
+def decode_design(data: bytes, max_side: Optional[int] = None) -> Tuple[np.ndarray, float]:
+    """解码上传的设计稿为RGB uint8数组（最长边不超过max_side），返回 (像素, 原图/数组 的缩放比)"""
+    max_side = max_side or settings.DESIGN_MAX_SIDE
+    try:
+        image = Image.open(io.BytesIO(data))
+        # JPEG可在解码时直接按2的幂缩小
+        image.draft("RGB", (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+    except Exception as e:
+        raise ValueError(f"Unsupported design image: {e}") from e
+
+    original_width = image.size[0]
+    if image.mode in ("RGBA", "LA", "P"):
+        # 透明区域按白色背景处理
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    else:
+        image = image.convert("RGB")
+    image.thumbnail((max_side, max_side), Image.Resampling.BILINEAR)
+    return np.asarray(image), original_width / image.size[0]
+
+
+@dataclass
+class LayoutRegion:
+    """版面区域：box为 (x, y, 宽, 高)，坐标基于解码后的数组"""
+    box: Tuple[int, int, int, int]
+    background: Tuple[int, int, int]
+    depth: int = 0
+    direction: str = "column"  # 子区域的排列方向：column（上下）/ row（左右）
+    children: List["LayoutRegion"] = field(default_factory=list)
+    kind: str = "section"
+    confidence: float = 0.0
+    parent_background: Optional[Tuple[int, int, int]] = None
+
+    def walk(self):
+        """广度优先遍历（外层区域优先，区域数超过上限时截掉的是最内层）"""
+        queue = deque([self])
+        while queue:
+            region = queue.popleft()
+            yield region
+            queue.extend(region.children)
+
+    @property
+    def filled(self) -> bool:
+        """背景色与外层区域不同（彩色区块、按钮）"""
+        return self.parent_background is not None and not same_color(self.background, self.parent_background)
+
+    def to_dict(self, scale: float = 1.0) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "confidence": round(self.confidence, 3),
+            "box": [round(value * scale) for value in self.box],
+            "background": "#{:02x}{:02x}{:02x}".format(*self.background),
+            "filled": self.filled,
+            "direction": self.direction,
+            "children": [child.to_dict(scale) for child in self.children],
+        }
+
+
+def same_color(a: Sequence[float], b: Sequence[float], tolerance: int = COLOR_TOLERANCE) -> bool:
+    return max(abs(int(x) - int(y)) for x, y in zip(a, b)) <= tolerance
+
+
+def _color_codes(pixels: np.ndarray) -> np.ndarray:
+    """颜色量化到每通道32级后的编码"""
+    quantized = (pixels >> 3).astype(np.int32)
+    return (quantized[..., 0] << 10) | (quantized[..., 1] << 5) | quantized[..., 2]
+
+
+def _dominant_color(pixels: np.ndarray) -> np.ndarray:
+    """出现最多的颜色（量化统计后取对应像素的均值）"""
+    if pixels.shape[0] * pixels.shape[1] > 65_536:
+        pixels = pixels[::2, ::2]
+    codes = _color_codes(pixels)
+    mode = np.bincount(codes.ravel(), minlength=1 << 15).argmax()
+    return pixels[codes == mode].mean(axis=0)
+
+
+def _background_candidates(block: np.ndarray, count: int = 3) -> List[np.ndarray]:
+    """候选背景色：边缘像素中出现最多的几种颜色（占边缘10%以上）"""
+    border = np.concatenate([block[0], block[-1], block[:, 0], block[:, -1]])
+    codes = _color_codes(border)
+    values, counts = np.unique(codes, return_counts=True)
+    order = np.argsort(counts)[::-1][:count]
+    return [
+        border[codes == values[i]].mean(axis=0)
+        for rank, i in enumerate(order) if rank == 0 or counts[i] >= len(codes) * 0.1
+    ]
+
+
+def _runs(profile: np.ndarray, min_gap: int, min_length: int = 3) -> List[Tuple[int, int]]:
+    """投影中连续为True的区间 [start, end)，间隔小于min_gap的相邻区间合并，过短的区间（抗锯齿噪点）丢弃"""
+    edges = np.diff(np.concatenate(([0], profile.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    runs: List[Tuple[int, int]] = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        if runs and start - runs[-1][1] < min_gap:
+            runs[-1] = (runs[-1][0], end)
+        else:
+            runs.append((start, end))
+    return [(start, end) for start, end in runs if end - start >= min_length]
+
+
+def segment_layout(
+    pixels: np.ndarray,
+    tolerance: int = COLOR_TOLERANCE,
+    max_depth: int = 4,
+    min_gap_ratio: float = 0.012,
+) -> LayoutRegion:
+    """递归XY-cut：在与背景色不同的像素的行/列投影中按空白切分
+
+    区域内先沿用外层背景色切分（几张卡片组成的一行是透明的分组）；切不开时该区域是一个色块
+    （导航栏、hero、卡片），改用其边缘颜色作为背景，切分其中的标题、按钮等。页面本身取能把
+    内容切分得最开的边缘颜色（顶部导航栏、底部页脚都是深色时，边缘出现最多的颜色并不是页面背景）。
+    """
+    height, width = pixels.shape[:2]
+    min_gap = max(4, round(min_gap_ratio * max(height, width)))
+
+    def cut(block: np.ndarray, background: np.ndarray, inset: int):
+        # 逐通道比较后按位或，比在长度为3的颜色轴上做归约快得多
+        diff = np.abs(block - background.astype(np.int16))
+        foreground = (diff[..., 0] > tolerance) | (diff[..., 1] > tolerance) | (diff[..., 2] > tolerance)
+        if inset:
+            # 色块边缘缩放时与外层颜色混合的像素不算内容
+            foreground[:inset] = foreground[-inset:] = False
+            foreground[:, :inset] = foreground[:, -inset:] = False
+        # 左右切分需要更宽的空白：大字号标题的词间距会超过行距阈值
+        column_gap = max(min_gap, min(block.shape[0] // 2, 3 * min_gap))
+        return foreground, _runs(foreground.any(axis=1), min_gap), _runs(foreground.any(axis=0), column_gap)
+
+    def split(x: int, y: int, w: int, h: int, depth: int, parent: Optional[np.ndarray]) -> LayoutRegion:
+        block = pixels[y:y + h, x:x + w]
+        parent_background = None if parent is None else tuple(int(round(c)) for c in parent)
+        # 叶子区域的颜色取其主色（按钮底色、文字所在的背景）；容器在切分后改为所用的背景色
+        region = LayoutRegion((x, y, w, h), _rgb(_dominant_color(block)), depth, parent_background=parent_background)
+        if depth >= max_depth or w < 24 or h < 12:
+            return region
+
+        candidates = _background_candidates(block)
+        if parent is not None:
+            candidates = [parent] + [c for c in candidates if not same_color(c, parent, tolerance)]
+
+        signed = block.astype(np.int16)
+        best = None
+        for background in candidates:
+            inset = 0 if parent is None or background is parent else 2
+            foreground, rows, columns = cut(signed, background, inset)
+            if not rows or not columns:
+                continue
+            pieces = max(len(rows), len(columns))
+            if best is None or pieces > best[0]:
+                best = (pieces, background, foreground, rows, columns)
+            if parent is not None and pieces > 1:
+                break  # 有外层背景时取第一个能切开的候选
+        if best is None:
+            return region
+        _, background, foreground, rows, columns = best
+
+        if len(rows) > 1:
+            region.direction = "column"
+            boxes = []
+            for top, bottom in rows:
+                cols = np.flatnonzero(foreground[top:bottom].any(axis=0))
+                boxes.append((x + int(cols[0]), y + top, int(cols[-1] - cols[0]) + 1, bottom - top))
+        elif len(columns) > 1:
+            region.direction = "row"
+            boxes = []
+            for left, right in columns:
+                lines = np.flatnonzero(foreground[:, left:right].any(axis=1))
+                boxes.append((x + left, y + int(lines[0]), right - left, int(lines[-1] - lines[0]) + 1))
+        else:
+            # 只有一块内容：四周有留白时裁掉留白后继续切分
+            (top, bottom), (left, right) = rows[0], columns[0]
+            if (left, top, right - left, bottom - top) == (0, 0, w, h) or right - left < 4 or bottom - top < 4:
+                return region
+            if depth > 0:
+                return split(x + left, y + top, right - left, bottom - top, depth, parent)
+            boxes = [(x + left, y + top, right - left, bottom - top)]
+
+        region.background = _rgb(background)
+        region.children = [
+            split(bx, by, bw, bh, depth + 1, background) for bx, by, bw, bh in boxes if bw >= 4 and bh >= 4
+        ]
+        return region
+
+    return split(0, 0, width, height, 0, None)
+
+
+def _rgb(color: np.ndarray) -> Tuple[int, int, int]:
+    return tuple(int(round(c)) for c in color)
+
+
+def letterbox(pixels: np.ndarray, region: LayoutRegion, size: int) -> np.ndarray:
+    """把区域补成正方形（用区域背景色填充）再缩放到size，避免CLIP中心裁剪丢掉细长区域的两端"""
+    x, y, w, h = region.box
+    crop = pixels[y:y + h, x:x + w]
+    side = max(w, h)
+    canvas = np.empty((side, side, 3), dtype=np.uint8)
+    canvas[:] = region.background
+    top, left = (side - h) // 2, (side - w) // 2
+    canvas[top:top + h, left:left + w] = crop
+    return np.asarray(Image.fromarray(canvas).resize((size, size), Image.Resampling.BICUBIC))
+
+
+# --- CLIP编码 ---------------------------------------------------------------------------
+
+class ClipRegionEncoder:
+    """用已加载的CLIP模型批量编码区域图像与模板文本，输出L2归一化的float32向量"""
+
+    def __init__(self, model: Any):
+        self.model = model
+        self.model_id = settings.CLIP_MODEL_ID
+        self.input_size = getattr(getattr(model, "visual", None), "input_resolution", 224)
+
+    def _device(self):
+        return next(self.model.parameters()).device
+
+    def embed_regions(self, crops: np.ndarray) -> np.ndarray:
+        """crops: (N, S, S, 3) uint8；S与模型输入尺寸不同时（模型服务的调用方不知道尺寸）先缩放"""
+        import torch
+
+        if crops.shape[1] != self.input_size:
+            crops = np.stack([
+                np.asarray(Image.fromarray(crop).resize((self.input_size, self.input_size), Image.Resampling.BICUBIC))
+                for crop in crops
+            ])
+
+        batch = (crops.astype(np.float32) / 255.0 - _CLIP_MEAN) / _CLIP_STD
+        tensor = torch.from_numpy(np.ascontiguousarray(batch.transpose(0, 3, 1, 2))).to(self._device())
+        with torch.no_grad():
+            features = self.model.encode_image(tensor).float()
+        return _normalize(features.cpu().numpy())
+
+    def embed_texts(self, texts: Sequence[str]) -> np.ndarray:
+        import clip
+        import torch
+
+        tokens = clip.tokenize(list(texts)).to(self._device())
+        with torch.no_grad():
+            features = self.model.encode_text(tokens).float()
+        return _normalize(features.cpu().numpy())
+
+
+def clip_encoder() -> Optional[Any]:
+    """当前可用的CLIP编码器：本进程加载的模型，或多worker部署时的模型服务客户端；都没有时返回None"""
+    from services.ai_models import get_clip_model, get_image_generator
+
+    clip_model = get_clip_model()
+    if clip_model is not None:
+        return ClipRegionEncoder(clip_model)
+    generator = get_image_generator()
+    if getattr(generator, "is_remote", False):
+        return generator
+    return None
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = vectors.astype(np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+@dataclass
+class TemplateIndex:
+    """组件模板编码索引（每行一个组件，已归一化）"""
+    labels: List[str]
+    embeddings: np.ndarray
+    key: str
+
+    @staticmethod
+    def fingerprint(encoder: Any, templates: Dict[str, Tuple[str, ...]]) -> str:
+        """索引标识：编码模型 + 模板内容"""
+        model_id = getattr(encoder, "model_id", settings.CLIP_MODEL_ID)
+        payload = json.dumps({"model": model_id, "templates": templates}, sort_keys=True)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    @classmethod
+    def build(cls, encoder: Any, templates: Dict[str, Tuple[str, ...]] = COMPONENT_TEMPLATES) -> "TemplateIndex":
+        labels = list(templates)
+        prompts = [prompt for label in labels for prompt in templates[label]]
+        vectors = encoder.embed_texts(prompts)
+        embeddings, offset = [], 0
+        for label in labels:
+            count = len(templates[label])
+            embeddings.append(vectors[offset:offset + count].mean(axis=0))
+            offset += count
+        return cls(labels, _normalize(np.stack(embeddings)), cls.fingerprint(encoder, templates))
+
+    @classmethod
+    def load_or_build(
+        cls, encoder: Any, path: Optional[str] = None, templates: Dict[str, Tuple[str, ...]] = COMPONENT_TEMPLATES
+    ) -> "TemplateIndex":
+        """优先读取磁盘上的索引；模板或模型变化后重新编码并写回"""
+        path = Path(path or settings.DESIGN_TEMPLATE_INDEX_PATH)
+        key = cls.fingerprint(encoder, templates)
+        if path.exists():
+            try:
+                with np.load(path) as data:
+                    if str(data["key"]) == key:
+                        return cls([str(label) for label in data["labels"]], data["embeddings"], key)
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable design template index {path}: {e}")
+
+        index = cls.build(encoder, templates)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp = path.with_suffix(".tmp.npz")
+            np.savez(temp, key=np.array(key), labels=np.array(index.labels), embeddings=index.embeddings)
+            temp.replace(path)
+            logger.info(f"Design template index written to {path} ({len(index.labels)} templates)")
+        except OSError as e:
+            logger.warning(f"Could not persist design template index: {e}")
+        return index
+
+    def match(self, embeddings: np.ndarray) -> Tuple[List[str], np.ndarray]:
+        """返回每个区域最相似的模板及其概率（按CLIP的logit尺度做softmax）"""
+        logits = 100.0 * embeddings @ self.embeddings.T
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        best = probabilities.argmax(axis=1)
+        return [self.labels[i] for i in best], probabilities[np.arange(len(best)), best]
+
+
+# --- 入口 -------------------------------------------------------------------------------
+
+@dataclass
+class DesignLayout:
+    """设计稿分析结果"""
+    width: int
+    height: int
+    scale: float
+    root: LayoutRegion
+    method: str  # clip / geometry
+    timings: Dict[str, float]
+
+    @property
+    def regions(self) -> List[LayoutRegion]:
+        return list(self.root.walk())[1:]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "width": self.width,
+            "height": self.height,
+            "method": self.method,
+            "background": "#{:02x}{:02x}{:02x}".format(*self.root.background),
+            "direction": self.root.direction,
+            "regions": [child.to_dict(self.scale) for child in self.root.children],
+            "timings_ms": {stage: round(seconds * 1000, 2) for stage, seconds in self.timings.items()},
+        }
+
+
+class DesignAnalyzer:
+    """设计稿版面分析
+
+    CLIP在本进程加载时直接使用；多worker部署时CLIP在模型服务进程中，区域与模板文本经模型服务编码；
+    两者都不可用时按区域的位置与形状分类。模板索引在首次使用时加载或构建，之后常驻内存。
+    """
+
+    def __init__(
+        self,
+        max_side: Optional[int] = None,
+        max_regions: Optional[int] = None,
+        index_path: Optional[str] = None,
+    ):
+        self.max_side = max_side or settings.DESIGN_MAX_SIDE
+        self.max_regions = max_regions or settings.DESIGN_MAX_REGIONS
+        self.index_path = index_path
+        self._index: Optional[TemplateIndex] = None
+        self._index_lock = threading.Lock()
+
+    def encoder(self) -> Optional[Any]:
+        """可用的区域编码器（需提供embed_regions/embed_texts）"""
+        return clip_encoder()
+
+    def template_index(self, encoder: Any) -> TemplateIndex:
+        with self._index_lock:
+            if self._index is None:
+                self._index = TemplateIndex.load_or_build(encoder, self.index_path)
+            return self._index
+
+    def analyze(self, data: bytes) -> DesignLayout:
+        """分析设计稿（CPU密集，调用方应放到线程中执行）"""
+        timings: Dict[str, float] = {}
+
+        start = time.perf_counter()
+        pixels, scale = decode_design(data, self.max_side)
+        timings["decode"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        root = segment_layout(pixels)
+        timings["segment"] = time.perf_counter() - start
+
+        regions = list(root.walk())[1:]
+        for region in regions:
+            region.kind = classify_geometry(region, root, pixels)
+        method = "geometry"
+
+        encoder = self.encoder() if regions else None
+        if encoder is not None:
+            start = time.perf_counter()
+            try:
+                self._match(encoder, pixels, regions[:self.max_regions])
+                method = "clip"
+            except Exception as e:
+                logger.warning(f"CLIP region matching failed, using layout geometry: {e}")
+            timings["embed"] = time.perf_counter() - start
+
+        for stage, seconds in timings.items():
+            observe_stage("design_to_code", stage, seconds, method)
+        height, width = pixels.shape[:2]
+        return DesignLayout(round(width * scale), round(height * scale), scale, root, method, timings)
+
+    def _match(self, encoder: Any, pixels: np.ndarray, regions: List[LayoutRegion]):
+        index = self.template_index(encoder)
+        size = getattr(encoder, "input_size", 224)
+        crops = np.stack([letterbox(pixels, region, size) for region in regions])
+        labels, confidences = index.match(encoder.embed_regions(crops))
+        for region, label, confidence in zip(regions, labels, confidences.tolist()):
+            # 有子区域的只能是容器类组件，没有子区域的容器按几何规则的结果
+            if (label in CONTAINER_KINDS) == bool(region.children):
+                region.kind, region.confidence = label, confidence
+
+
+def classify_geometry(region: LayoutRegion, root: LayoutRegion, pixels: np.ndarray) -> str:
+    """无CLIP时按位置、形状、背景与颜色丰富程度分类"""
+    _, _, page_width, page_height = root.box
+    x, y, w, h = region.box
+
+    if region.children:
+        if region.depth == 1:
+            if y <= page_height * 0.05 and h <= page_height * 0.15 and region.direction == "row":
+                return "navbar"
+            if y + h >= page_height * 0.95 and h <= page_height * 0.3:
+                return "footer"
+            if y <= page_height * 0.4 and h >= page_height * 0.2:
+                return "hero"
+        return "card" if region.filled else "section"
+
+    if region.filled and h <= page_height * 0.08 and w <= page_width * 0.3:
+        return "button"
+    if w * h >= page_width * page_height * 0.02 and h >= page_height * 0.08:
+        # 照片/插图的颜色种类远多于文字（每通道量化到16级后统计）
+        sample = pixels[y:y + h:2, x:x + w:2] >> 4
+        colors = np.unique(sample.reshape(-1, 3).astype(np.int32) @ np.array([256, 16, 1], dtype=np.int32))
+        if len(colors) > 64:
+            return "image"
+    return "heading" if page_height * 0.035 <= h <= page_height * 0.08 else "text"
+
+
+# 全局设计稿分析器（首次访问时创建，模板索引常驻内存）
+design_analyzer = LazyObject(DesignAnalyzer)
@@ -0,0 +1,569 @@
+"""
+Generation Jobs
+异步图像生成任务 - 扩散过程中推送低分辨率潜空间预览，支持提前取消；
+多worker部署时任务状态、事件与结果经Redis共享（IMAGE_JOB_BACKEND=redis）
+"""
+
+import asyncio
+import base64
+import io
+import json
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Set, Union
+from uuid import uuid4
+
+import numpy as np
+from loguru import logger
+from PIL import Image
+from starlette.concurrency import run_in_threadpool
+
+from core.config import settings
+from core.metrics import CANCELLED_JOBS, CANCELLED_SECONDS_RECLAIMED, CANCELLED_STEPS_RECLAIMED
+from core.redis import cache
+
+
+class GenerationCancelled(Exception):
+    """生成任务已被取消"""
+
+
+class JobBackendUnavailable(Exception):
+    """任务表无法被其他worker访问（多worker下的memory后端，或redis后端未连接Redis）"""
+
+
+# 潜空间前4通道 -> RGB 的线性近似，代替完整的VAE解码
+LATENT_RGB_FACTORS = {
+    "sdxl": (
+        [[0.3651, 0.4232, 0.4341],
+         [-0.2533, -0.0042, 0.1068],
+         [0.1076, 0.1111, -0.0362],
+         [-0.3165, -0.2492, -0.2188]],
+        [0.1084, -0.0175, -0.0011],
+    ),
+    "sd": (
+        [[0.3512, 0.2297, 0.3227],
+         [0.3250, 0.4974, 0.2350],
+         [-0.2829, 0.1762, 0.2721],
+         [-0.2120, -0.2616, -0.7177]],
+        [0.0, 0.0, 0.0],
+    ),
+}
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+# redis后端的键：任务状态哈希（snapshot/preview/terminal/结果）、事件频道、订阅者计数与取消请求频道
+JOB_KEY = "jobs:{job_id}"
+JOB_EVENTS = "jobs:{job_id}:events"
+JOB_SUBSCRIBERS = "jobs:{job_id}:subscribers"
+JOB_CONTROL = "jobs:control"
+SNAPSHOT_FIELDS = ("job_id", "status", "step", "total_steps", "error")
+
+
+def latent_format_for(model_id: str) -> str:
+    """按模型ID选择潜空间预览系数"""
+    return "sdxl" if "xl" in model_id.lower() else "sd"
+
+
+def latents_to_preview(latents: Any, latent_format: str = "sdxl") -> Optional[Image.Image]:
+    """潜变量 [1, C, h, w] 线性投影为RGB预览图（输出分辨率的1/8），不支持的形状返回None"""
+    if hasattr(latents, "detach"):
+        latents = latents.detach()[:1].float().cpu().numpy()
+    latents = np.asarray(latents)
+    if latents.ndim != 4 or latents.shape[1] < 4:
+        return None  # 例如FLUX的打包潜变量
+
+    factors, bias = LATENT_RGB_FACTORS[latent_format]
+    rgb = np.einsum(
+        "chw,cr->hwr",
+        latents[0, :4].astype(np.float32),
+        np.asarray(factors, dtype=np.float32)
+    ) + np.asarray(bias, dtype=np.float32)
+    rgb = ((rgb + 1.0) * 127.5).clip(0, 255).astype(np.uint8)
+    return Image.fromarray(rgb, "RGB")
+
+
+def encode_preview(image: Image.Image) -> bytes:
+    """预览图编码为JPEG（几十KB以内）"""
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=70)
+    return output.getvalue()
+
+
+class StepReporter:
+    """逐步进度接收方：按间隔生成预览，由子类决定如何上报以及是否取消"""
+
+    def __init__(self, preview_every: int, latent_format: str):
+        self.preview_every = max(1, preview_every)
+        self.latent_format = latent_format
+
+    def on_step(self, step: int, total: Optional[int], latents: Any = None):
+        """pipeline每步结束时调用（推理线程中）"""
+        preview = None
+        if latents is not None and (step % self.preview_every == 0) and step != total:
+            image = latents_to_preview(latents, self.latent_format)
+            if image is not None:
+                preview = encode_preview(image)
+        self.report(step, total, preview)
+
+    def report(self, step: int, total: Optional[int], preview: Optional[bytes]):
+        raise NotImplementedError
+
+    def check_cancelled(self):
+        """已取消时抛出GenerationCancelled"""
+
+
+def step_callback_kwargs(pipe: Any, reporter: StepReporter, total_steps: Optional[int]) -> Dict[str, Any]:
+    """构造pipeline的逐步回调参数（diffusers callback_on_step_end / optimum旧式callback）"""
+    inner = getattr(pipe, "inner", pipe)  # TiledPipeline
+
+    if type(inner).__module__.startswith("optimum"):
+        def callback(step, timestep, latents):
+            reporter.on_step(step + 1, total_steps, latents)
+
+        return {"callback": callback, "callback_steps": 1}
+
+    def on_step_end(pipeline, step, timestep, callback_kwargs):
+        total = getattr(pipeline, "num_timesteps", None) or total_steps
+        reporter.on_step(step + 1, total, callback_kwargs.get("latents"))
+        return callback_kwargs
+
+    return {"callback_on_step_end": on_step_end}
+
+
+class GenerationJob(StepReporter):
+    """一次异步生成任务，事件通过asyncio队列推送给订阅者"""
+
+    def __init__(
+        self,
+        registry: "JobRegistry",
+        endpoint: str,
+        total_steps: Optional[int],
+        preview_every: int,
+        latent_format: str,
+        loop: asyncio.AbstractEventLoop,
+    ):
+        super().__init__(preview_every, latent_format)
+        self.id = uuid4().hex
+        self.endpoint = endpoint
+        self.status = "queued"
+        self.step = 0
+        self.total_steps = total_steps
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.cancel_reason: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+        self._registry = registry
+        self._loop = loop
+        self._cancelled = threading.Event()
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._terminal_event: Optional[Dict[str, Any]] = None
+        self._last_preview: Optional[Dict[str, Any]] = None
+        self._first_step_at: Optional[float] = None
+        self._last_step_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def snapshot(self) -> Dict[str, Any]:
+        """任务状态"""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "step": self.step,
+            "total_steps": self.total_steps,
+            "error": self.error,
+        }
+
+    # ---- 推理线程侧 ----
+
+    def report(self, step: int, total: Optional[int], preview: Optional[bytes]):
+        self.check_cancelled()
+
+        now = time.perf_counter()
+        if self._first_step_at is None:
+            self._first_step_at = now
+        self._last_step_at = now
+        self.step = step
+        if total:
+            self.total_steps = total
+
+        self._publish({"event": "progress", "step": step, "total_steps": self.total_steps})
+        if preview is not None:
+            event = {
+                "event": "preview",
+                "step": step,
+                "total_steps": self.total_steps,
+                "image": "data:image/jpeg;base64," + base64.b64encode(preview).decode("ascii"),
+            }
+            self._last_preview = event
+            self._publish(event)
+
+    def check_cancelled(self):
+        if self._cancelled.is_set():
+            raise GenerationCancelled(self.cancel_reason or "cancelled")
+
+    # ---- 事件循环侧 ----
+
+    def cancel(self, reason: str = "client") -> bool:
+        """请求取消；推理在下一步结束时停止"""
+        if self.finished or self._cancelled.is_set():
+            return False
+        self.cancel_reason = reason
+        self._cancelled.set()
+        logger.info(f"Cancelling generation job {self.id} ({reason}) at step {self.step}/{self.total_steps}")
+        return True
+
+    def subscribe(self) -> asyncio.Queue:
+        """订阅事件；先收到当前状态和最近一次预览"""
+        queue: asyncio.Queue = asyncio.Queue()
+        queue.put_nowait({"event": "status", **self.snapshot()})
+        if self._last_preview is not None:
+            queue.put_nowait(self._last_preview)
+        if self._terminal_event is not None:
+            queue.put_nowait(self._terminal_event)
+        else:
+            self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, cancel_if_last: bool = True):
+        """取消订阅；最后一个订阅者离开时视为任务被放弃（cancel_if_last=False 时由调用方按全局订阅数判断）"""
+        self._subscribers.discard(queue)
+        if cancel_if_last and not self._subscribers and not self.finished and settings.IMAGE_CANCEL_ON_DISCONNECT:
+            self.cancel("disconnect")
+
+    def start(
+        self,
+        func: Callable[["GenerationJob"], Any],
+        describe: Optional[Callable[[Any], Dict]] = None,
+        on_finished: Optional[Callable[[], None]] = None,
+    ):
+        """在线程池中执行 func(job)；on_finished在任务结束（含开始前被取消）时调用"""
+        self._task = self._loop.create_task(self._run(func, describe, on_finished))
+
+    async def _run(
+        self,
+        func: Callable[["GenerationJob"], Any],
+        describe: Optional[Callable[[Any], Dict]],
+        on_finished: Optional[Callable[[], None]],
+    ):
+        self.status = "running"
+        extra: Dict[str, Any] = {}
+        try:
+            self.check_cancelled()
+            self.result = await run_in_threadpool(func, self)
+            self.status = "completed"
+            if describe is not None:
+                extra = describe(self.result)
+            self._registry.record_step_time(self.endpoint, self._seconds_per_step())
+        except GenerationCancelled:
+            self.status = "cancelled"
+            self._record_reclaimed()
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            logger.error(f"Generation job {self.id} failed: {e}")
+        finally:
+            if on_finished is not None:
+                on_finished()
+            self.finished_at = time.time()
+            self._terminal_event = {"event": self.status, **self.snapshot(), **extra}
+            self._fanout(self._terminal_event)
+            self._subscribers.clear()
+
+    def _seconds_per_step(self) -> Optional[float]:
+        if self._first_step_at is None or self.step < 2:
+            return None
+        return (self._last_step_at - self._first_step_at) / (self.step - 1)
+
+    def _record_reclaimed(self):
+        """记录取消节省的推理步数与估算耗时"""
+        reason = self.cancel_reason or "client"
+        CANCELLED_JOBS.labels(self.endpoint, reason).inc()
+
+        remaining = max(0, (self.total_steps or 0) - self.step)
+        if not remaining:
+            return
+        CANCELLED_STEPS_RECLAIMED.labels(self.endpoint).inc(remaining)
+
+        seconds_per_step = self._seconds_per_step() or self._registry.step_seconds.get(self.endpoint)
+        if seconds_per_step:
+            CANCELLED_SECONDS_RECLAIMED.labels(self.endpoint).inc(remaining * seconds_per_step)
+
+    def _publish(self, event: Dict[str, Any]):
+        self._loop.call_soon_threadsafe(self._fanout, event)
+
+    def _fanout(self, event: Dict[str, Any]):
+        for queue in list(self._subscribers):
+            queue.put_nowait(event)
+        self._registry.mirror(self, event)
+
+
+class SharedJob:
+    """其他worker上的任务：Redis中状态的只读视图"""
+
+    def __init__(self, job_id: str, state: Dict[str, str]):
+        self.id = job_id
+        # 结束事件包含最终状态，snapshot可能是更早写入的
+        latest = json.loads(state.get("terminal") or state["snapshot"])
+        self._snapshot = {field: latest.get(field) for field in SNAPSHOT_FIELDS}
+        self.status = self._snapshot["status"]
+        self.result: Optional[Dict[str, Any]] = None
+        if "result" in state:
+            self.result = {
+                "image_data": base64.b64decode(state["result"]),
+                "width": int(state["result_width"]),
+                "height": int(state["result_height"]),
+            }
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(self._snapshot)
+
+
+class JobRegistry:
+    """
+    生成任务表，完成的任务保留IMAGE_JOB_TTL秒
+
+    任务总是在创建它的进程中执行。memory后端只有本进程能查询/订阅/取消，不能用于多worker；
+    redis后端把状态、事件（pub/sub）与结果写入Redis，其他worker读取状态、转发事件，
+    取消请求经 jobs:control 频道送回持有任务的worker，断线取消按所有worker的订阅者总数判断
+    """
+
+    def __init__(self, ttl: Optional[int] = None, backend: Optional[str] = None, redis: Any = None):
+        self.ttl = ttl if ttl is not None else settings.IMAGE_JOB_TTL
+        self.backend = backend or settings.IMAGE_JOB_BACKEND
+        if self.backend not in ("memory", "redis"):
+            raise ValueError(f"Unknown job backend: {self.backend}")
+        self._jobs: Dict[str, GenerationJob] = {}
+        # 每个端点最近的平均单步耗时，用于估算排队中被取消任务节省的时间
+        self.step_seconds: Dict[str, float] = {}
+
+        self._redis_client = redis  # 未指定时使用全局Redis连接
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._outbox: Optional[asyncio.Queue] = None
+        self._publisher: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def shared(self) -> bool:
+        return self.backend == "redis"
+
+    def create(
+        self,
+        endpoint: str,
+        total_steps: Optional[int] = None,
+        preview_every: Optional[int] = None,
+    ) -> GenerationJob:
+        """创建任务（需在事件循环中调用）"""
+        self._purge()
+        job = GenerationJob(
+            self,
+            endpoint,
+            total_steps,
+            preview_every or settings.IMAGE_PREVIEW_EVERY,
+            latent_format_for(settings.IMAGE_MODEL_ID),
+            asyncio.get_running_loop(),
+        )
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        return self._jobs.get(job_id)
+
+    # ---- 跨worker共享（redis后端） ----
+
+    async def _redis(self):
+        return self._redis_client if self._redis_client is not None else await cache.get_client()
+
+    async def prepare(self):
+        """创建任务前调用：确认其他worker能访问任务，redis后端启动取消请求监听"""
+        if not self.shared:
+            if settings.WORKERS > 1:
+                raise JobBackendUnavailable("Generation jobs need IMAGE_JOB_BACKEND=redis when WORKERS > 1")
+            return
+        client = await self._redis()
+        if client is None:
+            raise JobBackendUnavailable("Generation jobs need Redis (IMAGE_JOB_BACKEND=redis)")
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._outbox = asyncio.Queue()
+            self._publisher = loop.create_task(self._publish_events())
+            self._listener = None
+        if self._listener is None or self._listener.done():
+            pubsub = client.pubsub()
+            await pubsub.subscribe(JOB_CONTROL)
+            self._listener = loop.create_task(self._listen_control(pubsub))
+
+    async def close(self):
+        """停止事件写入与取消请求监听（关闭时调用）"""
+        for task in (self._publisher, self._listener):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._loop = self._outbox = self._publisher = self._listener = None
+
+    async def share(self, job: GenerationJob):
+        """redis后端：在返回任务ID之前写入初始状态，其他worker立即可以查询"""
+        if self.shared:
+            await self._write(job, None)
+
+    def mirror(self, job: GenerationJob, event: Dict[str, Any]):
+        """事件按发生顺序交给后台任务写入Redis（事件循环中调用）"""
+        if self.shared and self._outbox is not None and job._loop is self._loop:
+            self._outbox.put_nowait((job, event))
+
+    async def _publish_events(self):
+        while True:
+            job, event = await self._outbox.get()
+            try:
+                await self._write(job, event)
+            except Exception as e:
+                logger.warning(f"Generation job {job.id} event not shared: {e}")
+
+    async def _write(self, job: GenerationJob, event: Optional[Dict[str, Any]]):
+        client = await self._redis()
+        fields = {"snapshot": json.dumps(job.snapshot())}
+        if event is not None and event["event"] == "preview":
+            fields["preview"] = json.dumps(event)
+        if event is not None and event["event"] in TERMINAL_STATUSES:
+            fields["terminal"] = json.dumps(event)
+            if job.status == "completed" and isinstance(job.result, dict) and "image_data" in job.result:
+                fields["result"] = base64.b64encode(bytes(job.result["image_data"])).decode("ascii")
+                fields["result_width"] = job.result["width"]
+                fields["result_height"] = job.result["height"]
+
+        key = JOB_KEY.format(job_id=job.id)
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping=fields)
+            pipe.expire(key, self.ttl)
+            if event is not None:
+                pipe.publish(JOB_EVENTS.format(job_id=job.id), json.dumps(event))
+            await pipe.execute()
+
+    async def _listen_control(self, pubsub):
+        """取消请求：只处理本进程持有的任务"""
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                request = json.loads(message["data"])
+                job = self._jobs.get(request["job_id"])
+                if job is not None:
+                    job.cancel(request["reason"])
+        finally:
+            await pubsub.aclose()
+
+    async def lookup(self, job_id: str) -> Optional[Union[GenerationJob, SharedJob]]:
+        """本进程的任务，或（redis后端）其他worker上的任务"""
+        job = self._jobs.get(job_id)
+        if job is not None or not self.shared:
+            return job
+        client = await self._redis()
+        state = await client.hgetall(JOB_KEY.format(job_id=job_id)) if client is not None else None
+        return SharedJob(job_id, state) if state else None
+
+    async def cancel(self, job: Union[GenerationJob, SharedJob], reason: str = "client") -> bool:
+        """取消任务；其他worker上的任务经 jobs:control 频道通知"""
+        if isinstance(job, GenerationJob):
+            return job.cancel(reason)
+        if job.finished:
+            return False
+        client = await self._redis()
+        await client.publish(JOB_CONTROL, json.dumps({"job_id": job.id, "reason": reason}))
+        return True
+
+    async def events(self, job: Union[GenerationJob, SharedJob]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        订阅任务事件直到结束事件：先是当前状态与最近一次预览
+
+        redis后端按所有worker的订阅者总数判断断线取消：最后一个订阅者离开时取消未结束的任务
+        """
+        if not self.shared:
+            async for event in self._local_events(job, cancel_if_last=True):
+                yield event
+            return
+
+        client = await self._redis()
+        subscribers = JOB_SUBSCRIBERS.format(job_id=job.id)
+        finished = job.finished
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.incr(subscribers)
+            pipe.expire(subscribers, self.ttl)
+            await pipe.execute()
+        try:
+            if isinstance(job, GenerationJob):
+                source = self._local_events(job, cancel_if_last=False)
+            else:
+                source = self._shared_events(client, job.id)
+            async for event in source:
+                yield event
+                finished = event["event"] in TERMINAL_STATUSES
+        finally:
+            remaining = await client.decr(subscribers)
+            if remaining <= 0 and not finished and settings.IMAGE_CANCEL_ON_DISCONNECT:
+                await self.cancel(job, "disconnect")
+
+    @staticmethod
+    async def _local_events(job: GenerationJob, cancel_if_last: bool) -> AsyncIterator[Dict[str, Any]]:
+        queue = job.subscribe()
+        try:
+            while True:
+                event = await queue.get()
+                yield event
+                if event["event"] in TERMINAL_STATUSES:
+                    return
+        finally:
+            job.unsubscribe(queue, cancel_if_last)
+
+    @staticmethod
+    async def _shared_events(client, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """转发其他worker发布的事件；先订阅再读状态，避免漏掉两者之间的事件"""
+        pubsub = client.pubsub()
+        await pubsub.subscribe(JOB_EVENTS.format(job_id=job_id))
+        try:
+            state = await client.hgetall(JOB_KEY.format(job_id=job_id))
+            if not state:
+                return
+            yield {"event": "status", **SharedJob(job_id, state).snapshot()}
+            if "terminal" in state:
+                yield json.loads(state["terminal"])
+                return
+            if "preview" in state:
+                yield json.loads(state["preview"])
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                event = json.loads(message["data"])
+                yield event
+                if event["event"] in TERMINAL_STATUSES:
+                    return
+        finally:
+            await pubsub.aclose()
+
+    def record_step_time(self, endpoint: str, seconds: Optional[float]):
+        if seconds is None:
+            return
+        previous = self.step_seconds.get(endpoint)
+        self.step_seconds[endpoint] = seconds if previous is None else 0.8 * previous + 0.2 * seconds
+
+    def _purge(self):
+        cutoff = time.time() - self.ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+
+# 全局任务表
+job_registry = JobRegistry()
@@ -3,16 +3,31 @@ Image Generation Service
 图像生成服务 - 支持Hero Banner、Icon、背景纹理等
 """
 
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from pathlib import Path
 from PIL import Image
-import io
+import threading
+import time
 from loguru import logger
-import torch
+from core.admission import image_admission
+from core.image_buffer import encode_image
+from core.lazy import LazyObject
+from core.metrics import bounded_label, observe_stage, track_stage
+from schemas.image import ImageSize, ImageStyle
+from services.generation_jobs import StepReporter, step_callback_kwargs
+from services.near_duplicates import near_duplicates
+from services.prompt_embeddings import prompt_embedding_cache
 
 # 延迟导入AI模型，避免在没有依赖时失败
 try:
-    from services.ai_models import get_image_generator, get_clip_model, get_clip_preprocess
+    from services.ai_models import (
+        get_image_generator,
+        get_clip_model,
+        get_clip_preprocess,
+        get_generation_profile,
+        apply_scheduler_profile,
+        make_generator
+    )
     AI_MODELS_AVAILABLE = True
 except ImportError:
     AI_MODELS_AVAILABLE = False
@@ -65,17 +80,94 @@ class ImageGenerationService:
         "thumbnail": (256, 256)
     }
 
+    # Icon/背景的默认推理步数（准入控制降级时由调用方传入更少的步数）
+    ICON_INFERENCE_STEPS = 30
+    BACKGROUND_INFERENCE_STEPS = 40
+
+    # Icon风格提示词
+    ICON_STYLE_PROMPTS = {
+        "outline": "icon, outline style, simple lines, vector, transparent background",
+        "filled": "icon, filled style, solid shapes, vector, transparent background",
+        "lineart": "icon, line art, minimalist, clean lines, transparent background",
+        "minimal": "icon, minimal, geometric, simple, transparent background",
+        "3d": "icon, 3d rendered, soft shadows, modern, transparent background"
+    }
+
+    # 背景风格提示词（{colors}为颜色提示词）
+    BACKGROUND_STYLE_PROMPTS = {
+        "gradient": "beautiful gradient, smooth color transitions, {colors}, modern",
+        "pattern": "geometric pattern, {colors}, subtle, professional background",
+        "abstract": "abstract background, artistic, {colors}, subtle texture",
+        "mesh": "mesh gradient, {colors}, smooth, modern, elegant",
+        "noise": "subtle noise texture, {colors}, professional background"
+    }
+
     def __init__(self):
         if AI_MODELS_AVAILABLE:
             self.generator = get_image_generator()
             self.clip_model = get_clip_model()
             self.clip_preprocess = get_clip_preprocess()
+            self.generation_profile = get_generation_profile()
         else:
             self.generator = None
             self.clip_model = None
             self.clip_preprocess = None
+            self.generation_profile = None
 
         self.demo_mode = not self.generator  # 如果没有生成器，使用演示模式
+        # 多worker部署时生成器为模型服务客户端，CLIP也在模型服务进程中
+        self.remote = getattr(self.generator, "is_remote", False)
+
+        # diffusers pipeline非线程安全，同一时间只允许一个推理；等待时间记为queue_wait
+        self._pipeline_lock = threading.Lock()
+
+    def _run_pipeline(
+        self,
+        endpoint: str,
+        style: str,
+        size: str,
+        seed: Optional[int] = None,
+        progress: Optional[StepReporter] = None,
+        **kwargs
+    ):
+        """串行执行推理并记录排队与推理耗时；progress接收逐步进度与预览，可在步间取消"""
+        # 准入控制按请求的步数估算耗时（调度器配置可能在此之后改写步数）
+        requested_steps = kwargs.get("num_inference_steps")
+        # 远程模式下由模型服务按其加载的模型处理种子与步数限制
+        if self.remote:
+            kwargs["seed"] = seed
+            if progress is not None:
+                kwargs["progress"] = progress
+        else:
+            if seed is not None:
+                kwargs["generator"] = make_generator(self.generator, seed)
+            apply_scheduler_profile(kwargs, self.generation_profile)
+            if progress is not None:
+                kwargs.update(step_callback_kwargs(self.generator, progress, kwargs.get("num_inference_steps")))
+
+        wait_start = time.perf_counter()
+        with self._pipeline_lock:
+            observe_stage(endpoint, "queue_wait", time.perf_counter() - wait_start, style, size)
+            if progress is not None:
+                progress.check_cancelled()  # 排队期间已被取消则不再推理
+            if not self.remote:
+                # 相同提示词（种子变体、重复的风格预设）只运行一次文本编码器
+                kwargs = prompt_embedding_cache.apply(self.generator, kwargs)
+            inference_start = time.perf_counter()
+            with track_stage(endpoint, "inference", style, size):
+                result = self.generator(**kwargs)
+
+        if requested_steps and "width" in kwargs:
+            image_admission.observe(
+                endpoint, kwargs["width"], kwargs["height"], requested_steps,
+                time.perf_counter() - inference_start
+            )
+        return result
+
+    def _encode_png(self, image: Image.Image, endpoint: str, style: str, size: str) -> memoryview:
+        """编码为PNG并记录编码耗时（返回编码缓冲区的memoryview，不复制）"""
+        with track_stage(endpoint, "encoding", style, size):
+            return encode_image(image, format="PNG")
 
     def generate_hero_banner(
         self,
@@ -85,7 +177,10 @@ class ImageGenerationService:
         negative_prompt: Optional[str] = None,
         guidance_scale: float = 7.5,
         num_inference_steps: int = 50,
-        seed: Optional[int] = None
+        seed: Optional[int] = None,
+        progress: Optional[StepReporter] = None,
+        demo: bool = False,
+        owner: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         生成Hero Banner
@@ -98,30 +193,34 @@ class ImageGenerationService:
             guidance_scale: 引导强度
             num_inference_steps: 推理步数
             seed: 随机种子
+            progress: 逐步进度/预览接收方（异步任务）
+            demo: 使用演示渲染（过载时准入控制降级）
+            owner: 近重复检测的用户范围；None表示不检测
         """
         try:
-            if self.demo_mode:
+            # 尺寸预设名或 "宽x高"
+            if "x" in size:
+                width, height = map(int, size.split("x"))
+            else:
+                width, height = self.SIZE_PRESETS.get(size, self.SIZE_PRESETS["hero_medium"])
+
+            if self.demo_mode or demo:
                 # 演示模式：生成一个示例图像
                 logger.info(f"[Demo Mode] Generating hero banner: {prompt[:50]}...")
 
-                # 获取尺寸
-                if "x" in size:
-                    width, height = map(int, size.split("x"))
-                else:
-                    width, height = self.SIZE_PRESETS.get(size, self.SIZE_PRESETS["hero_medium"])
+                style_label, size_label = stage_labels(style, width, height)
 
                 # 创建示例图像 - 简单的渐变背景
                 try:
-                    image = self._generate_demo_image(width, height, style)
+                    with track_stage("hero_banner", "inference", style_label, size_label):
+                        image = self._generate_demo_image(width, height, style)
                 except Exception as e:
                     logger.error(f"Failed to generate demo image: {e}")
                     # 降级为纯色背景
                     image = Image.new('RGB', (width, height), color=(100, 100, 200))
 
                 # 转换为bytes
-                img_byte_arr = io.BytesIO()
-                image.save(img_byte_arr, format='PNG')
-                img_bytes = img_byte_arr.getvalue()
+                img_bytes = self._encode_png(image, "hero_banner", style_label, size_label)
 
                 logger.info(f"[Demo Mode] Hero banner generated | Size: {len(img_bytes)} bytes")
 
@@ -145,35 +244,51 @@ class ImageGenerationService:
             full_prompt = f"{prompt}, {style_config['prompt_additions']}, 8k, ultra detailed, masterpiece"
             full_negative = negative_prompt or style_config['negative_prompt']
 
-            # 获取尺寸
-            width, height = self.SIZE_PRESETS.get(size, self.SIZE_PRESETS["hero_medium"])
-
             logger.info(f"Generating hero banner: {prompt[:50]}... | Style: {style} | Size: {width}x{height}")
 
             # 生成图像
-            generator = None
-            if seed is not None:
-                generator = torch.Generator(device=self.generator.device).manual_seed(seed)
-
-            result = self.generator(
+            style_label, size_label = stage_labels(style, width, height)
+            result = self._run_pipeline(
+                "hero_banner", style_label, size_label,
                 prompt=full_prompt,
                 negative_prompt=full_negative,
                 width=width,
                 height=height,
                 guidance_scale=guidance_scale,
                 num_inference_steps=num_inference_steps,
-                generator=generator
+                seed=seed,
+                progress=progress
             )
 
             image = result.images[0]
 
+            # 编码前查找该用户的近重复结果，命中时复用已编码的图像
+            image_hash = duplicate = None
+            if owner is not None:
+                with track_stage("hero_banner", "dedup", style_label, size_label):
+                    image_hash, duplicate = near_duplicates.check(owner, image)
+            if duplicate is not None:
+                original = duplicate.original
+                logger.info(
+                    f"♻️ Hero banner is a near-duplicate of {original.generation_id} "
+                    f"(distance {duplicate.distance}), reusing encoded image"
+                )
+                return {
+                    "image_data": original.image_data,
+                    "width": width,
+                    "height": height,
+                    "format": "PNG",
+                    "aesthetic_score": original.aesthetic_score,
+                    "prompt": full_prompt,
+                    "seed": seed,
+                    "duplicate_of": original.generation_id,
+                }
+
             # 转换为bytes
-            img_byte_arr = io.BytesIO()
-            image.save(img_byte_arr, format='PNG')
-            img_bytes = img_byte_arr.getvalue()
+            img_bytes = self._encode_png(image, "hero_banner", style_label, size_label)
 
             # 计算CLIP美学分数
-            aesthetic_score = self._calculate_aesthetic_score(image) if self.clip_model else None
+            aesthetic_score = self._calculate_aesthetic_score(image) if self.clip_model or self.remote else None
 
             logger.info(f"✅ Hero banner generated | Size: {len(img_bytes)} bytes | Aesthetic: {aesthetic_score}")
 
@@ -184,7 +299,8 @@ class ImageGenerationService:
                 "format": "PNG",
                 "aesthetic_score": aesthetic_score,
                 "prompt": full_prompt,
-                "seed": seed
+                "seed": seed,
+                "image_hash": image_hash
             }
 
         except Exception as e:
@@ -197,7 +313,8 @@ class ImageGenerationService:
         style: str = "outline",
         count: int = 1,
         size: str = "icon",
-        seed: Optional[int] = None
+        seed: Optional[int] = None,
+        num_inference_steps: int = ICON_INFERENCE_STEPS
     ) -> List[Dict[str, Any]]:
         """
         生成Icon
@@ -206,50 +323,40 @@ class ImageGenerationService:
             concept: 图标概念描述
             style: 图标风格 (outline, filled, lineart, minimal, 3d)
             count: 生成数量
-            size: 尺寸
+            size: 尺寸预设名或 "宽x高"
             seed: 随机种子
+            num_inference_steps: 每个图标的推理步数
         """
         icons = []
 
         try:
-            width, height = self.SIZE_PRESETS.get(size, self.SIZE_PRESETS["icon"])
-
-            # Icon特定风格提示词
-            style_prompts = {
-                "outline": "icon, outline style, simple lines, vector, transparent background",
-                "filled": "icon, filled style, solid shapes, vector, transparent background",
-                "lineart": "icon, line art, minimalist, clean lines, transparent background",
-                "minimal": "icon, minimal, geometric, simple, transparent background",
-                "3d": "icon, 3d rendered, soft shadows, modern, transparent background"
-            }
+            if "x" in size:
+                width, height = map(int, size.split("x"))
+            else:
+                width, height = self.SIZE_PRESETS.get(size, self.SIZE_PRESETS["icon"])
+            style_label, size_label = stage_labels(style, width, height)
 
-            style_prompt = style_prompts.get(style, style_prompts["outline"])
+            style_prompt = self.ICON_STYLE_PROMPTS.get(style, self.ICON_STYLE_PROMPTS["outline"])
+            full_prompt = f"{concept} icon, {style_prompt}, professional design, high quality"
 
+            # 各变体只有种子不同，提示词编码由缓存复用
             for i in range(count):
-                full_prompt = f"{concept} icon, {style_prompt}, professional design, high quality"
-
                 logger.info(f"Generating icon {i+1}/{count}: {concept}")
 
-                generator = None
-                if seed is not None:
-                    current_seed = seed + i
-                    generator = torch.Generator(device=self.generator.device).manual_seed(current_seed)
-
-                result = self.generator(
+                result = self._run_pipeline(
+                    "icon", style_label, size_label,
                     prompt=full_prompt,
                     negative_prompt="complex, detailed, photograph, realistic",
                     width=width,
                     height=height,
                     guidance_scale=8.0,
-                    num_inference_steps=30,
-                    generator=generator
+                    num_inference_steps=num_inference_steps,
+                    seed=seed + i if seed is not None else None
                 )
 
                 image = result.images[0]
 
-                img_byte_arr = io.BytesIO()
-                image.save(img_byte_arr, format='PNG')
-                img_bytes = img_byte_arr.getvalue()
+                img_bytes = self._encode_png(image, "icon", style_label, size_label)
 
                 icons.append({
                     "image_data": img_bytes,
@@ -274,7 +381,8 @@ class ImageGenerationService:
         colors: Optional[List[str]] = None,
         complexity: str = "medium",
         size: str = "hero_medium",
-        seed: Optional[int] = None
+        seed: Optional[int] = None,
+        num_inference_steps: int = BACKGROUND_INFERENCE_STEPS
     ) -> Dict[str, Any]:
         """
         生成背景纹理
@@ -283,8 +391,9 @@ class ImageGenerationService:
             style: 背景风格 (gradient, pattern, abstract, mesh, noise)
             colors: 颜色列表
             complexity: 复杂度 (low, medium, high)
-            size: 尺寸
+            size: 尺寸预设名或 "宽x高"
             seed: 随机种子
+            num_inference_steps: 推理步数
         """
         try:
             # 构建颜色提示词
@@ -293,15 +402,6 @@ class ImageGenerationService:
             else:
                 color_prompt = "vibrant, modern colors"
 
-            # 风格提示词
-            style_prompts = {
-                "gradient": f"beautiful gradient, smooth color transitions, {color_prompt}, modern",
-                "pattern": f"geometric pattern, {color_prompt}, subtle, professional background",
-                "abstract": f"abstract background, artistic, {color_prompt}, subtle texture",
-                "mesh": f"mesh gradient, {color_prompt}, smooth, modern, elegant",
-                "noise": f"subtle noise texture, {color_prompt}, professional background"
-            }
-
             # 复杂度控制
             complexity_prompts = {
                 "low": "simple, minimal",
@@ -309,31 +409,31 @@ class ImageGenerationService:
                 "high": "complex, detailed, intricate"
             }
 
-            full_prompt = f"{style_prompts.get(style, style_prompts['gradient'])}, {complexity_prompts.get(complexity, 'balanced')}"
+            style_prompt = self.BACKGROUND_STYLE_PROMPTS.get(style, self.BACKGROUND_STYLE_PROMPTS["gradient"])
+            full_prompt = f"{style_prompt.format(colors=color_prompt)}, {complexity_prompts.get(complexity, 'balanced')}"
 
-            width, height = self.SIZE_PRESETS.get(size, self.SIZE_PRESETS["hero_medium"])
+            if "x" in size:
+                width, height = map(int, size.split("x"))
+            else:
+                width, height = self.SIZE_PRESETS.get(size, self.SIZE_PRESETS["hero_medium"])
+            style_label, size_label = stage_labels(style, width, height)
 
             logger.info(f"Generating background: {style} | Complexity: {complexity}")
 
-            generator = None
-            if seed is not None:
-                generator = torch.Generator(device=self.generator.device).manual_seed(seed)
-
-            result = self.generator(
+            result = self._run_pipeline(
+                "background", style_label, size_label,
                 prompt=full_prompt,
                 negative_prompt="distracting, busy, overwhelming, photo, realistic",
                 width=width,
                 height=height,
                 guidance_scale=6.0,
-                num_inference_steps=40,
-                generator=generator
+                num_inference_steps=num_inference_steps,
+                seed=seed
             )
 
             image = result.images[0]
 
-            img_byte_arr = io.BytesIO()
-            image.save(img_byte_arr, format='PNG')
-            img_bytes = img_byte_arr.getvalue()
+            img_bytes = self._encode_png(image, "background", style_label, size_label)
 
             logger.info(f"✅ Background generated | Style: {style}")
             return {
@@ -399,9 +499,14 @@ class ImageGenerationService:
             美学分数 (0-1)
         """
         try:
+            if self.remote:
+                return self.generator.aesthetic_score(image)
+
             if not self.clip_model or not self.clip_preprocess:
                 return 0.5
 
+            import torch
+
             # 预处理图像
             image_input = self.clip_preprocess(image).unsqueeze(0)
 
@@ -420,5 +525,20 @@ class ImageGenerationService:
             return 0.5
 
 
-# 全局服务实例
-image_service = ImageGenerationService()
+# 阶段耗时指标中允许的风格与尺寸（"宽x高"）标签
+STAGE_STYLES = frozenset(
+    [*ImageGenerationService.STYLE_PRESETS, *ImageGenerationService.ICON_STYLE_PROMPTS,
+     *ImageGenerationService.BACKGROUND_STYLE_PROMPTS, *(style.value for style in ImageStyle)]
+)
+STAGE_SIZES = frozenset(
+    [*(f"{w}x{h}" for w, h in ImageGenerationService.SIZE_PRESETS.values()), *(size.value for size in ImageSize)]
+)
+
+
+def stage_labels(style: Optional[str], width: int, height: int) -> Tuple[str, str]:
+    """阶段耗时指标的 style/size 标签：只保留预设取值，其余记为other"""
+    return bounded_label(style, STAGE_STYLES), bounded_label(f"{width}x{height}", STAGE_SIZES)
+
+
+# 全局服务实例（首次访问时创建）
+image_service = LazyObject(ImageGenerationService)
@@ -0,0 +1,332 @@
+"""
+Model Server
+模型服务进程 - 独占ModelManager，多个API worker通过Unix socket调用，生成的像素经共享内存返回
+
+启动方式：
+    MODEL_SERVER_ENABLED=true WORKERS=4 python main.py   # 自动拉起模型服务进程
+    MODEL_SERVER_AUTHKEY=... python -m services.model_server   # 单独部署（worker需使用相同的密钥）
+
+连接上传输的是pickle：只有持有本次启动的 MODEL_SERVER_AUTHKEY 的进程能连接，socket所在目录仅本用户可访问
+"""
+
+import asyncio
+import multiprocessing
+import os
+import secrets
+import signal
+import socket
+import threading
+from multiprocessing.connection import Client, Connection, Listener
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from PIL import Image
+
+from core.config import settings
+from core.image_buffer import SharedImageBuffer
+from services.ai_models import (
+    model_manager,
+    get_image_generator,
+    get_generation_profile,
+    apply_scheduler_profile,
+    make_generator
+)
+from services.generation_jobs import GenerationCancelled, StepReporter, step_callback_kwargs
+from services.prompt_embeddings import prompt_embedding_cache
+
+
+def _authkey() -> bytes:
+    if not settings.MODEL_SERVER_AUTHKEY:
+        raise RuntimeError("MODEL_SERVER_AUTHKEY is not set; start the model server through main.py or configure a key")
+    return settings.MODEL_SERVER_AUTHKEY.encode()
+
+
+def ensure_authkey() -> str:
+    """本次启动的连接密钥：未配置时随机生成，写入环境变量由之后启动的子进程（模型服务、worker）继承"""
+    if not settings.MODEL_SERVER_AUTHKEY:
+        settings.MODEL_SERVER_AUTHKEY = secrets.token_urlsafe(32)
+        os.environ["MODEL_SERVER_AUTHKEY"] = settings.MODEL_SERVER_AUTHKEY
+    return settings.MODEL_SERVER_AUTHKEY
+
+
+def _private_socket_dir(address: str):
+    """socket所在目录只允许本用户访问（0700），其他本地用户无法连接"""
+    directory = os.path.dirname(os.path.abspath(address))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if info.st_uid != os.getuid():
+        raise RuntimeError(f"Model server socket directory {directory} is not owned by the current user")
+    if info.st_mode & 0o077:
+        os.chmod(directory, 0o700)
+
+
+class ModelServer:
+    """模型服务 - 在单独进程中持有模型，串行执行推理"""
+
+    def __init__(self, address: Optional[str] = None):
+        self.address = address or settings.MODEL_SERVER_SOCKET
+        self._listener: Optional[Listener] = None
+        # diffusers pipeline非线程安全，所有worker的请求在此排队
+        self._pipeline_lock = threading.Lock()
+        self._scorer = None
+
+    def bind(self) -> "ModelServer":
+        """监听Unix socket"""
+        authkey = _authkey()
+        _private_socket_dir(self.address)
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        self._listener = Listener(self.address, family="AF_UNIX", authkey=authkey)
+        os.chmod(self.address, 0o600)
+        logger.info(f"Model server listening on {self.address}")
+        return self
+
+    def serve_forever(self):
+        """接受连接，每个连接一个线程"""
+        if self._listener is None:
+            self.bind()
+
+        listener = self._listener
+        while self._listener is listener:
+            try:
+                conn = listener.accept()
+            except OSError:
+                break  # 已关闭
+            except Exception as e:
+                logger.warning(f"Model server rejected connection: {e}")
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def close(self):
+        """停止监听"""
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            # close不会打断阻塞中的accept，先连接一次唤醒监听线程
+            try:
+                with socket.socket(socket.AF_UNIX) as sock:
+                    sock.connect(self.address)
+            except OSError:
+                pass
+            listener.close()
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def _handle(self, conn: Connection):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if request.get("op") == "cancel":
+                    continue  # 生成结束后才到达的取消请求
+
+                try:
+                    response = {"ok": True, "result": self.dispatch(request, conn)}
+                except GenerationCancelled as e:
+                    response = {"ok": False, "cancelled": True, "error": str(e)}
+                except Exception as e:
+                    logger.error(f"Model server {request.get('op')} failed: {e}")
+                    response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+                try:
+                    conn.send(response)
+                except OSError:
+                    # 客户端已超时断开，回收为其准备的共享内存
+                    if response["ok"] and isinstance(response["result"], dict):
+                        for ref in response["result"].get("images", []):
+                            SharedImageBuffer.discard(ref)
+                    return
+
+    def dispatch(self, request: Dict[str, Any], conn: Optional[Connection] = None) -> Any:
+        """处理单个请求；带progress的生成请求在同一连接上逐步推送进度"""
+        op = request.get("op")
+
+        if op == "ping":
+            return {
+                "pid": os.getpid(),
+                "models": sorted(model_manager.models),
+                "scheduler": (model_manager.generation_profile or {}).get("name"),
+            }
+
+        if op == "generate":
+            reporter = None
+            if request.get("progress") and conn is not None:
+                reporter = _ConnectionReporter(conn, **request["progress"])
+            return self._generate(dict(request["kwargs"]), reporter)
+
+        if op == "aesthetic_score":
+            with SharedImageBuffer.attach(request["image"]) as buffer:
+                image = buffer.to_image()
+            return self._aesthetic_score(image)
+
+        if op in ("embed_regions", "embed_texts"):
+            return self._embed(op, request["inputs"])
+
+        raise ValueError(f"Unknown operation: {op}")
+
+    def _generate(self, kwargs: Dict[str, Any], reporter: Optional[StepReporter] = None) -> Dict[str, Any]:
+        pipe = get_image_generator()
+        if pipe is None:
+            raise RuntimeError("Image generator not loaded")
+
+        seed = kwargs.pop("seed", None)
+        if seed is not None:
+            kwargs["generator"] = make_generator(pipe, seed)
+        apply_scheduler_profile(kwargs, get_generation_profile())
+        if reporter is not None:
+            kwargs.update(step_callback_kwargs(pipe, reporter, kwargs.get("num_inference_steps")))
+
+        with self._pipeline_lock:
+            if reporter is not None:
+                reporter.check_cancelled()
+            result = pipe(**prompt_embedding_cache.apply(pipe, kwargs))
+
+        return {"images": [SharedImageBuffer.from_image(image).transfer() for image in result.images]}
+
+    def _aesthetic_score(self, image: Image.Image) -> Optional[float]:
+        if not model_manager.is_loaded("clip_model"):
+            return None
+
+        if self._scorer is None:
+            from services.image_generation import ImageGenerationService
+            self._scorer = ImageGenerationService()
+        return self._scorer._calculate_aesthetic_score(image)
+
+
+    def _embed(self, op: str, inputs: Any) -> Any:
+        """设计稿分析：CLIP编码区域图像或模板文本"""
+        clip_model = model_manager.get_model("clip_model")
+        if clip_model is None:
+            raise RuntimeError("CLIP model not loaded")
+
+        from services.design_analysis import ClipRegionEncoder
+
+        encoder = ClipRegionEncoder(clip_model)
+        return encoder.embed_regions(inputs) if op == "embed_regions" else encoder.embed_texts(inputs)
+
+
+class _ConnectionReporter(StepReporter):
+    """模型服务侧的进度上报：预览在服务进程中生成，经连接发回客户端；客户端可随时发送cancel"""
+
+    def __init__(self, conn: Connection, preview_every: int, latent_format: str):
+        super().__init__(preview_every, latent_format)
+        self.conn = conn
+        self.cancelled = False
+
+    def check_cancelled(self):
+        while not self.cancelled and self.conn.poll(0):
+            try:
+                self.cancelled = self.conn.recv().get("op") == "cancel"
+            except (EOFError, OSError):
+                self.cancelled = True  # 客户端已断开
+        if self.cancelled:
+            raise GenerationCancelled("cancelled by client")
+
+    def report(self, step: int, total: Optional[int], preview: Optional[bytes]):
+        self.check_cancelled()
+        try:
+            self.conn.send({"event": "step", "step": step, "total": total, "preview": preview})
+        except OSError:
+            raise GenerationCancelled("client disconnected")
+
+
+class ModelServerClient:
+    """API worker侧客户端，调用方式与diffusers pipeline一致（返回带images属性的结果）"""
+
+    is_remote = True
+
+    def __init__(self, address: Optional[str] = None, timeout: Optional[float] = None):
+        self.address = address or settings.MODEL_SERVER_SOCKET
+        self.timeout = timeout if timeout is not None else settings.MODEL_SERVER_TIMEOUT
+
+    def _call(self, op: str, progress: Optional[StepReporter] = None, **payload) -> Any:
+        if progress is not None:
+            payload["progress"] = {"preview_every": progress.preview_every, "latent_format": progress.latent_format}
+
+        with Client(self.address, family="AF_UNIX", authkey=_authkey()) as conn:
+            conn.send({"op": op, **payload})
+            while True:
+                if not conn.poll(self.timeout):
+                    raise TimeoutError(f"Model server did not answer {op} within {self.timeout}s")
+                response = conn.recv()
+                if response.get("event") != "step":
+                    break
+                try:
+                    progress.report(response["step"], response["total"], response["preview"])
+                except GenerationCancelled:
+                    conn.send({"op": "cancel"})
+
+        if response.get("cancelled"):
+            raise GenerationCancelled(response["error"])
+        if not response["ok"]:
+            raise RuntimeError(f"Model server error: {response['error']}")
+        return response["result"]
+
+    def ping(self) -> Dict[str, Any]:
+        """检查模型服务状态"""
+        return self._call("ping")
+
+    def __call__(self, seed: Optional[int] = None, progress: Optional[StepReporter] = None, **kwargs) -> SimpleNamespace:
+        result = self._call("generate", progress=progress, kwargs={**kwargs, "seed": seed})
+
+        images = []
+        for ref in result["images"]:
+            with SharedImageBuffer.attach(ref) as buffer:
+                images.append(buffer.to_image())
+        return SimpleNamespace(images=images)
+
+    def embed_regions(self, crops: Any) -> Any:
+        """由模型服务中的CLIP批量编码区域图像（N×S×S×3 uint8），返回归一化向量"""
+        return self._call("embed_regions", inputs=crops)
+
+    def embed_texts(self, texts: List[str]) -> Any:
+        """由模型服务中的CLIP编码文本"""
+        return self._call("embed_texts", inputs=list(texts))
+
+    def aesthetic_score(self, image: Image.Image) -> Optional[float]:
+        """由模型服务中的CLIP计算美学分数"""
+        ref = SharedImageBuffer.from_image(image).transfer()
+        try:
+            return self._call("aesthetic_score", image=ref)
+        except Exception:
+            SharedImageBuffer.discard(ref)
+            raise
+
+
+def run_model_server(address: Optional[str] = None):
+    """模型服务进程入口：加载模型后开始监听"""
+    from core.logging import setup_logging
+
+    setup_logging()
+
+    async def load_models():
+        await model_manager.load_image_generator()
+        await model_manager.load_clip_model()
+
+    asyncio.run(load_models())
+
+    server = ModelServer(address).bind()
+    # terminate()时正常退出，让日志队列写完
+    signal.signal(signal.SIGTERM, lambda *_: server.close())
+    try:
+        server.serve_forever()
+    finally:
+        server.close()
+        logger.info("Model server stopped")
+        logger.remove()
+
+
+def start_model_server(address: Optional[str] = None) -> multiprocessing.Process:
+    """以子进程方式启动模型服务（须在启动worker之前调用，worker继承同一个连接密钥）"""
+    ensure_authkey()
+    ctx = multiprocessing.get_context("spawn")
+    process = ctx.Process(target=run_model_server, args=(address,), name="model-server", daemon=True)
+    process.start()
+    logger.info(f"Model server process started (pid={process.pid})")
+    return process
+
+
+if __name__ == "__main__":
+    run_model_server()
@@ -0,0 +1,289 @@
+"""
+Near Duplicates
+近重复检测 - 生成结果编码前计算感知哈希（pHash + dHash，NumPy批量计算），在同一用户已有结果的
+多索引哈希表中查找汉明距离内的近重复；命中时直接复用已编码的结果并记录关联，不再编码和存储。
+固定种子的提示词变体（大小写、标点、空白不同）直接返回缓存结果
+"""
+
+import hashlib
+import itertools
+import json
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from PIL import Image
+
+from core.config import settings
+from core.lazy import LazyObject
+from core.metrics import NEAR_DUPLICATE_BYTES_SAVED, NEAR_DUPLICATE_RESULTS
+
+PHASH_INPUT = 32  # pHash在32x32灰度图上做DCT，取左上8x8低频
+DHASH_INPUT = (9, 8)  # dHash比较9x8灰度图中相邻像素
+
+ImageHash = Tuple[int, int]  # (pHash, dHash)
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix.astype(np.float32)
+
+
+_DCT = _dct_matrix(PHASH_INPUT)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _pack_bits(bits: np.ndarray) -> np.ndarray:
+    """(N, 64) bool -> (N,) uint64（第一个比特为最高位）"""
+    return np.packbits(bits, axis=1).view(">u8").reshape(-1).astype(np.uint64)
+
+
+def phash(grays: np.ndarray) -> np.ndarray:
+    """批量pHash：grays为 (N, 32, 32) 灰度图，返回 (N,) uint64"""
+    grays = np.asarray(grays, dtype=np.float32)
+    coefficients = _DCT @ grays @ _DCT.T
+    low = coefficients[:, :8, :8].reshape(len(grays), 64)
+    # 中位数不含直流分量（整体亮度）
+    median = np.median(low[:, 1:], axis=1, keepdims=True)
+    return _pack_bits(low > median)
+
+
+def dhash(grays: np.ndarray) -> np.ndarray:
+    """批量dHash：grays为 (N, 8, 9) 灰度图，返回 (N,) uint64"""
+    grays = np.asarray(grays, dtype=np.int16)
+    return _pack_bits((grays[:, :, 1:] > grays[:, :, :-1]).reshape(len(grays), 64))
+
+
+def image_hashes(images: Sequence[Image.Image]) -> List[ImageHash]:
+    """图像只缩小一次到32x32灰度，两种哈希在整批上向量化计算"""
+    smalls = [image.resize((PHASH_INPUT, PHASH_INPUT), Image.Resampling.BOX).convert("L") for image in images]
+    grays = np.stack([np.asarray(small) for small in smalls])
+    gradients = np.stack([np.asarray(small.resize(DHASH_INPUT, Image.Resampling.BOX)) for small in smalls])
+    return list(zip(phash(grays).tolist(), dhash(gradients).tolist()))
+
+
+def hamming_distance(a: Any, b: Any) -> np.ndarray:
+    """逐元素的64位汉明距离（查表popcount）"""
+    diff = np.ascontiguousarray(np.atleast_1d(np.bitwise_xor(np.asarray(a, dtype=np.uint64), np.asarray(b, dtype=np.uint64))))
+    return _POPCOUNT[diff.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.int64)
+
+
+@lru_cache(maxsize=None)
+def _flip_masks(bits: int, radius: int) -> Tuple[int, ...]:
+    """所有汉明重量不超过radius的bits位掩码"""
+    masks = [0]
+    for weight in range(1, radius + 1):
+        for positions in itertools.combinations(range(bits), weight):
+            masks.append(sum(1 << position for position in positions))
+    return tuple(masks)
+
+
+class MultiIndexHashTable:
+    """64位哈希的多索引哈希表
+
+    哈希切成4段16位，每段一张表。两个哈希的汉明距离不超过r时，至少有一段的距离不超过r // 4
+    （抽屉原理），所以每张表只需枚举距离r // 4内的段值（r < 8时只查精确相同的段），候选再用
+    完整哈希确认。
+    """
+
+    CHUNKS = 4
+    CHUNK_BITS = 16
+
+    def __init__(self):
+        self._tables: List[Dict[int, Set[Hashable]]] = [defaultdict(set) for _ in range(self.CHUNKS)]
+        self._hashes: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def _chunks(self, value: int) -> List[int]:
+        mask = (1 << self.CHUNK_BITS) - 1
+        return [(value >> (self.CHUNK_BITS * i)) & mask for i in range(self.CHUNKS)]
+
+    def add(self, key: Hashable, value: int):
+        self.remove(key)
+        self._hashes[key] = value
+        for table, chunk in zip(self._tables, self._chunks(value)):
+            table[chunk].add(key)
+
+    def remove(self, key: Hashable):
+        value = self._hashes.pop(key, None)
+        if value is None:
+            return
+        for table, chunk in zip(self._tables, self._chunks(value)):
+            bucket = table[chunk]
+            bucket.discard(key)
+            if not bucket:
+                del table[chunk]
+
+    def search(self, value: int, radius: int) -> List[Tuple[Hashable, int]]:
+        """汉明距离不超过radius的 (key, 距离)，按距离升序"""
+        candidates: Set[Hashable] = set()
+        masks = _flip_masks(self.CHUNK_BITS, radius // self.CHUNKS)
+        for table, chunk in zip(self._tables, self._chunks(value)):
+            for mask in masks:
+                bucket = table.get(chunk ^ mask)
+                if bucket:
+                    candidates.update(bucket)
+        if not candidates:
+            return []
+
+        keys = list(candidates)
+        distances = hamming_distance([self._hashes[key] for key in keys], value)
+        matches = [(key, int(distance)) for key, distance in zip(keys, distances) if distance <= radius]
+        return sorted(matches, key=lambda match: match[1])
+
+
+def prompt_variant_key(prompt: str, **params: Any) -> str:
+    """提示词归一化（小写、去标点、合并空白）后与其余参数一起取哈希"""
+    normalized = " ".join(re.findall(r"\w+", prompt.lower()))
+    payload = json.dumps({"prompt": normalized, **params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class StoredImage:
+    """已编码保存的生成结果"""
+    generation_id: str
+    owner: str
+    image_data: memoryview
+    width: int
+    height: int
+    image_hash: ImageHash
+    aesthetic_score: Optional[float] = None
+
+
+@dataclass
+class NearDuplicate:
+    """近重复匹配结果"""
+    original: StoredImage
+    distance: int
+
+
+class NearDuplicateStore:
+    """按用户（客户端）隔离的近重复索引与已编码结果的LRU
+
+    每个用户一张以pHash为键的多索引哈希表，dHash用于二次确认。近重复的生成记录只保存到原结果的
+    关联，不再保存图像数据。总大小超过上限时淘汰最久未使用的结果。
+    """
+
+    def __init__(self, max_distance: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.max_distance = settings.NEAR_DUPLICATE_MAX_DISTANCE if max_distance is None else max_distance
+        self.max_bytes = max_bytes if max_bytes is not None else settings.NEAR_DUPLICATE_CACHE_MB * 1024 * 1024
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, StoredImage]" = OrderedDict()
+        self._tables: Dict[str, MultiIndexHashTable] = {}
+        self._links: "OrderedDict[str, str]" = OrderedDict()  # 近重复的生成ID -> 原结果ID
+        self._requests: "OrderedDict[Tuple[str, str], str]" = OrderedDict()  # (用户, 请求键) -> 结果ID
+        self._bytes = 0
+
+    @property
+    def stored_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def check(self, owner: str, image: Image.Image) -> Tuple[ImageHash, Optional[NearDuplicate]]:
+        """计算图像哈希并查找该用户已有的近重复结果"""
+        image_hash = image_hashes([image])[0]
+        with self._lock:
+            table = self._tables.get(owner)
+            if table is None:
+                return image_hash, None
+            for generation_id, distance in table.search(image_hash[0], self.max_distance):
+                original = self._entries[generation_id]
+                # 感知哈希与尺寸无关，尺寸不同的结果不能复用
+                if (original.width, original.height) != image.size:
+                    continue
+                if hamming_distance(original.image_hash[1], image_hash[1])[0] <= self.max_distance:
+                    self._entries.move_to_end(generation_id)
+                    return image_hash, NearDuplicate(original, distance)
+        return image_hash, None
+
+    def resolve(self, generation_id: str) -> Optional[StoredImage]:
+        """生成ID对应的结果（近重复的生成ID返回原结果）"""
+        with self._lock:
+            generation_id = self._links.get(generation_id, generation_id)
+            return self._entries.get(generation_id)
+
+    def lookup_request(self, owner: str, request_key: str) -> Optional[StoredImage]:
+        """相同（归一化后）请求此前的结果"""
+        with self._lock:
+            generation_id = self._requests.get((owner, request_key))
+            if generation_id is None:
+                return None
+            self._requests.move_to_end((owner, request_key))
+            entry = self._entries.get(generation_id)
+            if entry is not None:
+                self._entries.move_to_end(generation_id)
+            return entry
+
+    def record(
+        self,
+        owner: str,
+        generation_id: str,
+        result: Dict[str, Any],
+        endpoint: str,
+        request_key: Optional[str] = None,
+    ):
+        """保存新结果，或把近重复/缓存命中的生成ID关联到原结果"""
+        original_id = result.get("duplicate_of")
+        if original_id is None and result.get("image_hash") is None:
+            return  # 演示渲染等未计算哈希的结果
+        with self._lock:
+            if original_id is None:
+                # 合并的并发请求共享同一结果，只保存一次
+                for existing_id, _ in self._tables.get(owner, MultiIndexHashTable()).search(result["image_hash"][0], 0):
+                    if self._entries[existing_id].image_data == memoryview(result["image_data"]):
+                        original_id = existing_id
+                        break
+            if original_id is not None:
+                self._remember(self._links, generation_id, original_id)
+                outcome = "cache_hit" if result.get("cache_hit") else "duplicate"
+                NEAR_DUPLICATE_RESULTS.labels(endpoint, outcome).inc()
+                NEAR_DUPLICATE_BYTES_SAVED.labels(endpoint).inc(len(result["image_data"]))
+            else:
+                entry = StoredImage(
+                    generation_id,
+                    owner,
+                    memoryview(result["image_data"]),
+                    result["width"],
+                    result["height"],
+                    tuple(result["image_hash"]),
+                    result.get("aesthetic_score"),
+                )
+                self._entries[generation_id] = entry
+                self._tables.setdefault(owner, MultiIndexHashTable()).add(generation_id, entry.image_hash[0])
+                self._bytes += entry.image_data.nbytes
+                NEAR_DUPLICATE_RESULTS.labels(endpoint, "stored").inc()
+                self._evict()
+            if request_key is not None:
+                self._remember(self._requests, (owner, request_key), original_id or generation_id)
+
+    def _remember(self, mapping: "OrderedDict", key: Any, value: str):
+        mapping[key] = value
+        mapping.move_to_end(key)
+        # 关联只是字符串，数量按结果数的固定倍数限制
+        while len(mapping) > 16 * max(len(self._entries), 64):
+            mapping.popitem(last=False)
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            generation_id, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.image_data.nbytes
+            table = self._tables[entry.owner]
+            table.remove(generation_id)
+            if not len(table):
+                del self._tables[entry.owner]
+
+
+# 全局近重复索引（进程内，首次访问时创建）
+near_duplicates = LazyObject(NearDuplicateStore)
@@ -0,0 +1,126 @@
+"""
+Prompt Embeddings
+提示词编码缓存 - 按 模型 + 提示词 + 负面提示词 缓存文本编码器输出，种子变体与重复的风格预设直接复用
+"""
+
+import inspect
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+from core.config import settings
+from core.metrics import PROMPT_EMBEDDING_REQUESTS
+
+# encode_prompt 输出 -> pipeline调用参数名
+SDXL_EMBEDDING_NAMES = (
+    "prompt_embeds",
+    "negative_prompt_embeds",
+    "pooled_prompt_embeds",
+    "negative_pooled_prompt_embeds",
+)
+SD_EMBEDDING_NAMES = ("prompt_embeds", "negative_prompt_embeds")
+FLUX_EMBEDDING_NAMES = ("prompt_embeds", "pooled_prompt_embeds")  # 第三个输出text_ids由pipeline自行生成
+
+EMBEDDING_KWARGS = frozenset(SDXL_EMBEDDING_NAMES)
+
+
+def _encodable(pipe: Any) -> Optional[Any]:
+    """返回可调用encode_prompt的diffusers pipeline，不支持时返回None"""
+    inner = getattr(pipe, "inner", pipe)  # TiledPipeline
+    if type(inner).__module__.startswith("optimum") or not callable(getattr(inner, "encode_prompt", None)):
+        return None
+    return inner
+
+
+def encode_prompt(pipe: Any, prompt: str, negative_prompt: Optional[str]) -> Dict[str, Any]:
+    """运行文本编码器，返回可直接传给pipeline的 *_embeds 参数"""
+    params = inspect.signature(pipe.encode_prompt).parameters
+    device = getattr(pipe, "_execution_device", None) or pipe.device
+
+    call: Dict[str, Any] = {"prompt": prompt, "device": device, "num_images_per_prompt": 1}
+    for name in ("prompt_2", "prompt_3"):
+        if name in params:
+            call[name] = None
+
+    if "negative_prompt" not in params:
+        # FLUX等无负面提示词的模型
+        outputs = pipe.encode_prompt(**call)
+        return dict(zip(FLUX_EMBEDDING_NAMES, outputs))
+
+    # 始终编码负面提示词：引导系数是否>1由调用方决定，缓存结果两种情况都能用
+    call.update(do_classifier_free_guidance=True, negative_prompt=negative_prompt)
+    for name in ("negative_prompt_2", "negative_prompt_3"):
+        if name in params:
+            call[name] = None
+
+    outputs = pipe.encode_prompt(**call)
+    names = SDXL_EMBEDDING_NAMES if len(outputs) == 4 else SD_EMBEDDING_NAMES
+    return dict(zip(names, outputs))
+
+
+class PromptEmbeddingCache:
+    """文本编码结果的LRU缓存（张量保留在模型所在设备上）"""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries if max_entries is not None else settings.IMAGE_PROMPT_CACHE_SIZE
+        self._entries: "OrderedDict[Tuple[str, str, Optional[str]], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_encode(
+        self,
+        pipe: Any,
+        prompt: str,
+        negative_prompt: Optional[str] = None,
+        model_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """命中则直接返回，否则编码并缓存"""
+        key = (model_id or settings.IMAGE_MODEL_ID, prompt, negative_prompt)
+        with self._lock:
+            embeddings = self._entries.get(key)
+            if embeddings is not None:
+                self._entries.move_to_end(key)
+        if embeddings is not None:
+            PROMPT_EMBEDDING_REQUESTS.labels("hit").inc()
+            return embeddings
+
+        PROMPT_EMBEDDING_REQUESTS.labels("miss").inc()
+        embeddings = encode_prompt(pipe, prompt, negative_prompt)
+        with self._lock:
+            self._entries[key] = embeddings
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return embeddings
+
+    def apply(self, pipe: Any, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """将kwargs中的prompt/negative_prompt替换为缓存的编码结果（需在推理锁内调用）"""
+        prompt = kwargs.get("prompt")
+        inner = _encodable(pipe)
+        if not self.max_entries or inner is None or not isinstance(prompt, str):
+            return kwargs
+        if EMBEDDING_KWARGS.intersection(kwargs):
+            return kwargs  # 调用方已提供编码结果
+
+        try:
+            embeddings = self.get_or_encode(inner, prompt, kwargs.get("negative_prompt"))
+        except Exception as e:
+            logger.warning(f"Prompt encoding failed, passing text to the pipeline: {e}")
+            return kwargs
+
+        kwargs = {key: value for key, value in kwargs.items() if key != "prompt"}
+        if "negative_prompt_embeds" in embeddings:
+            kwargs.pop("negative_prompt", None)
+        kwargs.update(embeddings)
+        return kwargs
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# 全局提示词编码缓存
+prompt_embedding_cache = PromptEmbeddingCache()
@@ -0,0 +1,435 @@
+"""
+Search Service
+资源与模板检索 - 全文检索（PostgreSQL tsvector/GIN，本地SQLite FTS5）、规范化标签关联（带使用计数）与
+分面查询（类型、格式/分类、标签、月份）。结果页一条查询；总数一条计数查询，全部分面一条查询（匹配数
+很大时在均匀抽样上估算），过滤条件都走索引；排序综合文本相关度与 usage_count / rating
+"""
+
+import hashlib
+import json
+import re
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Type
+
+from sqlalchemy import String, and_, column, delete, exists, false, func, literal_column, select, table, text, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.lazy import LazyObject
+from core.redis import cache
+from models.asset import Asset
+from models.search import SEARCH_COLUMNS, SEARCH_VECTOR_COLUMN, fts_table, rebuild_statement
+from models.tag import AssetTag, Tag, TemplateTag
+from models.template import Template
+from services.usage_counters import usage_counters
+
+SORTS = ("relevance", "newest", "popular", "rating")
+DATE_FACET = "date"
+TAG_FACET = "tag"
+UUID_SPACE = 1 << 128
+# 结果页中使用次数超过此值的标签按排序索引扫描并逐行探测关联（EXISTS），其余由关联表驱动（IN子查询）
+TAG_LINK_DRIVEN_MAX = 5000
+
+
+@dataclass(frozen=True)
+class SearchTarget:
+    """可检索的表：模型、标签关联表及按列分面的字段"""
+    model: Type
+    link: Type
+    link_column: str  # 关联表中指向模型的外键列
+    facets: Tuple[str, ...]  # 按列分面/过滤的字段（另有 tag 与 date）
+
+
+TARGETS: Dict[str, SearchTarget] = {
+    "assets": SearchTarget(Asset, AssetTag, "asset_id", ("type", "format")),
+    "templates": SearchTarget(Template, TemplateTag, "template_id", ("type", "category")),
+}
+
+
+@dataclass
+class SearchResults:
+    """检索结果：(模型实例, 得分) 列表、总数与分面计数"""
+    items: List[Tuple[Any, float]]
+    total: Optional[int] = None
+    facets: Dict[str, List[Tuple[str, int]]] = field(default_factory=dict)
+    facets_estimated: bool = False  # 分面由抽样按比例估算
+
+
+@dataclass
+class TagChanges:
+    """set_tags的结果：设置后的标签，以及 Tag.id -> 使用次数增量（事务提交成功后才交给计数器）"""
+    tags: List[Tag]
+    usage: Counter = field(default_factory=Counter)
+
+
+def slugify(name: str) -> str:
+    """标签名 -> slug（小写，非单词字符合并为 -）"""
+    return re.sub(r"[^\w]+", "-", name.strip().lower()).strip("-")
+
+
+def query_terms(query: Optional[str]) -> List[str]:
+    """检索词切分；只保留单词字符，避免把用户输入当作FTS/tsquery语法"""
+    return re.findall(r"\w+", (query or "").lower())
+
+
+def _match_expression(dialect: str, terms: Sequence[str]) -> str:
+    """所有词都须命中，最后一个词按前缀匹配（输入即搜索）"""
+    if dialect == "postgresql":
+        return " & ".join(list(terms[:-1]) + [f"{terms[-1]}:*"])
+    return " ".join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+
+
+class SearchService:
+    """资源/模板检索与标签维护"""
+
+    @staticmethod
+    def _dialect(db: AsyncSession) -> str:
+        return db.get_bind().dialect.name
+
+    @staticmethod
+    def _target(kind: str) -> SearchTarget:
+        target = TARGETS.get(kind)
+        if target is None:
+            raise ValueError(f"Unknown search target: {kind}")
+        return target
+
+    def _month(self, dialect: str, created_at):
+        """按月分桶（格式串用字面量，保证SELECT与GROUP BY是同一表达式）"""
+        if dialect == "postgresql":
+            return func.to_char(created_at, literal_column("'YYYY-MM'"))
+        return func.strftime(literal_column("'%Y-%m'"), created_at)
+
+    def _filtered(
+        self,
+        dialect: str,
+        target: SearchTarget,
+        terms: Sequence[str],
+        filters: Dict[str, Sequence[str]],
+        tags: Sequence[Optional[Tag]],
+        created_from: Optional[datetime],
+        created_to: Optional[datetime],
+        probe_common_tags: bool = False,
+    ):
+        """
+        返回 (FROM子句, WHERE条件列表, 文本相关度表达式或None)
+
+        tags 为已解析的标签（None表示标签不存在）。默认由标签关联表驱动；probe_common_tags 时
+        常用标签改为逐行探测关联，用于按排序索引取前N条即可结束的结果页
+        """
+        model = target.model
+        source = model.__table__
+        criteria = []
+        relevance = None
+
+        if model is Asset:
+            criteria.append(Asset.is_deleted == False)  # noqa: E712
+            criteria.append(Asset.is_public == True)  # noqa: E712
+        else:
+            criteria.append(Template.is_public == True)  # noqa: E712
+
+        if terms:
+            match = _match_expression(dialect, terms)
+            if dialect == "postgresql":
+                vector = literal_column(f"{source.name}.{SEARCH_VECTOR_COLUMN}")
+                tsquery = func.to_tsquery(literal_column(f"'{settings.SEARCH_TEXT_CONFIG}'"), match)
+                criteria.append(vector.op("@@")(tsquery))
+                relevance = func.ts_rank_cd(vector, tsquery)
+            else:
+                name = fts_table(source.name)
+                fts = table(name, column("rowid"))
+                source = source.join(fts, fts.c.rowid == literal_column(f"{model.__tablename__}.rowid"))
+                criteria.append(literal_column(name).op("MATCH")(match))
+                # bm25越小越相关
+                weights = [weight for _, _, weight in SEARCH_COLUMNS[model.__tablename__]]
+                relevance = -func.bm25(literal_column(name), *weights)
+
+        for facet, values in filters.items():
+            if values:
+                criteria.append(getattr(model, facet).in_(list(values)))
+
+        link = target.link
+        link_id = getattr(link, target.link_column)
+        for tag in tags:
+            if tag is None:
+                criteria.append(false())
+            elif probe_common_tags and tag.usage_count > TAG_LINK_DRIVEN_MAX:
+                criteria.append(exists().where(link_id == model.id, link.tag_id == tag.id))
+            else:
+                criteria.append(model.id.in_(select(link_id).where(link.tag_id == tag.id)))
+
+        if created_from is not None:
+            criteria.append(model.created_at >= created_from)
+        if created_to is not None:
+            criteria.append(model.created_at < created_to)
+        return source, criteria, relevance
+
+    @staticmethod
+    def _score(model, relevance):
+        """文本相关度乘以热度加成（使用次数饱和到2倍，评分0-5最多1.5倍）"""
+        boost = (1.0 + model.usage_count / (model.usage_count + 10.0)) * (1.0 + model.rating / 10.0)
+        return relevance * boost
+
+    def _order(self, model, sort: str, relevance):
+        popularity = [model.usage_count.desc(), model.rating.desc(), model.created_at.desc()]
+        if sort == "newest":
+            order = [model.created_at.desc()]
+        elif sort == "popular":
+            order = popularity
+        elif sort == "rating":
+            order = [model.rating.desc(), model.usage_count.desc(), model.created_at.desc()]
+        elif relevance is not None:
+            order = [self._score(model, relevance).desc()]
+        else:
+            order = popularity
+        return order + [model.id]
+
+    def _facet_query(self, dialect: str, target: SearchTarget, source, criteria):
+        """一条查询返回全部分面计数：过滤结果作为CTE，每个分面一个GROUP BY分支"""
+        model = target.model
+        matches = (
+            select(model.id, model.created_at, *[getattr(model, facet) for facet in target.facets])
+            .select_from(source)
+            .where(and_(*criteria))
+            .cte("matches")
+        )
+        count = func.count().label("count")
+
+        def branch(name: str, value, source_=matches):
+            grouped = (
+                select(literal_column(f"'{name}'", String).label("facet"), value.label("value"), count)
+                .select_from(source_)
+                .group_by(value)
+                .order_by(count.desc(), value)
+                .limit(settings.SEARCH_FACET_LIMIT)
+                .subquery()
+            )
+            return select(grouped)
+
+        link = target.link
+        tagged = matches.join(link, getattr(link, target.link_column) == matches.c.id).join(Tag, Tag.id == link.tag_id)
+        branches = [branch(facet, matches.c[facet]) for facet in target.facets]
+        branches.append(branch(TAG_FACET, Tag.name, tagged))
+        branches.append(branch(DATE_FACET, self._month(dialect, matches.c.created_at)))
+        return union_all(*branches)
+
+    async def _facet_counts(self, db: AsyncSession, dialect: str, target: SearchTarget, source, criteria) -> dict:
+        """
+        总数与分面计数。匹配数超过 SEARCH_FACET_SAMPLE_SIZE 时，分面只在 id 小于某个界限的行上计算
+        再按比例放大：id 为随机UUID，按主键范围取到的是均匀抽样，工作量与总匹配数无关
+        """
+        model = target.model
+        total = (await db.execute(select(func.count()).select_from(source).where(and_(*criteria)))).scalar_one()
+
+        fraction = 1.0
+        sample_size = settings.SEARCH_FACET_SAMPLE_SIZE
+        if 0 < sample_size < total:
+            bound = int(sample_size / total * UUID_SPACE)
+            fraction = bound / UUID_SPACE
+            criteria = [*criteria, model.id < uuid.UUID(int=bound)]
+
+        facets = []
+        if total:
+            rows = (await db.execute(self._facet_query(dialect, target, source, criteria))).all()
+            facets = [[facet, value, round(count / fraction)] for facet, value, count in rows]
+        return {"total": total, "estimated": fraction < 1.0, "facets": facets}
+
+    async def search(
+        self,
+        db: AsyncSession,
+        kind: str,
+        query: Optional[str] = None,
+        *,
+        filters: Optional[Dict[str, Sequence[str]]] = None,
+        tags: Sequence[str] = (),
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        sort: str = "relevance",
+        limit: int = 20,
+        offset: int = 0,
+        facets: bool = True,
+    ) -> SearchResults:
+        """
+        检索公开的资源或模板（私有内容需要先有已认证用户才能开放检索）
+
+        Args:
+            kind: assets / templates
+            query: 全文检索词（名称、标签、描述等），为空时按热度浏览
+            filters: 分面字段 -> 允许的取值（资源：type/format，模板：type/category）
+            tags: 标签名或slug，须全部命中
+            created_from/created_to: 创建时间范围 [from, to)
+            sort: relevance / newest / popular / rating
+            facets: 同时返回总数与分面计数
+        """
+        target = self._target(kind)
+        if sort not in SORTS:
+            raise ValueError(f"Unknown sort: {sort}")
+        filters = filters or {}
+        unknown = set(filters) - set(target.facets)
+        if unknown:
+            raise ValueError(f"Unknown filter for {kind}: {', '.join(sorted(unknown))}")
+
+        dialect = self._dialect(db)
+        terms = query_terms(query)
+        resolved = await self._resolve_tags(db, tags)
+        source, criteria, relevance = self._filtered(
+            dialect, target, terms, filters, resolved, created_from, created_to, probe_common_tags=True
+        )
+
+        model = target.model
+        score = self._score(model, relevance) if relevance is not None else literal_column("0.0")
+        rows = await db.execute(
+            select(model, score.label("score"))
+            .select_from(source)
+            .where(and_(*criteria))
+            .order_by(*self._order(model, sort, relevance))
+            .limit(limit)
+            .offset(offset)
+        )
+        results = SearchResults(items=[(item, float(item_score or 0.0)) for item, item_score in rows.all()])
+
+        if facets:
+            # 分面计数与匹配数成正比，结果页始终实时，分面按过滤条件短时缓存
+            key = self._facet_cache_key(kind, terms, filters, tags, created_from, created_to)
+            cached = await cache.get(key) if settings.SEARCH_FACET_CACHE_TTL > 0 else None
+            if cached is None:
+                # 计数要访问全部匹配行，标签过滤总是由关联表驱动
+                source, criteria, _ = self._filtered(
+                    dialect, target, terms, filters, resolved, created_from, created_to
+                )
+                cached = await self._facet_counts(db, dialect, target, source, criteria)
+                if settings.SEARCH_FACET_CACHE_TTL > 0:
+                    await cache.set(key, cached, expire=settings.SEARCH_FACET_CACHE_TTL)
+            results.total = cached["total"]
+            results.facets_estimated = cached["estimated"]
+            for facet, value, count in cached["facets"]:
+                if value is not None:
+                    results.facets.setdefault(facet, []).append((value, count))
+            for values in results.facets.values():
+                values.sort(key=lambda item: (-item[1], item[0]))
+        return results
+
+    @staticmethod
+    async def _resolve_tags(db: AsyncSession, names: Sequence[str]) -> List[Optional[Tag]]:
+        """按slug解析过滤标签，使用次数用于选择执行计划"""
+        slugs = {slugify(name) for name in names}
+        if not slugs:
+            return []
+        found = {
+            tag.slug: tag
+            for tag in (await db.execute(select(Tag).where(Tag.slug.in_(list(slugs))))).scalars()
+        }
+        return [found.get(slug) for slug in sorted(slugs)]
+
+    @staticmethod
+    def _facet_cache_key(kind: str, terms, filters, tags, created_from, created_to) -> str:
+        payload = json.dumps(
+            {
+                "terms": list(terms),
+                "filters": {facet: sorted(values) for facet, values in filters.items() if values},
+                "tags": sorted({slugify(tag) for tag in tags}),
+                "from": created_from.isoformat() if created_from else None,
+                "to": created_to.isoformat() if created_to else None,
+                "limit": settings.SEARCH_FACET_LIMIT,
+                "sample": settings.SEARCH_FACET_SAMPLE_SIZE,
+            },
+            sort_keys=True,
+        )
+        return f"search:facets:{kind}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    async def set_tags(self, db: AsyncSession, kind: str, obj: Any, names: Sequence[str]) -> TagChanges:
+        """
+        设置资源/模板的标签：维护关联表并同步冗余的逗号分隔字段（全文检索用）。不提交事务，
+        也不计数：调用方提交成功后把返回的 usage 交给 count_tag_usage，回滚时丢弃即可，
+        Tag.usage_count 不会因未提交的关联而漂移
+        """
+        target = self._target(kind)
+        link = target.link
+        link_id = getattr(link, target.link_column)
+
+        wanted: Dict[str, str] = {}
+        for name in names:
+            slug = slugify(name)
+            if slug and slug not in wanted:
+                wanted[slug] = name.strip()
+
+        existing = {
+            tag.slug: tag
+            for tag in (await db.execute(select(Tag).where(Tag.slug.in_(list(wanted))))).scalars()
+        } if wanted else {}
+        for slug, name in wanted.items():
+            if slug not in existing:
+                existing[slug] = Tag(name=name, slug=slug, usage_count=0)
+                db.add(existing[slug])
+        await db.flush()
+
+        tags = [existing[slug] for slug in wanted]
+        current = set((await db.execute(select(link.tag_id).where(link_id == obj.id))).scalars())
+        added = [tag.id for tag in tags if tag.id not in current]
+        removed = current - {tag.id for tag in tags}
+
+        for tag_id in added:
+            db.add(link(**{target.link_column: obj.id, "tag_id": tag_id}))
+        if removed:
+            await db.execute(delete(link).where(link_id == obj.id, link.tag_id.in_(removed)))
+        usage = Counter({tag_id: 1 for tag_id in added})
+        usage.subtract({tag_id: 1 for tag_id in removed})
+
+        obj.tags = ",".join(tag.name for tag in tags) or None
+        await db.flush()
+        return TagChanges(tags, usage)
+
+    async def count_tag_usage(self, usage: Mapping[Any, int]):
+        """提交成功后记录 set_tags 的使用次数增量；热门标签行不在打标签时加锁更新，由计数器批量写回"""
+        by_amount: Dict[int, List[Any]] = {}
+        for tag_id, amount in usage.items():
+            if amount:
+                by_amount.setdefault(amount, []).append(tag_id)
+        for amount, tag_ids in by_amount.items():
+            await usage_counters.increment("tags", tag_ids, amount)
+
+    async def backfill_tags(self, db: AsyncSession, kind: str, batch_size: int = 1000) -> int:
+        """把旧数据中逗号分隔的标签迁移到关联表（按主键分批，每批提交一次），返回处理的行数"""
+        target = self._target(kind)
+        model = target.model
+        link = target.link
+        linked = select(getattr(link, target.link_column))
+
+        processed = 0
+        last_id = None
+        while True:
+            statement = select(model).where(model.tags.is_not(None), model.tags != "", model.id.not_in(linked))
+            if last_id is not None:
+                statement = statement.where(model.id > last_id)
+            batch = (await db.execute(statement.order_by(model.id).limit(batch_size))).scalars().all()
+            if not batch:
+                return processed
+            usage = Counter()
+            for obj in batch:
+                usage.update((await self.set_tags(db, kind, obj, obj.tags.split(","))).usage)
+            await db.commit()
+            await self.count_tag_usage(usage)
+            processed += len(batch)
+            last_id = batch[-1].id
+
+    async def popular_tags(self, db: AsyncSession, prefix: Optional[str] = None, limit: int = 20) -> List[Tag]:
+        """按使用次数排序的标签（可按slug前缀过滤，用于自动补全）"""
+        statement = select(Tag).where(Tag.usage_count > 0)
+        if prefix:
+            statement = statement.where(Tag.slug.startswith(slugify(prefix), autoescape=True))
+        statement = statement.order_by(Tag.usage_count.desc(), Tag.slug).limit(limit)
+        return list((await db.execute(statement)).scalars())
+
+    async def rebuild_index(self, db: AsyncSession):
+        """SQLite：重建FTS5索引（PostgreSQL的tsvector是生成列，无需重建）"""
+        if self._dialect(db) != "sqlite":
+            return
+        for target in TARGETS.values():
+            await db.execute(text(rebuild_statement(target.model.__tablename__)))
+        await db.commit()
+
+
+# 全局检索服务（无状态，首次访问时创建）
+search_service = LazyObject(SearchService)
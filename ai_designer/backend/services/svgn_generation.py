@@ -7,7 +7,13 @@ from typing import Optional, List, Dict, Any
 from dataclasses import dataclass
 import json
 from loguru import logger
+from core.lazy import LazyObject
 from services.ai_models import get_gemini_model
+from core.metrics import bounded_label, track_stage
+
+# 阶段耗时指标中允许的风格与尺寸标签（其余记为other）
+STAGE_STYLES = frozenset(["modern", "outline", "filled", "minimal", "glassmorphism", "gradient"])
+STAGE_SIZES = frozenset(f"{side}x{side}" for side in (16, 24, 32, 48, 64, 128, 256, 512, 1024))
 
 
 @dataclass
@@ -56,15 +62,19 @@ class SVGGenerationService:
         """
         try:
             logger.info(f"Generating SVG from description: {description}")
+            style_label = bounded_label(style, STAGE_STYLES)
+            size_label = bounded_label(f"{width}x{height}", STAGE_SIZES)
 
-            if self.gemini_model:
-                svg_code = await self._generate_with_gemini(description, style, width, height)
-            else:
-                # 回退到模板生成
-                svg_code = self._generate_from_template(description, style, width, height)
+            with track_stage("text_to_svg", "inference", style_label, size_label):
+                if self.gemini_model:
+                    svg_code = await self._generate_with_gemini(description, style, width, height)
+                else:
+                    # 回退到模板生成
+                    svg_code = self._generate_from_template(description, style, width, height)
 
             if optimize:
-                svg_code = self._optimize_svg(svg_code)
+                with track_stage("text_to_svg", "encoding", style_label, size_label):
+                    svg_code = self._optimize_svg(svg_code)
 
             # 提取元数据
             metadata = self._extract_svg_metadata(svg_code)
@@ -298,5 +308,5 @@ Return ONLY the SVG code, no explanations.
         return icons
 
 
-# 全局服务实例
-svg_service = SVGGenerationService()
+# 全局服务实例（首次访问时创建）
+svg_service = LazyObject(SVGGenerationService)
@@ -0,0 +1,180 @@
+"""
+Template Engine
+模板变量替换 - prompt_template（{name}）与 code_snippet（{{ name }}）按 模板ID + updated_at 编译一次并缓存，
+渲染只是一次 str.format_map；参数网格（画廊批量生成）一次调用渲染全部组合
+"""
+
+import itertools
+import json
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from core.config import settings
+from core.metrics import TEMPLATE_COMPILE_REQUESTS
+
+# 代码片段中的单花括号是JSX/CSS语法，变量使用双花括号
+PLACEHOLDERS = {
+    "prompt_template": re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}"),
+    "code_snippet": re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}"),
+}
+
+
+class TemplateRenderError(ValueError):
+    """缺少模板变量或参数网格过大"""
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """编译结果：字面量中的花括号已转义、可直接 format_map 的格式串，以及按出现顺序的变量名"""
+    format_string: str
+    variables: Tuple[str, ...]
+    defaults: Dict[str, Any] = field(default_factory=dict)  # 来自模板parameters的同名默认值
+
+    def missing(self, provided) -> List[str]:
+        return [name for name in self.variables if name not in provided and name not in self.defaults]
+
+    def _check(self, provided):
+        missing = self.missing(provided)
+        if missing:
+            raise TemplateRenderError(f"Missing template variables: {', '.join(missing)}")
+
+    def render(self, values: Optional[Mapping[str, Any]] = None) -> str:
+        """替换变量；values覆盖默认值"""
+        values = values or {}
+        if not self.variables:
+            return self.format_string.format_map({})
+        self._check(values)
+        return self.format_string.format_map({**self.defaults, **values})
+
+    def render_grid(
+        self,
+        grid: Mapping[str, Sequence[Any]],
+        values: Optional[Mapping[str, Any]] = None,
+    ) -> List[Tuple[Dict[str, Any], str]]:
+        """
+        按参数网格渲染全部组合，返回 [(本组合的网格取值, 渲染结果)]
+
+        Args:
+            grid: 变量名 -> 取值列表，按笛卡尔积展开（先出现的变量变化最慢）
+            values: 所有组合共用的变量
+        """
+        names = list(grid)
+        size = 1
+        for name in names:
+            size *= len(grid[name])
+        if size > settings.TEMPLATE_GRID_MAX:
+            raise TemplateRenderError(f"Parameter grid has {size} combinations (max {settings.TEMPLATE_GRID_MAX})")
+        base = {**self.defaults, **(values or {})}
+        self._check({**base, **dict.fromkeys(names)})
+
+        render = self.format_string.format_map
+        results = []
+        for combination in itertools.product(*(grid[name] for name in names)):
+            point = dict(zip(names, combination))
+            base.update(point)
+            results.append((point, render(base)))
+        return results
+
+
+def compile_template(source: str, kind: str = "prompt_template", defaults: Optional[Mapping[str, Any]] = None) -> CompiledTemplate:
+    """解析一次模板源码"""
+    pattern = PLACEHOLDERS[kind]
+    parts, variables = [], []
+    position = 0
+    for match in pattern.finditer(source):
+        parts.append(source[position:match.start()].replace("{", "{{").replace("}", "}}"))
+        name = match.group(1)
+        parts.append("{" + name + "}")
+        if name not in variables:
+            variables.append(name)
+        position = match.end()
+    parts.append(source[position:].replace("{", "{{").replace("}", "}}"))
+    defaults = {name: value for name, value in (defaults or {}).items() if name in variables}
+    return CompiledTemplate("".join(parts), tuple(variables), defaults)
+
+
+def template_defaults(template: Any) -> Dict[str, Any]:
+    """模板parameters（JSON字符串）中的默认值"""
+    if not template.parameters:
+        return {}
+    try:
+        parameters = json.loads(template.parameters)
+    except (TypeError, ValueError):
+        logger.warning(f"Template {template.id} has invalid parameters JSON")
+        return {}
+    return parameters if isinstance(parameters, dict) else {}
+
+
+class TemplateEngine:
+    """编译结果的LRU缓存，按 (模板ID, 字段) 存放，updated_at 或源码变化时重新编译"""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries if max_entries is not None else settings.TEMPLATE_CACHE_SIZE
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Any, CompiledTemplate]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def compiled(self, template: Any, kind: str = "prompt_template") -> CompiledTemplate:
+        """
+        取模板字段的编译结果
+
+        Raises:
+            ValueError: 未知字段或模板没有该字段的内容
+        """
+        if kind not in PLACEHOLDERS:
+            raise ValueError(f"Unknown template field: {kind}")
+        source = getattr(template, kind)
+        if not source:
+            raise ValueError(f"Template {template.slug} has no {kind}")
+
+        key = (str(template.id), kind)
+        # updated_at可能只精确到秒，同一秒内的两次修改靠源码哈希区分（str的哈希值会缓存在对象上）
+        version = (template.updated_at or template.created_at, hash(source))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                TEMPLATE_COMPILE_REQUESTS.labels("hit").inc()
+                return entry[1]
+
+        TEMPLATE_COMPILE_REQUESTS.labels("miss").inc()
+        compiled = compile_template(source, kind, template_defaults(template))
+        with self._lock:
+            self._entries[key] = (version, compiled)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def render(self, template: Any, values: Optional[Mapping[str, Any]] = None, kind: str = "prompt_template") -> str:
+        return self.compiled(template, kind).render(values)
+
+    def render_grid(
+        self,
+        template: Any,
+        grid: Mapping[str, Sequence[Any]],
+        values: Optional[Mapping[str, Any]] = None,
+        kind: str = "prompt_template",
+    ) -> List[Tuple[Dict[str, Any], str]]:
+        return self.compiled(template, kind).render_grid(grid, values)
+
+    def invalidate(self, template_id: Any):
+        """丢弃模板的全部编译结果（删除模板时使用；修改会更新updated_at，无需手动失效）"""
+        with self._lock:
+            for kind in PLACEHOLDERS:
+                self._entries.pop((str(template_id), kind), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# 全局模板编译缓存
+template_engine = TemplateEngine()
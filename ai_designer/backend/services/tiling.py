@@ -0,0 +1,210 @@
+"""
+Tiled Generation
+分块生成 - 按内存预算启用VAE分块解码，超大尺寸先按基础尺寸生成再分块放大
+"""
+
+import math
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+from PIL import Image
+
+Box = Tuple[int, int, int, int]
+
+# 细化分块时沿用的生成参数（含预先编码的提示词）
+REFINE_KWARGS = (
+    "prompt",
+    "negative_prompt",
+    "prompt_embeds",
+    "negative_prompt_embeds",
+    "pooled_prompt_embeds",
+    "negative_pooled_prompt_embeds",
+    "guidance_scale",
+    "num_inference_steps",
+    "generator",
+)
+
+
+def estimate_decode_mb(width: int, height: int, dtype_bytes: int = 2) -> float:
+    """VAE整图解码峰值激活内存的粗略估算（MB）
+
+    全分辨率上采样块为128通道，约4个特征图同时存活；中间块在1/8分辨率上做自注意力，
+    注意力矩阵为 (h/8 * w/8)^2。大尺寸时后者增长最快。
+    """
+    conv = width * height * 128 * 4 * dtype_bytes
+    tokens = (width // 8) * (height // 8)
+    attention = tokens * tokens * dtype_bytes
+    return (conv + attention) / 2**20
+
+
+def base_size(width: int, height: int, max_pixels: int, multiple: int = 64) -> Tuple[int, int]:
+    """保持宽高比、面积不超过max_pixels的生成尺寸"""
+    if width * height <= max_pixels:
+        return width, height
+
+    scale = math.sqrt(max_pixels / (width * height))
+    return (
+        max(multiple, int(width * scale) // multiple * multiple),
+        max(multiple, int(height * scale) // multiple * multiple),
+    )
+
+
+def _positions(length: int, tile: int, overlap: int) -> List[int]:
+    if length <= tile:
+        return [0]
+    stride = tile - overlap
+    positions = list(range(0, length - tile, stride))
+    positions.append(length - tile)  # 最后一块贴齐边缘，所有块尺寸一致
+    return positions
+
+
+def plan_tiles(width: int, height: int, tile: int, overlap: int) -> List[Box]:
+    """按行优先顺序规划覆盖整幅图像的分块 (left, top, right, bottom)"""
+    if not 0 <= overlap < tile:
+        raise ValueError("tile overlap must be in [0, tile)")
+
+    return [
+        (x, y, min(x + tile, width), min(y + tile, height))
+        for y in _positions(height, tile, overlap)
+        for x in _positions(width, tile, overlap)
+    ]
+
+
+def _feather_mask(box: Box, overlap: int) -> Image.Image:
+    """左/上与已写入区域重叠的部分线性过渡，其余区域完全覆盖"""
+    left, top, right, bottom = box
+    mask = np.full((bottom - top, right - left), 255.0, dtype=np.float32)
+    if overlap:
+        ramp = np.linspace(0.0, 255.0, overlap + 2, dtype=np.float32)[1:-1]
+        if left > 0:
+            mask[:, :overlap] *= ramp[None, :] / 255.0
+        if top > 0:
+            mask[:overlap, :] *= ramp[:, None] / 255.0
+    return Image.fromarray(mask.astype(np.uint8), "L")
+
+
+def tiled_map(
+    image: Image.Image,
+    fn: Callable[[Image.Image], Image.Image],
+    tile: int,
+    overlap: int,
+) -> Image.Image:
+    """逐块处理图像并按重叠区域羽化拼接，峰值内存只与分块大小有关"""
+    output = Image.new(image.mode, image.size)
+    for box in plan_tiles(image.width, image.height, tile, overlap):
+        processed = fn(image.crop(box))
+        if processed.size != (box[2] - box[0], box[3] - box[1]):
+            processed = processed.resize((box[2] - box[0], box[3] - box[1]), Image.LANCZOS)
+        output.paste(processed.convert(image.mode), box[:2], _feather_mask(box, overlap))
+    return output
+
+
+class TiledPipeline:
+    """包装diffusers pipeline，按内存预算决定是否分块
+
+    - 整图解码估算超出预算：开启VAE分块解码（tile_size/overlap）
+    - 面积超过max_base_pixels：先按基础尺寸生成，Lanczos放大后逐块img2img细化
+    其余属性透传给原pipeline。
+    """
+
+    def __init__(
+        self,
+        pipe: Any,
+        memory_budget_mb: int,
+        tile_size: int = 512,
+        overlap: int = 64,
+        max_base_pixels: int = 1024 * 1024,
+        upscale_strength: float = 0.3,
+        refiner: Optional[Callable[..., Any]] = None,
+    ):
+        if tile_size % 8:
+            raise ValueError("tile size must be a multiple of 8")
+        plan_tiles(tile_size, tile_size, tile_size, overlap)  # 校验overlap
+
+        self.inner = pipe
+        self.memory_budget_mb = memory_budget_mb
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.max_base_pixels = max_base_pixels
+        self.upscale_strength = upscale_strength
+        self._refiner = refiner
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
+
+    @property
+    def dtype_bytes(self) -> int:
+        dtype = getattr(getattr(self.inner, "vae", None), "dtype", None)
+        return 2 if dtype is not None and "16" in str(dtype) else 4
+
+    def fits(self, width: int, height: int) -> bool:
+        """整图解码是否在预算内"""
+        return estimate_decode_mb(width, height, self.dtype_bytes) <= self.memory_budget_mb
+
+    def _set_vae_tiling(self, enabled: bool):
+        if not hasattr(self.inner, "enable_vae_tiling"):
+            return  # optimum导出的pipeline不支持
+        if enabled:
+            self.inner.enable_vae_tiling()
+            vae = getattr(self.inner, "vae", None)
+            if vae is not None and hasattr(vae, "tile_sample_min_size"):
+                vae.tile_sample_min_size = self.tile_size
+                vae.tile_latent_min_size = self.tile_size // 8
+                vae.tile_overlap_factor = self.overlap / self.tile_size
+        else:
+            self.inner.disable_vae_tiling()
+
+    def _get_refiner(self) -> Optional[Callable[..., Any]]:
+        """复用已加载组件构建img2img pipeline，不额外占用权重内存"""
+        if self._refiner is None and not type(self.inner).__module__.startswith("optimum"):
+            try:
+                from diffusers import AutoPipelineForImage2Image
+                self._refiner = AutoPipelineForImage2Image.from_pipe(self.inner)
+            except Exception as e:
+                logger.warning(f"img2img refiner unavailable, upscaling without refinement: {e}")
+                self._refiner = False
+        return self._refiner or None
+
+    def __call__(self, **kwargs) -> Any:
+        width, height = kwargs.get("width"), kwargs.get("height")
+        if not self.memory_budget_mb or width is None or height is None:
+            return self.inner(**kwargs)
+
+        if width * height <= self.max_base_pixels:
+            self._set_vae_tiling(not self.fits(width, height))
+            return self.inner(**kwargs)
+
+        return self._generate_and_upscale(kwargs, width, height)
+
+    def _generate_and_upscale(self, kwargs: Dict[str, Any], width: int, height: int) -> SimpleNamespace:
+        base_width, base_height = base_size(width, height, self.max_base_pixels)
+        logger.info(f"Tiled generation: {base_width}x{base_height} -> {width}x{height} (tile {self.tile_size})")
+
+        self._set_vae_tiling(not self.fits(base_width, base_height))
+        base = self.inner(**{**kwargs, "width": base_width, "height": base_height}).images[0]
+        upscaled = base.resize((width, height), Image.LANCZOS)
+        del base
+
+        refiner = self._get_refiner()
+        if refiner is None or self.upscale_strength <= 0:
+            return SimpleNamespace(images=[upscaled])
+
+        self._set_vae_tiling(not self.fits(self.tile_size, self.tile_size))
+        refine_kwargs = {
+            key: kwargs[key]
+            for key in REFINE_KWARGS
+            if key in kwargs
+        }
+
+        def refine(tile: Image.Image) -> Image.Image:
+            return refiner(
+                image=tile,
+                strength=self.upscale_strength,
+                width=tile.width,
+                height=tile.height,
+                **refine_kwargs
+            ).images[0]
+
+        return SimpleNamespace(images=[tiled_map(upscaled, refine, self.tile_size, self.overlap)])
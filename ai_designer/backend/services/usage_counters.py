@@ -0,0 +1,281 @@
+"""
+Usage Counters
+使用次数计数器 - 模板/标签的使用次数先累积在进程内分片（或Redis哈希）中，定期合并为
+UPDATE ... SET usage_count = usage_count + :delta 批量写回，热门行不再逐次读-改-写；
+热门模板列表在写回后预先计算并缓存
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import nullcontext
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.lazy import LazyObject
+from core.metrics import USAGE_COUNTER_FLUSHES, USAGE_COUNTER_ROWS
+from core.redis import cache
+from models.tag import Tag
+from models.template import Template
+from schemas.template import TemplateSummary
+
+COUNTED = {"templates": Template, "tags": Tag}
+PENDING_KEY = "usage:pending:{kind}"
+POPULAR_KEY = "templates:popular:{category}"
+ALL_CATEGORIES = "all"
+
+Deltas = Dict[str, Dict[str, int]]  # kind -> id -> 增量
+
+
+class UsageCounters:
+    """
+    使用次数计数器
+
+    increment只在内存分片（memory后端）或Redis哈希（redis后端，多worker共享）上累加；
+    flush取走全部待写回增量，每张表按id排序后分批执行 usage_count = usage_count + delta，
+    写回失败时增量放回待写回队列。数据库中的计数因此最多落后一个写回周期
+    """
+
+    def __init__(self, backend: Optional[str] = None, shards: Optional[int] = None):
+        self.backend = backend or settings.USAGE_COUNTER_BACKEND
+        if self.backend not in ("memory", "redis"):
+            raise ValueError(f"Unknown usage counter backend: {self.backend}")
+        self.shards = max(1, shards or settings.USAGE_COUNTER_SHARDS)
+        # 线程池中的调用方也可以计数，每个分片一把锁
+        self._pending: List[Dict[Tuple[str, str], int]] = [defaultdict(int) for _ in range(self.shards)]
+        self._locks = [threading.Lock() for _ in range(self.shards)]
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        # 进程内的热门列表副本：category -> (过期时间, 列表)
+        self._popular: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+
+    @staticmethod
+    def _model(kind: str):
+        if kind not in COUNTED:
+            raise ValueError(f"Unknown counter: {kind}")
+        return COUNTED[kind]
+
+    # ---- 计数 ----
+
+    def _add_local(self, kind: str, ids: Iterable[Any], amount: int):
+        for row_id in ids:
+            key = (kind, str(row_id))
+            shard = hash(key) % self.shards
+            with self._locks[shard]:
+                pending = self._pending[shard]
+                pending[key] += amount
+                if not pending[key]:
+                    del pending[key]
+
+    async def _redis(self):
+        return await cache.get_client() if self.backend == "redis" else None
+
+    async def increment(self, kind: str, ids: Iterable[Any], amount: int = 1):
+        """ids中每一行的使用次数加amount（可为负），不访问数据库"""
+        self._model(kind)
+        ids = list(ids)
+        if not ids or not amount:
+            return
+        client = await self._redis()
+        if client is not None:
+            try:
+                async with client.pipeline(transaction=False) as pipe:
+                    for row_id in ids:
+                        pipe.hincrby(PENDING_KEY.format(kind=kind), str(row_id), amount)
+                    await pipe.execute()
+                return
+            except Exception as e:
+                logger.warning(f"Usage counter Redis increment failed, counting in memory: {e}")
+        self._add_local(kind, ids, amount)
+
+    async def pending(self, kind: str, row_id: Any) -> int:
+        """尚未写回数据库的增量（本进程内存 + Redis）"""
+        self._model(kind)
+        key = (kind, str(row_id))
+        shard = hash(key) % self.shards
+        with self._locks[shard]:
+            total = self._pending[shard].get(key, 0)
+        client = await self._redis()
+        if client is not None:
+            try:
+                total += int(await client.hget(PENDING_KEY.format(kind=kind), str(row_id)) or 0)
+            except Exception as e:
+                logger.warning(f"Usage counter Redis read failed: {e}")
+        return total
+
+    # ---- 写回 ----
+
+    def _drain_local(self) -> Deltas:
+        drained: Deltas = defaultdict(dict)
+        for shard, lock in enumerate(self._locks):
+            with lock:
+                pending, self._pending[shard] = self._pending[shard], defaultdict(int)
+            for (kind, row_id), delta in pending.items():
+                drained[kind][row_id] = drained[kind].get(row_id, 0) + delta
+        return drained
+
+    async def _drain_redis(self, client, drained: Deltas) -> List[str]:
+        """把待写回哈希原子地改名后读出，其他worker的新增量写入新的哈希；返回改名后的key"""
+        claimed = []
+        for kind in COUNTED:
+            key = PENDING_KEY.format(kind=kind)
+            flushing = f"{key}:flushing:{uuid.uuid4().hex}"
+            try:
+                await client.rename(key, flushing)
+            except Exception:
+                continue  # 没有待写回增量
+            claimed.append(flushing)
+            for row_id, delta in (await client.hgetall(flushing)).items():
+                drained[kind][row_id] = drained[kind].get(row_id, 0) + int(delta)
+        return claimed
+
+    async def _apply(self, db: AsyncSession, drained: Deltas) -> int:
+        rows = 0
+        for kind, deltas in drained.items():
+            table = self._model(kind).__table__
+            statement = (
+                update(table)
+                .where(table.c.id == bindparam("row_id", type_=table.c.id.type))
+                .values(usage_count=table.c.usage_count + bindparam("delta"))
+            )
+            # 固定按id顺序加行锁，多个worker同时写回时不会互相死锁
+            params = [
+                {"row_id": uuid.UUID(row_id), "delta": delta}
+                for row_id, delta in sorted(deltas.items()) if delta
+            ]
+            for start in range(0, len(params), settings.USAGE_COUNTER_BATCH_SIZE):
+                await db.execute(statement, params[start:start + settings.USAGE_COUNTER_BATCH_SIZE])
+            rows += len(params)
+            USAGE_COUNTER_ROWS.labels(kind).inc(len(params))
+        await db.commit()
+        return rows
+
+    async def flush(self, db: Optional[AsyncSession] = None) -> int:
+        """
+        写回全部待写回增量，返回更新的行数
+
+        Args:
+            db: 使用的会话（会被提交）；None时新建会话
+        """
+        async with self._flush_lock:
+            drained = self._drain_local()
+            client = await self._redis()
+            claimed = await self._drain_redis(client, drained) if client is not None else []
+            drained = {kind: deltas for kind, deltas in drained.items() if deltas}
+            if not drained:
+                return 0
+
+            if db is None:
+                from core.database import AsyncSessionLocal
+
+                session_scope = AsyncSessionLocal()
+            else:
+                session_scope = nullcontext(db)
+            async with session_scope as session:
+                try:
+                    rows = await self._apply(session, drained)
+                except Exception:
+                    USAGE_COUNTER_FLUSHES.labels("error").inc()
+                    await session.rollback()
+                    # 增量放回内存分片，下次写回重试（Redis中已认领的哈希随后删除）
+                    for kind, deltas in drained.items():
+                        for row_id, delta in deltas.items():
+                            self._add_local(kind, [row_id], delta)
+                    raise
+                finally:
+                    if claimed:
+                        await client.delete(*claimed)
+
+                if "templates" in drained:
+                    try:
+                        await self.refresh_popular(session)
+                    except Exception as e:
+                        logger.warning(f"Popular templates refresh failed: {e}")
+
+            USAGE_COUNTER_FLUSHES.labels("ok").inc()
+            return rows
+
+    async def _run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Usage counter flush failed: {e}")
+
+    def start(self, interval: Optional[float] = None):
+        """启动后台定期写回"""
+        if self._task is None or self._task.done():
+            interval = interval if interval is not None else settings.USAGE_COUNTER_FLUSH_INTERVAL
+            self._task = asyncio.get_running_loop().create_task(self._run(interval))
+
+    async def close(self):
+        """停止后台写回并写回剩余增量"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    # ---- 热门模板 ----
+
+    async def _compute_popular(self, db: AsyncSession, category: Optional[str]) -> List[Dict[str, Any]]:
+        statement = (
+            select(Template)
+            .where(Template.is_public == True)  # noqa: E712
+            .order_by(Template.usage_count.desc(), Template.rating.desc(), Template.created_at.desc(), Template.id)
+            .limit(settings.POPULAR_TEMPLATES_SIZE)
+            .execution_options(populate_existing=True)  # 会话中已加载的模板取写回后的计数
+        )
+        if category is not None:
+            statement = statement.where(Template.category == category)
+        templates = (await db.execute(statement)).scalars().all()
+        return [TemplateSummary.model_validate(template).model_dump(mode="json") for template in templates]
+
+    async def _store_popular(self, category: str, templates: List[Dict[str, Any]]):
+        ttl = settings.POPULAR_TEMPLATES_TTL
+        self._popular[category] = (time.monotonic() + ttl, templates)
+        await cache.set(POPULAR_KEY.format(category=category), templates, expire=ttl)
+
+    async def refresh_popular(self, db: AsyncSession):
+        """重新计算全部分类的热门列表；其余分类的本地副本作废，由TTL控制Redis中的副本"""
+        templates = await self._compute_popular(db, None)
+        self._popular.clear()
+        await self._store_popular(ALL_CATEGORIES, templates)
+
+    async def popular_templates(
+        self,
+        db: AsyncSession,
+        category: Optional[str] = None,
+        limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """
+        按使用次数与评分排序的公开模板（最多 POPULAR_TEMPLATES_SIZE 个）
+
+        依次查找进程内副本、Redis，都没有时查询一次并写入两级缓存
+        """
+        name = category or ALL_CATEGORIES
+        local = self._popular.get(name)
+        if local is not None and local[0] > time.monotonic():
+            return local[1][:limit]
+
+        templates = await cache.get(POPULAR_KEY.format(category=name))
+        if templates is None:
+            templates = await self._compute_popular(db, category)
+            await self._store_popular(name, templates)
+        else:
+            self._popular[name] = (time.monotonic() + settings.POPULAR_TEMPLATES_TTL, templates)
+        return templates[:limit]
+
+
+# 全局使用次数计数器（首次访问时创建）
+usage_counters = LazyObject(UsageCounters)
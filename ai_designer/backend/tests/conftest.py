@@ -15,7 +15,7 @@ import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from core.config import settings
-from core.database import Base, get_db
+from core.database import Base, get_db, get_read_db
 from main import app
 
 
@@ -67,6 +67,7 @@ async def client(db_session):
             pass
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
 
     async with AsyncClient(app=app, base_url="http://test") as ac:
         yield ac
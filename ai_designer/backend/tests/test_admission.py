@@ -0,0 +1,121 @@
+"""
+Admission Control Tests
+"""
+
+import httpx
+import pytest
+
+from benchmarks.runner import BenchEnvironment
+from core.admission import AdmissionController, AdmissionRejected, work_units
+
+
+def _controller(**kwargs) -> AdmissionController:
+    options = dict(deadline=10.0, max_queue=0, min_steps=10, min_scale=0.5, demo_fallback=False)
+    options.update(kwargs)
+    controller = AdmissionController(**options)
+    # 1百万像素×1步 = 0.1秒
+    controller.observe("hero_banner", 1000, 1000, 10, 1.0)
+    return controller
+
+
+@pytest.mark.unit
+def test_admission_degrades_then_rejects_as_queue_grows():
+    """Test requests are admitted, then cut to fewer steps, then smaller, then rejected with Retry-After"""
+    controller = _controller()
+    assert AdmissionController(max_queue=0).admit("generate", "hero_banner", 1024, 1024, 50).decision == "admit"
+
+    # 1024×1024×50 ≈ 5.2秒，队列为空时直接接收
+    first = controller.admit("generate", "hero_banner", 1024, 1024, 50)
+    assert first.decision == "admit" and first.steps == 50
+    assert controller.queued_units == pytest.approx(work_units(1024, 1024, 50))
+
+    # 排队5秒：剩余预算只够约47步
+    controller.queued_units = 50.0
+    fewer_steps = controller.admit("generate", "hero_banner", 1024, 1024, 50)
+    assert fewer_steps.decision == "degrade" and fewer_steps.steps == 47
+    assert (fewer_steps.width, fewer_steps.height) == (1024, 1024)
+    assert fewer_steps.predicted_seconds <= controller.deadline
+
+    # 排队9.5秒：最少步数也放不下，缩小尺寸（64的倍数）
+    controller.queued_units = 95.0
+    smaller = controller.admit("jobs", "hero_banner", 1024, 1024, 50)
+    assert smaller.decision == "degrade" and smaller.steps == 10
+    assert (smaller.width, smaller.height) == (704, 704)
+
+    controller.queued_units = 99.5
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit("generate", "hero_banner", 1024, 1024, 50)
+    assert rejected.value.retry_after >= 1
+
+    # 完成后释放工作量，重复释放无效
+    controller.queued_units = first.units + fewer_steps.units + smaller.units
+    for decision in (first, fewer_steps, fewer_steps, smaller):
+        controller.release(decision)
+    assert controller.queued_units == pytest.approx(0.0)
+    assert controller.in_flight == {"generate": 0, "jobs": 0}
+
+
+@pytest.mark.unit
+def test_queue_cap_and_demo_fallback():
+    """Test the queue cap applies without timing samples and demo fallback replaces rejection"""
+    capped = AdmissionController(deadline=10.0, max_queue=1, demo_fallback=False)
+    capped.admit("generate", "hero_banner", 512, 512, 20)
+    with pytest.raises(AdmissionRejected):
+        capped.admit("generate", "hero_banner", 512, 512, 20)
+
+    controller = _controller(demo_fallback=True)
+    controller.queued_units = 1000.0
+    demo = controller.admit("generate", "hero_banner", 1024, 576, 30)
+    assert demo.demo and demo.units == 0.0 and (demo.width, demo.height, demo.steps) == (1024, 576, 30)
+
+
+@pytest.mark.unit
+def test_batch_admission_counts_every_image():
+    """Test an icon set is costed as count × preset × steps and routes without a demo render are rejected"""
+    controller = _controller(demo_fallback=True)
+    icons = controller.admit("icons", "icon", 512, 512, 30, count=4)
+    assert icons.decision == "admit" and icons.units == pytest.approx(4 * work_units(512, 512, 30))
+
+    # 排队8秒：剩余2秒，4张512×512最多约19步
+    controller.queued_units = 80.0
+    fewer_steps = controller.admit("icons", "icon", 512, 512, 30, count=4)
+    assert fewer_steps.decision == "degrade" and fewer_steps.steps == 19
+    assert fewer_steps.units == pytest.approx(4 * work_units(512, 512, 19))
+
+    controller.queued_units = 1000.0
+    with pytest.raises(AdmissionRejected):
+        controller.admit("background", "background", 1280, 720, 40, allow_demo=False)
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_overloaded_generation_returns_503_with_retry_after(monkeypatch):
+    """Test overloaded /generate, /jobs, /icons and /background answer 503 + Retry-After and degraded requests report it"""
+    controller = _controller()
+    monkeypatch.setattr("api.v1.endpoints.image.image_admission", controller)
+    payload = {"prompt": "landing hero", "width": 1024, "height": 1024, "num_inference_steps": 50}
+
+    async with BenchEnvironment(image_seconds_per_megapixel_step=0) as app:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            controller.queued_units = work_units(1024, 1024, 50)
+            degraded = await client.post("/api/v1/image/generate", json=payload, params={"response_format": "png"})
+            assert degraded.status_code == 200
+            assert degraded.headers["x-admission"] == "degrade"
+
+            controller.queued_units = 1000.0
+            for path in ("/api/v1/image/generate", "/api/v1/image/jobs"):
+                response = await client.post(path, json=payload)
+                assert response.status_code == 503
+                assert int(response.headers["retry-after"]) >= 1
+
+            icons = {"concept": "navigation", "count": 4}
+            for path, body in (("/api/v1/image/icons", icons), ("/api/v1/image/background", {"style": "mesh"})):
+                response = await client.post(path, json=body)
+                assert response.status_code == 503
+                assert int(response.headers["retry-after"]) >= 1
+
+            controller.queued_units = 0.0
+            admitted = await client.post("/api/v1/image/icons", json=icons)
+            assert admitted.status_code == 200 and admitted.headers["x-admission"] == "admit"
+            assert len(admitted.json()["icons"]) == 4
+            assert controller.queued_units == pytest.approx(0.0)
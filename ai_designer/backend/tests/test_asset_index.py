@@ -0,0 +1,165 @@
+"""
+Asset Index Tests
+"""
+
+import asyncio
+import io
+
+import httpx
+import numpy as np
+import pytest
+from PIL import Image
+
+from benchmarks.runner import BenchEnvironment
+from core.config import settings
+from services import asset_index as asset_index_module
+from services.asset_index import AssetIndexService, IVFIndex
+
+
+def _clustered(count: int, dim: int = 32, clusters: int = 50, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = np.random.default_rng(1).standard_normal((clusters, dim))
+    vectors = centers[rng.integers(0, clusters, count)] + 0.3 * rng.standard_normal((count, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _png(color) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class MeanColorEncoder:
+    """CLIP编码桩：图像按平均颜色编码，颜色相近的图像向量相近"""
+
+    input_size = 32
+
+    def embed_regions(self, crops):
+        means = crops.reshape(len(crops), -1, 3).mean(axis=1) / 255.0
+        return np.concatenate([means, np.full((len(crops), 1), 0.1)], axis=1).astype(np.float32)
+
+    def embed_texts(self, texts):
+        return np.array([[0.0, 0.0, 0.0, 1.0] for _ in texts], dtype=np.float32)
+
+
+@pytest.mark.unit
+def test_ivf_index_search_remove_and_reload(tmp_path):
+    """Test IVF search matches exact search, removals apply and the journal and segments survive a reload"""
+    vectors = _clustered(5000)
+    ids = [f"asset-{i}" for i in range(len(vectors))]
+    index = IVFIndex(str(tmp_path), compact_threshold=10**9)
+    assert index.add(ids, vectors) == 5000
+    assert index.add(ids[:10], vectors[:10]) == 0  # 已存在的ID跳过
+    assert index.compact()
+    assert index.stats()["lists"] > 1 and index.stats()["pending"] == 0
+
+    queries = _clustered(50, seed=7)
+    recall = []
+    for query in queries:
+        exact = {ids[row] for row in np.argsort(-(vectors @ query))[:10]}
+        recall.append(len(exact & {asset_id for asset_id, _ in index.search(query, 10)}) / 10)
+    assert np.mean(recall) >= 0.95
+
+    index.add(["late"], vectors[3] + 0.001)
+    assert index.remove(["asset-3", "missing"]) == 1
+    hits = [asset_id for asset_id, _ in index.search(vectors[3], 3, exclude=["asset-4"])]
+    assert hits[0] == "late" and "asset-3" not in hits and "asset-4" not in hits
+    index.close()
+
+    # 重放日志：删除与新增在合并前后都保持
+    reloaded = IVFIndex(str(tmp_path))
+    assert len(reloaded) == 5000 and reloaded.get("asset-3") is None and reloaded.get("late") is not None
+    assert reloaded.compact()
+    reloaded.close()
+    compacted = IVFIndex(str(tmp_path))
+    assert len(compacted) == 5000 and compacted.stats()["pending"] == 0
+    assert compacted.search(vectors[3], 1)[0][0] == "late"
+    assert np.allclose(compacted.get("asset-7"), vectors[7], atol=1e-6)
+    compacted.close()
+
+
+@pytest.mark.unit
+def test_background_compaction_keeps_concurrent_writes(tmp_path):
+    """Test writes and removals made while a background compaction runs are not lost"""
+    vectors = _clustered(3000, seed=3)
+    index = IVFIndex(str(tmp_path), compact_threshold=1000)
+    index.add([f"a{i}" for i in range(1000)], vectors[:1000])  # 触发后台合并
+    index.add([f"a{i}" for i in range(1000, 1500)], vectors[1000:1500])
+    index.remove(["a10", "a1200"])
+    index.close()
+
+    assert len(index) == 1498
+    reloaded = IVFIndex(str(tmp_path))
+    assert len(reloaded) == 1498
+    assert reloaded.get("a10") is None and reloaded.get("a1200") is None
+    assert reloaded.search(vectors[1300], 1)[0][0] == "a1300"
+    reloaded.close()
+
+
+@pytest.mark.unit
+def test_ingest_deduplicates_similar_images(tmp_path, monkeypatch):
+    """Test ingest reports near-duplicates instead of indexing them unless dedup is off"""
+    monkeypatch.setattr(asset_index_module, "clip_encoder", lambda: MeanColorEncoder())
+    service = AssetIndexService(IVFIndex(str(tmp_path)))
+
+    red = service.ingest("red", service.embed_image(_png((220, 30, 30))))
+    again = service.ingest("red-copy", service.embed_image(_png((221, 30, 31))))
+    blue = service.ingest("blue", service.embed_image(_png((30, 30, 220))))
+    forced = service.ingest("red-forced", service.embed_image(_png((221, 30, 31))), dedup=False)
+
+    assert red["indexed"] and blue["indexed"] and forced["indexed"]
+    assert not again["indexed"] and again["duplicate_of"] == "red" and again["similarity"] > 0.99
+    assert [hit["asset_id"] for hit in service.similar("red", 2)] == ["red-forced", "blue"]
+    assert service.similar("unknown") is None
+    assert service.stats()["vectors"] == 3
+    service.close()
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_generated_images_are_searchable(monkeypatch):
+    """Test /image/generate indexes its result in the background and the asset endpoints find it"""
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "test-admin")
+    admin = {"X-Admin-Token": "test-admin"}
+    async with BenchEnvironment() as app:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            generated = await client.post(
+                "/api/v1/image/generate",
+                params={"response_format": "png"},
+                json={"prompt": "sunset gradient", "width": 512, "height": 512, "num_inference_steps": 10},
+            )
+            generation_id = generated.headers["X-Generation-Id"]
+
+            similar = None
+            for _ in range(100):
+                similar = await client.get(f"/api/v1/assets/{generation_id}/similar")
+                if similar.status_code != 404:
+                    break
+                await asyncio.sleep(0.02)
+            assert similar.status_code == 200 and similar.json()["results"] == []
+
+            anonymous_ingest = await client.post(
+                "/api/v1/assets/ingest",
+                params={"asset_id": "upload-1"},
+                files={"image": ("copy.png", generated.content, "image/png")},
+            )
+            duplicate = await client.post(
+                "/api/v1/assets/ingest",
+                params={"asset_id": "upload-1"},
+                files={"image": ("copy.png", generated.content, "image/png")},
+                headers=admin,
+            )
+            text = await client.post("/api/v1/assets/search", params={"query": "sunset"})
+            anonymous_remove = await client.delete(f"/api/v1/assets/{generation_id}")
+            wrong_token = await client.delete(f"/api/v1/assets/{generation_id}", headers={"X-Admin-Token": "guess"})
+            removed = await client.delete(f"/api/v1/assets/{generation_id}", headers=admin)
+            missing = await client.get(f"/api/v1/assets/{generation_id}/similar")
+            empty = await client.post("/api/v1/assets/search")
+
+    assert anonymous_ingest.status_code == 401
+    assert anonymous_remove.status_code == 401 and wrong_token.status_code == 401
+    assert duplicate.status_code == 200
+    assert duplicate.json()["duplicate_of"] == generation_id and not duplicate.json()["indexed"]
+    assert text.status_code == 200 and len(text.json()["results"]) == 1
+    assert removed.status_code == 200 and missing.status_code == 404
+    assert empty.status_code == 400
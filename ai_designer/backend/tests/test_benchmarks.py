@@ -0,0 +1,80 @@
+"""
+Benchmark Harness Tests
+"""
+
+import copy
+
+import pytest
+
+from benchmarks.runner import BenchEnvironment, compare, percentile, run_workload
+from benchmarks.stubs import StubGeminiModel, StubImageBackend
+from benchmarks.workloads import WORKLOADS, plan_requests
+
+
+@pytest.mark.unit
+def test_stubs_and_plans_are_deterministic():
+    """Test stub outputs and request plans repeat for the same inputs"""
+    backend = StubImageBackend(seconds_per_megapixel_step=0)
+    first = backend(seed=7, prompt="hero", width=64, height=32, num_inference_steps=2).images[0]
+    second = backend(seed=7, prompt="hero", width=64, height=32, num_inference_steps=2).images[0]
+    other = backend(seed=8, prompt="hero", width=64, height=32, num_inference_steps=2).images[0]
+    assert first.tobytes() == second.tobytes() != other.tobytes()
+    assert 0.0 <= backend.aesthetic_score(first) <= 1.0
+
+    svg = StubGeminiModel().generate_content("Generate SVG code for: logo\n\nSize: 128x64").text
+    assert 'viewBox="0 0 128 64"' in svg
+
+    assert plan_requests("mixed", 50, seed=3) == plan_requests("mixed", 50, seed=3)
+    assert plan_requests("mixed", 50, seed=3) != plan_requests("mixed", 50, seed=4)
+
+
+@pytest.mark.unit
+def test_percentile_nearest_rank():
+    """Test nearest-rank percentiles"""
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([], 50) == 0.0
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_mixed_workload_runs_against_stub_backends():
+    """Test every workload endpoint succeeds in-process with stub models"""
+    async with BenchEnvironment(image_seconds_per_megapixel_step=0) as app:
+        result = await run_workload(app, "mixed", requests=60, concurrency=4, warmup=0)
+
+    assert result["requests"] == 60
+    assert result["errors"] == 0, result["endpoints"]
+    latency = result["latency_ms"]
+    assert 0 < latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+    assert set(result["endpoints"]) <= {template.name for template in WORKLOADS["mixed"]}
+
+
+@pytest.mark.unit
+def test_compare_flags_regressions_beyond_tolerance():
+    """Test comparison flags slower, bigger and failing runs only"""
+    result = {
+        "requests": 100,
+        "errors": 0,
+        "throughput_rps": 100.0,
+        "latency_ms": {"p50": 10.0, "p95": 20.0, "p99": 40.0, "mean": 12.0, "max": 50.0},
+        "peak_rss_delta_mb": 50.0,
+    }
+    baseline = {"workloads": {"mixed": result, "svg": copy.deepcopy(result)}}
+
+    current = copy.deepcopy(baseline)
+    current["workloads"]["mixed"]["latency_ms"]["p95"] = 21.5  # 7.5%，在容差内
+    current["workloads"]["mixed"]["peak_rss_delta_mb"] = 54.0  # 低于绝对下限
+    assert compare(baseline, current, tolerance=0.1) == []
+
+    current["workloads"]["mixed"]["throughput_rps"] = 80.0
+    current["workloads"]["mixed"]["latency_ms"]["p99"] = 60.0
+    current["workloads"]["svg"]["errors"] = 1
+    regressions = {(r.workload, r.metric) for r in compare(baseline, current, tolerance=0.1)}
+    assert regressions == {
+        ("mixed", "throughput_rps"),
+        ("mixed", "latency_p99_ms"),
+        ("svg", "errors"),
+    }
@@ -0,0 +1,115 @@
+"""
+Local Code Optimizer Tests
+"""
+
+import time
+
+import httpx
+import pytest
+
+from benchmarks.runner import BenchEnvironment
+from services.code_optimizer import code_optimizer, sort_tailwind_classes, tokenize
+
+COMPONENT = '''import React, { useState, useEffect, useMemo as memo } from "react";
+import { motion } from "framer-motion";
+import type { Props } from "./types";
+import * as icons from "./icons";
+import "./hero.css";
+
+// Hero section
+export const Hero = ({ title }: { title: string }) => {
+  const [count, setCount] = useState(0);   /* clicks */
+  const label = `clicked  ${count}   times`;
+  const pattern = /\\s+  \\//g;
+  return (
+    <motion.section className="p-4 flex p-4 text-white bg-indigo-600 md:p-8 hover:bg-indigo-700">
+      <h1 className={`text-3xl ${count ? "font-bold" : ""}`}>{title}</h1>
+      <button onClick={() => setCount(count + 1)} title="a  //  b">{label}</button>
+    </motion.section>
+  );
+};
+'''
+
+
+@pytest.mark.unit
+def test_removes_unused_imports_and_sorts_tailwind_classes():
+    """Test unused bindings are dropped while used ones, JSX React and side-effect imports remain"""
+    result = code_optimizer.optimize(COMPONENT, "react", minify=False)
+
+    assert sorted(result.removed_imports) == ["Props", "icons", "memo", "useEffect"]
+    assert 'import React, { useState } from "react";' in result.code
+    assert 'import { motion } from "framer-motion";' in result.code
+    assert 'import "./hero.css";' in result.code
+    assert 'className="flex p-4 text-white bg-indigo-600 hover:bg-indigo-700 md:p-8"' in result.code
+    assert sort_tailwind_classes("md:p-8 p-2 p-2 mt-1 flex") == "flex p-2 mt-1 md:p-8"
+
+    # 无法可靠解析时原样返回
+    broken = code_optimizer.optimize("const a = `unterminated ${x}", "react")
+    assert broken.code == "const a = `unterminated ${x}" and broken.warnings
+
+
+@pytest.mark.unit
+def test_minify_preserves_literals_and_reports_sizes():
+    """Test minification keeps strings, templates, regexes and newlines while shrinking the byte size"""
+    result = code_optimizer.optimize(COMPONENT, "react")
+
+    assert "`clicked  ${count}   times`" in result.code
+    assert "/\\s+  \\//g" in result.code
+    assert 'title="a  //  b"' in result.code
+    assert "Hero section" not in result.code and "clicks" not in result.code
+    assert "const[count,setCount]=useState(0);\n" in result.code
+    assert result.original_size == len(COMPONENT.encode("utf-8"))
+    assert result.optimized_size == len(result.code.encode("utf-8")) < result.original_size
+    assert result.optimized_gzip_size < result.original_gzip_size
+    # 重新分词结果一致，且已压缩的代码再次优化不变
+    assert "".join(token.text for token in tokenize(result.code)) == result.code
+    assert code_optimizer.optimize(result.code, "react").code == result.code
+
+
+@pytest.mark.unit
+def test_markup_frameworks_and_large_files():
+    """Test Vue/Svelte template usages keep imports and a large file is optimized quickly"""
+    vue = '''<template>
+  <!-- header -->
+  <div class="p-4 flex p-4"><my-button @click="go">{{ $t("hi") }}</my-button></div>
+  <pre>  keep   this  </pre>
+</template>
+<script setup>
+import MyButton from "./MyButton.vue";
+import Unused from "./Unused.vue";
+import { ref } from "vue";
+const go = ref(1);
+</script>
+<style scoped>
+.card  :hover { color : red ; }
+</style>
+'''
+    result = code_optimizer.optimize(vue, "vue")
+    assert result.removed_imports == ["Unused"]
+    assert 'class="flex p-4"' in result.code and "header" not in result.code
+    assert "<pre>  keep   this  </pre>" in result.code
+    assert ".card  :hover{color : red;}" in result.code
+
+    svelte = '<script>\nimport { count } from "./stores";\nimport { other } from "./x";\n</script>\n<p>{$count}</p>\n'
+    assert code_optimizer.optimize(svelte, "svelte").removed_imports == ["other"]
+
+    large = COMPONENT * 300  # 约230KB
+    start = time.perf_counter()
+    result = code_optimizer.optimize(large, "react")
+    assert time.perf_counter() - start < 2.0
+    assert not result.warnings and result.optimized_size < result.original_size * 0.8
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_optimize_endpoint_runs_locally_without_llm():
+    """Test /code/optimize returns locally optimized code with byte sizes and no AI stage by default"""
+    async with BenchEnvironment() as app:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/v1/code/optimize", json={"code": COMPONENT, "framework": "react"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["stages"] == ["local"]
+    assert "useEffect" in data["removed_imports"]
+    assert data["optimized_size"] < data["original_size"] == len(COMPONENT.encode("utf-8"))
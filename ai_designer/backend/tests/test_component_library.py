@@ -0,0 +1,112 @@
+"""
+Component Library Generation Tests
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from benchmarks.runner import BenchEnvironment
+from core.config import settings
+from services.code_generation import CodeGenerationService
+
+
+class FakeGemini:
+    """异步Gemini桩：记录提示词与最大并发数，指定组件可挂起"""
+
+    def __init__(self, seconds: float = 0.05, hang: str = None):
+        self.seconds = seconds
+        self.hang = hang
+        self.prompts = []
+        self.active = 0
+        self.max_active = 0
+
+    async def generate_content_async(self, prompt: str):
+        self.prompts.append(prompt)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            name = prompt.split("Component name: ")[1].split("\n")[0]
+            await asyncio.sleep(3600 if name == self.hang else self.seconds)
+            return SimpleNamespace(text=f"```tsx\nexport const {name} = () => <div />;\n```")
+        finally:
+            self.active -= 1
+
+
+def _service(model: FakeGemini) -> CodeGenerationService:
+    service = CodeGenerationService()
+    service.gemini_model = model
+    service.gemini_client = None
+    return service
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_component_library_runs_concurrently_with_shared_theme_prefix(monkeypatch):
+    """Test components are generated in parallel up to the limit and keep request order"""
+    monkeypatch.setattr(settings, "CODE_LIBRARY_CONCURRENCY", 3)
+    model = FakeGemini(seconds=0.1)
+    service = _service(model)
+    names = ["Button", "Card", "Input", "Modal", "Badge", "Avatar"]
+
+    start = time.perf_counter()
+    library = await service.generate_component_library("minimal", names)
+    elapsed = time.perf_counter() - start
+
+    assert [component["component_name"] for component in library] == names
+    assert all(component["status"] == "completed" for component in library)
+    assert model.max_active == 3
+    assert elapsed < 0.45  # 串行需要0.6秒
+    context = service.theme_context("minimal")
+    assert all(prompt.startswith(context) for prompt in model.prompts)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_component_deadline_falls_back_and_streams_in_completion_order(monkeypatch):
+    """Test a hung component times out to template code while finished ones stream first"""
+    monkeypatch.setattr(settings, "CODE_COMPONENT_TIMEOUT", 0.3)
+    service = _service(FakeGemini(seconds=0.01, hang="Card"))
+
+    streamed = [component async for component in service.iter_component_library("modern", ["Card", "Button", "Badge"])]
+
+    assert {component["component_name"] for component in streamed[:2]} == {"Button", "Badge"}
+    card = streamed[-1]
+    assert card["status"] == "timeout" and card["index"] == 0
+    assert "export const Card" in card["code"] and card["generation_time"] >= 0.3
+
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_empty_component_list_generates_nothing():
+    """Test an explicit empty list yields no components while None uses the defaults"""
+    model = FakeGemini(seconds=0)
+    service = _service(model)
+
+    assert await service.generate_component_library("modern", []) == []
+    assert model.prompts == []
+
+    library = await service.generate_component_library("modern")
+    assert [component["component_name"] for component in library] == service.DEFAULT_COMPONENTS
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_component_library_stream_endpoint():
+    """Test the SSE endpoint emits one component event per component then done"""
+    async with BenchEnvironment() as app:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post(
+                "/api/v1/code/component-library/stream",
+                json={"theme": "glassmorphism", "components": ["Button", "Card", "Input"]},
+            )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n")[0] for block in response.text.strip().split("\n\n")]
+    assert events == ["event: component"] * 3 + ["event: done"]
+    assert '"completed": 3' in response.text
@@ -0,0 +1,164 @@
+"""
+Design to Code Tests
+"""
+
+import io
+import time
+
+import httpx
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+from benchmarks.runner import BenchEnvironment
+from core.config import settings
+from services.code_generation import CodeGenerationService
+from services.design_analysis import COMPONENT_TEMPLATES, DesignAnalyzer, decode_design, segment_layout
+
+
+def _landing_page(fmt: str = "PNG") -> bytes:
+    """导航栏 + hero + 三张卡片 + 页脚"""
+    image = Image.new("RGB", (1200, 1000), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    big, medium, small = (ImageFont.load_default(size=size) for size in (56, 22, 16))
+
+    draw.rectangle([0, 0, 1199, 69], fill=(17, 24, 39))
+    draw.text((40, 20), "Acme", font=medium, fill=(255, 255, 255))
+    for i, label in enumerate(["Home", "Pricing", "Docs"]):
+        draw.text((820 + i * 120, 24), label, font=small, fill=(209, 213, 219))
+
+    draw.rectangle([0, 110, 1199, 469], fill=(79, 70, 229))
+    draw.text((300, 165), "Build faster today", font=big, fill=(255, 255, 255))
+    draw.text((380, 265), "Design to code in one click, no setup needed", font=medium, fill=(224, 231, 255))
+    draw.rounded_rectangle([520, 340, 680, 390], radius=8, fill=(236, 72, 153))
+    draw.text((555, 355), "Get started", font=small, fill=(255, 255, 255))
+
+    for i in range(3):
+        x = 60 + i * 380
+        draw.rectangle([x, 520, x + 320, 820], fill=(243, 244, 246))
+        for y in range(540, 660, 2):
+            draw.line([(x + 20, y), (x + 300, y)], fill=((y * 7) % 255, (x + y * 3) % 255, (y * 13) % 255))
+        draw.text((x + 20, 685), f"Feature {i + 1}", font=medium, fill=(31, 41, 55))
+        draw.text((x + 20, 735), "Short description of the feature", font=small, fill=(107, 114, 128))
+
+    draw.rectangle([0, 900, 1199, 999], fill=(31, 41, 55))
+    draw.text((40, 940), "(c) 2026 Acme Inc. All rights reserved", font=small, fill=(156, 163, 175))
+    draw.text((1000, 940), "Privacy  Terms", font=small, fill=(156, 163, 175))
+
+    buffer = io.BytesIO()
+    image.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+class RecordingEncoder:
+    """CLIP编码桩：模板文本为各组件的单位向量，区域一律指向footer；记录调用"""
+
+    model_id = "recording"
+
+    def __init__(self):
+        self.region_batches = []
+        self.text_calls = 0
+        self.labels = list(COMPONENT_TEMPLATES)
+
+    def embed_texts(self, texts):
+        self.text_calls += 1
+        label_of = {prompt: label for label, prompts in COMPONENT_TEMPLATES.items() for prompt in prompts}
+        return np.eye(len(self.labels), dtype=np.float32)[[self.labels.index(label_of[text]) for text in texts]]
+
+    def embed_regions(self, crops):
+        self.region_batches.append(crops.shape)
+        vectors = np.zeros((len(crops), len(self.labels)), dtype=np.float32)
+        vectors[:, self.labels.index("footer")] = 1.0
+        return vectors
+
+
+@pytest.mark.unit
+def test_segments_landing_page_into_sections_and_components():
+    """Test XY-cut finds the navbar, hero, card row and footer and their inner elements"""
+    for fmt in ("PNG", "JPEG"):
+        data = _landing_page(fmt)
+        start = time.perf_counter()
+        pixels, scale = decode_design(data, max_side=1024)
+        root = segment_layout(pixels)
+
+        assert pixels.shape == (853, 1024, 3) and scale == pytest.approx(1200 / 1024)
+        navbar, hero, cards, footer = root.children
+        assert navbar.direction == "row" and len(navbar.children) == 4
+        assert hero.background == pytest.approx((79, 70, 229), abs=3) and len(hero.children) == 3
+        assert cards.direction == "row" and not cards.filled
+        assert [len(card.children) for card in cards.children] == [3, 3, 3]
+        assert footer.direction == "row" and len(footer.children) == 2
+        assert time.perf_counter() - start < 1.0
+
+
+@pytest.mark.unit
+def test_clip_matching_batches_regions_and_persists_template_index(tmp_path, monkeypatch):
+    """Test regions are embedded in one batch, container labels only apply to containers and the index is reused"""
+    encoder = RecordingEncoder()
+    index_path = tmp_path / "index.npz"
+    analyzer = DesignAnalyzer(max_regions=8, index_path=str(index_path))
+    monkeypatch.setattr(analyzer, "encoder", lambda: encoder)
+
+    layout = analyzer.analyze(_landing_page())
+
+    assert layout.method == "clip" and encoder.text_calls == 1
+    assert encoder.region_batches == [(8, 224, 224, 3)]
+    assert index_path.exists()
+    matched = layout.regions[:8]
+    assert all((region.kind == "footer") == bool(region.children) for region in matched)
+    assert all(region.kind != "footer" for region in layout.regions[8:] if not region.children)
+
+    # 新实例直接读取磁盘上的索引，不再编码模板文本
+    fresh = DesignAnalyzer(index_path=str(index_path))
+    monkeypatch.setattr(fresh, "encoder", lambda: encoder)
+    assert fresh.analyze(_landing_page()).method == "clip"
+    assert encoder.text_calls == 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_image_to_code_renders_layout_templates(monkeypatch):
+    """Test the detected layout is rendered as React with Tailwind and as plain Vue markup"""
+    monkeypatch.setattr(DesignAnalyzer, "encoder", lambda self: None)
+    service = CodeGenerationService()
+
+    react = await service.image_to_code(_landing_page(), framework="react", component_name="Landing")
+    assert react["layout"]["method"] == "geometry"
+    assert "const Landing: React.FC" in react["code"]
+    assert "<nav" in react["code"] and "<footer" in react["code"]
+    assert "md:grid-cols-3" in react["code"]
+    assert react["metadata"]["analysis"]["regions"] == len(list(_walk(react["layout"]))) - 1
+
+    vue = await service.image_to_code(_landing_page(), framework="vue", language="javascript", with_tailwind=False)
+    assert vue["code"].startswith("<template>")
+    assert "className" not in vue["code"] and "grid-cols" not in vue["code"]
+
+
+def _walk(node):
+    yield node
+    for child in node.get("regions", node.get("children", [])):
+        yield from _walk(child)
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_design_to_code_endpoint(tmp_path, monkeypatch):
+    """Test /code/design-to-code returns code and layout for an upload and rejects non-images"""
+    monkeypatch.setattr(settings, "DESIGN_TEMPLATE_INDEX_PATH", str(tmp_path / "index.npz"))
+    async with BenchEnvironment() as app:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post(
+                "/api/v1/code/design-to-code",
+                files={"image": ("design.png", _landing_page(), "image/png")},
+                params={"framework": "react"},
+            )
+            invalid = await client.post(
+                "/api/v1/code/design-to-code",
+                files={"image": ("design.png", b"not an image", "image/png")},
+            )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["success"] and "<nav" in data["code"]
+    assert data["layout"]["width"] == 1200 and data["layout"]["regions"]
+    assert invalid.status_code == 400
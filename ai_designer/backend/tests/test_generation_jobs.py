@@ -0,0 +1,290 @@
+"""
+Generation Job Tests
+"""
+
+import asyncio
+import io
+import json
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from PIL import Image
+from prometheus_client import REGISTRY
+
+from core.image_buffer import encode_image
+from core.config import settings
+from services.generation_jobs import (
+    GenerationCancelled,
+    JobBackendUnavailable,
+    JobRegistry,
+    job_registry,
+    latents_to_preview,
+)
+from services.image_generation import ImageGenerationService
+from services.model_server import ModelServer, ModelServerClient
+
+
+class LatentPipeline:
+    """逐步调用callback_on_step_end的pipeline，可在指定步后触发回调"""
+
+    device = "cpu"
+
+    def __init__(self, after_step=None, step_seconds=0.0):
+        self.after_step = after_step
+        self.step_seconds = step_seconds
+        self.steps_run = 0
+
+    def __call__(self, width, height, num_inference_steps, callback_on_step_end=None, **kwargs):
+        latents = np.random.default_rng(0).standard_normal((1, 4, height // 8, width // 8)).astype(np.float32)
+        for i in range(num_inference_steps):
+            self.steps_run += 1
+            time.sleep(self.step_seconds)
+            if callback_on_step_end is not None:
+                callback_on_step_end(self, i, 999 - i, {"latents": latents})
+            if self.after_step is not None:
+                self.after_step(i + 1)
+        return SimpleNamespace(images=[Image.new("RGB", (width, height), (40, 80, 120))])
+
+
+def _reclaimed_steps() -> float:
+    return REGISTRY.get_sample_value(
+        "ai_designer_cancelled_steps_reclaimed_total", {"endpoint": "hero_banner"}
+    ) or 0.0
+
+
+def _drain(queue: asyncio.Queue) -> list:
+    events = []
+    while not queue.empty():
+        events.append(queue.get_nowait())
+    return events
+
+
+def _local_service(pipeline) -> ImageGenerationService:
+    service = ImageGenerationService()
+    service.generator = pipeline
+    service.generation_profile = None
+    service.remote = False
+    service.demo_mode = False
+    service.clip_model = None
+    return service
+
+
+@pytest.mark.unit
+def test_latent_preview_is_one_eighth_resolution():
+    """Test latent previews decode at latent resolution without the VAE"""
+    latents = np.zeros((1, 4, 72, 128), dtype=np.float32)
+
+    preview = latents_to_preview(latents, "sdxl")
+    assert preview.size == (128, 72)
+    # 零潜变量只剩偏置项
+    assert preview.getpixel((0, 0)) == (141, 125, 127)
+
+    # 打包格式（如FLUX）不生成预览
+    assert latents_to_preview(np.zeros((1, 4096, 64), dtype=np.float32)) is None
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_job_streams_previews_and_cancels_between_steps():
+    """Test previews are published every N steps and cancellation stops the pipeline"""
+    job = job_registry.create("hero_banner", total_steps=20, preview_every=2)
+    pipeline = LatentPipeline(after_step=lambda step: step == 5 and job.cancel("client"))
+    service = _local_service(pipeline)
+    queue = job.subscribe()
+    reclaimed_before = _reclaimed_steps()
+
+    job.start(lambda progress: service.generate_hero_banner(
+        "landing page", size="thumbnail", num_inference_steps=20, progress=progress
+    ))
+    await job._task
+
+    events = _drain(queue)
+    assert job.status == "cancelled"
+    assert job.step == 5
+    # 取消后只多跑当前一步
+    assert pipeline.steps_run == 6
+    previews = [e for e in events if e["event"] == "preview"]
+    assert [e["step"] for e in previews] == [2, 4]
+    assert previews[0]["image"].startswith("data:image/jpeg;base64,")
+    assert events[-1]["event"] == "cancelled"
+    assert _reclaimed_steps() - reclaimed_before == 15
+
+
+@pytest.mark.unit
+def test_remote_generation_reports_progress_and_cancels(tmp_path, monkeypatch):
+    """Test previews cross the model server connection and cancel reaches the server"""
+    from services.ai_models import model_manager
+
+    pipeline = LatentPipeline(step_seconds=0.02)
+    monkeypatch.setitem(model_manager.models, "image_generator", pipeline)
+    monkeypatch.setattr(settings, "MODEL_SERVER_AUTHKEY", "test-authkey")
+    server = ModelServer(str(tmp_path / "models.sock")).bind()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    class Recorder:
+        preview_every = 3
+        latent_format = "sd"
+
+        def __init__(self):
+            self.steps = []
+            self.previews = []
+
+        def report(self, step, total, preview):
+            if step > 4:
+                raise GenerationCancelled("client")
+            self.steps.append((step, total))
+            if preview is not None:
+                self.previews.append(Image.open(io.BytesIO(preview)).size)
+
+    try:
+        client = ModelServerClient(server.address, timeout=10)
+        recorder = Recorder()
+        with pytest.raises(GenerationCancelled):
+            client(prompt="hero", width=64, height=32, num_inference_steps=30, progress=recorder)
+    finally:
+        server.close()
+        thread.join(timeout=5)
+
+    assert recorder.steps == [(1, 30), (2, 30), (3, 30), (4, 30)]
+    assert recorder.previews == [(8, 4)]
+    assert pipeline.steps_run < 30
+
+
+def _build_app():
+    from api.v1.endpoints import image
+
+    app = FastAPI()
+    app.include_router(image.router, prefix="/image")
+    return app
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_job_endpoints_stream_events_and_serve_result():
+    """Test the job lifecycle over HTTP: create, SSE events, result, cancel"""
+    png = encode_image(Image.new("RGB", (64, 32), (1, 2, 3)))
+    latents = np.zeros((1, 4, 4, 8), dtype=np.float32)
+
+    def generate(progress=None, **kwargs):
+        for step in range(1, 5):
+            progress.on_step(step, 4, latents)
+        return {"image_data": png, "width": 64, "height": 32, "aesthetic_score": None}
+
+    with patch("api.v1.endpoints.image.image_service") as mock_service:
+        mock_service.generate_hero_banner.side_effect = generate
+        async with AsyncClient(app=_build_app(), base_url="http://test") as ac:
+            created = await ac.post(
+                "/image/jobs", params={"preview_every": 2},
+                json={"prompt": "hero", "width": 512, "height": 512}
+            )
+            job = created.json()
+            stream = await ac.get(job["events_url"])
+            result = await ac.get(f"/image/jobs/{job['job_id']}/result")
+            cancelled = await ac.delete(f"/image/jobs/{job['job_id']}")
+            missing = await ac.get("/image/jobs/unknown")
+
+    assert created.status_code == 202
+    assert stream.headers["content-type"].startswith("text/event-stream")
+    events = [
+        json.loads(block.split("data: ", 1)[1])
+        for block in stream.text.strip().split("\n\n")
+    ]
+    assert [e["step"] for e in events if e["event"] == "preview"] == [2]
+    assert events[-1]["event"] == "completed"
+    assert events[-1]["result_url"] == f"/image/jobs/{job['job_id']}/result"
+
+    assert result.content == bytes(png)
+    assert cancelled.json()["status"] == "completed"
+    assert missing.status_code == 404
+
+
+async def _wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not await condition():
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_redis_backend_shares_jobs_between_workers(monkeypatch):
+    """Test another worker's registry sees job status, streams events, serves the result and cancels jobs it does not own"""
+    from fakeredis import FakeServer, aioredis
+
+    server = FakeServer()
+    owner, other = (
+        JobRegistry(backend="redis", redis=aioredis.FakeRedis(server=server, decode_responses=True)) for _ in range(2)
+    )
+    latents = np.zeros((1, 4, 4, 8), dtype=np.float32)
+    previewed = threading.Event()
+
+    def generate(progress):
+        for step in range(1, 5):
+            progress.on_step(step, 4, latents)
+            if step == 2:
+                previewed.wait(5)  # 等另一个worker收到预览后再继续
+        return {"image_data": b"png", "width": 64, "height": 32}
+
+    def run_until_cancelled(progress):
+        for step in range(1, 1000):
+            time.sleep(0.005)
+            progress.on_step(step, 1000)
+
+    try:
+        await owner.prepare()
+        await other.prepare()
+
+        job = owner.create("hero_banner", total_steps=4, preview_every=2)
+        await owner.share(job)
+        assert (await other.lookup(job.id)).snapshot() == job.snapshot()
+        assert await other.lookup("unknown") is None
+
+        events = []
+        job.start(generate)
+        async for event in other.events(await other.lookup(job.id)):
+            events.append(event)
+            if event["event"] == "preview":
+                previewed.set()
+        assert events[0]["event"] == "status" and events[-1]["event"] == "completed"
+        assert [e["step"] for e in events if e["event"] == "preview"] == [2]
+        await _wait_for(lambda: _status(other, job.id, "completed"))
+        assert (await other.lookup(job.id)).result == {"image_data": b"png", "width": 64, "height": 32}
+
+        # DELETE打到其他worker：经控制频道取消
+        cancelled = owner.create("hero_banner", total_steps=1000)
+        await owner.share(cancelled)
+        cancelled.start(run_until_cancelled)
+        await _wait_for(lambda: _status(other, cancelled.id, "running"))
+        assert await other.cancel(await other.lookup(cancelled.id), "client")
+        await cancelled._task
+        assert cancelled.status == "cancelled" and cancelled.cancel_reason == "client"
+        await _wait_for(lambda: _status(other, cancelled.id, "cancelled"))
+
+        # 唯一的订阅者（在其他worker上）断开：视为放弃
+        abandoned = owner.create("hero_banner", total_steps=1000)
+        await owner.share(abandoned)
+        abandoned.start(run_until_cancelled)
+        stream = other.events(await other.lookup(abandoned.id))
+        assert (await anext(stream))["event"] == "status"
+        await stream.aclose()
+        await abandoned._task
+        assert abandoned.status == "cancelled" and abandoned.cancel_reason == "disconnect"
+    finally:
+        await owner.close()
+        await other.close()
+
+    monkeypatch.setattr(settings, "WORKERS", 2)
+    with pytest.raises(JobBackendUnavailable, match="IMAGE_JOB_BACKEND=redis"):
+        await JobRegistry(backend="memory").prepare()
+
+
+async def _status(registry, job_id: str, status: str) -> bool:
+    job = await registry.lookup(job_id)
+    return job is not None and job.status == status
@@ -0,0 +1,102 @@
+"""
+Image Buffer Tests
+"""
+
+import base64
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from PIL import Image
+
+from core.image_buffer import (
+    EmbeddedImage,
+    ImageJSONResponse,
+    SharedImageBuffer,
+    encode_image,
+    iter_base64,
+)
+
+
+def _gradient(width=320, height=200) -> Image.Image:
+    return Image.linear_gradient("L").resize((width, height)).convert("RGB")
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("size", [0, 1, 2, 3, 49151, 49152, 49153, 200001])
+def test_chunked_base64_matches_b64encode(size):
+    """Test chunked base64 output concatenates to the standard encoding"""
+    data = os.urandom(size)
+    assert b"".join(iter_base64(data)) == base64.b64encode(data)
+
+
+@pytest.mark.unit
+def test_shared_buffer_round_trip():
+    """Test pixels survive a transfer through shared memory"""
+    image = _gradient()
+    ref = SharedImageBuffer.from_image(image).transfer()
+
+    with SharedImageBuffer.attach(ref) as buffer:
+        restored = buffer.to_image()
+
+    assert restored.tobytes() == image.tobytes()
+    with pytest.raises(FileNotFoundError):
+        SharedImageBuffer.attach(ref)
+
+
+@pytest.mark.unit
+def test_image_json_response_body():
+    """Test streamed JSON body and precomputed Content-Length"""
+    png = encode_image(_gradient())
+    response = ImageJSONResponse({
+        "success": True,
+        "image_url": EmbeddedImage(png, prefix="data:image/png;base64,"),
+        "items": [{"name": "中文", "data": EmbeddedImage(png)}],
+    })
+
+    body = b"".join(response.iter_body())
+    data = json.loads(body)
+    expected = base64.b64encode(png).decode()
+
+    assert int(response.headers["content-length"]) == len(body)
+    assert data["image_url"] == f"data:image/png;base64,{expected}"
+    assert data["items"][0] == {"name": "中文", "data": expected}
+
+
+def _build_app():
+    from api.v1.endpoints import image
+
+    app = FastAPI()
+    app.include_router(image.router, prefix="/image")
+    return app
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_generate_response_formats():
+    """Test JSON and raw PNG responses of the generate endpoint"""
+    png = encode_image(_gradient(64, 32))
+    result = {"image_data": png, "width": 64, "height": 32}
+
+    with patch("api.v1.endpoints.image.image_service") as mock_service:
+        mock_service.generate_hero_banner.return_value = result
+        async with AsyncClient(app=_build_app(), base_url="http://test") as ac:
+            as_json = await ac.post("/image/generate", json={"prompt": "hero", "width": 512, "height": 512})
+            as_png = await ac.post(
+                "/image/generate",
+                params={"response_format": "png"},
+                json={"prompt": "hero", "width": 512, "height": 512}
+            )
+
+    data = as_json.json()
+    assert data["success"] is True
+    assert base64.b64decode(data["image_base64"]) == bytes(png)
+    assert data["image_url"].endswith(data["image_base64"])
+    assert data["dimensions"] == {"width": 64, "height": 32}
+
+    assert as_png.headers["content-type"] == "image/png"
+    assert as_png.headers["x-image-width"] == "64"
+    assert as_png.content == bytes(png)
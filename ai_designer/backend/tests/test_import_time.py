@@ -0,0 +1,84 @@
+"""
+Import Time Regression Tests
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# 冷启动导入 main 的耗时上限（毫秒），可通过环境变量调整
+IMPORT_TIME_BUDGET_MS = int(os.getenv("IMPORT_TIME_BUDGET_MS", "3000"))
+
+HEAVY_MODULES = ("torch", "diffusers", "clip", "google.generativeai", "transformers")
+
+
+def _import_times(module: str) -> dict:
+    """在子进程中以 -X importtime 导入模块，返回 {模块名: 累计微秒}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            times[name.strip()] = int(cumulative.strip())
+        except ValueError:
+            continue  # 表头
+    return times
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("module", ["services", "main"])
+def test_no_heavy_frameworks_at_import(module):
+    """Test that importing the app does not load ML frameworks"""
+    times = _import_times(module)
+
+    loaded = [name for name in HEAVY_MODULES if name in times]
+    assert loaded == [], f"{module} imports heavy frameworks eagerly: {loaded}"
+
+
+@pytest.mark.unit
+def test_main_cold_import_budget():
+    """Test cold import time of the app stays within budget"""
+    times = _import_times("main")
+
+    cumulative_ms = times["main"] / 1000
+    assert cumulative_ms < IMPORT_TIME_BUDGET_MS, (
+        f"import main took {cumulative_ms:.0f}ms (budget {IMPORT_TIME_BUDGET_MS}ms)"
+    )
+
+
+@pytest.mark.unit
+def test_service_singletons_are_lazy():
+    """Test that service singletons are created on first access"""
+    code = (
+        "import services, sys\n"
+        "from services import image_service, svg_service\n"
+        "assert not image_service.is_initialized\n"
+        "assert not svg_service.is_initialized\n"
+        "svg_service.gemini_model\n"
+        "assert svg_service.is_initialized\n"
+        "assert 'torch' not in sys.modules\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
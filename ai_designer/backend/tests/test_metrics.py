@@ -0,0 +1,129 @@
+"""
+Metrics Tests
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+from prometheus_client import REGISTRY
+
+from core.coalesce import RequestCoalescer
+from core.metrics import bounded_label, render_metrics, setup_multiprocess_metrics, track_stage
+
+
+def _sample(name, labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.unit
+def test_track_stage_observes_duration():
+    """Test that stage timing lands in the histogram"""
+    labels = {"endpoint": "test_endpoint", "stage": "encoding", "style": "modern", "size": "64x64"}
+    before = _sample("ai_designer_stage_seconds_count", labels)
+
+    with track_stage("test_endpoint", "encoding", "modern", "64x64"):
+        pass
+
+    assert _sample("ai_designer_stage_seconds_count", labels) == before + 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_stage_labels_are_bounded_to_presets():
+    """Test client-supplied style, size and framework values outside the presets are recorded as other"""
+    from services.image_generation import stage_labels
+    from services.svgn_generation import SVGGenerationService
+
+    assert bounded_label("react", ["react", "vue"]) == "react"
+    assert bounded_label("react<script>", ["react", "vue"]) == "other"
+    assert bounded_label(None, ["react"]) == ""
+    assert stage_labels("modern_minimal", 1920, 1080) == ("modern_minimal", "1920x1080")
+    assert stage_labels("random-style-123", 1919, 1080) == ("other", "other")
+
+    labels = {"endpoint": "text_to_svg", "stage": "inference", "style": "other", "size": "other"}
+    before = _sample("ai_designer_stage_seconds_count", labels)
+    service = SVGGenerationService()
+    service.gemini_model = None
+    await service.text_to_svg("a circle", style="unbounded-style-7f3a", width=333, height=777)
+
+    assert _sample("ai_designer_stage_seconds_count", labels) == before + 1
+    assert b"unbounded-style-7f3a" not in render_metrics()[0]
+
+
+@pytest.mark.unit
+def test_render_metrics():
+    """Test Prometheus exposition output"""
+    body, content_type = render_metrics()
+
+    assert content_type.startswith("text/plain")
+    assert b"ai_designer_stage_seconds" in body
+    assert b"ai_designer_rate_limit_rejections_total" in body
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_coalescer_runs_identical_requests_once():
+    """Test that concurrent identical requests share one execution"""
+    coalescer = RequestCoalescer("test_coalesce")
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": 42}
+
+    before = _sample("ai_designer_coalesced_requests_total", {"endpoint": "test_coalesce"})
+    results = await asyncio.gather(*[coalescer.run("same", work) for _ in range(5)])
+
+    assert calls == 1
+    assert all(r == {"value": 42} for r in results)
+    assert coalescer.inflight == 0
+    assert _sample("ai_designer_coalesced_requests_total", {"endpoint": "test_coalesce"}) == before + 4
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_coalescer_propagates_errors():
+    """Test that a failure is delivered to every waiter"""
+    coalescer = RequestCoalescer("test_coalesce_error")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        *[coalescer.run("same", fail) for _ in range(3)],
+        return_exceptions=True
+    )
+
+    assert all(isinstance(r, ValueError) for r in results)
+    assert coalescer.inflight == 0
+
+
+@pytest.mark.unit
+def test_multiprocess_metrics_aggregate_all_workers(tmp_path, monkeypatch):
+    """Test /metrics sums counters written by separate worker processes"""
+    stale = tmp_path / "prometheus"
+    stale.mkdir()
+    (stale / "counter_999.db").write_bytes(b"stale")
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+
+    path = setup_multiprocess_metrics(str(stale))
+    assert os.listdir(path) == []
+
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    worker = (
+        "from core.metrics import RATE_LIMIT_REJECTIONS, ADMISSION_QUEUED_WORK\n"
+        "RATE_LIMIT_REJECTIONS.labels('multiproc').inc(3)\n"
+        "ADMISSION_QUEUED_WORK.set(5)\n"
+    )
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", worker], cwd=backend, env=dict(os.environ), check=True)
+
+    body, _ = render_metrics()
+    text = body.decode()
+    assert 'ai_designer_rate_limit_rejections_total{scope="multiproc"} 6.0' in text
@@ -4,6 +4,7 @@ Middleware Tests
 
 import pytest
 from httpx import AsyncClient
+from fastapi.responses import JSONResponse
 from middleware.error_handler import (
     ValidationError,
     NotFoundError,
@@ -68,3 +69,218 @@ def test_custom_errors():
     error = RateLimitError("Too many requests", 60)
     assert error.status_code == 429
     assert error.error_code == "RATE_LIMIT_EXCEEDED"
+
+
+def _build_stack_app(limiter=None):
+    """Minimal app wrapped in the full ASGI middleware stack"""
+    from fastapi import FastAPI
+    from fastapi.responses import StreamingResponse
+    from middleware import (
+        RequestIDMiddleware,
+        LoggingMiddleware,
+        ErrorHandlerMiddleware,
+        RateLimitMiddleware,
+    )
+    from core.rate_limiter import RateLimiter, RateLimitRule
+
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    @app.get("/not-found")
+    async def not_found():
+        raise NotFoundError("Design not found")
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(3):
+                yield f"chunk{i};"
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    limiter = limiter or RateLimiter(route_rules={}, default_rule=RateLimitRule(1000, 60))
+    app.add_middleware(RateLimitMiddleware, limiter=limiter)
+    app.add_middleware(ErrorHandlerMiddleware)
+    app.add_middleware(LoggingMiddleware, skip_paths=[])
+    app.add_middleware(RequestIDMiddleware)
+    return app
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_asgi_stack_headers():
+    """Test request ID propagation and timing header"""
+    async with AsyncClient(app=_build_stack_app(), base_url="http://test") as ac:
+        response = await ac.get("/ping", headers={"X-Request-ID": "req-123"})
+
+    assert response.status_code == 200
+    assert response.headers["x-request-id"] == "req-123"
+    assert "x-process-time" in response.headers
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_asgi_stack_streaming_response():
+    """Test that streaming responses pass through untouched"""
+    async with AsyncClient(app=_build_stack_app(), base_url="http://test") as ac:
+        response = await ac.get("/stream")
+
+    assert response.status_code == 200
+    assert response.text == "chunk0;chunk1;chunk2;"
+    assert "x-request-id" in response.headers
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_asgi_stack_error_handling():
+    """Test that unhandled and API errors become JSON responses"""
+    async with AsyncClient(app=_build_stack_app(), base_url="http://test") as ac:
+        response = await ac.get("/boom", headers={"X-Request-ID": "req-err"})
+        not_found = await ac.get("/not-found")
+
+    assert response.status_code == 500
+    assert response.json()["error_code"] == "INTERNAL_ERROR"
+    assert response.json()["request_id"] == "req-err"
+
+    assert not_found.status_code == 404
+    assert not_found.json()["error_code"] == "NOT_FOUND"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_asgi_stack_rate_limit(monkeypatch):
+    """Test that the rate limiter rejects with 429 and Retry-After"""
+    from core.redis import cache
+    from core.rate_limiter import RateLimiter, RateLimitRule
+    monkeypatch.setattr(cache, "_client", None)
+
+    limiter = RateLimiter(route_rules={}, default_rule=RateLimitRule(2, 60))
+    async with AsyncClient(app=_build_stack_app(limiter), base_url="http://test") as ac:
+        statuses = [(await ac.get("/ping")).status_code for _ in range(3)]
+        response = await ac.get("/ping")
+
+    assert statuses == [200, 200, 429]
+    assert response.json()["error_code"] == "RATE_LIMIT_EXCEEDED"
+    assert int(response.headers["retry-after"]) >= 1
+    assert "x-request-id" in response.headers
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_logging_sampling_keeps_errors_and_slow_requests():
+    """Test that 2xx logs are sampled while errors and slow requests are always logged"""
+    import asyncio
+    from fastapi import FastAPI
+    from loguru import logger
+    from middleware import LoggingMiddleware
+
+    app = FastAPI()
+
+    @app.get("/ok")
+    async def ok():
+        return {"ok": True}
+
+    @app.get("/slow")
+    async def slow():
+        await asyncio.sleep(0.02)
+        return {"ok": True}
+
+    @app.get("/missing")
+    async def missing():
+        return JSONResponse(status_code=404, content={})
+
+    app.add_middleware(LoggingMiddleware, skip_paths=[], sample_rate=0.0, slow_request_ms=10)
+
+    records = []
+    sink_id = logger.add(lambda msg: records.append(msg.record), level="DEBUG")
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            for _ in range(5):
+                await ac.get("/ok")
+            await ac.get("/slow")
+            await ac.get("/missing")
+    finally:
+        logger.remove(sink_id)
+
+    paths = [(r["extra"]["path"], r["level"].name) for r in records if "path" in r["extra"]]
+    assert paths == [("/slow", "WARNING"), ("/missing", "WARNING")]
+    assert records[-1]["extra"]["status_code"] == 404
+
+
+
+@pytest.mark.unit
+def test_exception_logs_omit_local_variables_by_default(tmp_path, monkeypatch, capsys):
+    """Test that exception logs do not include local variable values unless LOG_DIAGNOSE is on"""
+    import sys
+    from loguru import logger
+    from core.config import settings
+    from core.logging import setup_logging
+
+    log_file = tmp_path / "app.log"
+    monkeypatch.setattr(settings, "DEBUG", True)
+    monkeypatch.setattr(settings, "LOG_FILE", str(log_file))
+
+    secret = "-".join(["sk", "local", "secret"])  # 源码行里不出现完整值，只有诊断信息会打印它
+
+    def fail(api_key):
+        raise ValueError("boom")
+
+    try:
+        setup_logging(json_format=False, enqueue=False)
+        try:
+            fail(secret)
+        except ValueError:
+            logger.exception("request failed")
+    finally:
+        logger.remove()
+        logger.add(sys.__stderr__, level=settings.LOG_LEVEL)
+
+    console, stored = capsys.readouterr().err, log_file.read_text()
+    assert "request failed" in console and "ValueError" in stored
+    assert secret not in console + stored
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_authentication_middleware_sets_user_from_bearer_token(monkeypatch):
+    """Test valid access tokens set scope user while missing, forged, expired and placeholder-signed tokens stay anonymous"""
+    from fastapi import FastAPI, Request
+    from core.config import settings
+    from core.security import create_access_token
+    from middleware import AuthenticationMiddleware
+
+    app = FastAPI()
+
+    @app.get("/whoami")
+    async def whoami(request: Request):
+        return {"user": request.user.identity if request.user.is_authenticated else None}
+
+    app.add_middleware(AuthenticationMiddleware)
+
+    monkeypatch.setattr(settings, "SECRET_KEY", "test-secret")
+    token = create_access_token("alice")
+    expired = create_access_token("alice", expires_minutes=-1)
+    monkeypatch.setattr(settings, "SECRET_KEY", "other-secret")
+    forged = create_access_token("alice")
+    monkeypatch.setattr(settings, "SECRET_KEY", "test-secret")
+
+    async def user(headers):
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            return (await ac.get("/whoami", headers=headers)).json()["user"]
+
+    assert await user({"Authorization": f"Bearer {token}"}) == "alice"
+    for headers in ({}, {"Authorization": f"Bearer {forged}"}, {"Authorization": f"Bearer {expired}"},
+                    {"Authorization": f"Basic {token}"}):
+        assert await user(headers) is None
+
+    # 占位密钥签名的令牌任何人都能伪造：不签发也不接受
+    monkeypatch.setattr(settings, "SECRET_KEY", "your-secret-key-change-in-production")
+    assert await user({"Authorization": f"Bearer {token}"}) is None
+    with pytest.raises(RuntimeError):
+        create_access_token("alice")
@@ -0,0 +1,150 @@
+"""
+Schema Migration Tests
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event, insert, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import models  # noqa: F401
+from core import database, migrations
+from core.config import settings
+from core.database import Base, init_db
+from core.migrations import SchemaNotMigrated
+from models import Template
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _run_script(*args, **env):
+    return subprocess.run(
+        [sys.executable, *args], cwd=BACKEND_DIR, capture_output=True, text=True,
+        env={**os.environ, **env}, timeout=300,
+    )
+
+
+async def _tables(engine):
+    async with engine.connect() as conn:
+        return set(await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names()))
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_upgrade_creates_models_and_search_index(tmp_path):
+    """Test upgrading to head creates every mapped table plus the FTS index, and downgrade removes them"""
+    url = f"sqlite+aiosqlite:///{tmp_path}/app.db"
+    engine = create_async_engine(url)
+    try:
+        await migrations.upgrade(url=url)
+        assert await migrations.verify_schema(engine) == migrations.head_revisions()
+        assert set(Base.metadata.tables) | {"alembic_version", "templates_fts"} <= await _tables(engine)
+
+        async with engine.begin() as conn:
+            await conn.execute(insert(Template), [{"name": "Neon hero", "slug": "neon-hero", "type": "image"}])
+            matches = await conn.execute(text("SELECT rowid FROM templates_fts WHERE templates_fts MATCH 'neon'"))
+            assert len(matches.all()) == 1
+
+        await migrations.downgrade("base", url=url)
+        assert await _tables(engine) == {"alembic_version"}
+        assert await migrations.current_revisions(engine) == ()
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_verify_schema_is_one_query_and_rejects_other_revisions(tmp_path):
+    """Test verification runs a single SELECT and fails on unmigrated, create_all-only and stale databases"""
+    url = f"sqlite+aiosqlite:///{tmp_path}/app.db"
+    engine = create_async_engine(url)
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    try:
+        with pytest.raises(SchemaNotMigrated, match="migrate.py upgrade") as missing:
+            await migrations.verify_schema(engine)
+        assert missing.value.current == () and missing.value.head == migrations.head_revisions()
+
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        with pytest.raises(SchemaNotMigrated):
+            await migrations.verify_schema(engine)
+
+        await migrations.stamp("head", url=url)
+        statements.clear()
+        assert await migrations.verify_schema(engine) == migrations.head_revisions()
+        assert statements == [f"SELECT version_num FROM {migrations.VERSION_TABLE}"]
+
+        async with engine.begin() as conn:
+            await conn.execute(text("UPDATE alembic_version SET version_num = '0000'"))
+        with pytest.raises(SchemaNotMigrated, match="0000"):
+            await migrations.verify_schema(engine)
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_init_db_schema_modes(tmp_path, monkeypatch):
+    """Test init_db only verifies by default, creates every table in create mode and does nothing when off"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/app.db")
+    monkeypatch.setattr(database, "engine", engine)
+    try:
+        monkeypatch.setattr(settings, "DATABASE_SCHEMA_MODE", "off")
+        await init_db()
+        monkeypatch.setattr(settings, "DATABASE_SCHEMA_MODE", "verify")
+        with pytest.raises(SchemaNotMigrated):
+            await init_db()
+        assert await _tables(engine) == set()
+
+        monkeypatch.setattr(settings, "DATABASE_SCHEMA_MODE", "create")
+        await init_db()
+        assert set(Base.metadata.tables) <= await _tables(engine)
+
+        monkeypatch.setattr(settings, "DATABASE_SCHEMA_MODE", "migrate")
+        with pytest.raises(ValueError, match="DATABASE_SCHEMA_MODE"):
+            await init_db()
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_startup_refuses_unmigrated_database(tmp_path, monkeypatch):
+    """Test the app lifespan aborts when the schema is behind instead of serving requests"""
+    from main import app, lifespan
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/app.db")
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(settings, "DATABASE_SCHEMA_MODE", "verify")
+    try:
+        with pytest.raises(SchemaNotMigrated):
+            async with lifespan(app):
+                pass
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.integration
+def test_migrate_cli_and_cold_start_benchmark(tmp_path):
+    """Test the migrate CLI check exit codes and that the cold start benchmark reports verify as one statement"""
+    url = f"sqlite+aiosqlite:///{tmp_path}/app.db"
+
+    before = _run_script("scripts/migrate.py", "--url", url, "check")
+    assert before.returncode == 1 and "current: none" in before.stdout
+    assert _run_script("scripts/migrate.py", "--url", url, "upgrade").returncode == 0
+    after = _run_script("scripts/migrate.py", "--url", url, "check")
+    assert after.returncode == 0, after.stderr[-2000:]
+
+    output = tmp_path / "startup.json"
+    bench = _run_script("scripts/bench_startup.py", "--runs", "1", "--database-url", url, "--output", str(output))
+    assert bench.returncode == 0, bench.stderr[-2000:]
+    modes = json.loads(output.read_text())["modes"]
+    assert modes["verify"]["init_db_statements"]["p50"] == 1
+    assert modes["create"]["init_db_statements"]["p50"] > len(Base.metadata.tables) / 2
+    assert modes["verify"]["import_ms"]["p50"] > 0
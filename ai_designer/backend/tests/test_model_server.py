@@ -0,0 +1,129 @@
+"""
+Model Server Tests
+"""
+
+import os
+import stat
+import threading
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from core.config import settings
+from services.ai_models import model_manager
+from services.image_generation import ImageGenerationService
+from services.model_server import ModelServer, ModelServerClient, ensure_authkey
+
+
+class SolidColorPipeline:
+    """按请求尺寸返回纯色图像的最小pipeline"""
+
+    device = "cpu"
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, **kwargs):
+        self.calls.append(kwargs)
+        image = Image.new("RGB", (kwargs["width"], kwargs["height"]), color=(10, 200, 30))
+        return SimpleNamespace(images=[image])
+
+
+@pytest.fixture
+def model_server(tmp_path, monkeypatch):
+    pipeline = SolidColorPipeline()
+    monkeypatch.setitem(model_manager.models, "image_generator", pipeline)
+    monkeypatch.setattr(settings, "MODEL_SERVER_AUTHKEY", "test-authkey")
+
+    server = ModelServer(str(tmp_path / "run" / "models.sock")).bind()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server, pipeline
+
+    server.close()
+    thread.join(timeout=5)
+
+
+def _shm_segments():
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+
+@pytest.mark.unit
+def test_generate_returns_pixels_via_shared_memory(model_server):
+    """Test remote generation round-trip and shared memory cleanup"""
+    server, pipeline = model_server
+    client = ModelServerClient(server.address, timeout=10)
+
+    before = _shm_segments()
+    result = client(prompt="hero", width=64, height=32)
+
+    image = result.images[0]
+    assert image.size == (64, 32)
+    assert image.getpixel((0, 0)) == (10, 200, 30)
+    assert pipeline.calls[0]["prompt"] == "hero"
+    assert _shm_segments() == before
+
+
+@pytest.mark.unit
+def test_ping_and_errors(model_server):
+    """Test status reporting and error propagation"""
+    server, _ = model_server
+    client = ModelServerClient(server.address, timeout=10)
+
+    status = client.ping()
+    assert status["pid"] == os.getpid()
+    assert "image_generator" in status["models"]
+
+    with pytest.raises(RuntimeError, match="Unknown operation"):
+        client._call("explode")
+
+
+@pytest.mark.unit
+def test_image_service_uses_remote_generator(model_server):
+    """Test that the image service runs against the model server client"""
+    server, pipeline = model_server
+    service = ImageGenerationService()
+    service.generator = ModelServerClient(server.address, timeout=10)
+    service.remote = True
+    service.demo_mode = False
+
+    result = service.generate_hero_banner("landing page", size="hero_small")
+
+    assert result["width"] == 1024
+    assert bytes(result["image_data"][:4]) == b"\x89PNG"
+    # 模型服务未加载CLIP时不给分
+    assert result["aesthetic_score"] is None
+    assert "generator" not in pipeline.calls[0]
+
+
+@pytest.mark.unit
+def test_socket_is_private_and_requires_launch_key(model_server, monkeypatch):
+    """Test the socket directory is owner-only and other keys are rejected"""
+    server, _ = model_server
+
+    assert stat.S_IMODE(os.stat(os.path.dirname(server.address)).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(server.address).st_mode) == 0o600
+
+    monkeypatch.setattr(settings, "MODEL_SERVER_AUTHKEY", "wrong-key")
+    with pytest.raises(Exception):
+        ModelServerClient(server.address, timeout=10).ping()
+
+    monkeypatch.setattr(settings, "MODEL_SERVER_AUTHKEY", None)
+    with pytest.raises(RuntimeError, match="MODEL_SERVER_AUTHKEY"):
+        ModelServerClient(server.address, timeout=10).ping()
+
+
+@pytest.mark.unit
+def test_ensure_authkey_generates_random_key_for_workers(monkeypatch):
+    """Test a missing key is generated per launch and exported to child processes"""
+    monkeypatch.setattr(settings, "MODEL_SERVER_AUTHKEY", None)
+    monkeypatch.delenv("MODEL_SERVER_AUTHKEY", raising=False)
+
+    key = ensure_authkey()
+
+    assert len(key) >= 32
+    assert settings.MODEL_SERVER_AUTHKEY == key
+    assert os.environ["MODEL_SERVER_AUTHKEY"] == key
+    assert ensure_authkey() == key
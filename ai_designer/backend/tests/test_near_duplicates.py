@@ -0,0 +1,172 @@
+"""
+Near Duplicate Tests
+"""
+
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+from PIL import Image
+
+from benchmarks.runner import BenchEnvironment
+from core.config import settings
+from core.security import create_access_token
+from services.near_duplicates import (
+    MultiIndexHashTable,
+    NearDuplicateStore,
+    hamming_distance,
+    image_hashes,
+    prompt_variant_key,
+)
+
+
+def _scene(seed: int, size=(256, 192)) -> Image.Image:
+    """平滑的随机色块图（接近生成图像的低频结构）"""
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    return Image.fromarray(coarse).resize(size, Image.Resampling.BICUBIC)
+
+
+def _noisy(image: Image.Image, seed: int = 0) -> Image.Image:
+    pixels = np.asarray(image, dtype=np.int16)
+    noise = np.random.default_rng(seed).integers(-6, 7, pixels.shape)
+    return Image.fromarray(np.clip(pixels + noise, 0, 255).astype(np.uint8))
+
+
+def _result(image: Image.Image, payload: bytes) -> dict:
+    return {"image_data": payload, "width": image.width, "height": image.height, "image_hash": image_hashes([image])[0]}
+
+
+@pytest.mark.unit
+def test_perceptual_hashes_are_robust_to_small_changes():
+    """Test pHash/dHash stay close under noise and resizing, differ for other images and batch like single calls"""
+    original, other = _scene(1), _scene(2)
+    hashes = image_hashes([original, _noisy(original), original.resize((200, 150)), other])
+
+    for candidate in hashes[1:3]:
+        assert hamming_distance(hashes[0][0], candidate[0])[0] <= 6
+        assert hamming_distance(hashes[0][1], candidate[1])[0] <= 6
+    assert hamming_distance(hashes[0][0], hashes[3][0])[0] > 12
+    assert image_hashes([other]) == hashes[3:]
+
+
+@pytest.mark.unit
+def test_multi_index_search_matches_brute_force():
+    """Test multi-index hash table lookups return exactly the hashes within the radius"""
+    rng = np.random.default_rng(5)
+    values = rng.integers(0, 2**63, 2000, dtype=np.uint64)
+    # 在部分哈希附近制造邻居
+    flips = np.uint64(1) << rng.integers(0, 64, (500, 8)).astype(np.uint64)
+    neighbours = values[:500] ^ np.bitwise_xor.reduce(flips[:, :rng.integers(1, 9)], axis=1)
+    values = np.concatenate([values, neighbours])
+
+    table = MultiIndexHashTable()
+    for key, value in enumerate(values.tolist()):
+        table.add(key, value)
+    table.remove(0)
+
+    for radius in (0, 6, 10):
+        for query in values[:50].tolist():
+            distances = hamming_distance(values, query)
+            expected = {key for key in np.flatnonzero(distances <= radius).tolist() if key != 0}
+            hits = table.search(query, radius)
+            assert {key for key, _ in hits} == expected
+            assert [distance for _, distance in hits] == sorted(distances[key] for key, _ in hits)
+
+
+@pytest.mark.unit
+def test_store_links_duplicates_per_owner_and_evicts():
+    """Test near-duplicates link to the owner's original, owners are isolated and the LRU respects its byte budget"""
+    store = NearDuplicateStore(max_distance=6, max_bytes=2500)
+    scene = _scene(3)
+
+    assert store.check("alice", scene)[1] is None
+    store.record("alice", "g1", _result(scene, b"x" * 1000), "hero_banner", request_key="k1")
+
+    _, duplicate = store.check("alice", _noisy(scene))
+    assert duplicate is not None and duplicate.original.generation_id == "g1"
+    assert store.check("bob", scene)[1] is None
+    assert store.check("alice", scene.resize((128, 96)))[1] is None  # 尺寸不同不复用
+
+    store.record("alice", "g2", {**_result(scene, b""), "image_data": duplicate.original.image_data, "duplicate_of": "g1"}, "hero_banner")
+    store.record("alice", "g2b", _result(scene, b"x" * 1000), "hero_banner")  # 合并请求共享的同一结果
+    assert store.resolve("g2").generation_id == "g1" and store.resolve("g2b").generation_id == "g1"
+    assert store.lookup_request("alice", "k1").generation_id == "g1"
+    assert len(store) == 1 and store.stored_bytes == 1000
+
+    store.record("bob", "g3", _result(_scene(4), b"y" * 1000), "hero_banner")
+    store.record("bob", "g4", _result(_scene(5), b"z" * 1000), "hero_banner")
+    assert store.resolve("g1") is None and store.lookup_request("alice", "k1") is None
+    assert store.check("alice", scene)[1] is None
+    assert len(store) == 2 and store.stored_bytes == 2000
+
+    assert prompt_variant_key("Sunset  banner.", seed=1) == prompt_variant_key("sunset banner", seed=1)
+    assert prompt_variant_key("sunset banner", seed=1) != prompt_variant_key("sunset banner", seed=2)
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_generate_reuses_near_duplicates_and_prompt_variants(monkeypatch):
+    """Test /image/generate links a user's repeated results to the original and serves fixed-seed prompt variants from cache"""
+    body = {"prompt": "Sunset banner", "width": 512, "height": 512, "num_inference_steps": 10}
+    monkeypatch.setattr(settings, "SECRET_KEY", "test-secret")
+    alice, bob = ({"Authorization": f"Bearer {create_access_token(user)}"} for user in ("alice", "bob"))
+    env = BenchEnvironment()
+    async with env as app:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            first = await client.post(
+                "/api/v1/image/generate", params={"response_format": "png"}, json=body, headers=alice
+            )
+            second = await client.post("/api/v1/image/generate", json=body, headers=alice)
+            # 共用出口地址或伪造X-Forwarded-For都不能拿到其他用户的结果
+            other_user = await client.post(
+                "/api/v1/image/generate", json=body, headers={**bob, "X-Forwarded-For": "127.0.0.1"}
+            )
+            anonymous = [(await client.post("/api/v1/image/generate", json=body)).json() for _ in range(2)]
+
+            seeded = await client.post("/api/v1/image/generate", json={**body, "seed": 7}, headers=alice)
+            calls = env.image_backend.calls
+            variant = await client.post(
+                "/api/v1/image/generate", json={**body, "prompt": "sunset  BANNER.", "seed": 7}, headers=alice
+            )
+            calls_after_variant = env.image_backend.calls
+            anonymous_variant = await client.post(
+                "/api/v1/image/generate", json={**body, "prompt": "sunset  BANNER.", "seed": 7}
+            )
+            calls_after_anonymous = env.image_backend.calls
+
+    original_id = first.headers["X-Generation-Id"]
+    assert "X-Duplicate-Of" not in first.headers
+    assert second.status_code == 200 and second.json()["duplicate_of"] == original_id
+    assert second.json()["image_base64"] == second.json()["image_url"].split(",", 1)[1]
+    assert other_user.json()["duplicate_of"] is None
+    assert [response["duplicate_of"] for response in anonymous] == [None, None]
+
+    assert seeded.json()["duplicate_of"] is None
+    assert variant.status_code == 200 and calls_after_variant == calls
+    assert variant.json()["duplicate_of"] == seeded.json()["generation_id"]
+    assert variant.json()["image_base64"] == seeded.json()["image_base64"]
+    assert anonymous_variant.json()["duplicate_of"] is None and calls_after_anonymous == calls + 1
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_coalesce_only_within_one_owner(monkeypatch):
+    """Test concurrent fixed-seed requests share one generation per user and never another user's duplicate_of"""
+    body = {"prompt": "Sunset banner", "width": 512, "height": 512, "num_inference_steps": 10, "seed": 7}
+    monkeypatch.setattr(settings, "SECRET_KEY", "test-secret")
+    alice, bob = ({"Authorization": f"Bearer {create_access_token(user)}"} for user in ("alice", "bob"))
+    env = BenchEnvironment(image_seconds_per_megapixel_step=0.02)
+    async with env as app:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            # 桩模型的图像只取决于提示词与种子：alice已有一张相同的图（请求参数不同，不命中变体缓存）
+            original = await client.post("/api/v1/image/generate", json={**body, "guidance_scale": 9.0}, headers=alice)
+            calls = env.image_backend.calls
+            responses = await asyncio.gather(*[
+                client.post("/api/v1/image/generate", json=body, headers=headers) for headers in (alice, alice, bob)
+            ])
+
+    original_id = original.json()["generation_id"]
+    assert env.image_backend.calls == calls + 2  # alice的两个请求合并，bob单独生成
+    assert [response.json()["duplicate_of"] for response in responses] == [original_id, original_id, None]
@@ -0,0 +1,124 @@
+"""
+Sampling Profiler Tests
+"""
+
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+
+from core.config import settings
+from core.profiler import SamplingProfiler, format_collapsed, profile_store, top_frames
+
+
+def busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+@pytest.mark.unit
+def test_profiler_captures_busy_thread():
+    """Test that a CPU-bound thread shows up in collapsed stacks"""
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name="busy-worker")
+    worker.start()
+
+    profiler = SamplingProfiler(hz=200).start()
+    time.sleep(0.2)
+    counts = profiler.stop()
+
+    stop.set()
+    worker.join()
+
+    assert profiler.samples > 0
+    busy = {stack: n for stack, n in counts.items() if stack.startswith("busy-worker;")}
+    assert busy
+    assert any("busy_loop (test_profiler.py" in stack for stack in busy)
+
+    output = format_collapsed(counts)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in output.strip().splitlines())
+    assert top_frames(counts, limit=1)[0]["samples"] > 0
+
+
+@pytest.fixture
+def admin_settings(monkeypatch):
+    monkeypatch.setattr(settings, "PROFILER_ENABLED", True)
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret-token")
+
+
+def _build_app():
+    from api.v1.endpoints import admin
+    from middleware import ProfilingMiddleware
+
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/admin")
+
+    @app.get("/work")
+    async def work():
+        time.sleep(0.05)
+        return {"ok": True}
+
+    app.add_middleware(ProfilingMiddleware)
+    return app
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_admin_profile_requires_token(admin_settings):
+    """Test admin token guard"""
+    async with AsyncClient(app=_build_app(), base_url="http://test") as ac:
+        missing = await ac.get("/admin/profile", params={"seconds": 0.1})
+        wrong = await ac.get("/admin/profile", params={"seconds": 0.1}, headers={"X-Admin-Token": "nope"})
+
+    assert missing.status_code == 401
+    assert wrong.status_code == 401
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_admin_profile_disabled(monkeypatch):
+    """Test that the endpoint is hidden unless enabled"""
+    monkeypatch.setattr(settings, "PROFILER_ENABLED", False)
+
+    async with AsyncClient(app=_build_app(), base_url="http://test") as ac:
+        response = await ac.get("/admin/profile", headers={"X-Admin-Token": "secret-token"})
+
+    assert response.status_code == 404
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_admin_profile_collapsed(admin_settings):
+    """Test timed profiling returns a collapsed stack file"""
+    async with AsyncClient(app=_build_app(), base_url="http://test") as ac:
+        response = await ac.get(
+            "/admin/profile",
+            params={"seconds": 0.1, "include_idle": True},
+            headers={"X-Admin-Token": "secret-token"}
+        )
+
+    assert response.status_code == 200
+    assert "attachment" in response.headers["content-disposition"]
+    assert response.text.strip()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_per_request_profile(admin_settings):
+    """Test X-Profile header attaches a retrievable profile"""
+    headers = {"X-Admin-Token": "secret-token"}
+    async with AsyncClient(app=_build_app(), base_url="http://test") as ac:
+        plain = await ac.get("/work")
+        response = await ac.get("/work", headers={**headers, "X-Profile": "1"})
+
+        profile_id = response.headers["x-profile-id"]
+        profile = await ac.get(f"/admin/profile/{profile_id}", params={"format": "json"}, headers=headers)
+
+    assert "x-profile-id" not in plain.headers
+    assert profile_store.get(profile_id) is not None
+    assert profile.status_code == 200
+    data = profile.json()
+    assert data["path"] == "/work"
+    assert data["samples"] > 0
@@ -0,0 +1,117 @@
+"""
+Prompt Embedding Cache Tests
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from services.image_generation import ImageGenerationService
+from services.prompt_embeddings import PromptEmbeddingCache, prompt_embedding_cache
+
+
+class EncodingPipeline:
+    """记录文本编码次数的SDXL风格pipeline"""
+
+    device = "cpu"
+
+    def __init__(self):
+        self.encoded = []
+        self.calls = []
+
+    def encode_prompt(
+        self,
+        prompt,
+        prompt_2=None,
+        device=None,
+        num_images_per_prompt=1,
+        do_classifier_free_guidance=True,
+        negative_prompt=None,
+        negative_prompt_2=None,
+    ):
+        self.encoded.append((prompt, negative_prompt))
+        return (f"embeds:{prompt}", f"embeds:{negative_prompt}", f"pooled:{prompt}", f"pooled:{negative_prompt}")
+
+    def __call__(self, width, height, **kwargs):
+        self.calls.append(kwargs)
+        return SimpleNamespace(images=[Image.new("RGB", (width, height))])
+
+
+class FluxLikePipeline(EncodingPipeline):
+    """无负面提示词的编码接口"""
+
+    def encode_prompt(self, prompt, prompt_2, device=None, num_images_per_prompt=1):
+        self.encoded.append((prompt, None))
+        return (f"embeds:{prompt}", f"pooled:{prompt}", "text_ids")
+
+
+@pytest.fixture
+def service():
+    prompt_embedding_cache.clear()
+    service = ImageGenerationService()
+    service.generator = EncodingPipeline()
+    service.generation_profile = None
+    service.remote = False
+    service.demo_mode = False
+    yield service
+    prompt_embedding_cache.clear()
+
+
+@pytest.mark.unit
+def test_icon_variants_encode_prompt_once(service):
+    """Test seed variants share one text encoder pass"""
+    pipeline = service.generator
+
+    icons = service.generate_icon("navigation", count=4, size="thumbnail")
+    service.generate_icon("navigation", count=2, size="thumbnail")
+
+    assert len(icons) == 4
+    assert len(pipeline.encoded) == 1
+    assert len(pipeline.calls) == 6
+    for call in pipeline.calls:
+        assert "prompt" not in call and "negative_prompt" not in call
+        assert call["prompt_embeds"].startswith("embeds:navigation icon")
+        assert call["negative_pooled_prompt_embeds"] == "pooled:complex, detailed, photograph, realistic"
+
+    service.generate_icon("search", count=2, size="thumbnail")
+    assert len(pipeline.encoded) == 2
+
+
+@pytest.mark.unit
+def test_cache_key_and_eviction():
+    """Test entries are keyed by model, prompt and negative prompt with LRU eviction"""
+    pipeline = EncodingPipeline()
+    cache = PromptEmbeddingCache(max_entries=2)
+
+    cache.get_or_encode(pipeline, "a", "x")
+    cache.get_or_encode(pipeline, "a", "y")
+    cache.get_or_encode(pipeline, "a", "x")  # 命中，移到最近
+    cache.get_or_encode(pipeline, "a", "x", model_id="other-model")  # 淘汰 ("a", "y")
+    assert len(cache) == 2
+    assert len(pipeline.encoded) == 3
+
+    cache.get_or_encode(pipeline, "a", "x")
+    cache.get_or_encode(pipeline, "a", "y")
+    assert len(pipeline.encoded) == 4
+
+
+@pytest.mark.unit
+def test_apply_handles_pipelines_without_negative_embeddings():
+    """Test negative prompts pass through when the encoder has no negative branch"""
+    cache = PromptEmbeddingCache(max_entries=4)
+
+    flux = FluxLikePipeline()
+    kwargs = cache.apply(flux, {"prompt": "hero", "negative_prompt": "blurry", "width": 64})
+    assert kwargs == {
+        "negative_prompt": "blurry",
+        "width": 64,
+        "prompt_embeds": "embeds:hero",
+        "pooled_prompt_embeds": "pooled:hero",
+    }
+
+    # 无encode_prompt的pipeline或已给出编码结果时不做替换
+    plain = SimpleNamespace()
+    assert cache.apply(plain, {"prompt": "hero"}) == {"prompt": "hero"}
+    assert cache.apply(flux, {"prompt_embeds": "given"}) == {"prompt_embeds": "given"}
+    assert PromptEmbeddingCache(max_entries=0).apply(flux, {"prompt": "hero"}) == {"prompt": "hero"}
@@ -0,0 +1,119 @@
+"""
+Rate Limiter Tests
+"""
+
+import asyncio
+import uuid
+
+import pytest
+from redis.asyncio import from_url
+
+from core.config import settings
+from core.rate_limiter import RateLimiter, RateLimitRule, TokenBucket
+
+
+ROUTES = {
+    "/api/v1/image/": "3/60",
+    "/api/v1/image/styles": "100/60",
+}
+
+
+@pytest.mark.unit
+def test_rule_parse():
+    """Test parsing "limit/window" rules"""
+    assert RateLimitRule.parse("10/60") == RateLimitRule(limit=10, window=60)
+    assert RateLimitRule.parse("5") == RateLimitRule(limit=5, window=60)
+
+
+@pytest.mark.unit
+def test_longest_prefix_rule_wins():
+    """Test route rule matching"""
+    limiter = RateLimiter(route_rules=ROUTES, default_rule=RateLimitRule(50, 60))
+
+    assert limiter.get_rule("/api/v1/image/styles") == ("/api/v1/image/styles", RateLimitRule(100, 60))
+    assert limiter.get_rule("/api/v1/image/generate") == ("/api/v1/image/", RateLimitRule(3, 60))
+    assert limiter.get_rule("/api/v1/svg/generate") == ("default", RateLimitRule(50, 60))
+
+
+@pytest.mark.unit
+def test_token_bucket_refill():
+    """Test token bucket consumption and refill"""
+    bucket = TokenBucket(capacity=2, window=2)  # 1 token/s
+    now = bucket.updated_at
+
+    assert bucket.consume(now)[0] is True
+    assert bucket.consume(now)[0] is True
+
+    allowed, retry_after = bucket.consume(now)
+    assert allowed is False
+    assert retry_after == pytest.approx(1.0)
+
+    assert bucket.consume(now + 1.0)[0] is True
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_local_fallback_without_redis(monkeypatch):
+    """Test that the local token bucket applies when Redis is unavailable"""
+    from core.redis import cache
+    monkeypatch.setattr(cache, "_client", None)
+
+    limiter = RateLimiter(route_rules=ROUTES)
+    results = [await limiter.check("1.2.3.4", "/api/v1/image/generate") for _ in range(4)]
+
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert results[-1].retry_after > 0
+
+    # 其他客户端不受影响
+    assert (await limiter.check("5.6.7.8", "/api/v1/image/generate")).allowed is True
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_redis_sliding_window_burst():
+    """Test that concurrent same-millisecond requests are all counted"""
+    redis = from_url(settings.REDIS_URL, decode_responses=True)
+    limiter = RateLimiter(
+        redis_client=redis,
+        route_rules=ROUTES,
+        key_prefix=f"test_rate_limit:{uuid.uuid4().hex}"
+    )
+
+    try:
+        results = await asyncio.gather(
+            *[limiter.check("burst-client", "/api/v1/image/generate") for _ in range(10)]
+        )
+
+        assert sum(r.allowed for r in results) == 3
+        rejected = [r for r in results if not r.allowed]
+        assert all(0 < r.retry_after <= 60 for r in rejected)
+    finally:
+        await redis.close()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_default_rules_only_limit_generation_posts(monkeypatch):
+    """Test polling a job's status, events and result more than 10 times a minute is not rate limited"""
+    from core.redis import cache
+    monkeypatch.setattr(cache, "_client", None)
+
+    limiter = RateLimiter(default_rule=RateLimitRule(100, 60))
+    assert limiter.get_rule("/api/v1/image/jobs/abc", "GET")[0] == "default"
+    assert limiter.get_rule("/api/v1/image/jobs", "POST") == ("POST /api/v1/image/", RateLimitRule(10, 60))
+
+    assert (await limiter.check("poller", "/api/v1/image/jobs", "POST")).allowed
+    polls = []
+    for _ in range(15):
+        for path in ("/api/v1/image/jobs/abc", "/api/v1/image/jobs/abc/events", "/api/v1/image/jobs/abc/result"):
+            polls.append(await limiter.check("poller", path, "GET"))
+    assert all(r.allowed for r in polls)
+    assert all([(await limiter.check("poller", "/api/v1/code/frameworks", "GET")).allowed for _ in range(25)])
+
+    # 图像生成类POST共用一个限额：jobs、generate、icons、background合计10次
+    generations = [
+        await limiter.check("poller", path, "POST")
+        for path in ("/api/v1/image/generate", "/api/v1/image/icons", "/api/v1/image/background") * 3
+    ]
+    assert [r.allowed for r in generations] == [True] * 9
+    assert not (await limiter.check("poller", "/api/v1/image/jobs", "POST")).allowed
@@ -0,0 +1,236 @@
+"""
+Search Tests
+"""
+
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime
+import uuid
+
+import httpx
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import models  # noqa: F401
+from benchmarks.runner import BenchEnvironment
+from core.config import settings
+from core.database import Base
+from models import Asset, AssetTag, Tag, Template, User
+from services.search import search_service
+from services.usage_counters import usage_counters
+
+
+@asynccontextmanager
+async def _database():
+    """内存SQLite（含FTS5索引）"""
+    usage_counters.reset()
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+            yield session
+    finally:
+        await engine.dispose()
+
+
+async def _tag_counts(db):
+    """数据库中的标签使用次数（按列查询，不受会话中已加载的Tag对象影响）"""
+    return dict((await db.execute(select(Tag.slug, Tag.usage_count))).all())
+
+
+async def _seed(db):
+    """一个用户、若干资源与模板"""
+    user = User(email="designer@example.com")
+    db.add(user)
+    await db.flush()
+
+    def asset(name, type="image", format="png", created_at="2024-03-10", **kwargs):
+        return Asset(
+            user_id=user.id, name=name, type=type, format=format,
+            created_at=datetime.fromisoformat(created_at), is_public=kwargs.pop("is_public", True), **kwargs
+        )
+
+    assets = {
+        "sunset": asset("Sunset hero banner", description="warm gradient", usage_count=40, rating=5),
+        "sunset_plain": asset("Sunset banner", created_at="2024-04-02"),
+        "dashboard": asset("Dark dashboard", description="sunset palette accents", created_at="2024-04-20"),
+        "icon": asset("Sun icon", type="svg", format="svg", usage_count=3),
+        "private": asset("Sunset draft", is_public=False),
+        "deleted": asset("Sunset deleted", is_deleted=True),
+    }
+    templates = {
+        "hero": Template(name="Hero Banner - Modern", slug="hero-modern", type="image", category="hero",
+                         is_public=True, usage_count=12, rating=5),
+        "login": Template(name="Login page", slug="login", type="code", category="auth",
+                          description="hero illustration on the left", is_public=True),
+    }
+    db.add_all([*assets.values(), *templates.values()])
+    await db.flush()
+
+    usage = Counter()
+    usage.update((await search_service.set_tags(db, "assets", assets["sunset"], ["Hero", "Warm tones"])).usage)
+    usage.update((await search_service.set_tags(db, "assets", assets["sunset_plain"], ["hero"])).usage)
+    usage.update((await search_service.set_tags(db, "assets", assets["icon"], ["Icons"])).usage)
+    usage.update((await search_service.set_tags(db, "templates", templates["hero"], ["hero", "Landing"])).usage)
+    await db.commit()
+    await search_service.count_tag_usage(usage)
+    await usage_counters.flush(db)
+    return user, assets, templates
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_full_text_ranking_and_prefix_match():
+    """Test text search matches name/tags/description by prefix, ranks by relevance and popularity and hides private or deleted rows"""
+    async with _database() as sqlite_db:
+        await _seed(sqlite_db)
+
+        results = await search_service.search(sqlite_db, "assets", "suns")
+        names = [asset.name for asset, _ in results.items]
+        assert names[0] == "Sunset hero banner"  # 相关度相近时使用次数与评分靠前
+        assert set(names) == {"Sunset hero banner", "Sunset banner", "Dark dashboard"}
+        assert all(score > 0 for _, score in results.items) and results.total == 3
+
+        # 标签参与全文检索；FTS语法字符按普通文本处理
+        assert [a.name for a, _ in (await search_service.search(sqlite_db, "assets", "warm TONES")).items] == ["Sunset hero banner"]
+        assert (await search_service.search(sqlite_db, "assets", 'sunset* ("')).total == 3
+
+        # 只检索公开且未删除的资源
+        newest = [a.name for a, _ in (await search_service.search(sqlite_db, "assets", "sunset", sort="newest")).items]
+        assert "Sunset draft" not in newest and "Sunset deleted" not in newest
+
+        browse = await search_service.search(sqlite_db, "assets", sort="relevance", limit=2)
+        assert [a.name for a, _ in browse.items] == ["Sunset hero banner", "Sun icon"] and browse.total == 4
+
+        templates = await search_service.search(sqlite_db, "templates", "hero")
+        assert [t.slug for t, _ in templates.items] == ["hero-modern", "login"]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_facets_and_filters_in_one_query():
+    """Test type/format/tag/date filters combine and facets count all matches per value"""
+    async with _database() as sqlite_db:
+        await _seed(sqlite_db)
+
+        results = await search_service.search(sqlite_db, "assets")
+        assert results.total == 4
+        assert results.facets["type"] == [("image", 3), ("svg", 1)]
+        assert results.facets["format"] == [("png", 3), ("svg", 1)]
+        assert results.facets["tag"] == [("Hero", 2), ("Icons", 1), ("Warm tones", 1)]
+        assert results.facets["date"] == [("2024-03", 2), ("2024-04", 2)]
+
+        filtered = await search_service.search(
+            sqlite_db, "assets", filters={"type": ["image"]}, tags=["hero"],
+            created_from=datetime(2024, 4, 1), created_to=datetime(2024, 5, 1),
+        )
+        assert [a.name for a, _ in filtered.items] == ["Sunset banner"]
+        assert filtered.facets["date"] == [("2024-04", 1)]
+
+        both = await search_service.search(sqlite_db, "assets", tags=["HERO", "warm-tones"])
+        assert [a.name for a, _ in both.items] == ["Sunset hero banner"]
+        assert (await search_service.search(sqlite_db, "assets", tags=["missing"])).total == 0
+
+        templates = await search_service.search(sqlite_db, "templates", filters={"category": ["hero"]})
+        assert templates.facets["category"] == [("hero", 1)] and templates.facets["tag"] == [("Hero", 1), ("Landing", 1)]
+
+        with pytest.raises(ValueError):
+            await search_service.search(sqlite_db, "templates", filters={"format": ["png"]})
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_large_match_sets_use_sampled_facets(monkeypatch):
+    """Test facets over many matches are estimated from a uniform id sample while the total stays exact"""
+    monkeypatch.setattr(settings, "SEARCH_FACET_SAMPLE_SIZE", 500)
+    async with _database() as sqlite_db:
+        user = User(email="bulk@example.com")
+        sqlite_db.add(user)
+        await sqlite_db.flush()
+        await sqlite_db.execute(insert(Asset), [
+            {"id": uuid.uuid4(), "user_id": user.id, "name": f"asset {i}", "type": "svg" if i % 4 == 0 else "image",
+             "format": "png", "is_public": True, "is_deleted": False}
+            for i in range(4000)
+        ])
+        await sqlite_db.commit()
+
+        results = await search_service.search(sqlite_db, "assets", limit=5)
+        assert results.total == 4000 and results.facets_estimated
+        estimated = dict(results.facets["type"])
+        assert abs(estimated["image"] - 3000) < 450 and abs(estimated["svg"] - 1000) < 300
+
+        exact = await search_service.search(sqlite_db, "assets", "asset 8", filters={"type": ["svg"]})
+        assert not exact.facets_estimated and exact.facets["type"] == [("svg", exact.total)]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_tag_links_counts_and_backfill():
+    """Test set_tags keeps links, committed usage counts and the comma field in sync, backfill migrates legacy tags and rollbacks are not counted"""
+    async with _database() as sqlite_db:
+        _, assets, _ = await _seed(sqlite_db)
+
+        changes = await search_service.set_tags(sqlite_db, "assets", assets["sunset_plain"], ["Warm tones", "Minimal"])
+        legacy = Asset(user_id=assets["sunset"].user_id, name="Legacy", type="image", tags="Hero,minimal, Retro", is_public=True)
+        sqlite_db.add(legacy)
+        await sqlite_db.commit()
+        await search_service.count_tag_usage(changes.usage)
+        await usage_counters.flush(sqlite_db)
+
+        counts = await _tag_counts(sqlite_db)
+        assert counts["hero"] == 2 and counts["warm-tones"] == 2 and counts["minimal"] == 1 and counts["icons"] == 1
+        assert assets["sunset_plain"].tags == "Warm tones,Minimal"
+        minimal = await search_service.search(sqlite_db, "assets", "minimal")
+        assert {a.name for a, _ in minimal.items} == {"Sunset banner", "Legacy"}  # 旧数据的逗号字段同样可检索
+
+        assert await search_service.backfill_tags(sqlite_db, "assets", batch_size=1) == 1
+        assert await search_service.backfill_tags(sqlite_db, "assets") == 0
+        await usage_counters.flush(sqlite_db)
+        counts = await _tag_counts(sqlite_db)
+        assert counts["hero"] == 3 and counts["minimal"] == 2 and counts["retro"] == 1
+        links = (await sqlite_db.execute(select(AssetTag).where(AssetTag.asset_id == legacy.id))).scalars().all()
+        assert len(links) == 3
+
+        assert [tag.slug for tag in await search_service.popular_tags(sqlite_db, "m")] == ["minimal"]
+        await search_service.rebuild_index(sqlite_db)
+        assert (await search_service.search(sqlite_db, "assets", "retro")).total == 1
+
+        # 回滚的打标签不计数
+        rolled_back = await search_service.set_tags(sqlite_db, "assets", assets["icon"], ["Hero", "Unreleased"])
+        usage = dict(rolled_back.usage)
+        await sqlite_db.rollback()
+        assert sorted(usage.values()) == [-1, 1, 1]
+        assert [await usage_counters.pending("tags", tag_id) for tag_id in usage] == [0, 0, 0]
+        await usage_counters.flush(sqlite_db)
+        assert await _tag_counts(sqlite_db) == counts
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_search_endpoints():
+    """Test /search/assets, /search/templates and /search/tags return ranked hits with facets"""
+    env = BenchEnvironment()
+    async with env as app:
+        async with env.sessions() as db:
+            user, _, _ = await _seed(db)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            assets = await client.get("/api/v1/search/assets", params={"q": "sunset", "tag": "hero", "type": "image"})
+            templates = await client.get("/api/v1/search/templates", params={"q": "hero", "facets": "false"})
+            tags = await client.get("/api/v1/search/tags", params={"prefix": "he"})
+            invalid = await client.get("/api/v1/search/assets", params={"sort": "random"})
+            # 客户端传入的user_id不能打开他人的私有内容
+            spoofed = await client.get("/api/v1/search/assets", params={"q": "sunset", "user_id": str(user.id)})
+
+    body = assets.json()
+    assert assets.status_code == 200 and body["total"] == 2
+    assert [hit["name"] for hit in body["results"]] == ["Sunset hero banner", "Sunset banner"]
+    assert body["results"][0]["tags"] == ["Hero", "Warm tones"] and body["results"][0]["score"] > 0
+    assert {"value": "2024-03", "count": 1} in body["facets"]["date"]
+
+    assert templates.status_code == 200 and templates.json()["total"] is None
+    assert [hit["slug"] for hit in templates.json()["results"]] == ["hero-modern", "login"]
+    assert tags.json() == [{"name": "Hero", "slug": "hero", "color": None, "usage_count": 3}]
+    assert invalid.status_code == 422
+    assert spoofed.status_code == 200 and "Sunset draft" not in [hit["name"] for hit in spoofed.json()["results"]]
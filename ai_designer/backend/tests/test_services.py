@@ -192,3 +192,40 @@ class TestModelManager:
 
         manager = ModelManager()
         assert manager.is_loaded("image_generator") is False
+
+    def test_scheduler_profile_detection(self):
+        """Test few-step scheduler selection from model id"""
+        from services.ai_models import resolve_scheduler_profile
+
+        assert resolve_scheduler_profile("stabilityai/sdxl-turbo")["name"] == "turbo"
+        assert resolve_scheduler_profile("latent-consistency/lcm-sdxl")["name"] == "lcm"
+        assert resolve_scheduler_profile("ByteDance/SDXL-Lightning")["name"] == "lightning"
+        assert resolve_scheduler_profile("stabilityai/stable-diffusion-xl-base-1.0")["name"] == "dpm"
+        assert resolve_scheduler_profile("stabilityai/sdxl-turbo", "dpm")["name"] == "dpm"
+
+        with pytest.raises(ValueError):
+            resolve_scheduler_profile("any", "unknown")
+
+    def test_apply_scheduler_profile(self):
+        """Test step and guidance limits of few-step models"""
+        from services.ai_models import apply_scheduler_profile, resolve_scheduler_profile
+
+        turbo = resolve_scheduler_profile("stabilityai/sdxl-turbo")
+        kwargs = apply_scheduler_profile({"num_inference_steps": 50, "guidance_scale": 7.5}, turbo)
+        assert kwargs == {"num_inference_steps": 4, "guidance_scale": 0.0}
+
+        dpm = resolve_scheduler_profile("stabilityai/stable-diffusion-xl-base-1.0")
+        kwargs = apply_scheduler_profile({"num_inference_steps": 50, "guidance_scale": 7.5}, dpm)
+        assert kwargs == {"num_inference_steps": 50, "guidance_scale": 7.5}
+
+    def test_cpu_runtime_selection(self, monkeypatch):
+        """Test bf16 detection and CPU runtime fallback"""
+        from services import ai_models
+
+        assert ai_models.cpu_supports_bf16("flags\t\t: fpu sse avx512f avx512_bf16\n") is True
+        assert ai_models.cpu_supports_bf16("flags\t\t: fpu sse avx2\n") is False
+
+        monkeypatch.setattr(ai_models, "OPENVINO_AVAILABLE", False)
+        monkeypatch.setattr(ai_models, "ONNX_AVAILABLE", True)
+        assert ai_models.resolve_cpu_runtime("auto") == "onnx"
+        assert ai_models.resolve_cpu_runtime("openvino") == "torch"
@@ -0,0 +1,155 @@
+"""
+Template Engine Tests
+"""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import uuid
+
+import httpx
+import pytest
+
+from benchmarks.runner import BenchEnvironment
+from core.config import settings
+from models import Template
+from services.template_engine import TemplateEngine, TemplateRenderError, compile_template
+
+HERO_PROMPT = "Modern hero banner for website, {title}, {style} design, gradient background"
+BUTTON_SNIPPET = (
+    "export const Button = () => (\n"
+    "  <button style={{ color: '{{ color }}' }} onClick={() => track('{{name}}')}>{label}</button>\n"
+    ");"
+)
+
+
+def _template(**kwargs):
+    values = {
+        "id": uuid.uuid4(), "slug": "hero", "prompt_template": HERO_PROMPT, "code_snippet": BUTTON_SNIPPET,
+        "parameters": '{"width": 1920, "style": "modern"}', "created_at": datetime(2024, 1, 1), "updated_at": None,
+    }
+    values.update(kwargs)
+    return SimpleNamespace(**values)
+
+
+@pytest.mark.unit
+def test_compile_and_render_prompt():
+    """Test prompt templates substitute {name} variables, fall back to parameter defaults and keep other braces"""
+    engine = TemplateEngine()
+    template = _template()
+
+    compiled = engine.compiled(template)
+    assert compiled.variables == ("title", "style") and compiled.defaults == {"style": "modern"}
+    assert engine.render(template, {"title": "Coffee shop"}) == (
+        "Modern hero banner for website, Coffee shop, modern design, gradient background"
+    )
+    assert engine.render(template, {"title": "A", "style": "flat", "unused": 1}).endswith("A, flat design, gradient background")
+
+    with pytest.raises(TemplateRenderError, match="title"):
+        engine.render(template, {})
+    assert compile_template("JSON like {\"a\": 1} and {{ not a variable }} stay").render() == (
+        "JSON like {\"a\": 1} and {{ not a variable }} stay"
+    )
+
+
+@pytest.mark.unit
+def test_code_snippets_use_double_brace_placeholders():
+    """Test code snippets only substitute {{ name }} so JSX and CSS braces pass through untouched"""
+    engine = TemplateEngine()
+    template = _template()
+
+    compiled = engine.compiled(template, "code_snippet")
+    assert compiled.variables == ("color", "name")
+    rendered = engine.render(template, {"color": "#fff", "name": "cta"}, "code_snippet")
+    assert rendered == BUTTON_SNIPPET.replace("{{ color }}", "#fff").replace("{{name}}", "cta")
+
+    with pytest.raises(ValueError):
+        engine.compiled(_template(code_snippet=None), "code_snippet")
+    with pytest.raises(ValueError):
+        engine.compiled(template, "description")
+
+
+@pytest.mark.unit
+def test_compiled_templates_are_cached_by_id_and_version():
+    """Test a template is parsed once per updated_at and source, and the cache is bounded"""
+    engine = TemplateEngine(max_entries=2)
+    template = _template()
+
+    first = engine.compiled(template)
+    assert engine.compiled(_template(id=template.id)) is first  # 重新加载的同一版本
+
+    edited = _template(id=template.id, prompt_template="Flat banner, {title}")
+    assert engine.compiled(edited) is not first and engine.compiled(edited).variables == ("title",)
+    touched = _template(id=template.id, prompt_template="Flat banner, {title}", updated_at=datetime(2024, 2, 1))
+    assert engine.compiled(touched) is not engine.compiled(edited)
+
+    for _ in range(3):
+        engine.compiled(_template())
+    assert len(engine) == 2
+    engine.invalidate(template.id)
+    engine.clear()
+    assert len(engine) == 0
+
+
+@pytest.mark.unit
+def test_render_grid_expands_every_combination(monkeypatch):
+    """Test grid rendering returns the cartesian product in order and rejects grids over TEMPLATE_GRID_MAX"""
+    engine = TemplateEngine()
+    template = _template()
+
+    rendered = engine.render_grid(template, {"title": ["A", "B"], "style": ["flat", "glass", "neon"]})
+    assert len(rendered) == 6
+    assert rendered[0] == ({"title": "A", "style": "flat"}, "Modern hero banner for website, A, flat design, gradient background")
+    assert [point for point, _ in rendered][:3] == [
+        {"title": "A", "style": style} for style in ("flat", "glass", "neon")
+    ]
+    assert {text for _, text in engine.render_grid(template, {"title": ["A", "B"]})} == {
+        "Modern hero banner for website, A, modern design, gradient background",
+        "Modern hero banner for website, B, modern design, gradient background",
+    }
+
+    with pytest.raises(TemplateRenderError, match="style"):
+        compile_template("{title} {style}").render_grid({"title": ["A"]})
+    monkeypatch.setattr(settings, "TEMPLATE_GRID_MAX", 4)
+    with pytest.raises(TemplateRenderError, match="6 combinations"):
+        engine.render_grid(template, {"title": ["A", "B"], "style": ["flat", "glass", "neon"]})
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_render_endpoints():
+    """Test /templates/{id}/render and /render-grid substitute variables, report errors and hide private templates"""
+    env = BenchEnvironment()
+    async with env as app:
+        async with env.sessions() as db:
+            template = Template(
+                name="Hero", slug="hero-render", type="code", prompt_template=HERO_PROMPT,
+                code_snippet=BUTTON_SNIPPET, parameters='{"style": "modern"}', is_public=True,
+                created_at=datetime.now() - timedelta(days=1),
+            )
+            private = Template(
+                name="Draft", slug="draft-render", type="image", prompt_template=HERO_PROMPT, is_public=False
+            )
+            db.add_all([template, private])
+            await db.commit()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            base = f"/api/v1/templates/{template.id}"
+            prompt = await client.post(f"{base}/render", json={"variables": {"title": "Bakery"}})
+            code = await client.post(f"{base}/render", json={
+                "field": "code_snippet", "variables": {"color": "red", "name": "buy"}
+            })
+            grid = await client.post(f"{base}/render-grid", json={"grid": {"title": ["A", "B"], "style": ["x", "y"]}})
+            missing = await client.post(f"{base}/render", json={})
+            unknown = await client.post(f"/api/v1/templates/{uuid.uuid4()}/render", json={})
+            hidden = [
+                await client.post(f"/api/v1/templates/{private.id}/render", json={"variables": {"title": "A"}}),
+                await client.post(f"/api/v1/templates/{private.id}/render-grid", json={"grid": {"title": ["A"]}}),
+            ]
+
+    assert prompt.json()["text"] == "Modern hero banner for website, Bakery, modern design, gradient background"
+    assert "color: 'red'" in code.json()["text"] and "track('buy')" in code.json()["text"]
+    assert [item["variables"] for item in grid.json()["items"]] == [
+        {"title": "A", "style": "x"}, {"title": "A", "style": "y"}, {"title": "B", "style": "x"}, {"title": "B", "style": "y"},
+    ]
+    assert missing.status_code == 400 and "title" in missing.json()["detail"]
+    assert unknown.status_code == 404
+    assert [response.status_code for response in hidden] == [404, 404]
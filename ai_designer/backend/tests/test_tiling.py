@@ -0,0 +1,113 @@
+"""
+Tiled Generation Tests
+"""
+
+import tracemalloc
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from services.image_generation import ImageGenerationService
+from services.tiling import TiledPipeline, base_size, estimate_decode_mb, plan_tiles, tiled_map
+
+# 模拟每像素32字节的激活内存
+ACTIVATION_BYTES_PER_PIXEL = 32
+TILE = 256
+OVERLAP = 32
+MAX_BASE_PIXELS = 512 * 512
+
+
+class ActivationPipeline:
+    """按实际处理的像素数分配激活内存的pipeline，用于测量峰值"""
+
+    device = "cpu"
+
+    def __init__(self):
+        self.vae_tiling = False
+        self.calls = []
+
+    def enable_vae_tiling(self):
+        self.vae_tiling = True
+
+    def disable_vae_tiling(self):
+        self.vae_tiling = False
+
+    def __call__(self, width, height, image=None, **kwargs):
+        self.calls.append((width, height, self.vae_tiling))
+        pixels = min(width, TILE) * min(height, TILE) if self.vae_tiling else width * height
+        activations = np.ones(pixels * ACTIVATION_BYTES_PER_PIXEL // 4, dtype=np.float32)
+        color = (int(activations[0]) * 100, 120, 140)
+        del activations
+        return SimpleNamespace(images=[image or Image.new("RGB", (width, height), color)])
+
+
+@pytest.mark.unit
+def test_plan_tiles_covers_image():
+    """Test tiles cover the image with uniform size and overlap"""
+    tiles = plan_tiles(1920, 1080, 512, 64)
+
+    covered = np.zeros((1080, 1920), dtype=bool)
+    for left, top, right, bottom in tiles:
+        assert (right - left, bottom - top) == (512, 512)
+        covered[top:bottom, left:right] = True
+    assert covered.all()
+
+    assert plan_tiles(400, 300, 512, 64) == [(0, 0, 400, 300)]
+    with pytest.raises(ValueError):
+        plan_tiles(100, 100, 64, 64)
+
+
+@pytest.mark.unit
+def test_tiled_map_is_seamless_for_identity():
+    """Test that an identity pass reproduces the image exactly"""
+    image = Image.linear_gradient("L").resize((700, 300)).convert("RGB")
+    assert tiled_map(image, lambda tile: tile, TILE, OVERLAP).tobytes() == image.tobytes()
+
+
+@pytest.mark.unit
+def test_base_size_keeps_aspect():
+    """Test base generation size for oversized requests"""
+    assert base_size(1024, 576, 2048 * 2048) == (1024, 576)
+    width, height = base_size(1920, 1080, 1024 * 1024)
+    assert width * height <= 1024 * 1024
+    assert width % 64 == 0 and height % 64 == 0
+    assert abs(width / height - 16 / 9) < 0.1
+
+
+def _peak_bytes(pipe, width, height) -> int:
+    tracemalloc.start()
+    try:
+        result = pipe(prompt="hero", width=width, height=height, num_inference_steps=4)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert result.images[0].size == (width, height)
+    return peak
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("preset", list(ImageGenerationService.SIZE_PRESETS))
+def test_peak_memory_bounded_at_each_preset(preset):
+    """Test peak memory is bounded by tile/base size at every size preset"""
+    width, height = ImageGenerationService.SIZE_PRESETS[preset]
+    inner = ActivationPipeline()
+    pipe = TiledPipeline(
+        inner,
+        memory_budget_mb=int(estimate_decode_mb(512, 512, 4)),
+        tile_size=TILE,
+        overlap=OVERLAP,
+        max_base_pixels=MAX_BASE_PIXELS,
+        refiner=inner,
+    )
+
+    peak = _peak_bytes(pipe, width, height)
+    untiled_peak = _peak_bytes(ActivationPipeline(), width, height)
+
+    # 最大的一次分配来自基础尺寸生成，其余开销（羽化蒙版等）远小于1MB
+    bound = MAX_BASE_PIXELS * ACTIVATION_BYTES_PER_PIXEL + 2**20
+    assert peak <= bound, f"{preset}: {peak / 2**20:.1f}MB > {bound / 2**20:.1f}MB"
+    if width * height > MAX_BASE_PIXELS:
+        assert untiled_peak > bound
+        assert all(w <= TILE and h <= TILE for w, h, _ in inner.calls[1:])
@@ -0,0 +1,100 @@
+"""
+Traffic Capture and Replay Tests
+"""
+
+import hashlib
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from benchmarks.replay import replay, route_namer, synthesize_capture, write_capture
+from benchmarks.runner import BenchEnvironment
+from core.traffic import TrafficRecorder, load_capture
+from middleware.traffic_capture import TrafficCaptureMiddleware
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(payload: dict):
+        return payload
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int, q: str = ""):
+        return {"id": item_id, "q": q}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    return app
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_middleware_records_requests_without_headers(tmp_path):
+    """Test captured lines carry method, path, body and timing but no credentials"""
+    recorder = TrafficRecorder(tmp_path / "capture.jsonl")
+    app = TrafficCaptureMiddleware(_app(), recorder=recorder, sample_rate=1.0, max_body_bytes=32, skip_paths=["/health"])
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.post("/echo", json={"a": 1})).status_code == 200
+        await client.get("/items/7", params={"q": "x"}, headers={"Authorization": "Bearer secret"})
+        await client.get("/health")
+        await client.post("/echo", json={"large": "y" * 64})
+    recorder.close()
+
+    records = load_capture([recorder.path])
+    assert [(r["method"], r["path"]) for r in records] == [("POST", "/echo"), ("GET", "/items/7"), ("POST", "/echo")]
+    assert records[0]["offset"] == 0.0 and records[0]["status"] == 200 and records[0]["duration_ms"] > 0
+    assert records[0]["body"] == '{"a": 1}'
+    assert records[0]["body_sha256"] == hashlib.sha256(b'{"a": 1}').hexdigest()
+    assert records[1]["query"] == "q=x" and records[1]["body_size"] == 0
+    assert "secret" not in recorder.path.read_text()
+    # 超过上限的请求体只保留哈希
+    assert records[2]["body"] is None and records[2]["body_sha256"] and records[2]["body_size"] > 32
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_replay_honours_compressed_arrival_times():
+    """Test replay keeps order and spacing divided by speed, groups routes and skips hash-only bodies"""
+    app = _app()
+    records = [
+        {"method": "GET", "path": f"/items/{i}", "query": "", "offset": i * 0.2, "status": 200, "duration_ms": 5.0}
+        for i in range(3)
+    ]
+    records.append({"method": "POST", "path": "/echo", "offset": 0.1, "body": None, "body_size": 10})
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        report = await replay(client, records, speed=2.0, route_name=route_namer(app))
+
+    assert report["requests"] == 3 and report["errors"] == 0 and report["skipped"] == 1
+    assert 0.2 <= report["elapsed_s"] < 0.5
+    route = report["routes"]["GET /items/{item_id}"]
+    assert route["requests"] == 3 and route["status_mismatches"] == 0
+    assert route["recorded_latency_ms"]["p50"] == 5.0
+    assert route["lag_ms"]["max"] < 50
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_synthesized_capture_replays_offline(tmp_path):
+    """Test synthesized traffic is deterministic, round-trips through a file and replays against stubs"""
+    records = synthesize_capture("mixed", 30, rate=50.0, seed=5)
+    assert records == synthesize_capture("mixed", 30, rate=50.0, seed=5)
+    assert [r["offset"] for r in records] == sorted(r["offset"] for r in records)
+
+    write_capture(records, tmp_path / "mixed.jsonl")
+    loaded = load_capture([tmp_path / "mixed.jsonl"])
+    assert [(r["path"], r["body"]) for r in loaded] == [(r["path"], r["body"]) for r in records]
+
+    async with BenchEnvironment(image_seconds_per_megapixel_step=0) as app:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+            report = await replay(client, loaded, speed=0, route_name=route_namer(app))
+
+    assert report["requests"] == 30 and report["errors"] == 0, report["routes"]
+    assert all(route.startswith("POST /api/v1/") for route in report["routes"])
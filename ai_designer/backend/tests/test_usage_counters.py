@@ -0,0 +1,178 @@
+"""
+Usage Counter Tests
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+from fakeredis import aioredis
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import models  # noqa: F401
+from benchmarks.runner import BenchEnvironment
+from core.database import Base
+from core.redis import cache
+from models import Tag, Template
+from services.usage_counters import PENDING_KEY, UsageCounters
+
+
+@asynccontextmanager
+async def _database():
+    """内存SQLite"""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+            yield session
+    finally:
+        await engine.dispose()
+
+
+async def _templates(db, count=3):
+    templates = [
+        Template(name=f"Template {i}", slug=f"template-{i}", type="image", category="hero" if i % 2 else "auth",
+                 is_public=True, rating=i)
+        for i in range(count)
+    ]
+    db.add_all(templates)
+    await db.commit()
+    return templates
+
+
+async def _usage(db, model=Template):
+    db.expire_all()
+    return {row.slug: row.usage_count for row in (await db.execute(select(model))).scalars()}
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_increments_are_buffered_and_flushed_in_bulk():
+    """Test concurrent increments accumulate in memory shards and one flush adds the summed deltas"""
+    async with _database() as db:
+        templates = await _templates(db)
+        counters = UsageCounters(backend="memory", shards=4)
+
+        def bump(_):
+            counters._add_local("templates", [templates[0].id], 1)
+
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(bump, range(2000)))
+        await counters.increment("templates", [templates[1].id, templates[2].id], 3)
+        await counters.increment("templates", [templates[2].id], -1)
+
+        assert await _usage(db) == {"template-0": 0, "template-1": 0, "template-2": 0}
+        assert await counters.pending("templates", templates[0].id) == 2000
+
+        assert await counters.flush(db) == 3
+        assert await _usage(db) == {"template-0": 2000, "template-1": 3, "template-2": 2}
+        assert await counters.pending("templates", templates[0].id) == 0
+        assert await counters.flush(db) == 0
+
+        with pytest.raises(ValueError):
+            await counters.increment("users", [templates[0].id])
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_deltas():
+    """Test a failed write-back returns the drained deltas so the next flush applies them"""
+    async with _database() as db:
+        templates = await _templates(db, 1)
+        counters = UsageCounters(backend="memory")
+        await counters.increment("templates", [templates[0].id], 5)
+
+        await db.execute(update(Template).values(usage_count=0))
+        await db.commit()
+        original = counters._apply
+
+        async def broken(session, drained):
+            raise RuntimeError("database unavailable")
+
+        counters._apply = broken
+        with pytest.raises(RuntimeError):
+            await counters.flush(db)
+        assert await counters.pending("templates", templates[0].id) == 5
+
+        counters._apply = original
+        assert await counters.flush(db) == 1
+        assert (await _usage(db))["template-0"] == 5
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_redis_backend_shares_pending_deltas():
+    """Test the redis backend accumulates in a hash visible to every worker and a flush drains it"""
+    previous = cache._client
+    cache._client = aioredis.FakeRedis(decode_responses=True)
+    try:
+        async with _database() as db:
+            templates = await _templates(db, 1)
+            tag = Tag(name="Hero", slug="hero")
+            db.add(tag)
+            await db.commit()
+
+            first, second = UsageCounters(backend="redis"), UsageCounters(backend="redis")
+            await first.increment("templates", [templates[0].id], 2)
+            await second.increment("templates", [templates[0].id])
+            await second.increment("tags", [tag.id])
+            assert await first.pending("templates", templates[0].id) == 3
+            assert await cache._client.hget(PENDING_KEY.format(kind="templates"), str(templates[0].id)) == "3"
+
+            assert await first.flush(db) == 2
+            assert (await _usage(db))["template-0"] == 3 and (await _usage(db, Tag))["hero"] == 1
+            assert await cache._client.keys("usage:pending:*") == []
+            assert await second.flush(db) == 0
+    finally:
+        cache._client = previous
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_popular_listing_is_precomputed_and_refreshed_on_flush():
+    """Test the popular listing is served from cache until a flush recomputes it"""
+    async with _database() as db:
+        templates = await _templates(db)
+        counters = UsageCounters(backend="memory")
+
+        listing = await counters.popular_templates(db)
+        assert [t["slug"] for t in listing] == ["template-2", "template-1", "template-0"]  # 同为0次时按评分
+        assert [t["slug"] for t in await counters.popular_templates(db, category="hero")] == ["template-1"]
+
+        await db.execute(update(Template).where(Template.slug == "template-0").values(usage_count=50))
+        await db.commit()
+        assert (await counters.popular_templates(db, limit=1))[0]["slug"] == "template-2"  # 缓存中的列表
+
+        await counters.increment("templates", [templates[1].id], 100)
+        await counters.flush(db)
+        refreshed = await counters.popular_templates(db, limit=2)
+        assert [(t["slug"], t["usage_count"]) for t in refreshed] == [("template-1", 100), ("template-0", 50)]
+
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_template_endpoints():
+    """Test /templates/{id}/use counts without writing and /templates/popular reflects flushed counts"""
+    from services.usage_counters import usage_counters
+
+    env = BenchEnvironment()
+    async with env as app:
+        async with env.sessions() as db:
+            templates = await _templates(db)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            for _ in range(3):
+                used = await client.post(f"/api/v1/templates/{templates[0].id}/use")
+            missing = await client.post("/api/v1/templates/00000000-0000-0000-0000-000000000000/use")
+            async with env.sessions() as db:
+                assert (await _usage(db))["template-0"] == 0
+                await usage_counters.flush(db)
+            popular = await client.get("/api/v1/templates/popular", params={"limit": 2})
+
+    assert used.status_code == 200 and used.json()["usage_count"] == 3
+    assert missing.status_code == 404
+    body = popular.json()
+    assert [t["slug"] for t in body["templates"]] == ["template-0", "template-2"]
+    assert body["templates"][0]["usage_count"] == 3
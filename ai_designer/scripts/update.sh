@@ -44,7 +44,8 @@ restart_services() {
 # 数据库迁移
 run_migrations() {
     log_info "运行数据库迁移..."
-    docker-compose exec backend alembic upgrade head
+    # 用新构建的镜像执行迁移（运行中的旧容器里是旧版本的迁移脚本）
+    docker-compose run --rm backend python scripts/migrate.py upgrade
     log_success "数据库迁移完成"
 }
 